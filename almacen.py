@@ -0,0 +1,134 @@
+# almacen.py - Capa de almacenamiento intercambiable (memoria o SQLite)
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple
+
+from carritos import RepositorioCarritos
+from eventos import OutboxMemoria
+from ordenes import RepositorioOrdenes
+from stock import BaseMotorStock, MotorStock
+from ventas import LibroVentas
+
+
+# ----- INTERFACES -----
+class Ordenes(Protocol):
+    def agregar(self, orden: Dict) -> Dict: ...
+    def obtener(self, orden_id: str) -> Optional[Dict]: ...
+    def actualizar(self, orden_id: str, **campos) -> Dict: ...
+    def transicion(self, orden_id: str, estado: str, **campos) -> Dict: ...
+    def cambiar_estado(self, orden_id: str, estado: str) -> Dict: ...
+    def eliminar(self, orden_id: str) -> Optional[Dict]: ...
+    def buscar(self, campo: str, valor) -> List[Dict]: ...
+    def contar(self, campo: str, valor) -> int: ...
+    def pagina(self, estado: str, modo: Optional[str] = None, despues: Optional[int] = None,
+               limite: int = 50) -> Tuple[List[Dict], Optional[int]]: ...
+    def contar_cola(self, estado: str, modo: Optional[str] = None) -> int: ...
+    def __len__(self) -> int: ...
+    def __iter__(self) -> Iterator[Dict]: ...
+
+
+class Ventas(Protocol):
+    def agregar(self, venta: Dict) -> Dict: ...
+    def obtener(self, venta_id: str) -> Optional[Dict]: ...
+    def actualizar(self, venta_id: str, **campos) -> Dict: ...
+    def actualizar_si(self, venta_id: str, campo: str, esperado, **campos) -> Optional[Dict]: ...
+    def por_orden(self, orden_id: str) -> Optional[Dict]: ...
+    def por_tienda(self, tienda_id: str) -> List[Dict]: ...
+    def __len__(self) -> int: ...
+    def __iter__(self) -> Iterator[Dict]: ...
+
+
+class Carritos(Protocol):
+    def obtener(self, carrito_id: str) -> Optional[Dict]: ...
+    def guardar(self, carrito_id: str, carrito: Dict) -> Dict: ...
+    def eliminar(self, carrito_id: str) -> Optional[Dict]: ...
+    def __len__(self) -> int: ...
+
+
+class Outbox(Protocol):
+    def agregar(self, evento: Dict, suscriptores: List[str]): ...
+    def completar(self, evento_id: str, suscriptor: str): ...
+    def fallar(self, evento_id: str, suscriptor: str, error: str): ...
+    def pendientes(self) -> Iterator[Tuple[Dict, str]]: ...
+    def __len__(self) -> int: ...
+
+
+class Almacen:
+    """Agrupa los repositorios de los que dependen los endpoints (y el outbox del bus de eventos)"""
+
+    def __init__(self, ordenes: Ordenes, ventas: Ventas, carritos: Carritos, stock: BaseMotorStock, pool=None,
+                 outbox: Optional[Outbox] = None):
+        self.ordenes = ordenes
+        self.ventas = ventas
+        self.carritos = carritos
+        self.stock = stock
+        self.outbox = outbox if outbox is not None else OutboxMemoria()
+        self._pool = pool
+
+    def cerrar(self):
+        self.stock.cerrar()
+        if self._pool is not None:
+            self._pool.cerrar()
+
+
+# ----- BACKENDS -----
+def crear_almacen_memoria(stock: Dict, ttl_reserva: float = 900, ventas_compactas: bool = False,
+                          stock_columnar: bool = False, stock_compartido: Optional[str] = None,
+                          ruta_outbox: Optional[str] = None) -> Almacen:
+    """Backend en memoria: los dicts del proceso son la fuente de verdad.
+
+    Con `stock_columnar` el stock vive en arreglos contiguos (stock_columnar.py)
+    y el dict inicial solo se usa para cargarlos. Con `stock_compartido` las
+    unidades viven en el segmento de memoria compartida de ese nombre
+    (stock_compartido.py), común a todos los workers. El outbox de eventos
+    está en memoria salvo que se indique `ruta_outbox` (un archivo SQLite).
+    """
+    if stock_compartido:
+        from stock_compartido import MotorStockCompartido
+        motor = MotorStockCompartido(stock, nombre=stock_compartido, ttl_reserva=ttl_reserva)
+    elif stock_columnar:
+        from stock_columnar import MotorStockColumnar
+        motor = MotorStockColumnar(stock, ttl_reserva=ttl_reserva)
+    else:
+        motor = MotorStock(stock, ttl_reserva=ttl_reserva)
+    pool = outbox = None
+    if ruta_outbox:
+        from almacen_sqlite import OutboxSQLite, PoolConexiones
+        pool = PoolConexiones(ruta_outbox, esquema="")
+        outbox = OutboxSQLite(pool)
+    return Almacen(
+        ordenes=RepositorioOrdenes(),
+        ventas=LibroVentas(compacto=ventas_compactas),
+        carritos=RepositorioCarritos(),
+        stock=motor,
+        pool=pool,
+        outbox=outbox
+    )
+
+
+def crear_almacen_sqlite(ruta: str, stock: Dict, ttl_reserva: float = 900) -> Almacen:
+    """Backend SQLite en modo WAL; `stock` solo se usa para sembrar una base nueva"""
+    from almacen_sqlite import (LibroVentasSQLite, MotorStockSQLite, OutboxSQLite, PoolConexiones,
+                                RepositorioCarritosSQLite, RepositorioOrdenesSQLite)
+
+    pool = PoolConexiones(ruta)
+    motor = MotorStockSQLite(pool, ttl_reserva=ttl_reserva)
+    motor.cargar(stock)
+    return Almacen(
+        ordenes=RepositorioOrdenesSQLite(pool),
+        ventas=LibroVentasSQLite(pool),
+        carritos=RepositorioCarritosSQLite(pool),
+        stock=motor,
+        pool=pool,
+        outbox=OutboxSQLite(pool)
+    )
+
+
+def crear_almacen(backend: str, stock: Dict, ruta: str = "mifarma.db", ttl_reserva: float = 900,
+                  ventas_compactas: bool = False, stock_columnar: bool = False,
+                  stock_compartido: Optional[str] = None, ruta_outbox: Optional[str] = None) -> Almacen:
+    if backend == "memoria":
+        return crear_almacen_memoria(stock, ttl_reserva=ttl_reserva, ventas_compactas=ventas_compactas,
+                                     stock_columnar=stock_columnar, stock_compartido=stock_compartido,
+                                     ruta_outbox=ruta_outbox)
+    if backend == "sqlite":
+        return crear_almacen_sqlite(ruta, stock, ttl_reserva=ttl_reserva)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
@@ -0,0 +1,73 @@
+# almacen_async.py - Adaptadores asíncronos sobre los repositorios del almacén
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+
+
+class RepositorioAsync:
+    """Expone los métodos de un repositorio síncrono como corrutinas.
+
+    Sin ejecutor, las llamadas se hacen directamente en el event loop: sirve
+    para los repositorios en memoria, cuyas operaciones son O(1) y no hacen
+    I/O. Con ejecutor, cada llamada corre en ese pool de tamaño fijo, así que
+    la E/S bloqueante (SQLite) nunca ocupa el event loop ni el threadpool
+    por defecto de Starlette.
+    """
+
+    def __init__(self, repositorio, ejecutor: Optional[Executor] = None):
+        self._repositorio = repositorio
+        self._ejecutor = ejecutor
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._repositorio, nombre)
+        if not callable(atributo):
+            return atributo
+        if self._ejecutor is None:
+            async def llamada(*args, **kwargs):
+                return atributo(*args, **kwargs)
+        else:
+            ejecutor = self._ejecutor
+
+            async def llamada(*args, **kwargs):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(ejecutor, functools.partial(atributo, *args, **kwargs))
+        # Se cachea para no crear la corrutina envolvente en cada llamada
+        setattr(self, nombre, llamada)
+        return llamada
+
+    @property
+    def sincrono(self):
+        """Repositorio original, para tareas en segundo plano que corren en hilos"""
+        return self._repositorio
+
+
+class AlmacenAsync:
+    """Versión asíncrona de Almacen con un ejecutor opcional de tamaño explícito.
+
+    `hilos_stock` da al motor de stock su propio pool aunque el resto del
+    almacén esté en memoria: el stock compartido entre workers espera locks
+    de fcntl, que bloquearían el event loop.
+    """
+
+    def __init__(self, almacen, hilos: Optional[int] = None, hilos_stock: Optional[int] = None):
+        self.almacen = almacen
+        self.ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="almacen") if hilos else None
+        self.ejecutor_stock = (ThreadPoolExecutor(max_workers=hilos_stock, thread_name_prefix="stock")
+                               if hilos_stock and self.ejecutor is None else None)
+        self.ordenes = RepositorioAsync(almacen.ordenes, self.ejecutor)
+        self.ventas = RepositorioAsync(almacen.ventas, self.ejecutor)
+        self.carritos = RepositorioAsync(almacen.carritos, self.ejecutor)
+        self.stock = RepositorioAsync(almacen.stock, self.ejecutor_stock or self.ejecutor)
+
+    async def ejecutar(self, funcion, *args):
+        """Corre una tarea larga sobre los repositorios síncronos en el mismo ejecutor"""
+        if self.ejecutor is None:
+            return funcion(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.ejecutor, functools.partial(funcion, *args))
+
+    def cerrar(self):
+        for ejecutor in (self.ejecutor, self.ejecutor_stock):
+            if ejecutor is not None:
+                ejecutor.shutdown(wait=True)
+        self.almacen.cerrar()
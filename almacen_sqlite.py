@@ -0,0 +1,560 @@
+# almacen_sqlite.py - Backend de persistencia SQLite (WAL, pool por hilo, transacciones por lote)
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from estados import validar_transicion
+from stock import BaseMotorStock, StockInsuficiente, agrupar_items
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS stock (
+    tienda_id   TEXT NOT NULL,
+    producto_id TEXT NOT NULL,
+    nombre      TEXT NOT NULL,
+    precio      REAL NOT NULL,
+    stock       INTEGER NOT NULL CHECK (stock >= 0),
+    PRIMARY KEY (tienda_id, producto_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_stock_producto ON stock (producto_id, stock);
+
+-- Versión por tienda para cachear lecturas; la mantienen los triggers, así
+-- que todos los procesos que comparten el archivo ven el mismo contador
+CREATE TABLE IF NOT EXISTS versiones_stock (
+    tienda_id TEXT PRIMARY KEY,
+    version   INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS stock_version_insert AFTER INSERT ON stock BEGIN
+    INSERT INTO versiones_stock (tienda_id, version) VALUES (NEW.tienda_id, 1)
+        ON CONFLICT (tienda_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS stock_version_update AFTER UPDATE OF stock ON stock BEGIN
+    INSERT INTO versiones_stock (tienda_id, version) VALUES (NEW.tienda_id, 1)
+        ON CONFLICT (tienda_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS reservas (
+    reserva_id TEXT PRIMARY KEY,
+    tienda_id  TEXT NOT NULL,
+    items      TEXT NOT NULL,
+    expira     REAL
+);
+CREATE INDEX IF NOT EXISTS idx_reservas_expira ON reservas (expira) WHERE expira IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS ordenes (
+    orden_id  TEXT PRIMARY KEY,
+    user_id   TEXT,
+    tienda_id TEXT,
+    estado    TEXT,
+    datos     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ordenes_user_id ON ordenes (user_id);
+CREATE INDEX IF NOT EXISTS idx_ordenes_tienda_id ON ordenes (tienda_id);
+CREATE INDEX IF NOT EXISTS idx_ordenes_estado ON ordenes (estado);
+
+-- Colas de trabajo por estado: cada vez que una orden entra a un estado
+-- recibe una secuencia nueva, así que paginar por (estado, secuencia) sigue
+-- el orden de llegada al estado. La mantienen los triggers; el INSERT final
+-- completa las bases creadas antes de que existiera la tabla.
+CREATE TABLE IF NOT EXISTS colas_ordenes (
+    secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+    orden_id  TEXT NOT NULL UNIQUE,
+    estado    TEXT,
+    modalidad TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_colas_estado ON colas_ordenes (estado, secuencia);
+CREATE INDEX IF NOT EXISTS idx_colas_modalidad ON colas_ordenes (estado, modalidad, secuencia);
+CREATE TRIGGER IF NOT EXISTS ordenes_cola_insert AFTER INSERT ON ordenes BEGIN
+    INSERT OR REPLACE INTO colas_ordenes (orden_id, estado, modalidad) VALUES (
+        NEW.orden_id, NEW.estado,
+        CASE WHEN json_extract(NEW.datos, '$.isDelivery') THEN 'delivery' ELSE 'recojo' END);
+END;
+CREATE TRIGGER IF NOT EXISTS ordenes_cola_update AFTER UPDATE OF estado ON ordenes
+WHEN OLD.estado IS NOT NEW.estado BEGIN
+    INSERT OR REPLACE INTO colas_ordenes (orden_id, estado, modalidad) VALUES (
+        NEW.orden_id, NEW.estado,
+        CASE WHEN json_extract(NEW.datos, '$.isDelivery') THEN 'delivery' ELSE 'recojo' END);
+END;
+CREATE TRIGGER IF NOT EXISTS ordenes_cola_delete AFTER DELETE ON ordenes BEGIN
+    DELETE FROM colas_ordenes WHERE orden_id = OLD.orden_id;
+END;
+INSERT OR IGNORE INTO colas_ordenes (orden_id, estado, modalidad)
+    SELECT orden_id, estado, CASE WHEN json_extract(datos, '$.isDelivery') THEN 'delivery' ELSE 'recojo' END
+    FROM ordenes ORDER BY rowid;
+
+CREATE TABLE IF NOT EXISTS ventas (
+    venta_id  TEXT PRIMARY KEY,
+    orden_id  TEXT NOT NULL,
+    tienda_id TEXT NOT NULL,
+    datos     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ventas_orden_id ON ventas (orden_id);
+CREATE INDEX IF NOT EXISTS idx_ventas_tienda_id ON ventas (tienda_id);
+
+CREATE TABLE IF NOT EXISTS carritos (
+    carrito_id TEXT PRIMARY KEY,
+    datos      TEXT NOT NULL
+);
+"""
+
+# Outbox del bus de eventos (eventos.py): cada evento con una fila por
+# suscriptor que todavía no lo procesó; error no nulo = agotó los reintentos
+ESQUEMA_OUTBOX = """
+CREATE TABLE IF NOT EXISTS outbox (
+    evento_id TEXT PRIMARY KEY,
+    tipo      TEXT NOT NULL,
+    datos     TEXT NOT NULL,
+    creado    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox_entregas (
+    evento_id  TEXT NOT NULL,
+    suscriptor TEXT NOT NULL,
+    error      TEXT,
+    PRIMARY KEY (evento_id, suscriptor)
+) WITHOUT ROWID;
+"""
+
+
+def _a_json(datos: Dict) -> str:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+
+
+class PoolConexiones:
+    """Una conexión SQLite por hilo, configurada en modo WAL.
+
+    sqlite3 cachea las sentencias compiladas por conexión (`cached_statements`),
+    así que usar siempre el mismo texto SQL con parámetros equivale a usar
+    sentencias preparadas.
+    """
+
+    def __init__(self, ruta: str, esquema: str = ESQUEMA):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._conexiones: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.conexion().executescript(esquema)
+
+    def conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None,
+                                  check_same_thread=False, cached_statements=512)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+            with self._lock:
+                self._conexiones.append(con)
+        return con
+
+    @contextmanager
+    def transaccion(self):
+        """Transacción de escritura; BEGIN IMMEDIATE evita deadlocks de upgrade"""
+        con = self.conexion()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+
+    def cerrar(self):
+        with self._lock:
+            for con in self._conexiones:
+                con.close()
+            self._conexiones.clear()
+        self._local = threading.local()
+
+
+class RepositorioOrdenesSQLite:
+    """Misma interfaz que RepositorioOrdenes, con las órdenes en la tabla `ordenes`"""
+
+    INDICES = ("user_id", "tienda_id", "estado")
+
+    def __init__(self, pool: PoolConexiones):
+        self._pool = pool
+
+    def agregar(self, orden: Dict) -> Dict:
+        try:
+            with self._pool.transaccion() as con:
+                con.execute(
+                    "INSERT INTO ordenes (orden_id, user_id, tienda_id, estado, datos) VALUES (?, ?, ?, ?, ?)",
+                    (orden["orden_id"], orden.get("user_id"), orden.get("tienda_id"), orden.get("estado"), _a_json(orden))
+                )
+        except sqlite3.IntegrityError:
+            raise KeyError(f"La orden {orden['orden_id']} ya existe")
+        return orden
+
+    def _actualizar(self, con: sqlite3.Connection, orden_id: str, estado: Optional[str], campos: Dict) -> Dict:
+        fila = con.execute("SELECT datos FROM ordenes WHERE orden_id = ?", (orden_id,)).fetchone()
+        if fila is None:
+            raise KeyError(orden_id)
+        orden = json.loads(fila[0])
+        if estado is not None:
+            validar_transicion(orden, estado)
+            campos = {**campos, "estado": estado}
+        orden.update(campos)
+        con.execute(
+            "UPDATE ordenes SET user_id = ?, tienda_id = ?, estado = ?, datos = ? WHERE orden_id = ?",
+            (orden.get("user_id"), orden.get("tienda_id"), orden.get("estado"), _a_json(orden), orden_id)
+        )
+        return orden
+
+    def actualizar(self, orden_id: str, **campos) -> Dict:
+        with self._pool.transaccion() as con:
+            return self._actualizar(con, orden_id, None, campos)
+
+    def transicion(self, orden_id: str, estado: str, **campos) -> Dict:
+        # BEGIN IMMEDIATE: leer, validar y escribir es atómico también entre procesos
+        with self._pool.transaccion() as con:
+            return self._actualizar(con, orden_id, estado, campos)
+
+    def cambiar_estado(self, orden_id: str, estado: str) -> Dict:
+        return self.transicion(orden_id, estado)
+
+    def eliminar(self, orden_id: str) -> Optional[Dict]:
+        with self._pool.transaccion() as con:
+            fila = con.execute("SELECT datos FROM ordenes WHERE orden_id = ?", (orden_id,)).fetchone()
+            con.execute("DELETE FROM ordenes WHERE orden_id = ?", (orden_id,))
+        return None if fila is None else json.loads(fila[0])
+
+    def obtener(self, orden_id: str) -> Optional[Dict]:
+        fila = self._pool.conexion().execute("SELECT datos FROM ordenes WHERE orden_id = ?", (orden_id,)).fetchone()
+        return None if fila is None else json.loads(fila[0])
+
+    def buscar(self, campo: str, valor) -> List[Dict]:
+        if campo not in self.INDICES:
+            raise KeyError(campo)
+        filas = self._pool.conexion().execute(
+            f"SELECT datos FROM ordenes WHERE {campo} = ? ORDER BY rowid", (valor,)
+        ).fetchall()
+        return [json.loads(fila[0]) for fila in filas]
+
+    def por_usuario(self, user_id: str) -> List[Dict]:
+        return self.buscar("user_id", user_id)
+
+    def por_tienda(self, tienda_id: str) -> List[Dict]:
+        return self.buscar("tienda_id", tienda_id)
+
+    def por_estado(self, estado: str) -> List[Dict]:
+        return self.buscar("estado", estado)
+
+    def pagina(self, estado: str, modo: Optional[str] = None, despues: Optional[int] = None,
+               limite: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        filtro, parametros = ("c.estado = ?", [estado]) if modo is None else ("c.estado = ? AND c.modalidad = ?", [estado, modo])
+        filas = self._pool.conexion().execute(
+            f"SELECT c.secuencia, o.datos FROM colas_ordenes c JOIN ordenes o ON o.orden_id = c.orden_id "
+            f"WHERE {filtro} AND c.secuencia > ? ORDER BY c.secuencia LIMIT ?",
+            (*parametros, despues or 0, limite)
+        ).fetchall()
+        return [json.loads(datos) for _, datos in filas], filas[-1][0] if len(filas) == limite else None
+
+    def contar_cola(self, estado: str, modo: Optional[str] = None) -> int:
+        if modo is None:
+            return self.contar("estado", estado)
+        return self._pool.conexion().execute(
+            "SELECT COUNT(*) FROM colas_ordenes WHERE estado = ? AND modalidad = ?", (estado, modo)
+        ).fetchone()[0]
+
+    def contar(self, campo: str, valor) -> int:
+        if campo not in self.INDICES:
+            raise KeyError(campo)
+        return self._pool.conexion().execute(f"SELECT COUNT(*) FROM ordenes WHERE {campo} = ?", (valor,)).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._pool.conexion().execute("SELECT COUNT(*) FROM ordenes").fetchone()[0]
+
+    def __contains__(self, orden_id: str) -> bool:
+        return self._pool.conexion().execute("SELECT 1 FROM ordenes WHERE orden_id = ?", (orden_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[Dict]:
+        filas = self._pool.conexion().execute("SELECT datos FROM ordenes ORDER BY rowid").fetchall()
+        return (json.loads(fila[0]) for fila in filas)
+
+
+class LibroVentasSQLite:
+    """Misma interfaz que LibroVentas, con las ventas en la tabla `ventas`"""
+
+    def __init__(self, pool: PoolConexiones):
+        self._pool = pool
+
+    def agregar(self, venta: Dict) -> Dict:
+        try:
+            with self._pool.transaccion() as con:
+                con.execute(
+                    "INSERT INTO ventas (venta_id, orden_id, tienda_id, datos) VALUES (?, ?, ?, ?)",
+                    (venta["venta_id"], venta["orden_id"], venta["tienda_id"], _a_json(venta))
+                )
+        except sqlite3.IntegrityError:
+            raise KeyError(f"La venta {venta['venta_id']} ya existe")
+        return venta
+
+    def actualizar(self, venta_id: str, **campos) -> Dict:
+        return self.actualizar_si(venta_id, None, None, **campos)
+
+    def actualizar_si(self, venta_id: str, campo: Optional[str], esperado, **campos) -> Optional[Dict]:
+        # BEGIN IMMEDIATE: comparar y escribir es atómico también entre workers
+        with self._pool.transaccion() as con:
+            fila = con.execute("SELECT datos FROM ventas WHERE venta_id = ?", (venta_id,)).fetchone()
+            if fila is None:
+                raise KeyError(venta_id)
+            venta = json.loads(fila[0])
+            if campo is not None and venta.get(campo) != esperado:
+                return None
+            venta.update(campos)
+            con.execute("UPDATE ventas SET datos = ? WHERE venta_id = ?", (_a_json(venta), venta_id))
+        return venta
+
+    def _una(self, sql: str, parametro: str) -> Optional[Dict]:
+        fila = self._pool.conexion().execute(sql, (parametro,)).fetchone()
+        return None if fila is None else json.loads(fila[0])
+
+    def obtener(self, venta_id: str) -> Optional[Dict]:
+        return self._una("SELECT datos FROM ventas WHERE venta_id = ?", venta_id)
+
+    def por_orden(self, orden_id: str) -> Optional[Dict]:
+        return self._una("SELECT datos FROM ventas WHERE orden_id = ? LIMIT 1", orden_id)
+
+    def por_tienda(self, tienda_id: str) -> List[Dict]:
+        filas = self._pool.conexion().execute(
+            "SELECT datos FROM ventas WHERE tienda_id = ? ORDER BY rowid", (tienda_id,)
+        ).fetchall()
+        return [json.loads(fila[0]) for fila in filas]
+
+    def __len__(self) -> int:
+        return self._pool.conexion().execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+
+    def __contains__(self, venta_id: str) -> bool:
+        return self._pool.conexion().execute("SELECT 1 FROM ventas WHERE venta_id = ?", (venta_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[Dict]:
+        filas = self._pool.conexion().execute("SELECT datos FROM ventas ORDER BY rowid").fetchall()
+        return (json.loads(fila[0]) for fila in filas)
+
+
+class RepositorioCarritosSQLite:
+    """Misma interfaz que RepositorioCarritos, con los carritos en la tabla `carritos`"""
+
+    def __init__(self, pool: PoolConexiones):
+        self._pool = pool
+
+    def obtener(self, carrito_id: str) -> Optional[Dict]:
+        fila = self._pool.conexion().execute("SELECT datos FROM carritos WHERE carrito_id = ?", (carrito_id,)).fetchone()
+        return None if fila is None else json.loads(fila[0])
+
+    def guardar(self, carrito_id: str, carrito: Dict) -> Dict:
+        with self._pool.transaccion() as con:
+            con.execute(
+                "INSERT INTO carritos (carrito_id, datos) VALUES (?, ?) "
+                "ON CONFLICT (carrito_id) DO UPDATE SET datos = excluded.datos",
+                (carrito_id, _a_json(carrito))
+            )
+        return carrito
+
+    def eliminar(self, carrito_id: str) -> Optional[Dict]:
+        with self._pool.transaccion() as con:
+            fila = con.execute("SELECT datos FROM carritos WHERE carrito_id = ?", (carrito_id,)).fetchone()
+            con.execute("DELETE FROM carritos WHERE carrito_id = ?", (carrito_id,))
+        return None if fila is None else json.loads(fila[0])
+
+    def __len__(self) -> int:
+        return self._pool.conexion().execute("SELECT COUNT(*) FROM carritos").fetchone()[0]
+
+    def __contains__(self, carrito_id: str) -> bool:
+        return self._pool.conexion().execute("SELECT 1 FROM carritos WHERE carrito_id = ?", (carrito_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (fila[0] for fila in self._pool.conexion().execute("SELECT carrito_id FROM carritos").fetchall())
+
+
+class MotorStockSQLite(BaseMotorStock):
+    """Motor de reservas sobre la tabla `stock`.
+
+    Cada reserva es una sola transacción con un UPDATE condicional por item
+    (`stock >= cantidad`); si alguna fila no se actualiza, la transacción
+    completa se revierte. Las reservas se guardan
+    en la tabla `reservas`, con índice parcial por vencimiento.
+    """
+
+    def __init__(self, pool: PoolConexiones, ttl_reserva: float = 900,
+                 intervalo_barrido: float = 30, reloj=time.time):
+        super().__init__(intervalo_barrido)
+        self._pool = pool
+        self.ttl_reserva = ttl_reserva
+        self._reloj = reloj
+
+    def cargar(self, stock: Dict):
+        """Siembra el stock inicial sin pisar los valores ya persistidos"""
+        filas = [
+            (tienda_id, producto_id, entrada["nombre"], entrada["precio"], entrada["stock"])
+            for tienda_id, productos in stock.items()
+            for producto_id, entrada in productos.items()
+        ]
+        with self._pool.transaccion() as con:
+            con.executemany(
+                "INSERT OR IGNORE INTO stock (tienda_id, producto_id, nombre, precio, stock) VALUES (?, ?, ?, ?, ?)",
+                filas
+            )
+
+    # ----- LECTURA -----
+    def existe_tienda(self, tienda_id: str) -> bool:
+        return self._pool.conexion().execute(
+            "SELECT 1 FROM stock WHERE tienda_id = ? LIMIT 1", (tienda_id,)
+        ).fetchone() is not None
+
+    def inventario(self, tienda_id: str) -> Dict:
+        filas = self._pool.conexion().execute(
+            "SELECT producto_id, nombre, precio, stock FROM stock WHERE tienda_id = ?", (tienda_id,)
+        ).fetchall()
+        return {producto_id: {"nombre": nombre, "precio": precio, "stock": stock}
+                for producto_id, nombre, precio, stock in filas}
+
+    def producto(self, tienda_id: str, producto_id: str) -> Optional[Dict]:
+        fila = self._pool.conexion().execute(
+            "SELECT nombre, precio, stock FROM stock WHERE tienda_id = ? AND producto_id = ?", (tienda_id, producto_id)
+        ).fetchone()
+        return None if fila is None else {"nombre": fila[0], "precio": fila[1], "stock": fila[2]}
+
+    def version(self, tienda_id: str) -> int:
+        fila = self._pool.conexion().execute(
+            "SELECT version FROM versiones_stock WHERE tienda_id = ?", (tienda_id,)
+        ).fetchone()
+        return 0 if fila is None else fila[0]
+
+    def tiendas_con_stock(self, items: List[Tuple[str, int]]) -> List[str]:
+        # Con el índice (producto_id, stock) cada condición es un rango; una
+        # tienda califica si cumple las condiciones de todos los productos
+        cantidades = agrupar_items(items)
+        if not cantidades:
+            return []
+        condiciones = " OR ".join(["(producto_id = ? AND stock >= ?)"] * len(cantidades))
+        parametros = [valor for item in cantidades.items() for valor in item]
+        filas = self._pool.conexion().execute(
+            f"SELECT tienda_id FROM stock WHERE {condiciones} GROUP BY tienda_id HAVING COUNT(*) = ?",
+            parametros + [len(cantidades)]
+        ).fetchall()
+        return [tienda_id for (tienda_id,) in filas]
+
+    # ----- REPORTES -----
+    def unidades_por_producto(self) -> Dict[str, int]:
+        return dict(self._pool.conexion().execute(
+            "SELECT producto_id, SUM(stock) FROM stock GROUP BY producto_id"
+        ).fetchall())
+
+    def bajo_umbral(self, umbral: int) -> Dict[str, List[str]]:
+        resultado: Dict[str, List[str]] = {}
+        for tienda_id, producto_id in self._pool.conexion().execute(
+            "SELECT tienda_id, producto_id FROM stock WHERE stock < ? ORDER BY tienda_id, producto_id", (umbral,)
+        ):
+            resultado.setdefault(tienda_id, []).append(producto_id)
+        return resultado
+
+    def valorizacion(self) -> Dict[str, float]:
+        return dict(self._pool.conexion().execute(
+            "SELECT tienda_id, SUM(precio * stock) FROM stock GROUP BY tienda_id"
+        ).fetchall())
+
+    # ----- RESERVAS -----
+    def reservar(self, reserva_id: str, tienda_id: str, items: List[Tuple[str, int]],
+                 ttl: Optional[float] = None) -> None:
+        ttl = self.ttl_reserva if ttl is None else ttl
+        expira = self._reloj() + ttl if ttl else None
+        with self._pool.transaccion() as con:
+            for producto_id, cantidad in items:
+                actualizadas = con.execute(
+                    "UPDATE stock SET stock = stock - ? WHERE tienda_id = ? AND producto_id = ? AND stock >= ?",
+                    (cantidad, tienda_id, producto_id, cantidad)
+                ).rowcount
+                if actualizadas == 0:
+                    raise StockInsuficiente(tienda_id, producto_id)
+            con.execute(
+                "INSERT INTO reservas (reserva_id, tienda_id, items, expira) VALUES (?, ?, ?, ?)",
+                (reserva_id, tienda_id, json.dumps(items), expira)
+            )
+
+    def confirmar(self, reserva_id: str) -> bool:
+        with self._pool.transaccion() as con:
+            return con.execute("DELETE FROM reservas WHERE reserva_id = ?", (reserva_id,)).rowcount > 0
+
+    def fijar(self, reserva_id: str) -> bool:
+        with self._pool.transaccion() as con:
+            return con.execute("UPDATE reservas SET expira = NULL WHERE reserva_id = ?", (reserva_id,)).rowcount > 0
+
+    def _devolver(self, con: sqlite3.Connection, tienda_id: str, items_json: str):
+        con.executemany(
+            "UPDATE stock SET stock = stock + ? WHERE tienda_id = ? AND producto_id = ?",
+            [(cantidad, tienda_id, producto_id) for producto_id, cantidad in json.loads(items_json)]
+        )
+
+    def liberar(self, reserva_id: str, si_no_fijada: bool = False) -> bool:
+        with self._pool.transaccion() as con:
+            fila = con.execute(
+                "SELECT tienda_id, items, expira FROM reservas WHERE reserva_id = ?", (reserva_id,)
+            ).fetchone()
+            if fila is None or (si_no_fijada and fila[2] is None):
+                return False
+            con.execute("DELETE FROM reservas WHERE reserva_id = ?", (reserva_id,))
+            self._devolver(con, fila[0], fila[1])
+        return True
+
+    def reservado(self, reserva_id: str) -> bool:
+        return self._pool.conexion().execute(
+            "SELECT 1 FROM reservas WHERE reserva_id = ?", (reserva_id,)
+        ).fetchone() is not None
+
+    def liberar_vencidas(self) -> List[str]:
+        with self._pool.transaccion() as con:
+            vencidas = con.execute(
+                "SELECT reserva_id, tienda_id, items FROM reservas WHERE expira IS NOT NULL AND expira <= ?",
+                (self._reloj(),)
+            ).fetchall()
+            for reserva_id, tienda_id, items_json in vencidas:
+                con.execute("DELETE FROM reservas WHERE reserva_id = ?", (reserva_id,))
+                self._devolver(con, tienda_id, items_json)
+        for reserva_id, _, _ in vencidas:
+            if self.al_liberar_vencida is not None:
+                self.al_liberar_vencida(reserva_id)
+        return [reserva_id for reserva_id, _, _ in vencidas]
+
+
+class OutboxSQLite:
+    """Misma interfaz que eventos.OutboxMemoria, en las tablas `outbox` y `outbox_entregas`"""
+
+    def __init__(self, pool: PoolConexiones):
+        self._pool = pool
+        pool.conexion().executescript(ESQUEMA_OUTBOX)
+
+    def agregar(self, evento: Dict, suscriptores: List[str]):
+        with self._pool.transaccion() as con:
+            con.execute("INSERT INTO outbox (evento_id, tipo, datos, creado) VALUES (?, ?, ?, ?)",
+                        (evento["evento_id"], evento["tipo"], _a_json(evento["datos"]), evento["creado"]))
+            con.executemany("INSERT INTO outbox_entregas (evento_id, suscriptor) VALUES (?, ?)",
+                            [(evento["evento_id"], suscriptor) for suscriptor in suscriptores])
+
+    def _quitar_si_terminado(self, con: sqlite3.Connection, evento_id: str):
+        if con.execute("SELECT 1 FROM outbox_entregas WHERE evento_id = ?", (evento_id,)).fetchone() is None:
+            con.execute("DELETE FROM outbox WHERE evento_id = ?", (evento_id,))
+
+    def completar(self, evento_id: str, suscriptor: str):
+        with self._pool.transaccion() as con:
+            con.execute("DELETE FROM outbox_entregas WHERE evento_id = ? AND suscriptor = ?", (evento_id, suscriptor))
+            self._quitar_si_terminado(con, evento_id)
+
+    def fallar(self, evento_id: str, suscriptor: str, error: str):
+        # La entrega fallida se conserva (con el evento) para revisarla a mano
+        with self._pool.transaccion() as con:
+            con.execute("UPDATE outbox_entregas SET error = ? WHERE evento_id = ? AND suscriptor = ?",
+                        (error, evento_id, suscriptor))
+
+    def pendientes(self) -> Iterator[Tuple[Dict, str]]:
+        filas = self._pool.conexion().execute(
+            "SELECT o.evento_id, o.tipo, o.datos, o.creado, e.suscriptor FROM outbox_entregas e "
+            "JOIN outbox o ON o.evento_id = e.evento_id WHERE e.error IS NULL ORDER BY o.creado"
+        ).fetchall()
+        return (({"evento_id": evento_id, "tipo": tipo, "datos": json.loads(datos), "creado": creado}, suscriptor)
+                for evento_id, tipo, datos, creado, suscriptor in filas)
+
+    def __len__(self) -> int:
+        return self._pool.conexion().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
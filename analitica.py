@@ -0,0 +1,169 @@
+# analitica.py - Agregados de ventas mantenidos en cada venta: ingresos por tienda y hora, más vendidos, modalidad
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class TopK:
+    """Los k productos con más unidades, para contadores que solo crecen.
+
+    Los miembros viven en un dict y el mínimo en un heap con entradas
+    perezosas (se descartan al salir si el conteo ya cambió). Un producto de
+    afuera entra solo si supera al mínimo, así que cada actualización cuesta
+    O(log k) y consultar el top no ordena todo el catálogo.
+    """
+
+    def __init__(self, k: int, conteos: Dict[str, int]):
+        self.k = k
+        self._conteos = conteos
+        self._miembros: Dict[str, None] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def _minimo(self) -> Tuple[int, str]:
+        while True:
+            conteo, producto_id = self._heap[0]
+            if producto_id in self._miembros and self._conteos[producto_id] == conteo:
+                return conteo, producto_id
+            heapq.heappop(self._heap)
+
+    def actualizar(self, producto_id: str):
+        """Se llama después de aumentar el conteo de `producto_id`"""
+        conteo = self._conteos[producto_id]
+        if producto_id not in self._miembros:
+            if len(self._miembros) >= self.k:
+                if conteo <= self._minimo()[0]:
+                    return
+                del self._miembros[heapq.heappop(self._heap)[1]]
+            self._miembros[producto_id] = None
+        heapq.heappush(self._heap, (conteo, producto_id))
+        if len(self._heap) > 4 * self.k:
+            # Demasiadas entradas obsoletas: se reconstruye con las vigentes
+            self._heap = [(self._conteos[p], p) for p in self._miembros]
+            heapq.heapify(self._heap)
+
+    def mejores(self, n: int) -> List[Tuple[str, int]]:
+        conteos = self._conteos
+        return sorted(((p, conteos[p]) for p in self._miembros), key=lambda par: (-par[1], par[0]))[:n]
+
+
+class AnaliticaVentas:
+    """Agregados materializados de las ventas, actualizados en O(items) por venta.
+
+    - ventas e ingresos por tienda, día y hora (una consulta por rango de
+      fechas solo mira los días de cada tienda, no las ventas)
+    - unidades por producto: totales (con un TopK) y por día, para "los más
+      vendidos de la semana"
+    - ventas e ingresos por modalidad (delivery o recojo) por tienda
+
+    Las cubetas salen del texto ISO de `fecha_venta` ("2024-05-01T13" es la
+    hora, "2024-05-01" el día). No es seguro para hilos: se usa desde el
+    event loop. Tras un reinicio se reconstruye con `desde_historial`.
+    """
+
+    def __init__(self, k: int = 100):
+        self._por_hora: Dict[str, Dict[str, Dict[str, List]]] = {}  # tienda -> día -> hora -> [ventas, ingresos]
+        self._unidades: Dict[str, int] = {}
+        self._unidades_dia: Dict[str, Dict[str, int]] = {}
+        self._modalidad: Dict[str, Dict[str, List]] = {}  # tienda -> modalidad -> [ventas, ingresos]
+        self.top = TopK(k, self._unidades)
+
+    # ----- ACTUALIZACIÓN -----
+    def registrar(self, venta: Dict):
+        tienda_id = venta["tienda_id"]
+        dia, hora = venta["fecha_venta"][:10], venta["fecha_venta"][11:13]
+        total = venta["total"]
+        cubeta = self._por_hora.setdefault(tienda_id, {}).setdefault(dia, {}).setdefault(hora, [0, 0])
+        cubeta[0] += 1
+        cubeta[1] += total
+        modalidad = self._modalidad.setdefault(tienda_id, {}).setdefault(
+            "delivery" if venta.get("isDelivery") else "recojo", [0, 0]
+        )
+        modalidad[0] += 1
+        modalidad[1] += total
+
+        del_dia = self._unidades_dia.setdefault(dia, {})
+        for item in venta["items"]:
+            producto_id, cantidad = item["producto_id"], item["cantidad"]
+            self._unidades[producto_id] = self._unidades.get(producto_id, 0) + cantidad
+            del_dia[producto_id] = del_dia.get(producto_id, 0) + cantidad
+            self.top.actualizar(producto_id)
+
+    @classmethod
+    def desde_historial(cls, ventas: Iterable[Dict], k: int = 100) -> "AnaliticaVentas":
+        """Reconstruye los agregados en una sola pasada sobre el historial.
+
+        Se acumula con Counter por (tienda, hora) y por (día, producto), sin
+        tocar el TopK venta por venta; el top se arma al final con nlargest.
+        """
+        analitica = cls(k)
+        ingresos: Counter = Counter()
+        cantidad_ventas: Counter = Counter()
+        unidades_dia: Counter = Counter()
+        modalidad: Counter = Counter()
+        for venta in ventas:
+            clave = (venta["tienda_id"], venta["fecha_venta"][:13])
+            ingresos[clave] += venta["total"]
+            cantidad_ventas[clave] += 1
+            tipo = (venta["tienda_id"], "delivery" if venta.get("isDelivery") else "recojo")
+            modalidad[tipo + ("ventas",)] += 1
+            modalidad[tipo + ("ingresos",)] += venta["total"]
+            dia = clave[1][:10]
+            for item in venta["items"]:
+                unidades_dia[dia, item["producto_id"]] += item["cantidad"]
+
+        for (tienda_id, hora), monto in ingresos.items():
+            analitica._por_hora.setdefault(tienda_id, {}).setdefault(hora[:10], {})[hora[11:13]] = [
+                cantidad_ventas[tienda_id, hora], monto
+            ]
+        for (tienda_id, tipo, campo), valor in modalidad.items():
+            par = analitica._modalidad.setdefault(tienda_id, {}).setdefault(tipo, [0, 0])
+            par[0 if campo == "ventas" else 1] = valor
+        for (dia, producto_id), cantidad in unidades_dia.items():
+            analitica._unidades_dia.setdefault(dia, {})[producto_id] = cantidad
+            analitica._unidades[producto_id] = analitica._unidades.get(producto_id, 0) + cantidad
+        for producto_id, _ in heapq.nlargest(k, analitica._unidades.items(), key=lambda par: par[1]):
+            analitica.top.actualizar(producto_id)
+        return analitica
+
+    # ----- CONSULTAS -----
+    def ingresos(self, desde: str, hasta: str, cubeta: str = "dia",
+                 tienda_id: Optional[str] = None) -> Dict[str, Dict[str, Dict]]:
+        """Por tienda y cubeta ("dia" u "hora"): ingresos y ventas entre dos fechas ISO (inclusive)"""
+        tiendas = [tienda_id] if tienda_id is not None else list(self._por_hora)
+        resultado = {}
+        for tienda in tiendas:
+            por_cubeta: Dict[str, Dict] = {}
+            for dia, horas in self._por_hora.get(tienda, {}).items():
+                if not desde <= dia <= hasta:
+                    continue
+                if cubeta == "dia":
+                    por_cubeta[dia] = {"ingresos": sum(c[1] for c in horas.values()),
+                                       "ventas": sum(c[0] for c in horas.values())}
+                else:
+                    for hora, (ventas, ingresos) in horas.items():
+                        por_cubeta[f"{dia}T{hora}"] = {"ingresos": ingresos, "ventas": ventas}
+            if por_cubeta:
+                resultado[tienda] = dict(sorted(por_cubeta.items()))
+        return resultado
+
+    def mas_vendidos(self, n: int = 10, desde: Optional[str] = None,
+                     hasta: Optional[str] = None) -> List[Tuple[str, int]]:
+        """(producto_id, unidades) de los n más vendidos; sin fechas, desde siempre"""
+        if desde is None and hasta is None and n <= self.top.k:
+            return self.top.mejores(n)
+        if desde is None and hasta is None:
+            conteos = self._unidades
+        else:
+            conteos: Dict[str, int] = {}
+            for dia, unidades in self._unidades_dia.items():
+                if (desde is None or desde <= dia) and (hasta is None or dia <= hasta):
+                    for producto_id, cantidad in unidades.items():
+                        conteos[producto_id] = conteos.get(producto_id, 0) + cantidad
+        return heapq.nsmallest(n, conteos.items(), key=lambda par: (-par[1], par[0]))
+
+    def modalidad(self) -> Dict[str, Dict[str, Dict]]:
+        """Por tienda: ventas e ingresos con delivery y con recojo en tienda"""
+        return {
+            tienda_id: {tipo: {"ventas": par[0], "ingresos": par[1]} for tipo, par in tipos.items()}
+            for tienda_id, tipos in self._modalidad.items()
+        }
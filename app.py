@@ -1,12 +1,44 @@
 # app.py - Implementación POC MiFarma siguiendo exactamente la estructura del diagrama
-from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
+import asyncio
+import heapq
+import os
+import time
 import uuid
 import datetime
 
+from almacen import crear_almacen
+from almacen_async import AlmacenAsync
+from carritos import fijar_linea, lineas_carrito, normalizar_carrito, nuevo_carrito, vista_carrito
+from journal import Journal
+from almacen_sqlite import PoolConexiones
+from numeracion import NumeradorSeries, formatear, separar
+from sesiones import AlmacenSesiones
+from tokens import FirmadorTokens
+from stock import StockInsuficiente
+from geo import distancia_km
+from despacho import eta_minutos, flota_simulada
+from rutas import planificar_rutas
+from catalogo import IndiceCatalogo
+from analitica import AnaliticaVentas
+from recolector import Recolector
+from eventos import BusEventos
+from documentos import AlmacenDocumentos, PipelineDocumentos
+from estados import (CANCELADA, EN_DELIVERY, ENTREGADO, EXPIRADA, MODALIDADES, PAGADA, PENDIENTE, TRANSICIONES,
+                     VENDIDA, LocksOrden, TransicionInvalida, puede_pasar)
+from pasarela import PagoRechazado, PasarelaNoDisponible, PasarelaSimulada
+from pasarela_http import PasarelaHTTP
+from idempotencia import CacheIdempotencia, MiddlewareIdempotencia
+from cache_lecturas import CacheLecturas, responder
+from respuestas import RutaRapida
+
 # Inicializar FastAPI
 app = FastAPI(title="MiFarma POC")
+# Las respuestas se codifican con orjson (o pydantic-core) sin pasar por jsonable_encoder
+app.router.route_class = RutaRapida
 
 # ----- BASES DE DATOS MOCK -----
 # Usuarios
@@ -15,7 +47,7 @@ USUARIOS = {
     "admin1": {"id": "admin1", "nombre": "Administrador", "password": "admin123", "es_admin": True}
 }
 
-# Stock de productos (por tienda)
+# Stock inicial de productos (por tienda)
 STOCK = {
     "tienda_fisica_1": {
         "producto_001": {"nombre": "Paracetamol", "precio": 5.50, "stock": 100},
@@ -28,6 +60,15 @@ STOCK = {
     }
 }
 
+# Ubicación de las tiendas (la virtual despacha desde su almacén)
+TIENDAS = {
+    "tienda_fisica_1": {"nombre": "MiFarma Miraflores", "tipo": "fisica", "lat": -12.1211, "lon": -77.0297},
+    "tienda_virtual_1": {"nombre": "MiFarma Online", "tipo": "virtual", "lat": -12.0464, "lon": -77.0428}
+}
+
+# Serie de comprobantes de cada tienda (F001/B001, F002/B002...)
+SERIE_TIENDA = {tienda_id: f"{i:03d}" for i, tienda_id in enumerate(TIENDAS, start=1)}
+
 # Productos generales
 PRODUCTOS = {
     "producto_001": {"id": "producto_001", "nombre": "Paracetamol", "descripcion": "Analgésico y antipirético"},
@@ -35,17 +76,153 @@ PRODUCTOS = {
     "producto_003": {"id": "producto_003", "nombre": "Aspirina", "descripcion": "Ácido acetilsalicílico"}
 }
 
+# Almacenamiento: en memoria (por defecto) o SQLite con MIFARMA_BACKEND=sqlite;
+# en memoria, MIFARMA_STOCK_COLUMNAR=1 guarda el stock en arreglos contiguos y
+# MIFARMA_STOCK_COMPARTIDO=<nombre> en memoria compartida entre workers. El
+# outbox de eventos vive en la base SQLite, o en MIFARMA_OUTBOX_RUTA en memoria
+ALMACEN = crear_almacen(
+    os.environ.get("MIFARMA_BACKEND", "memoria"),
+    STOCK,
+    ruta=os.environ.get("MIFARMA_SQLITE_RUTA", "mifarma.db"),
+    ttl_reserva=float(os.environ.get("MIFARMA_RESERVA_TTL", 900)),
+    ventas_compactas=os.environ.get("MIFARMA_VENTAS_COMPACTAS") == "1",
+    stock_columnar=os.environ.get("MIFARMA_STOCK_COLUMNAR") == "1",
+    stock_compartido=os.environ.get("MIFARMA_STOCK_COMPARTIDO"),
+    ruta_outbox=os.environ.get("MIFARMA_OUTBOX_RUTA")
+)
+
+# Versión asíncrona para los endpoints: el backend en memoria se usa directo
+# desde el event loop; SQLite corre en un pool de MIFARMA_HILOS_ALMACEN hilos
+# y el stock compartido (locks de fcntl) en uno de MIFARMA_HILOS_STOCK hilos
+ALMACEN_ASYNC = AlmacenAsync(
+    ALMACEN,
+    hilos=int(os.environ.get("MIFARMA_HILOS_ALMACEN", 32)) if os.environ.get("MIFARMA_BACKEND", "memoria") != "memoria" else None,
+    hilos_stock=int(os.environ.get("MIFARMA_HILOS_STOCK", 8)) if os.environ.get("MIFARMA_STOCK_COMPARTIDO") else None
+)
+
+# Reservas de stock atómicas
+MOTOR_STOCK = ALMACEN_ASYNC.stock
+
 # Carritos de compra
-CARRITOS = {}
+CARRITOS = ALMACEN_ASYNC.carritos
+
+# Órdenes de venta (indexadas por orden_id, user_id, tienda_id y estado, con
+# colas paginables por estado y modalidad); los cambios de estado pasan por
+# la tabla de estados.py
+ORDENES = ALMACEN_ASYNC.ordenes
+
+# Lock por orden para los handlers que esperan (pasarela, pool) entre validar y cambiar el estado
+LOCKS_ORDEN = LocksOrden()
+
+# Ventas realizadas (indexadas por venta_id, orden_id y tienda_id)
+VENTAS = ALMACEN_ASYNC.ventas
+
+# Journal opcional (solo backend en memoria): cada cambio se registra en
+# MIFARMA_JOURNAL_DIR y al arrancar se recupera el último snapshot + la cola
+JOURNAL = None
+if os.environ.get("MIFARMA_JOURNAL_DIR"):
+    if os.environ.get("MIFARMA_BACKEND", "memoria") != "memoria":
+        raise RuntimeError("MIFARMA_JOURNAL_DIR solo se puede usar con el backend en memoria")
+    JOURNAL = Journal(
+        os.environ["MIFARMA_JOURNAL_DIR"],
+        intervalo_fsync_ms=float(os.environ.get("MIFARMA_JOURNAL_FSYNC_MS", 5)),
+        intervalo_snapshot=float(os.environ.get("MIFARMA_SNAPSHOT_SEGUNDOS", 300))
+    )
+    JOURNAL.conectar(ALMACEN)
+
+# Agregados de ventas (ingresos, más vendidos, modalidad): se reconstruyen del
+# historial al arrancar y luego cada venta los actualiza en O(items)
+ANALITICA = AnaliticaVentas.desde_historial(ALMACEN.ventas)
+
+# Bus de eventos para lo que sigue a una venta (comprobante, registro,
+# analítica): MIFARMA_EVENTOS_CONSUMIDORES tareas, con reintentos y outbox
+BUS = BusEventos(
+    ALMACEN.outbox,
+    concurrencia=int(os.environ.get("MIFARMA_EVENTOS_CONSUMIDORES", 4)),
+    max_intentos=int(os.environ.get("MIFARMA_EVENTOS_INTENTOS", 5)),
+    ejecutar=ALMACEN_ASYNC.ejecutar
+)
+
+# Numeración correlativa de facturas y boletas por serie: cada worker arrienda
+# bloques de MIFARMA_NUMERACION_BLOQUE números en una base SQLite compartida
+# (la del backend o MIFARMA_NUMERACION_RUTA)
+NUMERACION = NumeradorSeries(
+    PoolConexiones(
+        os.environ.get("MIFARMA_NUMERACION_RUTA") or (
+            os.environ.get("MIFARMA_SQLITE_RUTA", "mifarma.db")
+            if os.environ.get("MIFARMA_BACKEND", "memoria") != "memoria" else "mifarma_numeracion.db"
+        ),
+        esquema=""
+    ),
+    tam_bloque=int(os.environ.get("MIFARMA_NUMERACION_BLOQUE", 50)),
+    ttl=float(os.environ.get("MIFARMA_NUMERACION_TTL", 3_600))
+)
+
+# Render de comprobantes (XML UBL para SUNAT) por lotes en un pool de
+# MIFARMA_DOCUMENTOS_PROCESOS procesos (0 = en un hilo); los archivos se
+# guardan por su hash en MIFARMA_DOCUMENTOS_DIR
+DOCUMENTOS = PipelineDocumentos(
+    AlmacenDocumentos(os.environ.get("MIFARMA_DOCUMENTOS_DIR", "mifarma_documentos")),
+    procesos=int(os.environ["MIFARMA_DOCUMENTOS_PROCESOS"]) if "MIFARMA_DOCUMENTOS_PROCESOS" in os.environ else None,
+    tam_lote=int(os.environ.get("MIFARMA_DOCUMENTOS_LOTE", 64))
+)
+
+# Carritos sin cambios por MIFARMA_CARRITO_TTL segundos y órdenes sin pagar
+# tras MIFARMA_ORDEN_TTL se eliminan en segundo plano (liberando su reserva)
+RECOLECTOR = Recolector(
+    ALMACEN,
+    ttl_carrito=float(os.environ.get("MIFARMA_CARRITO_TTL", 86_400)),
+    ttl_orden=float(os.environ.get("MIFARMA_ORDEN_TTL", 3_600)),
+    intervalo=float(os.environ.get("MIFARMA_RECOLECTOR_SEGUNDOS", 30))
+)
+
+# Sesiones activas: en memoria (TTL deslizante y tope LRU) o tokens firmados
+# con HMAC, que permiten correr varios workers sin estado compartido
+def crear_sesiones():
+    ttl = float(os.environ.get("MIFARMA_SESION_TTL", 1800))
+    if os.environ.get("MIFARMA_TOKEN_MODO", "memoria") == "firmado":
+        secreto = os.environ.get("MIFARMA_TOKEN_SECRETO")
+        if not secreto:
+            raise RuntimeError("MIFARMA_TOKEN_SECRETO es obligatorio con MIFARMA_TOKEN_MODO=firmado")
+        return FirmadorTokens(secreto.encode("utf-8"), ttl=ttl)
+    return AlmacenSesiones(ttl=ttl, max_sesiones=int(os.environ.get("MIFARMA_SESION_MAX", 100_000)))
 
-# Órdenes de venta
-ORDENES = []
+SESIONES = crear_sesiones()
 
-# Ventas realizadas
-VENTAS = []
+# Pasarela de pagos (asíncrona): cliente HTTP si hay MIFARMA_PASARELA_URL
+# (p. ej. stub_pasarela.py); si no, una simulada con MIFARMA_PASARELA_LATENCIA_MS
+def crear_pasarela():
+    if os.environ.get("MIFARMA_PASARELA_URL"):
+        return PasarelaHTTP(
+            os.environ["MIFARMA_PASARELA_URL"],
+            timeout=float(os.environ.get("MIFARMA_PASARELA_TIMEOUT_MS", 2000)) / 1000,
+            max_conexiones=int(os.environ.get("MIFARMA_PASARELA_CONEXIONES", 100))
+        )
+    return PasarelaSimulada(latencia=float(os.environ.get("MIFARMA_PASARELA_LATENCIA_MS", 0)) / 1000)
 
-# Sesiones activas
-SESIONES = {}
+PASARELA = crear_pasarela()
+
+# Índice de búsqueda del catálogo (nombre y descripción, sin tildes, por prefijo)
+CATALOGO = IndiceCatalogo()
+for producto in PRODUCTOS.values():
+    CATALOGO.agregar(producto)
+
+# Lecturas calientes (/productos, /verificar-stock) pre-serializadas por versión;
+# el stock puede servirse hasta MIFARMA_STOCK_VENTANA_MS sin revisar su versión
+LECTURAS = CacheLecturas(ventana=float(os.environ.get("MIFARMA_STOCK_VENTANA_MS", 0)) / 1000)
+
+# Respuestas por Idempotency-Key de los endpoints que cobran, reservan o venden
+IDEMPOTENCIA = CacheIdempotencia(
+    ttl=float(os.environ.get("MIFARMA_IDEMPOTENCIA_TTL", 86400)),
+    max_entradas=int(os.environ.get("MIFARMA_IDEMPOTENCIA_MAX", 100_000))
+)
+
+# Flota de repartidores simulada alrededor de las tiendas (MIFARMA_REPARTIDORES)
+FLOTA = flota_simulada(int(os.environ.get("MIFARMA_REPARTIDORES", 200)))
+
+# Rutas de varias paradas: ventana de agrupación y minutos de atención por parada
+RUTA_VENTANA_MIN = float(os.environ.get("MIFARMA_RUTA_VENTANA_MIN", 15))
+MINUTOS_POR_PARADA = 3
 
 # ----- MODELOS DE DATOS -----
 class LoginData(BaseModel):
@@ -57,28 +234,185 @@ class ProductoCarrito(BaseModel):
     cantidad: int
     isDelivery: bool = False
     direccion_entrega: Optional[str] = None
+    lat_entrega: Optional[float] = None  # Coordenadas de la dirección, para despacho y ETA
+    lon_entrega: Optional[float] = None
+
+class LineaCarrito(BaseModel):
+    producto_id: str
+    cantidad: int = 0
+    operacion: str = "agregar"  # agregar | fijar | quitar
+
+class LineasCarrito(BaseModel):
+    lineas: List[LineaCarrito]
+    isDelivery: Optional[bool] = None
+    direccion_entrega: Optional[str] = None
+    lat_entrega: Optional[float] = None
+    lon_entrega: Optional[float] = None
+
+class RepartidorData(BaseModel):
+    id: str
+    nombre: str
+    lat: float
+    lon: float
+    vehiculo: str = "Moto"
+    telefono: str = ""
+
+class PosicionData(BaseModel):
+    lat: float
+    lon: float
 
 class PagoData(BaseModel):
     metodo: str  # "efectivo" o "pasarela"
     monto: float
     detalles: Optional[Dict] = None
 
+class CheckoutData(BaseModel):
+    metodo: str
+    detalles: Optional[Dict] = None
+    comprobante: str = "boleta"  # "boleta" o "factura"
+
+class ProductoData(BaseModel):
+    id: str
+    nombre: str
+    descripcion: str = ""
+
+class ItemConsulta(BaseModel):
+    producto_id: str
+    cantidad: int = 1
+
+class ConsultaTiendas(BaseModel):
+    lat: float
+    lon: float
+    items: List[ItemConsulta]
+    limite: int = 5
+
 # ----- FUNCIONES AUXILIARES -----
-def get_user_from_token(token: str = Header(...)):
-    if token not in SESIONES:
+async def get_user_from_token(token: str = Header(...)):
+    user = SESIONES.obtener(token)
+    if user is None:
         raise HTTPException(status_code=401, detail="Sesión inválida o expirada")
-    return SESIONES[token]
+    return user
 
-def verificar_admin(user: Dict = Depends(get_user_from_token)):
+async def verificar_admin(user: Dict = Depends(get_user_from_token)):
     if not user["es_admin"]:
         raise HTTPException(status_code=403, detail="Se requieren permisos de administrador")
     return user
 
+def items_reserva(orden: Dict):
+    return [(item["producto_id"], item["cantidad"]) for item in orden["items"]]
+
+async def fijar_reserva(orden_id: str):
+    # Al pagar, la reserva de stock deja de vencer
+    if not await MOTOR_STOCK.fijar(orden_id):
+        raise HTTPException(status_code=400, detail="La reserva de stock de la orden venció")
+
+async def cobrar(orden_id: str, pago: "PagoData") -> Dict:
+    """Autoriza el pago en la pasarela y fija la reserva; si la reserva venció, anula el cobro"""
+    try:
+        autorizacion = await PASARELA.autorizar(orden_id, pago.monto, pago.metodo, pago.detalles)
+    except PagoRechazado as e:
+        raise HTTPException(status_code=402, detail=f"Pago rechazado por la pasarela: {e}")
+    except PasarelaNoDisponible:
+        raise HTTPException(status_code=503, detail="Pasarela de pagos no disponible, intente más tarde")
+    try:
+        await fijar_reserva(orden_id)
+    except HTTPException:
+        try:
+            await PASARELA.anular(autorizacion["transaccion_id"])
+        except (PagoRechazado, PasarelaNoDisponible):
+            pass  # Una autorización sin captura vence sola en la pasarela
+        raise
+    return autorizacion
+
+async def confirmar_stock(orden: Dict):
+    # Confirmar es idempotente: el stock se descontó una sola vez al reservar
+    await MOTOR_STOCK.confirmar(orden["orden_id"])
+    await ORDENES.actualizar(orden["orden_id"], stock_actualizado=True)
+
+def expirar_orden(orden_id: str):
+    # Corre en el hilo de barrido, por eso usa el repositorio síncrono
+    try:
+        ALMACEN.ordenes.cambiar_estado(orden_id, EXPIRADA)
+    except (KeyError, TransicionInvalida):
+        pass  # Ya se pagó, se canceló o la eliminó el recolector
+
+ALMACEN.stock.al_liberar_vencida = expirar_orden
+
+# ----- CICLO DE VIDA -----
+@app.on_event("startup")
+def iniciar_tareas():
+    SESIONES.iniciar_barrido()
+    ALMACEN.stock.iniciar_barrido()
+    if JOURNAL is not None:
+        JOURNAL.iniciar()
+    RECOLECTOR.cargar()
+    RECOLECTOR.iniciar()
+    # Lo no usado de los bloques de workers caídos se vuelve a emitir; sin
+    # ventas durables no se sabe qué números salieron y solo se reportan
+    if JOURNAL is not None or os.environ.get("MIFARMA_BACKEND", "memoria") != "memoria":
+        NUMERACION.recuperar(numeros_emitidos())
+
+def ventas_sin_evento() -> List[str]:
+    """Ventas con comprobante pedido que no se registraron y no tienen ninguna entrega en el outbox.
+
+    Guardar la venta y publicar su evento no son una sola transacción (el
+    outbox puede estar en otra base), así que un crash entre ambas deja la
+    venta sin evento.
+    """
+    en_outbox = {evento["datos"].get("venta_id") for evento, _ in BUS.outbox.pendientes()}
+    return [venta["venta_id"] for venta in ALMACEN.ventas
+            if venta.get("comprobante") and not venta.get("registrada_bd") and venta["venta_id"] not in en_outbox]
+
+@app.on_event("startup")
+async def iniciar_bus():
+    # Vuelve a publicar las ventas que perdieron su evento y a encolar lo que
+    # quedó pendiente en el outbox antes del reinicio
+    for venta_id in ventas_sin_evento():
+        await BUS.publicar("venta_realizada", {"venta_id": venta_id})
+    await BUS.iniciar()
+    await DOCUMENTOS.iniciar()
+
+@app.on_event("shutdown")
+async def detener_tareas():
+    SESIONES.detener_barrido()
+    ALMACEN.stock.detener_barrido()
+    RECOLECTOR.detener()
+    await BUS.detener()
+    await DOCUMENTOS.detener()
+    NUMERACION.cerrar()  # devuelve lo que sobra de los bloques
+    if JOURNAL is not None:
+        JOURNAL.detener()
+    ALMACEN_ASYNC.cerrar()
+    await PASARELA.cerrar()
+
+async def esperar_journal(request: Request, call_next):
+    """Con journal activo, una escritura solo se responde cuando ya es durable"""
+    response = await call_next(request)
+    if request.method == "POST":
+        await JOURNAL.esperar_async()
+    return response
+
+# Sin journal no se registra el middleware, que agrega costo a cada solicitud
+if JOURNAL is not None:
+    app.middleware("http")(esperar_journal)
+
+# Se agrega después del journal para envolverlo: solo se guardan respuestas ya durables
+app.add_middleware(
+    MiddlewareIdempotencia,
+    cache=IDEMPOTENCIA,
+    rutas=["/orden-venta/", "/pos/", "/pasarela-pagos/", "/pago-online/", "/realizar-venta/", "/checkout/"]
+)
+
+@app.exception_handler(TransicionInvalida)
+async def transicion_invalida(request: Request, exc: TransicionInvalida):
+    # Otro pedido (u otro hilo) cambió el estado entre la validación y el cambio
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
 # ----- ENDPOINTS (APIS) -----
 
 # 1. Login Service
 @app.post("/login")
-def login_service(datos: LoginData):
+async def login_service(datos: LoginData):
     """Login Service para autenticación"""
     if datos.username not in USUARIOS:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
@@ -88,8 +422,7 @@ def login_service(datos: LoginData):
         raise HTTPException(status_code=401, detail="Contraseña incorrecta")
     
     # Generar token de sesión
-    token = str(uuid.uuid4())
-    SESIONES[token] = user
+    token = SESIONES.crear(user)
     
     return {
         "token": token,
@@ -100,48 +433,251 @@ def login_service(datos: LoginData):
 
 # 2. Verificar si es admin
 @app.get("/admin")
-def verificar_es_admin(user: Dict = Depends(get_user_from_token)):
+async def verificar_es_admin(user: Dict = Depends(get_user_from_token)):
     """Verifica si el usuario es admin, según el flujo 'admin' del diagrama"""
     return {"es_admin": user["es_admin"]}
 
+# Lo que eliminó el recolector de carritos y órdenes abandonados
+@app.get("/admin/recolector")
+async def estadisticas_recolector(user: Dict = Depends(verificar_admin)):
+    """Carritos y órdenes eliminados, reservas liberadas y entradas programadas"""
+    return RECOLECTOR.estadisticas()
+
+# Profundidad de la cola del bus de eventos y lag de cada suscriptor
+@app.get("/admin/eventos")
+async def metricas_eventos(user: Dict = Depends(verificar_admin)):
+    """Entregas en cola, en curso y esperando reintento; pendientes, lag y contadores por suscriptor"""
+    return {**BUS.metricas(), "outbox": await ALMACEN_ASYNC.ejecutar(len, ALMACEN.outbox)}
+
+@app.get("/admin/numeracion")
+async def reporte_numeracion(user: Dict = Depends(verificar_admin)):
+    """Por serie: marca alta, bloques arrendados (y vencidos) y números devueltos pendientes de emitir"""
+    return await asyncio.to_thread(NUMERACION.reporte)
+
+@app.get("/admin/documentos")
+async def metricas_documentos(user: Dict = Depends(verificar_admin)):
+    """Trabajos de render en cola y en proceso, lotes despachados y tamaño medio de lote"""
+    return DOCUMENTOS.metricas()
+
+# Colas de trabajo de los admins: nombre -> (estado, modalidad o None para ambas)
+COLAS_ADMIN = {
+    "por-pagar": (PENDIENTE, None),
+    "por-asignar": (PAGADA, "delivery"),
+    "por-retirar": (PAGADA, "recojo"),
+    "en-reparto": (EN_DELIVERY, "delivery"),
+    "por-confirmar-entrega": (VENDIDA, "delivery")
+}
+
+async def pagina_ordenes(estado: str, modo: Optional[str], despues: Optional[int], limite: int) -> Dict:
+    if not 1 <= limite <= 500:
+        raise HTTPException(status_code=400, detail="limite debe estar entre 1 y 500")
+    ordenes, siguiente = await ORDENES.pagina(estado, modo, despues=despues, limite=limite)
+    return {
+        "estado": estado,
+        "modalidad": modo,
+        "total": await ORDENES.contar_cola(estado, modo),
+        "ordenes": ordenes,
+        "siguiente": siguiente
+    }
+
+@app.get("/admin/colas")
+async def resumen_colas(user: Dict = Depends(verificar_admin)):
+    """Cantidad de órdenes en cada cola de trabajo y en cada estado"""
+    return {
+        "colas": {nombre: await ORDENES.contar_cola(estado, modo) for nombre, (estado, modo) in COLAS_ADMIN.items()},
+        "estados": {estado: await ORDENES.contar_cola(estado) for estado in TRANSICIONES}
+    }
+
+@app.get("/admin/colas/{cola}")
+async def ver_cola(cola: str, despues: Optional[int] = None, limite: int = 50,
+                   user: Dict = Depends(verificar_admin)):
+    """Una página de la cola en orden de llegada; `siguiente` es el cursor de la próxima"""
+    if cola not in COLAS_ADMIN:
+        raise HTTPException(status_code=404, detail="Cola no encontrada")
+    return await pagina_ordenes(*COLAS_ADMIN[cola], despues, limite)
+
+@app.get("/admin/ordenes/{estado}")
+async def ordenes_por_estado(estado: str, modalidad: Optional[str] = None, despues: Optional[int] = None,
+                             limite: int = 50, user: Dict = Depends(verificar_admin)):
+    """Una página de las órdenes en `estado` (opcionalmente solo delivery o recojo)"""
+    if estado not in TRANSICIONES:
+        raise HTTPException(status_code=404, detail="Estado desconocido")
+    if modalidad is not None and modalidad not in MODALIDADES:
+        raise HTTPException(status_code=400, detail="modalidad debe ser delivery o recojo")
+    return await pagina_ordenes(estado, modalidad, despues, limite)
+
 # 3. GET VerificarStock
 @app.get("/verificar-stock/{tienda_id}")
-def verificar_stock(tienda_id: str, producto_id: Optional[str] = None):
-    """GET VerificarStock para consultar disponibilidad"""
-    if tienda_id not in STOCK:
+async def verificar_stock(tienda_id: str, producto_id: Optional[str] = None,
+                          if_none_match: Optional[str] = Header(None)):
+    """GET VerificarStock para consultar disponibilidad (con ETag / 304)"""
+    clave = ("stock", tienda_id, producto_id)
+    entrada = LECTURAS.reciente(clave)
+    if entrada is None:
+        version = await MOTOR_STOCK.version(tienda_id)
+        entrada = LECTURAS.vigente(clave, version)
+    if entrada is not None:
+        return responder(entrada, if_none_match)
+    
+    if not await MOTOR_STOCK.existe_tienda(tienda_id):
         raise HTTPException(status_code=404, detail="Tienda no encontrada")
     
     if producto_id:
         # Verificar stock de un producto específico
-        if producto_id not in STOCK[tienda_id]:
+        producto = await MOTOR_STOCK.producto(tienda_id, producto_id)
+        if producto is None:
             raise HTTPException(status_code=404, detail="Producto no encontrado en esta tienda")
         
-        return {
-            "producto": STOCK[tienda_id][producto_id],
-            "disponible": STOCK[tienda_id][producto_id]["stock"] > 0
+        datos = {
+            "producto": producto,
+            "disponible": producto["stock"] > 0
         }
     else:
         # Retornar todo el stock de la tienda
-        return STOCK[tienda_id]
+        datos = await MOTOR_STOCK.inventario(tienda_id)
+    return responder(LECTURAS.guardar(clave, version, datos), if_none_match)
+
+# Tiendas cercanas que pueden surtir un carrito completo
+@app.post("/tiendas-cercanas")
+async def tiendas_cercanas(consulta: ConsultaTiendas):
+    """Tiendas con stock para todos los items, ordenadas por distancia a (lat, lon)"""
+    for item in consulta.items:
+        if item.producto_id not in PRODUCTOS:
+            raise HTTPException(status_code=404, detail=f"Producto {item.producto_id} no encontrado")
+        if item.cantidad <= 0:
+            raise HTTPException(status_code=400, detail="La cantidad debe ser mayor a cero")
+    
+    # El índice producto -> tiendas da las candidatas; solo a ellas se les calcula la distancia
+    candidatas = await MOTOR_STOCK.tiendas_con_stock([(i.producto_id, i.cantidad) for i in consulta.items])
+    cercanas = heapq.nsmallest(
+        max(consulta.limite, 0),
+        ((distancia_km(consulta.lat, consulta.lon, TIENDAS[t]["lat"], TIENDAS[t]["lon"]), t)
+         for t in candidatas if t in TIENDAS)
+    )
+    return {
+        "tiendas": [
+            {"tienda_id": t, "nombre": TIENDAS[t]["nombre"], "tipo": TIENDAS[t]["tipo"], "distancia_km": round(d, 2)}
+            for d, t in cercanas
+        ],
+        "total_candidatas": len(candidatas)
+    }
+
+# Reportes de inventario (solo admin)
+@app.get("/reportes/stock/productos")
+async def reporte_unidades_por_producto(user: Dict = Depends(verificar_admin)):
+    """Unidades de cada producto sumando todas las tiendas"""
+    return await MOTOR_STOCK.unidades_por_producto()
+
+@app.get("/reportes/stock/bajo-umbral")
+async def reporte_bajo_umbral(umbral: int = 10, user: Dict = Depends(verificar_admin)):
+    """Por tienda, los productos con menos de `umbral` unidades"""
+    return {"umbral": umbral, "tiendas": await MOTOR_STOCK.bajo_umbral(umbral)}
+
+@app.get("/reportes/stock/valorizacion")
+async def reporte_valorizacion(user: Dict = Depends(verificar_admin)):
+    """Valor del inventario (precio * stock) por tienda y total"""
+    por_tienda = await MOTOR_STOCK.valorizacion()
+    return {"tiendas": {t: round(v, 2) for t, v in por_tienda.items()}, "total": round(sum(por_tienda.values()), 2)}
+
+# Analítica de ventas (solo admin); fechas ISO, por defecto el día de hoy
+@app.get("/reportes/ventas/ingresos")
+async def reporte_ingresos(desde: Optional[str] = None, hasta: Optional[str] = None, cubeta: str = "dia",
+                           tienda_id: Optional[str] = None, user: Dict = Depends(verificar_admin)):
+    """Ingresos y cantidad de ventas por tienda y por día u hora"""
+    if cubeta not in ("dia", "hora"):
+        raise HTTPException(status_code=400, detail="cubeta debe ser 'dia' u 'hora'")
+    hoy = datetime.date.today().isoformat()
+    return ANALITICA.ingresos(desde or hoy, hasta or desde or hoy, cubeta, tienda_id)
+
+@app.get("/reportes/ventas/mas-vendidos")
+async def reporte_mas_vendidos(n: int = 10, desde: Optional[str] = None, hasta: Optional[str] = None,
+                               user: Dict = Depends(verificar_admin)):
+    """Los n productos con más unidades vendidas (desde siempre o entre dos fechas)"""
+    if not 1 <= n <= 1000:
+        raise HTTPException(status_code=400, detail="n debe estar entre 1 y 1000")
+    return [
+        {"producto_id": producto_id, "nombre": PRODUCTOS.get(producto_id, {}).get("nombre"), "unidades": unidades}
+        for producto_id, unidades in ANALITICA.mas_vendidos(n, desde, hasta)
+    ]
+
+@app.get("/reportes/ventas/modalidad")
+async def reporte_modalidad(user: Dict = Depends(verificar_admin)):
+    """Ventas e ingresos con delivery vs recojo en tienda, por tienda"""
+    return ANALITICA.modalidad()
+
+@app.post("/reportes/ventas/reconstruir")
+async def reconstruir_analitica(user: Dict = Depends(verificar_admin)):
+    """Recalcula los agregados desde el historial de ventas (camino lento)"""
+    global ANALITICA
+    inicio = time.perf_counter()
+    ANALITICA = await ALMACEN_ASYNC.ejecutar(AnaliticaVentas.desde_historial, ALMACEN.ventas)
+    return {"ventas": len(ALMACEN.ventas), "segundos": round(time.perf_counter() - inicio, 3)}
 
 # 4. GET Productos
 @app.get("/productos")
-def get_productos():
-    """GET Productos para obtener el catálogo"""
-    return PRODUCTOS
+async def get_productos(if_none_match: Optional[str] = Header(None)):
+    """GET Productos para obtener el catálogo (con ETag / 304)"""
+    entrada = (LECTURAS.vigente("productos", CATALOGO.version)
+               or LECTURAS.guardar("productos", CATALOGO.version, PRODUCTOS))
+    return responder(entrada, if_none_match)
+
+# Buscar en el catálogo (autocompletado por prefijo, paginado)
+@app.get("/productos/buscar")
+async def buscar_productos(q: str, offset: int = 0, limite: int = 20):
+    """Productos cuyo nombre o descripción contienen todos los términos de `q`"""
+    if offset < 0 or not 1 <= limite <= 100:
+        raise HTTPException(status_code=400, detail="offset debe ser >= 0 y limite estar entre 1 y 100")
+    
+    producto_ids, hay_mas = CATALOGO.buscar(q, offset, limite)
+    return {
+        "resultados": [PRODUCTOS[producto_id] for producto_id in producto_ids],
+        "offset": offset,
+        "limite": limite,
+        "hay_mas": hay_mas
+    }
+
+# Agregar un producto al catálogo (solo admin)
+@app.post("/productos")
+async def agregar_producto(producto: ProductoData, user: Dict = Depends(verificar_admin)):
+    """Agrega un producto al catálogo y lo indexa para la búsqueda"""
+    if producto.id in PRODUCTOS:
+        raise HTTPException(status_code=409, detail="El producto ya existe")
+    
+    PRODUCTOS[producto.id] = {"id": producto.id, "nombre": producto.nombre, "descripcion": producto.descripcion}
+    CATALOGO.agregar(PRODUCTOS[producto.id])
+    return PRODUCTOS[producto.id]
 
 # 5. Carrito de compras
+def respuesta_carrito(mensaje: str, carrito: Dict, cambios: List[Dict], respuesta: str) -> Dict:
+    """Carrito completo, o con respuesta=delta solo las líneas que cambiaron y el subtotal"""
+    if respuesta == "delta":
+        return {"mensaje": mensaje, "cambios": cambios, "subtotal": carrito["subtotal"],
+                "lineas": len(carrito["items"])}
+    return {"mensaje": mensaje, "carrito": vista_carrito(carrito)}
+
+def ubicacion_entrega(datos) -> Optional[Dict]:
+    if datos.lat_entrega is None or datos.lon_entrega is None:
+        return None
+    return {"lat": datos.lat_entrega, "lon": datos.lon_entrega}
+
+async def carrito_de(user: Dict, tienda_id: str):
+    carrito_id = f"cart_{user['id']}_{tienda_id}"
+    carrito = await CARRITOS.obtener(carrito_id)
+    return carrito_id, None if carrito is None else normalizar_carrito(carrito)
+
 @app.post("/carrito/{tienda_id}")
-def agregar_al_carrito(tienda_id: str, item: ProductoCarrito, user: Dict = Depends(get_user_from_token)):
+async def agregar_al_carrito(tienda_id: str, item: ProductoCarrito, respuesta: str = "completa",
+                             user: Dict = Depends(get_user_from_token)):
     """Agregar producto al carrito de compras"""
-    if tienda_id not in STOCK:
+    if not await MOTOR_STOCK.existe_tienda(tienda_id):
         raise HTTPException(status_code=404, detail="Tienda no encontrada")
     
-    if item.producto_id not in STOCK[tienda_id]:
+    producto = await MOTOR_STOCK.producto(tienda_id, item.producto_id)
+    if producto is None:
         raise HTTPException(status_code=404, detail="Producto no disponible en esta tienda")
     
-    # Verificar stock
-    if STOCK[tienda_id][item.producto_id]["stock"] < item.cantidad:
+    # Verificar stock (la reserva real se hace al crear la orden)
+    if not await MOTOR_STOCK.disponible(tienda_id, item.producto_id, item.cantidad):
         raise HTTPException(status_code=400, detail="Stock insuficiente")
     
     # Validar información de delivery si se solicita
@@ -149,66 +685,109 @@ def agregar_al_carrito(tienda_id: str, item: ProductoCarrito, user: Dict = Depen
         raise HTTPException(status_code=400, detail="Se requiere dirección de entrega para delivery")
     
     # Crear o actualizar carrito
-    carrito_id = f"cart_{user['id']}_{tienda_id}"
+    carrito_id, carrito = await carrito_de(user, tienda_id)
     
-    if carrito_id not in CARRITOS:
-        CARRITOS[carrito_id] = {
-            "user_id": user["id"],
-            "tienda_id": tienda_id,
-            "items": [],
-            "isDelivery": item.isDelivery,
-            "direccion_entrega": item.direccion_entrega if item.isDelivery else None,
-            "fecha_creacion": datetime.datetime.now().isoformat()
-        }
+    if carrito is None:
+        carrito = nuevo_carrito(user["id"], tienda_id, item.isDelivery, item.direccion_entrega,
+                                ubicacion_entrega(item))
     else:
         # Actualizar información de delivery en el carrito existente
-        if item.isDelivery != CARRITOS[carrito_id].get("isDelivery", False):
-            CARRITOS[carrito_id]["isDelivery"] = item.isDelivery
-            CARRITOS[carrito_id]["direccion_entrega"] = item.direccion_entrega
-    
-    # Verificar si ya existe el producto en el carrito
-    for carrito_item in CARRITOS[carrito_id]["items"]:
-        if carrito_item["producto_id"] == item.producto_id:
-            carrito_item["cantidad"] += item.cantidad
-            return {"mensaje": "Carrito actualizado", "carrito": CARRITOS[carrito_id]}
-    
-    # Agregar nuevo item
-    CARRITOS[carrito_id]["items"].append({
-        "producto_id": item.producto_id,
-        "cantidad": item.cantidad,
-        "precio": STOCK[tienda_id][item.producto_id]["precio"],
-        "isDelivery": item.isDelivery
-    })
-    
-    return {"mensaje": "Producto agregado al carrito", "carrito": CARRITOS[carrito_id]}
+        if item.isDelivery != carrito.get("isDelivery", False):
+            carrito["isDelivery"] = item.isDelivery
+            carrito["direccion_entrega"] = item.direccion_entrega
+            carrito["ubicacion_entrega"] = ubicacion_entrega(item)
+    
+    # La línea se busca por producto_id y el subtotal se ajusta solo con la diferencia
+    linea = carrito["items"].get(item.producto_id)
+    anterior = 0 if linea is None else linea["cantidad"]
+    cambio = fijar_linea(carrito, item.producto_id, anterior + item.cantidad, producto["precio"], item.isDelivery)
+    await CARRITOS.guardar(carrito_id, carrito)
+    RECOLECTOR.tocar_carrito(carrito_id)
+    
+    mensaje = "Carrito actualizado" if linea is not None else "Producto agregado al carrito"
+    return respuesta_carrito(mensaje, carrito, [cambio], respuesta)
+
+# Cambiar varias líneas del carrito en una sola llamada
+@app.post("/carrito/{tienda_id}/lineas")
+async def cambiar_lineas_carrito(tienda_id: str, cambios: LineasCarrito, respuesta: str = "delta",
+                                 user: Dict = Depends(get_user_from_token)):
+    """Agrega, fija o quita varias líneas; se validan todas antes de aplicar ninguna"""
+    if not await MOTOR_STOCK.existe_tienda(tienda_id):
+        raise HTTPException(status_code=404, detail="Tienda no encontrada")
+    if cambios.isDelivery and not cambios.direccion_entrega:
+        raise HTTPException(status_code=400, detail="Se requiere dirección de entrega para delivery")
+    
+    carrito_id, carrito = await carrito_de(user, tienda_id)
+    entrega = None  # modalidad nueva; se aplica junto con las líneas, ya validadas
+    if carrito is None:
+        carrito = nuevo_carrito(user["id"], tienda_id, bool(cambios.isDelivery), cambios.direccion_entrega,
+                                ubicacion_entrega(cambios))
+    elif cambios.isDelivery is not None:
+        entrega = {
+            "isDelivery": cambios.isDelivery,
+            "direccion_entrega": cambios.direccion_entrega if cambios.isDelivery else None,
+            "ubicacion_entrega": ubicacion_entrega(cambios) if cambios.isDelivery else None
+        }
+    
+    # Cantidad final de cada producto tocado, aplicando las líneas en orden
+    finales: Dict[str, int] = {}
+    for linea in cambios.lineas:
+        if linea.operacion not in ("agregar", "fijar", "quitar"):
+            raise HTTPException(status_code=400, detail=f"Operación inválida: {linea.operacion}")
+        if linea.cantidad < 0:
+            raise HTTPException(status_code=400, detail="La cantidad no puede ser negativa")
+        actual = carrito["items"].get(linea.producto_id)
+        previa = finales.get(linea.producto_id, 0 if actual is None else actual["cantidad"])
+        if linea.operacion == "agregar":
+            finales[linea.producto_id] = previa + linea.cantidad
+        elif linea.operacion == "fijar":
+            finales[linea.producto_id] = linea.cantidad
+        else:
+            finales[linea.producto_id] = 0
+    
+    precios = {}
+    for producto_id, cantidad in finales.items():
+        if cantidad == 0:
+            continue
+        producto = await MOTOR_STOCK.producto(tienda_id, producto_id)
+        if producto is None:
+            raise HTTPException(status_code=404, detail=f"Producto no disponible en esta tienda: {producto_id}")
+        if not await MOTOR_STOCK.disponible(tienda_id, producto_id, cantidad):
+            raise HTTPException(status_code=400, detail=f"Stock insuficiente para {producto_id}")
+        precios[producto_id] = producto["precio"]
+    
+    if entrega is not None:
+        carrito.update(entrega)
+    aplicados = [
+        fijar_linea(carrito, producto_id, cantidad, precios.get(producto_id, 0), bool(carrito.get("isDelivery")))
+        for producto_id, cantidad in finales.items()
+    ]
+    await CARRITOS.guardar(carrito_id, carrito)
+    RECOLECTOR.tocar_carrito(carrito_id)
+    
+    return respuesta_carrito("Carrito actualizado", carrito, aplicados, respuesta)
 
 # 6. Obtener carrito actual
 @app.get("/carrito/{tienda_id}")
-def obtener_carrito(tienda_id: str, user: Dict = Depends(get_user_from_token)):
+async def obtener_carrito(tienda_id: str, user: Dict = Depends(get_user_from_token)):
     """Obtener el carrito actual del usuario para una tienda"""
-    carrito_id = f"cart_{user['id']}_{tienda_id}"
+    _, carrito = await carrito_de(user, tienda_id)
     
-    if carrito_id not in CARRITOS or not CARRITOS[carrito_id]["items"]:
+    if carrito is None or not carrito["items"]:
         raise HTTPException(status_code=404, detail="Carrito vacío o no existe")
     
-    # Calcular total
-    total = 0
-    for item in CARRITOS[carrito_id]["items"]:
-        total += item["precio"] * item["cantidad"]
-    
-    return {"carrito": CARRITOS[carrito_id], "total": total}
+    # El total se mantiene al cambiar las líneas
+    return {"carrito": vista_carrito(carrito), "total": carrito["subtotal"]}
 
 # 7. Orden de Venta
-@app.post("/orden-venta/{tienda_id}")
-def crear_orden_venta(tienda_id: str, user: Dict = Depends(get_user_from_token)):
-    """Crear una orden de venta desde el carrito"""
-    carrito_id = f"cart_{user['id']}_{tienda_id}"
+async def crear_orden(user: Dict, tienda_id: str, **datos) -> Dict:
+    """Reserva el stock del carrito y registra la orden pendiente (`datos` se guardan en la orden)"""
+    _, carrito = await carrito_de(user, tienda_id)
     
-    if carrito_id not in CARRITOS or not CARRITOS[carrito_id]["items"]:
+    if carrito is None or not carrito["items"]:
         raise HTTPException(status_code=404, detail="Carrito vacío o no existe")
     
     # Obtener información del carrito
-    carrito = CARRITOS[carrito_id]
     isDelivery = carrito.get("isDelivery", False)
     direccion_entrega = carrito.get("direccion_entrega")
     
@@ -216,19 +795,19 @@ def crear_orden_venta(tienda_id: str, user: Dict = Depends(get_user_from_token))
     if isDelivery and not direccion_entrega:
         raise HTTPException(status_code=400, detail="Se requiere dirección de entrega para delivery")
     
-    # Verificar stock nuevamente
-    for item in carrito["items"]:
-        producto_id = item["producto_id"]
-        cantidad = item["cantidad"]
-        
-        if STOCK[tienda_id][producto_id]["stock"] < cantidad:
-            raise HTTPException(status_code=400, 
-                               detail=f"Stock insuficiente para {PRODUCTOS[producto_id]['nombre']}")
+    # Reservar stock de todos los items (todo o nada)
+    orden_id = str(uuid.uuid4())
+    try:
+        await MOTOR_STOCK.reservar(orden_id, tienda_id,
+                                   [(producto_id, item["cantidad"]) for producto_id, item in carrito["items"].items()])
+    except StockInsuficiente as e:
+        raise HTTPException(status_code=400, 
+                           detail=f"Stock insuficiente para {PRODUCTOS[e.producto_id]['nombre']}")
     
     # Calcular total
     total = 0
     items = []
-    for item in carrito["items"]:
+    for item in lineas_carrito(carrito):
         precio = item["precio"]
         cantidad = item["cantidad"]
         total += precio * cantidad
@@ -249,7 +828,6 @@ def crear_orden_venta(tienda_id: str, user: Dict = Depends(get_user_from_token))
         total += costo_delivery
     
     # Crear orden de venta
-    orden_id = str(uuid.uuid4())
     orden = {
         "orden_id": orden_id,
         "user_id": user["id"],
@@ -257,195 +835,199 @@ def crear_orden_venta(tienda_id: str, user: Dict = Depends(get_user_from_token))
         "tienda_recojo": tienda_id if not isDelivery else None,
         "isDelivery": isDelivery,
         "direccion_entrega": direccion_entrega if isDelivery else None,
+        "ubicacion_entrega": carrito.get("ubicacion_entrega") if isDelivery else None,
         "costo_delivery": costo_delivery if isDelivery else 0,
         "items": items,
         "total": total,
-        "estado": "pendiente",
-        "fecha_creacion": datetime.datetime.now().isoformat()
+        "estado": PENDIENTE,
+        "fecha_creacion": datetime.datetime.now().isoformat(),
+        **datos
     }
     
-    ORDENES.append(orden)
+    await ORDENES.agregar(orden)
+    RECOLECTOR.programar_orden(orden_id)
+    return orden
+
+@app.post("/orden-venta/{tienda_id}")
+async def crear_orden_venta(tienda_id: str, user: Dict = Depends(get_user_from_token)):
+    """Crear una orden de venta desde el carrito"""
+    orden = await crear_orden(user, tienda_id)
     
     return {
-        "orden_id": orden_id,
-        "total": total,
-        "isDelivery": isDelivery,
-        "costo_delivery": costo_delivery if isDelivery else 0,
-        "tienda_recojo": tienda_id if not isDelivery else None,
-        "direccion_entrega": direccion_entrega if isDelivery else None,
+        "orden_id": orden["orden_id"],
+        "total": orden["total"],
+        "isDelivery": orden["isDelivery"],
+        "costo_delivery": orden["costo_delivery"],
+        "tienda_recojo": orden["tienda_recojo"],
+        "direccion_entrega": orden["direccion_entrega"],
         "mensaje": "Orden de venta creada con éxito"
     }
 
 # 8. Sistema POS (para tienda física)
 @app.post("/pos/{orden_id}")
-def procesar_pos(orden_id: str, pago: PagoData, user: Dict = Depends(get_user_from_token)):
+async def procesar_pos(orden_id: str, pago: PagoData, user: Dict = Depends(get_user_from_token)):
     """Procesar pago a través del Sistema POS"""
-    # Buscar la orden
-    orden = next((o for o in ORDENES if o["orden_id"] == orden_id), None)
-    
-    if not orden:
-        raise HTTPException(status_code=404, detail="Orden no encontrada")
-    
-    # Verificar si la tienda es física
-    if not orden["tienda_id"].startswith("tienda_fisica"):
-        raise HTTPException(status_code=400, detail="El sistema POS solo es válido para tiendas físicas")
-    
-    # Verificar estado
-    if orden["estado"] != "pendiente":
-        raise HTTPException(status_code=400, detail="La orden ya ha sido procesada")
-    
-    # Verificar monto
-    if pago.monto < orden["total"]:
-        raise HTTPException(status_code=400, detail="Monto insuficiente")
-    
-    # Procesar pago
-    orden["estado"] = "pagada"
-    orden["metodo_pago"] = "pos"
-    orden["detalles_pago"] = {
-        "metodo": pago.metodo,
-        "monto": pago.monto,
-        "cambio": pago.monto - orden["total"],
-        "fecha_pago": datetime.datetime.now().isoformat()
-    }
+    async with LOCKS_ORDEN.orden(orden_id):
+        # Buscar la orden
+        orden = await ORDENES.obtener(orden_id)
+        
+        if not orden:
+            raise HTTPException(status_code=404, detail="Orden no encontrada")
+        
+        # Verificar si la tienda es física
+        if not orden["tienda_id"].startswith("tienda_fisica"):
+            raise HTTPException(status_code=400, detail="El sistema POS solo es válido para tiendas físicas")
+        
+        # Verificar estado
+        if not puede_pasar(orden["estado"], PAGADA):
+            raise HTTPException(status_code=400, detail="La orden ya ha sido procesada")
+        
+        # Verificar monto
+        if pago.monto < orden["total"]:
+            raise HTTPException(status_code=400, detail="Monto insuficiente")
+        
+        await fijar_reserva(orden_id)
+        
+        # Procesar pago
+        await ORDENES.transicion(
+            orden_id,
+            PAGADA,
+            fecha_pagada=datetime.datetime.now().isoformat(),
+            metodo_pago="pos",
+            detalles_pago={
+                "metodo": pago.metodo,
+                "monto": pago.monto,
+                "cambio": pago.monto - orden["total"],
+                "fecha_pago": datetime.datetime.now().isoformat()
+            }
+        )
     
     return {
         "orden_id": orden_id,
-        "estado": "pagada",
+        "estado": PAGADA,
         "cambio": pago.monto - orden["total"],
         "mensaje": "Pago procesado correctamente por POS"
     }
 
 # 9. Pasarela de Pagos (para tienda virtual)
 @app.post("/pasarela-pagos/{orden_id}")
-def procesar_pasarela(orden_id: str, pago: PagoData, user: Dict = Depends(get_user_from_token)):
+async def procesar_pasarela(orden_id: str, pago: PagoData, user: Dict = Depends(get_user_from_token)):
     """Procesar pago a través de la Pasarela de Pagos"""
-    # Buscar la orden
-    orden = None
-    for o in ORDENES:
-        if o["orden_id"] == orden_id:
-            orden = o
-            break
-    
-    if not orden:
-        raise HTTPException(status_code=404, detail="Orden no encontrada")
-    
-    # Verificar si la tienda es virtual
-    if not orden["tienda_id"].startswith("tienda_virtual"):
-        raise HTTPException(status_code=400, detail="La pasarela de pagos solo es válida para tiendas virtuales")
-    
-    # Verificar estado
-    if orden["estado"] != "pendiente":
-        raise HTTPException(status_code=400, detail="La orden ya ha sido procesada")
-    
-    # Verificar detalles para pasarela
-    if not pago.detalles or "tarjeta" not in pago.detalles:
-        raise HTTPException(status_code=400, detail="Detalles de tarjeta requeridos para pasarela")
-    
-    # Simular procesamiento de pasarela
-    # En un sistema real, aquí se conectaría con un gateway de pago
-    
-    # Procesar pago
-    orden["estado"] = "pagada"
-    orden["metodo_pago"] = "pasarela"
-    orden["detalles_pago"] = {
-        "metodo": pago.metodo,
-        "referencia": f"REF-{uuid.uuid4().hex[:8]}",
-        "fecha_pago": datetime.datetime.now().isoformat()
-    }
+    async with LOCKS_ORDEN.orden(orden_id):
+        # Buscar la orden
+        orden = await ORDENES.obtener(orden_id)
+        
+        if not orden:
+            raise HTTPException(status_code=404, detail="Orden no encontrada")
+        
+        # Verificar si la tienda es virtual
+        if not orden["tienda_id"].startswith("tienda_virtual"):
+            raise HTTPException(status_code=400, detail="La pasarela de pagos solo es válida para tiendas virtuales")
+        
+        # Verificar estado (con el lock tomado, dos pagos de la misma orden no cobran dos veces)
+        if not puede_pasar(orden["estado"], PAGADA):
+            raise HTTPException(status_code=400, detail="La orden ya ha sido procesada")
+        
+        # Verificar detalles para pasarela
+        if not pago.detalles or "tarjeta" not in pago.detalles:
+            raise HTTPException(status_code=400, detail="Detalles de tarjeta requeridos para pasarela")
+        
+        # Autorizar el cobro en la pasarela de pagos
+        autorizacion = await cobrar(orden_id, pago)
+        
+        # Procesar pago
+        orden = await ORDENES.transicion(
+            orden_id,
+            PAGADA,
+            fecha_pagada=datetime.datetime.now().isoformat(),
+            metodo_pago="pasarela",
+            detalles_pago={
+                "metodo": pago.metodo,
+                "referencia": autorizacion["referencia"],
+                "fecha_pago": datetime.datetime.now().isoformat()
+            }
+        )
     
     return {
         "orden_id": orden_id,
-        "estado": "pagada",
+        "estado": PAGADA,
         "referencia": orden["detalles_pago"]["referencia"],
         "mensaje": "Pago procesado correctamente por pasarela"
     }
 
 # 10. POST ActualizarStock (con rollback si es necesario)
 @app.post("/actualizar-stock/{orden_id}")
-def actualizar_stock(orden_id: str, user: Dict = Depends(get_user_from_token)):
+async def actualizar_stock(orden_id: str, user: Dict = Depends(get_user_from_token)):
     """POST ActualizarStock para actualizar inventario"""
     # Buscar la orden
-    orden = None
-    for o in ORDENES:
-        if o["orden_id"] == orden_id:
-            orden = o
-            break
+    orden = await ORDENES.obtener(orden_id)
     
     if not orden:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     
     # Verificar estado
-    if orden["estado"] != "pagada":
+    if orden["estado"] != PAGADA:
         raise HTTPException(status_code=400, detail="La orden debe estar pagada para actualizar stock")
     
-    tienda_id = orden["tienda_id"]
+    # Confirmar la reserva hecha al crear la orden (no se vuelve a descontar)
+    await confirmar_stock(orden)
     
-    # Actualizar stock
-    try:
-        for item in orden["items"]:
-            producto_id = item["producto_id"]
-            cantidad = item["cantidad"]
-            
-            if STOCK[tienda_id][producto_id]["stock"] < cantidad:
-                # Rollback - en caso de error
-                raise HTTPException(status_code=400, detail=f"Stock insuficiente para {item['nombre']}")
-            
-            STOCK[tienda_id][producto_id]["stock"] -= cantidad
+    return {
+        "orden_id": orden_id,
+        "mensaje": "Stock actualizado correctamente",
+        "stock_actualizado": True
+    }
+
+# 11. Pago Online
+async def pagar_online(orden_id: str, pago: PagoData) -> Dict:
+    """Cobra la orden pendiente en la pasarela y la deja pagada"""
+    async with LOCKS_ORDEN.orden(orden_id):
+        # Buscar la orden
+        orden = await ORDENES.obtener(orden_id)
+        if not orden:
+            raise HTTPException(status_code=404, detail="Orden no encontrada")
         
-        # Marcar como stock actualizado
-        orden["stock_actualizado"] = True
+        # Verificar estado (con el lock tomado, dos pagos de la misma orden no cobran dos veces)
+        if not puede_pasar(orden["estado"], PAGADA):
+            raise HTTPException(status_code=400, detail="La orden ya ha sido procesada")
         
-        return {
-            "orden_id": orden_id,
-            "mensaje": "Stock actualizado correctamente",
-            "stock_actualizado": True
-        }
-    except Exception as e:
-        # En caso de error, implementar rollback si es necesario
-        orden["rollback"] = True
-        return {
-            "orden_id": orden_id,
-            "mensaje": f"Error al actualizar stock: {str(e)}",
-            "stock_actualizado": False
-        }
+        # Verificar que el pago sea del monto correcto
+        if pago.monto != orden["total"]:
+            raise HTTPException(status_code=400, detail="Monto de pago incorrecto")
+        
+        # Autorizar el cobro en la pasarela de pagos
+        transaccion_id = (await cobrar(orden_id, pago))["transaccion_id"]
+        
+        # Actualizar estado de la orden
+        orden = await ORDENES.transicion(
+            orden_id,
+            PAGADA,
+            fecha_pagada=datetime.datetime.now().isoformat(),
+            pago={
+                "transaccion_id": transaccion_id,
+                "metodo": pago.metodo,
+                "monto": pago.monto,
+                "fecha": datetime.datetime.now().isoformat()
+            }
+        )
+    return orden
 
-# 11. Pago Online
 @app.post("/pago-online/{orden_id}")
-def procesar_pago_online(orden_id: str, pago: PagoData, user: Dict = Depends(get_user_from_token)):
+async def procesar_pago_online(orden_id: str, pago: PagoData, user: Dict = Depends(get_user_from_token)):
     """Procesar pago online para una orden"""
-    # Buscar la orden
-    orden = next((orden for orden in ORDENES if orden["orden_id"] == orden_id), None)
-    if not orden:
-        raise HTTPException(status_code=404, detail="Orden no encontrada")
-    
-    # Verificar que el pago sea del monto correcto
-    if pago.monto != orden["total"]:
-        raise HTTPException(status_code=400, detail="Monto de pago incorrecto")
-    
-    # Simular procesamiento de pago
-    transaccion_id = str(uuid.uuid4())
-    
-    # Actualizar estado de la orden
-    orden["estado"] = "pagada"
-    orden["pago"] = {
-        "transaccion_id": transaccion_id,
-        "metodo": pago.metodo,
-        "monto": pago.monto,
-        "fecha": datetime.datetime.now().isoformat()
-    }
+    orden = await pagar_online(orden_id, pago)
     
     return {
         "mensaje": "Pago procesado correctamente",
-        "transaccion_id": transaccion_id,
+        "transaccion_id": orden["pago"]["transaccion_id"],
         "estado": orden["estado"]
     }
 
 # 12. Asignar Delivery
-@app.post("/asignar-delivery/{orden_id}")
-def asignar_delivery(orden_id: str, user: Dict = Depends(verificar_admin)):
-    """Asignar un repartidor a una orden de delivery"""
-    # Buscar la orden
-    orden = next((orden for orden in ORDENES if orden["orden_id"] == orden_id), None)
+def datos_repartidor(repartidor: Dict) -> Dict:
+    return {campo: repartidor[campo] for campo in ("id", "nombre", "vehiculo", "telefono")}
+
+def validar_orden_delivery(orden: Optional[Dict]):
     if not orden:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     
@@ -454,53 +1036,185 @@ def asignar_delivery(orden_id: str, user: Dict = Depends(verificar_admin)):
         raise HTTPException(status_code=400, detail="Esta orden no es de delivery")
     
     # Verificar que la orden esté pagada
-    if orden["estado"] != "pagada":
+    if not puede_pasar(orden["estado"], EN_DELIVERY):
         raise HTTPException(status_code=400, detail="La orden debe estar pagada para asignar delivery")
-    
-    # Simular asignación de repartidor
-    repartidor = {
-        "id": "REP001",
-        "nombre": "Juan Delivery",
-        "vehiculo": "Moto",
-        "telefono": "999-888-777"
-    }
-    
-    tiempo_estimado = 30  # minutos
-    
-    # Actualizar orden con información de delivery
-    orden["delivery"] = {
-        "repartidor": repartidor,
-        "tiempo_estimado": tiempo_estimado,
+
+async def ordenes_en_cola(estado: str, modo: Optional[str] = None) -> List[Dict]:
+    """Todas las órdenes de una cola, de a páginas (sin recorrer las de otros estados)"""
+    ordenes, cursor = [], None
+    while True:
+        pagina, cursor = await ORDENES.pagina(estado, modo, despues=cursor, limite=500)
+        ordenes.extend(pagina)
+        if cursor is None:
+            return ordenes
+
+def fecha_pagada(orden: Dict) -> str:
+    """Cuándo pasó a PAGADA; las órdenes pagadas antes de `fecha_pagada` la tienen según el medio de pago"""
+    return (orden.get("fecha_pagada") or orden.get("pago", {}).get("fecha")
+            or orden.get("detalles_pago", {}).get("fecha_pago") or orden["fecha_creacion"])
+
+def km_hasta_cliente(orden: Dict) -> float:
+    tienda = TIENDAS[orden["tienda_id"]]
+    ubicacion = orden.get("ubicacion_entrega")
+    if ubicacion is None:
+        return 0.0
+    return distancia_km(tienda["lat"], tienda["lon"], ubicacion["lat"], ubicacion["lon"])
+
+async def registrar_delivery(orden: Dict, repartidor: Dict, km: float, minutos_extra: int = 0, **datos) -> Dict:
+    """Guarda la asignación en la orden; el ETA sale de los `km` que recorre el repartidor hasta el cliente"""
+    delivery = {
+        "repartidor": datos_repartidor(repartidor),
+        "distancia_km": round(km, 2),
+        "tiempo_estimado": eta_minutos(km, repartidor["vehiculo"]) + minutos_extra,
         "estado": "en_camino",
-        "fecha_asignacion": datetime.datetime.now().isoformat()
+        "fecha_asignacion": datetime.datetime.now().isoformat(),
+        **datos
     }
-    orden["estado"] = "en_delivery"
+    await ORDENES.transicion(orden["orden_id"], EN_DELIVERY, delivery=delivery)
+    return delivery
+
+@app.post("/asignar-delivery/{orden_id}")
+async def asignar_delivery(orden_id: str, user: Dict = Depends(verificar_admin)):
+    """Asignar el repartidor disponible más cercano a la tienda de la orden"""
+    async with LOCKS_ORDEN.orden(orden_id):
+        orden = await ORDENES.obtener(orden_id)
+        validar_orden_delivery(orden)
+        
+        tienda = TIENDAS[orden["tienda_id"]]
+        asignado = FLOTA.asignar(orden_id, tienda["lat"], tienda["lon"])
+        if asignado is None:
+            raise HTTPException(status_code=503, detail="No hay repartidores disponibles, intente más tarde")
+        repartidor, km_recojo = asignado
+        try:
+            delivery = await registrar_delivery(orden, repartidor, km_recojo + km_hasta_cliente(orden))
+        except TransicionInvalida:
+            FLOTA.liberar(repartidor["id"])
+            raise
     
     return {
         "mensaje": "Delivery asignado correctamente",
         "repartidor": repartidor["nombre"],
-        "tiempo_estimado": tiempo_estimado
+        "tiempo_estimado": delivery["tiempo_estimado"]
     }
 
+# Asignar en lote las órdenes de delivery pagadas que esperan repartidor (las `limite` más antiguas)
+@app.post("/asignar-delivery")
+async def asignar_delivery_lote(limite: int = 500, user: Dict = Depends(verificar_admin)):
+    """Empareja a la vez las órdenes pendientes de despacho con los repartidores disponibles"""
+    pendientes, _ = await ORDENES.pagina(PAGADA, "delivery", limite=limite)
+    asignados = FLOTA.asignar_lote([
+        (orden["orden_id"], TIENDAS[orden["tienda_id"]]["lat"], TIENDAS[orden["tienda_id"]]["lon"])
+        for orden in pendientes
+    ])
+    
+    asignaciones = []
+    for orden in pendientes:
+        if orden["orden_id"] not in asignados:
+            continue
+        repartidor, km_recojo = asignados[orden["orden_id"]]
+        try:
+            delivery = await registrar_delivery(orden, repartidor, km_recojo + km_hasta_cliente(orden))
+        except TransicionInvalida:
+            FLOTA.liberar(repartidor["id"])  # Cambió de estado mientras se emparejaba
+            continue
+        asignaciones.append({"orden_id": orden["orden_id"], "repartidor": repartidor["nombre"],
+                             "tiempo_estimado": delivery["tiempo_estimado"]})
+    
+    return {
+        "asignadas": len(asignaciones),
+        "sin_repartidor": len(pendientes) - len(asignaciones),
+        "asignaciones": asignaciones
+    }
+
+# Rutas de varias paradas: agrupa las órdenes de delivery pagadas de una tienda
+@app.post("/rutas/{tienda_id}")
+async def planificar_rutas_tienda(tienda_id: str, capacidad: int = 6, ventana_min: float = RUTA_VENTANA_MIN,
+                                  user: Dict = Depends(verificar_admin)):
+    """Arma rutas con las órdenes pagadas dentro de `ventana_min` desde la más antigua y les asigna repartidor"""
+    if tienda_id not in TIENDAS:
+        raise HTTPException(status_code=404, detail="Tienda no encontrada")
+    if not 1 <= capacidad <= 20:
+        raise HTTPException(status_code=400, detail="capacidad debe estar entre 1 y 20")
+    
+    # Sin coordenadas de entrega no se puede rutear: esas órdenes se asignan de a una
+    pendientes = sorted(
+        (orden for orden in await ordenes_en_cola(PAGADA, "delivery")
+         if orden["tienda_id"] == tienda_id and orden.get("ubicacion_entrega")),
+        key=fecha_pagada
+    )
+    if not pendientes:
+        return {"rutas": [], "ordenes": 0}
+    limite = (datetime.datetime.fromisoformat(fecha_pagada(pendientes[0]))
+              + datetime.timedelta(minutes=ventana_min)).isoformat()
+    pendientes = {orden["orden_id"]: orden for orden in pendientes if fecha_pagada(orden) <= limite}
+    
+    tienda = TIENDAS[tienda_id]
+    rutas = planificar_rutas(
+        (tienda["lat"], tienda["lon"]),
+        [(orden_id, orden["ubicacion_entrega"]["lat"], orden["ubicacion_entrega"]["lon"])
+         for orden_id, orden in pendientes.items()],
+        capacidad=capacidad
+    )
+    
+    resultado = []
+    for ruta in rutas:
+        ruta_id = f"ruta_{uuid.uuid4().hex[:12]}"
+        asignado = FLOTA.asignar(ruta_id, tienda["lat"], tienda["lon"])
+        if asignado is None:
+            break  # Sin repartidores: el resto queda pagada para el próximo intento
+        repartidor, km_recojo = asignado
+        paradas = []
+        for orden_id, km in zip(ruta["paradas"], ruta["km_acumulados"]):
+            try:
+                await registrar_delivery(
+                    pendientes[orden_id], repartidor, km_recojo + km,
+                    minutos_extra=MINUTOS_POR_PARADA * len(paradas),
+                    ruta={"ruta_id": ruta_id, "parada": len(paradas) + 1, "paradas": len(ruta["paradas"]),
+                          "secuencia": ruta["paradas"], "distancia_ruta_km": ruta["distancia_km"]}
+                )
+            except TransicionInvalida:
+                continue  # Se canceló o se asignó sola mientras se planificaba: el repartidor la salta
+            paradas.append(orden_id)
+        if not paradas:
+            FLOTA.liberar(repartidor["id"])
+            continue
+        resultado.append({"ruta_id": ruta_id, "repartidor": repartidor["nombre"], "paradas": paradas,
+                          "distancia_km": ruta["distancia_km"]})
+    
+    return {"rutas": resultado, "ordenes": sum(len(ruta["paradas"]) for ruta in resultado)}
+
+# Registro de repartidores y su posición en vivo
+@app.post("/repartidores")
+async def registrar_repartidor(repartidor: RepartidorData, user: Dict = Depends(verificar_admin)):
+    """Agrega un repartidor a la flota, disponible en la posición indicada"""
+    if FLOTA.obtener(repartidor.id) is not None:
+        raise HTTPException(status_code=409, detail="El repartidor ya existe")
+    return FLOTA.registrar(repartidor.id, repartidor.nombre, repartidor.lat, repartidor.lon,
+                           repartidor.vehiculo, repartidor.telefono)
+
+@app.put("/repartidores/{repartidor_id}/posicion")
+async def actualizar_posicion_repartidor(repartidor_id: str, posicion: PosicionData,
+                                         user: Dict = Depends(verificar_admin)):
+    """Actualiza la posición del repartidor (y su celda en el índice si está disponible)"""
+    if FLOTA.obtener(repartidor_id) is None:
+        raise HTTPException(status_code=404, detail="Repartidor no encontrado")
+    return FLOTA.actualizar_posicion(repartidor_id, posicion.lat, posicion.lon)
+
 # 13. Realizar Venta
-@app.post("/realizar-venta/{orden_id}")
-def realizar_venta(orden_id: str, user: Dict = Depends(get_user_from_token)):
-    """Realizar la venta final"""
+async def vender(orden_id: str, user: Dict) -> Dict:
+    """Confirma el stock, registra la venta y publica venta_realizada para los efectos posteriores"""
     # Buscar la orden
-    orden = next((orden for orden in ORDENES if orden["orden_id"] == orden_id), None)
+    orden = await ORDENES.obtener(orden_id)
     if not orden:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     
-    # Verificar estado de la orden
-    if orden["estado"] not in ["pagada", "en_delivery"]:
+    # Verificar estado de la orden (pagada o en delivery)
+    if not puede_pasar(orden["estado"], VENDIDA):
         raise HTTPException(status_code=400, detail="La orden debe estar pagada o en delivery para realizar la venta")
     
-    # Actualizar stock
+    # Confirmar stock (si ya se confirmó en ActualizarStock no se descuenta de nuevo)
     tienda_id = orden["tienda_id"]
-    for item in orden["items"]:
-        producto_id = item["producto_id"]
-        cantidad = item["cantidad"]
-        STOCK[tienda_id][producto_id]["stock"] -= cantidad
+    await confirmar_stock(orden)
     
     # Crear registro de venta
     venta_id = str(uuid.uuid4())
@@ -512,50 +1226,86 @@ def realizar_venta(orden_id: str, user: Dict = Depends(get_user_from_token)):
         "items": orden["items"],
         "total": orden["total"],
         "isDelivery": orden.get("isDelivery", False),
+        "direccion_entrega": orden.get("direccion_entrega"),
+        "costo_delivery": orden.get("costo_delivery", 0),
+        "tienda_recojo": orden.get("tienda_recojo"),
+        "comprobante": orden.get("comprobante"),
         "estado": "completada",
         "fecha_venta": datetime.datetime.now().isoformat()
     }
     
-    VENTAS.append(venta)
-    orden["estado"] = "vendida"
+    await ORDENES.cambiar_estado(orden_id, VENDIDA)
+    await VENTAS.agregar(venta)
+    # Comprobante (si la orden lo pidió), registro en BD y analítica corren en segundo plano
+    await BUS.publicar("venta_realizada", {"venta_id": venta_id})
+    return venta
+
+@app.post("/realizar-venta/{orden_id}")
+async def realizar_venta(orden_id: str, user: Dict = Depends(get_user_from_token)):
+    """Realizar la venta final"""
+    venta = await vender(orden_id, user)
     
     return {
-        "venta_id": venta_id,
+        "venta_id": venta["venta_id"],
         "mensaje": "Venta realizada con éxito"
     }
 
 # 14. Generar Factura
-@app.post("/factura/{venta_id}")
-def generar_factura(venta_id: str, user: Dict = Depends(get_user_from_token)):
-    """Generar factura para una venta completada"""
-    # Buscar la venta
-    venta = None
-    for v in VENTAS:
-        if v["id"] == venta_id:
-            venta = v
-            break
-    
-    if not venta:
-        raise HTTPException(status_code=404, detail="Venta no encontrada")
-    
-    # Verificar estado
-    if venta["estado"] != "completada":
-        raise HTTPException(status_code=400, detail="La venta debe estar completada para generar factura")
-    
-    # Generar número de factura
-    factura_numero = f"F-{uuid.uuid4().hex[:8]}"
-    
+async def numero_comprobante(tipo: str, tienda_id: str) -> str:
+    serie = ("F" if tipo == "factura" else "B") + SERIE_TIENDA[tienda_id]
+    # Una vez por bloque el numerador espera a la base: se corre fuera del event loop
+    return formatear(serie, await asyncio.to_thread(NUMERACION.siguiente, serie))
+
+def numeros_emitidos() -> Dict[str, Set[int]]:
+    """Números de factura y boleta que figuran en las ventas guardadas, por serie"""
+    usados: Dict[str, Set[int]] = {}
+    for venta in ALMACEN.ventas:
+        for campo in ("factura", "boleta_numero"):
+            if venta.get(campo):
+                try:
+                    serie, numero = separar(venta[campo])
+                except ValueError:
+                    continue  # número anterior a la numeración por series
+                usados.setdefault(serie, set()).add(numero)
+    return usados
+
+# Cada comprobante se emite una sola vez por venta, aunque lo pidan a la vez
+# el suscriptor del checkout y un cliente, o dos workers: el que gana el
+# reclamo (una actualización condicional en el almacén) toma el número; los
+# demás esperan a que quede en la venta. El reclamo queda en la venta después
+# de emitir: si volviera a None, quien leyó la venta antes de la emisión
+# podría ganarlo otra vez. La venta guarda solo número, fecha y trabajo, y el
+# documento se reconstruye a partir de ellos.
+RECLAMO_TTL = float(os.environ.get("MIFARMA_RECLAMO_TTL", 30))  # un reclamo más viejo es de un worker caído
+
+async def emitir_una_vez(venta_id: str, tipo: str, emitir) -> Dict:
+    """Venta con el comprobante `tipo` emitido; `emitir(venta, reclamo)` solo corre en quien gana el reclamo"""
+    campo, campo_reclamo = ("factura" if tipo == "factura" else "boleta_numero"), f"{tipo}_reclamo"
+    while True:
+        venta = await VENTAS.obtener(venta_id)
+        if venta.get(campo):
+            return venta
+        anterior = venta.get(campo_reclamo)
+        if anterior is None or anterior["vence"] < time.time():
+            reclamo = {"id": uuid.uuid4().hex, "vence": time.time() + RECLAMO_TTL}
+            if await VENTAS.actualizar_si(venta_id, campo_reclamo, anterior, **{campo_reclamo: reclamo}):
+                venta = await emitir(venta, reclamo)
+                if venta is not None:
+                    return venta
+                continue  # El reclamo venció mientras emitía y otro worker lo tomó
+        await asyncio.sleep(0.02)
+
+def documento_factura(venta: Dict) -> Dict:
     # Obtener información de delivery
     isDelivery = venta.get("isDelivery", False)
     direccion_entrega = venta.get("direccion_entrega", None)
     costo_delivery = venta.get("costo_delivery", 0)
-    tienda_recojo = venta.get("tienda_recojo", venta["tienda_id"])
+    tienda_recojo = venta.get("tienda_recojo") or venta["tienda_id"]
     
-    # Crear factura
-    factura = {
+    return {
         "tipo": "factura",
-        "numero": factura_numero,
-        "venta_id": venta_id,
+        "numero": venta["factura"],
+        "venta_id": venta["venta_id"],
         "cliente": USUARIOS[venta["user_id"]]["nombre"],
         "items": venta["items"],
         "isDelivery": isDelivery,
@@ -565,52 +1315,128 @@ def generar_factura(venta_id: str, user: Dict = Depends(get_user_from_token)):
         "subtotal": round((venta["total"] - costo_delivery) / 1.18, 2),
         "igv": round((venta["total"] - costo_delivery) * 0.18, 2),
         "total": venta["total"],
-        "fecha_emision": datetime.datetime.now().isoformat()
+        # Las ventas facturadas antes de guardar la fecha usan la de la venta
+        "fecha_emision": venta.get("fecha_factura") or venta["fecha_venta"],
+        "trabajo_id": venta.get("factura_trabajo")
     }
-    
-    # Actualizar la venta con la referencia a la factura
-    venta["factura"] = factura_numero
-    
-    return factura
 
-# 15. Generar Boleta
-@app.post("/boleta/{venta_id}")
-def generar_boleta(venta_id: str, user: Dict = Depends(get_user_from_token)):
-    """Generar una boleta para una venta"""
+async def emitir_factura(venta: Dict) -> Dict:
+    async def emitir(venta: Dict, reclamo: Dict) -> Optional[Dict]:
+        # Generar número de factura (correlativo de la serie de la tienda)
+        campos = {
+            "factura": await numero_comprobante("factura", venta["tienda_id"]),
+            "fecha_factura": datetime.datetime.now().isoformat(),
+            "factura_trabajo": str(uuid.uuid4())
+        }
+        # El trabajo se encola después de guardar su id, así que al terminar ya está en la venta
+        venta = await VENTAS.actualizar_si(venta["venta_id"], "factura_reclamo", reclamo, **campos,
+                                           documento=campos["factura_trabajo"])
+        if venta is not None:
+            DOCUMENTOS.encolar(documento_factura(venta), trabajo_id=campos["factura_trabajo"],
+                               venta_id=venta["venta_id"], user_id=venta["user_id"])
+        return venta
+    
+    return documento_factura(await emitir_una_vez(venta["venta_id"], "factura", emitir))
+
+@app.post("/factura/{venta_id}")
+async def generar_factura(venta_id: str, user: Dict = Depends(get_user_from_token)):
+    """Generar factura para una venta completada"""
     # Buscar la venta
-    venta = next((v for v in VENTAS if v["venta_id"] == venta_id), None)
+    venta = await VENTAS.obtener(venta_id)
+    
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
     
-    # Generar boleta
-    boleta = {
-        "boleta_id": str(uuid.uuid4()),
-        "venta_id": venta_id,
-        "fecha_emision": datetime.datetime.now().isoformat(),
+    # Verificar estado
+    if venta["estado"] != "completada":
+        raise HTTPException(status_code=400, detail="La venta debe estar completada para generar factura")
+    
+    return await emitir_factura(venta)
+
+# 15. Generar Boleta
+def documento_boleta(venta: Dict) -> Dict:
+    cliente = USUARIOS[venta.get("boleta_cliente") or venta["user_id"]]
+    return {
+        "tipo": "boleta",
+        "boleta_id": venta["boleta"],
+        "numero": venta["boleta_numero"],
+        "venta_id": venta["venta_id"],
+        "fecha_emision": venta.get("fecha_boleta") or venta["fecha_venta"],
         "cliente": {
-            "id": user["id"],
-            "nombre": user["nombre"]
+            "id": cliente["id"],
+            "nombre": cliente["nombre"]
         },
         "items": venta["items"],
         "total": venta["total"],
-        "isDelivery": venta.get("isDelivery", False)
+        "isDelivery": venta.get("isDelivery", False),
+        "trabajo_id": venta.get("boleta_trabajo")
     }
+
+async def emitir_boleta(venta: Dict, cliente: Dict) -> Dict:
+    async def emitir(venta: Dict, reclamo: Dict) -> Optional[Dict]:
+        campos = {
+            "boleta": str(uuid.uuid4()),
+            "boleta_numero": await numero_comprobante("boleta", venta["tienda_id"]),
+            "boleta_cliente": cliente["id"],
+            "fecha_boleta": datetime.datetime.now().isoformat(),
+            "boleta_trabajo": str(uuid.uuid4())
+        }
+        # El trabajo se encola después de guardar su id, así que al terminar ya está en la venta
+        venta = await VENTAS.actualizar_si(venta["venta_id"], "boleta_reclamo", reclamo, **campos,
+                                           documento=campos["boleta_trabajo"])
+        if venta is not None:
+            DOCUMENTOS.encolar(documento_boleta(venta), trabajo_id=campos["boleta_trabajo"],
+                               venta_id=venta["venta_id"], user_id=venta["user_id"])
+        return venta
+    
+    return documento_boleta(await emitir_una_vez(venta["venta_id"], "boleta", emitir))
+
+@app.post("/boleta/{venta_id}")
+async def generar_boleta(venta_id: str, user: Dict = Depends(get_user_from_token)):
+    """Generar una boleta para una venta"""
+    # Buscar la venta
+    venta = await VENTAS.obtener(venta_id)
+    if not venta:
+        raise HTTPException(status_code=404, detail="Venta no encontrada")
     
     return {
         "mensaje": "Boleta generada correctamente",
-        "boleta": boleta
+        "boleta": await emitir_boleta(venta, user)
     }
 
+# Estado del render de un comprobante y descarga del XML
+@app.get("/documentos/trabajos/{trabajo_id}")
+async def estado_documento(trabajo_id: str, user: Dict = Depends(get_user_from_token)):
+    """pendiente, renderizando, listo (con el hash y la URL del XML) o error"""
+    trabajo = DOCUMENTOS.trabajo(trabajo_id)
+    if not trabajo or (trabajo["user_id"] != user["id"] and not user["es_admin"]):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if trabajo["estado"] == "listo":
+        trabajo["url"] = f"/documentos/{trabajo['hash']}"
+    return trabajo
+
+@app.get("/documentos/{hash}")
+async def descargar_documento(hash: str, user: Dict = Depends(get_user_from_token)):
+    """XML de un comprobante por su hash (el contenido no cambia: se puede cachear sin límite)"""
+    contenido = await ALMACEN_ASYNC.ejecutar(DOCUMENTOS.almacen.obtener, hash)
+    if contenido is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    return Response(content=contenido, media_type="application/xml",
+                    headers={"Cache-Control": "private, max-age=31536000, immutable", "ETag": f'"{hash}"'})
+
 # 16. Registrar Venta en BD
+async def marcar_registrada(venta_id: str) -> str:
+    # Simular registro en BD
+    # En un sistema real, aquí se guardaría en una base de datos persistente
+    fecha_registro = datetime.datetime.now().isoformat()
+    await VENTAS.actualizar(venta_id, registrada_bd=True, fecha_registro=fecha_registro)
+    return fecha_registro
+
 @app.post("/registrar-venta/{venta_id}")
-def registrar_venta(venta_id: str, admin: Dict = Depends(verificar_admin)):
+async def registrar_venta(venta_id: str, admin: Dict = Depends(verificar_admin)):
     """Registrar la venta en la base de datos (solo admin)"""
     # Buscar la venta
-    venta = None
-    for v in VENTAS:
-        if v["id"] == venta_id:
-            venta = v
-            break
+    venta = await VENTAS.obtener(venta_id)
     
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
@@ -619,24 +1445,116 @@ def registrar_venta(venta_id: str, admin: Dict = Depends(verificar_admin)):
     if not venta.get("factura") and not venta.get("boleta"):
         raise HTTPException(status_code=400, detail="La venta debe tener factura o boleta para ser registrada")
     
-    # Simular registro en BD
-    # En un sistema real, aquí se guardaría en una base de datos persistente
-    
-    venta["registrada_bd"] = True
-    venta["fecha_registro"] = datetime.datetime.now().isoformat()
-    
     return {
         "venta_id": venta_id,
         "mensaje": "Venta registrada correctamente en la base de datos",
-        "fecha_registro": venta["fecha_registro"]
+        "fecha_registro": await marcar_registrada(venta_id)
+    }
+
+# El registro de trabajos vive en memoria: el hash del XML se guarda en la venta al terminar
+async def al_terminar_documento(trabajo: Dict):
+    # Solo si la venta sigue apuntando a este trabajo (con boleta y luego factura, el hash sería de otro documento)
+    await VENTAS.actualizar_si(trabajo["venta_id"], "documento", trabajo["trabajo_id"],
+                               documento_hash=trabajo["hash"])
+
+DOCUMENTOS.al_terminar = al_terminar_documento
+
+# ----- EFECTOS POSTERIORES A LA VENTA (suscriptores del bus) -----
+# Los manejadores toleran entregas repetidas (el bus entrega al menos una vez)
+async def al_vender_emitir_comprobante(datos: Dict):
+    venta = await VENTAS.obtener(datos["venta_id"])
+    tipo = venta.get("comprobante")
+    if tipo is None:
+        return  # Flujo por pasos: el cliente pide la boleta o factura aparte
+    if not venta.get(tipo):
+        if tipo == "factura":
+            await emitir_factura(venta)
+        else:
+            await emitir_boleta(venta, USUARIOS[venta["user_id"]])
+    if not venta.get("registrada_bd"):
+        await BUS.publicar("comprobante_emitido", {"venta_id": venta["venta_id"]})
+
+async def al_emitir_registrar_venta(datos: Dict):
+    venta = await VENTAS.obtener(datos["venta_id"])
+    if not venta.get("registrada_bd"):
+        await marcar_registrada(venta["venta_id"])
+
+async def al_vender_actualizar_analitica(datos: Dict):
+    ANALITICA.registrar(await VENTAS.obtener(datos["venta_id"]))
+
+BUS.suscribir("venta_realizada", "comprobante", al_vender_emitir_comprobante)
+BUS.suscribir("comprobante_emitido", "registro", al_emitir_registrar_venta)
+# No durable: al arrancar, la analítica se reconstruye del historial de ventas
+BUS.suscribir("venta_realizada", "analitica", al_vender_actualizar_analitica, durable=False)
+
+# Checkout en una sola solicitud: orden desde el carrito, pago online y venta
+@app.post("/checkout/{tienda_id}")
+async def checkout(tienda_id: str, datos: CheckoutData, user: Dict = Depends(get_user_from_token)):
+    """Crea la orden, la cobra y realiza la venta; comprobante y registro quedan en segundo plano.
+
+    Una orden de delivery queda pagada (en la cola por-asignar) y se vende
+    al despacharla, como en el flujo por pasos.
+    """
+    if datos.comprobante not in ("boleta", "factura"):
+        raise HTTPException(status_code=400, detail="comprobante debe ser boleta o factura")
+    orden = await crear_orden(user, tienda_id, comprobante=datos.comprobante)
+    pago = PagoData(metodo=datos.metodo, monto=orden["total"], detalles=datos.detalles)
+    try:
+        orden = await pagar_online(orden["orden_id"], pago)
+    except HTTPException:
+        # Sin cobro no queda nada retenido: se libera la reserva y la orden se cancela
+        if await MOTOR_STOCK.liberar(orden["orden_id"], si_no_fijada=True):
+            await ORDENES.cambiar_estado(orden["orden_id"], CANCELADA)
+        raise
+    venta = None if orden["isDelivery"] else await vender(orden["orden_id"], user)
+    
+    return {
+        "orden_id": orden["orden_id"],
+        "estado": VENDIDA if venta else orden["estado"],
+        "total": orden["total"],
+        "transaccion_id": orden["pago"]["transaccion_id"],
+        "venta_id": venta["venta_id"] if venta else None,
+        "comprobante": datos.comprobante,
+        "mensaje": "Compra realizada con éxito"
+    }
+
+# Consultar una venta (p. ej. si ya tiene comprobante y registro tras un checkout)
+@app.get("/ventas/{venta_id}")
+async def obtener_venta(venta_id: str, user: Dict = Depends(get_user_from_token)):
+    venta = await VENTAS.obtener(venta_id)
+    if not venta or (venta["user_id"] != user["id"] and not user["es_admin"]):
+        raise HTTPException(status_code=404, detail="Venta no encontrada")
+    return venta
+
+# Cancelar Orden
+@app.post("/cancelar-orden/{orden_id}")
+async def cancelar_orden(orden_id: str, user: Dict = Depends(get_user_from_token)):
+    """Cancelar una orden pendiente y liberar su reserva de stock"""
+    orden = await ORDENES.obtener(orden_id)
+    if not orden:
+        raise HTTPException(status_code=404, detail="Orden no encontrada")
+    
+    if orden["user_id"] != user["id"] and not user["es_admin"]:
+        raise HTTPException(status_code=403, detail="No puede cancelar órdenes de otro usuario")
+    
+    # Solo se cancelan órdenes sin pagar; si se pagó en paralelo la reserva ya está fijada
+    if not puede_pasar(orden["estado"], CANCELADA) or not await MOTOR_STOCK.liberar(orden_id, si_no_fijada=True):
+        raise HTTPException(status_code=400, detail="Solo se pueden cancelar órdenes pendientes")
+    
+    await ORDENES.cambiar_estado(orden_id, CANCELADA)
+    
+    return {
+        "orden_id": orden_id,
+        "estado": CANCELADA,
+        "mensaje": "Orden cancelada y stock liberado"
     }
 
 # Confirmar Entrega
 @app.post("/confirmar-entrega/{orden_id}")
-def confirmar_entrega(orden_id: str, user: Dict = Depends(verificar_admin)):
+async def confirmar_entrega(orden_id: str, user: Dict = Depends(verificar_admin)):
     """Confirmar la entrega de un pedido"""
     # Buscar la orden
-    orden = next((orden for orden in ORDENES if orden["orden_id"] == orden_id), None)
+    orden = await ORDENES.obtener(orden_id)
     if not orden:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     
@@ -649,17 +1567,26 @@ def confirmar_entrega(orden_id: str, user: Dict = Depends(verificar_admin)):
         raise HTTPException(status_code=400, detail="La orden no tiene delivery asignado")
     
     # Verificar que esté en estado correcto
-    if orden["estado"] != "vendida":
+    if not puede_pasar(orden["estado"], ENTREGADO):
         raise HTTPException(status_code=400, detail="La orden debe estar vendida para confirmar entrega")
     
     # Actualizar estado de la orden y del delivery
-    orden["estado"] = "entregado"
-    orden["delivery"]["estado"] = "entregado"
-    orden["delivery"]["fecha_entrega"] = datetime.datetime.now().isoformat()
+    fecha_entrega = datetime.datetime.now().isoformat()
+    await ORDENES.transicion(
+        orden_id,
+        ENTREGADO,
+        delivery={**orden["delivery"], "estado": ENTREGADO, "fecha_entrega": fecha_entrega}
+    )
+    
+    # El repartidor queda disponible donde entregó (en una ruta, tras la última parada)
+    ruta = orden["delivery"].get("ruta")
+    if ruta is None or ruta["parada"] == ruta["paradas"]:
+        ubicacion = orden.get("ubicacion_entrega") or TIENDAS[orden["tienda_id"]]
+        FLOTA.liberar(orden["delivery"]["repartidor"]["id"], ubicacion["lat"], ubicacion["lon"])
     
     return {
         "mensaje": "Entrega confirmada correctamente",
-        "fecha_entrega": orden["delivery"]["fecha_entrega"]
+        "fecha_entrega": fecha_entrega
     }
 
 # Iniciar la aplicación si se ejecuta directamente
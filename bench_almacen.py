@@ -0,0 +1,88 @@
+# bench_almacen.py - Benchmark de requests por segundo con backend en memoria y SQLite
+# Cada cliente repite: verificar stock, ver carrito, crear orden (reserva stock)
+# y cancelarla (libera stock), así el stock no se agota durante la medición.
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+PUERTO = 8012
+BASE_URL = f"http://127.0.0.1:{PUERTO}"
+DURACION = 5  # segundos por backend
+CLIENTES = 8
+
+
+def levantar_servidor(backend, ruta):
+    entorno = dict(os.environ, MIFARMA_BACKEND=backend, MIFARMA_SQLITE_RUTA=ruta)
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(PUERTO), "--log-level", "warning"],
+        env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"{BASE_URL}/productos", timeout=0.5)
+            return proceso
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El servidor no arrancó")
+
+
+def medir(backend, ruta):
+    proceso = levantar_servidor(backend, ruta)
+    try:
+        token = requests.post(f"{BASE_URL}/login", json={"username": "user1", "password": "password123"}).json()["token"]
+        headers = {"token": token}
+        tienda_id = "tienda_fisica_1"
+        requests.post(f"{BASE_URL}/carrito/{tienda_id}", json={"producto_id": "producto_001", "cantidad": 1}, headers=headers)
+
+        conteos = []
+        errores = []
+        fin = time.time() + DURACION
+
+        def cliente():
+            sesion = requests.Session()
+            hechas = fallidas = 0
+            while time.time() < fin:
+                sesion.get(f"{BASE_URL}/verificar-stock/{tienda_id}")
+                sesion.get(f"{BASE_URL}/carrito/{tienda_id}", headers=headers)
+                respuesta = sesion.post(f"{BASE_URL}/orden-venta/{tienda_id}", headers=headers)
+                hechas += 3
+                if respuesta.status_code != 200:
+                    fallidas += 1
+                    continue
+                orden_id = respuesta.json()["orden_id"]
+                if sesion.post(f"{BASE_URL}/cancelar-orden/{orden_id}", headers=headers).status_code != 200:
+                    fallidas += 1
+                hechas += 1
+            conteos.append(hechas)
+            errores.append(fallidas)
+
+        hilos = [threading.Thread(target=cliente) for _ in range(CLIENTES)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    return sum(conteos) / DURACION, sum(errores)
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: BACKENDS DE ALMACENAMIENTO ({CLIENTES} clientes, {DURACION}s)")
+    print("="*70)
+    print(f"{'backend':>8} | {'req/s':>10} | {'errores':>8}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for backend in ["memoria", "sqlite"]:
+            rps, errores = medir(backend, os.path.join(directorio, "bench.db"))
+            print(f"{backend:>8} | {rps:>10.0f} | {errores:>8}")
+
+
+if __name__ == "__main__":
+    benchmark()
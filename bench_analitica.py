@@ -0,0 +1,100 @@
+# bench_analitica.py - Benchmark de analítica de ventas: recorrer el historial vs agregados materializados
+# 300.000 ventas en 30 días, 50 tiendas y 20.000 productos con demanda sesgada.
+# Consultas: "ingresos por tienda hoy" y "top 10 de la semana" / "de siempre".
+import random
+import statistics
+import time
+from collections import Counter
+
+from analitica import AnaliticaVentas
+from ventas import LibroVentas
+
+VENTAS = 300_000
+TIENDAS = 50
+PRODUCTOS = 20_000
+DIAS = 30
+REPETICIONES = 5
+
+
+def crear_ventas():
+    random.seed(19)
+    pesos = [1 / (i + 1) for i in range(PRODUCTOS)]
+    productos = [f"producto_{i:05d}" for i in range(PRODUCTOS)]
+    ventas = []
+    for i in range(VENTAS):
+        dia = 1 + i * DIAS // VENTAS
+        items = [{"producto_id": p, "cantidad": random.randint(1, 3)}
+                 for p in random.choices(productos, weights=pesos, k=random.randint(1, 4))]
+        ventas.append({
+            "venta_id": f"venta_{i}", "orden_id": f"orden_{i}", "tienda_id": f"tienda_{random.randrange(TIENDAS):02d}",
+            "items": items, "total": round(random.uniform(5, 300), 2), "isDelivery": random.random() < 0.35,
+            "fecha_venta": f"2024-05-{dia:02d}T{random.randint(8, 21):02d}:{random.randint(0, 59):02d}:00"
+        })
+    return ventas
+
+
+def recorrer_ingresos_hoy(libro, hoy):
+    ingresos = Counter()
+    for venta in libro:
+        if venta["fecha_venta"].startswith(hoy):
+            ingresos[venta["tienda_id"]] += venta["total"]
+    return ingresos
+
+
+def recorrer_top(libro, desde, hasta, n=10):
+    unidades = Counter()
+    for venta in libro:
+        if desde <= venta["fecha_venta"][:10] <= hasta:
+            for item in venta["items"]:
+                unidades[item["producto_id"]] += item["cantidad"]
+    return unidades.most_common(n)
+
+
+def cronometrar(funcion) -> float:
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: ANALÍTICA DE VENTAS ({VENTAS:,} ventas, {TIENDAS} tiendas, {PRODUCTOS:,} productos)")
+    print("="*70)
+    ventas = crear_ventas()
+    libro = LibroVentas()
+    analitica = AnaliticaVentas()
+    inicio = time.perf_counter()
+    for venta in ventas:
+        libro.agregar(venta)
+    agregar = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for venta in ventas:
+        analitica.registrar(venta)
+    registrar = time.perf_counter() - inicio
+    print(f"   Costo por venta: {registrar / VENTAS * 1e6:.1f} µs de agregados "
+          f"(vs {agregar / VENTAS * 1e6:.1f} µs de guardarla en el libro)")
+
+    inicio = time.perf_counter()
+    reconstruida = AnaliticaVentas.desde_historial(libro)
+    print(f"   Reconstrucción desde el historial: {time.perf_counter() - inicio:.2f}s")
+    assert reconstruida.mas_vendidos(10) == analitica.mas_vendidos(10)
+
+    hoy, semana = "2024-05-30", "2024-05-24"
+    assert [p for p, _ in recorrer_top(libro, semana, hoy)] == [p for p, _ in analitica.mas_vendidos(10, semana, hoy)]
+    consultas = [
+        ("ingresos por tienda hoy", lambda: recorrer_ingresos_hoy(libro, hoy),
+         lambda: analitica.ingresos(hoy, hoy)),
+        ("top 10 de la semana", lambda: recorrer_top(libro, semana, hoy), lambda: analitica.mas_vendidos(10, semana, hoy)),
+        ("top 10 de siempre", lambda: recorrer_top(libro, "", "9999"), lambda: analitica.mas_vendidos(10)),
+    ]
+    print(f"   {'consulta':<26} | {'recorrido ms':>12} | {'agregados ms':>12} | {'mejora':>8}")
+    for nombre, lento, rapido in consultas:
+        t_lento, t_rapido = cronometrar(lento), cronometrar(rapido)
+        print(f"   {nombre:<26} | {t_lento:>12.1f} | {t_rapido:>12.3f} | {t_lento / t_rapido:>7,.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
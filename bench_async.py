@@ -0,0 +1,112 @@
+# bench_async.py - Benchmark de concurrencia: handlers async vs handlers síncronos en el threadpool
+# Cada pago espera a una pasarela simulada con latencia fija. Los handlers
+# `def` quedan limitados por los 40 hilos del threadpool de Starlette; los
+# `async def` atienden tantas esperas como solicitudes haya en vuelo.
+import asyncio
+import json
+import os
+import time
+from typing import Dict
+
+LATENCIA_MS = 100
+os.environ["MIFARMA_PASARELA_LATENCIA_MS"] = str(LATENCIA_MS)
+
+from fastapi import FastAPI  # noqa: E402
+
+import app as mifarma  # noqa: E402
+
+CONCURRENCIAS = [50, 200, 1000]
+SOLICITUDES = 2_000
+TIENDA = "tienda_virtual_1"
+PRODUCTO = "producto_003"
+
+
+async def llamar(aplicacion, ruta: str, cuerpo: Dict, token: str) -> int:
+    """Ejecuta una solicitud POST directamente contra la aplicación ASGI"""
+    datos = json.dumps(cuerpo).encode("utf-8")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": ruta, "raw_path": ruta.encode(),
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 8000),
+        "headers": [(b"content-type", b"application/json"), (b"token", token.encode())],
+    }
+    enviado = False
+    estado = 0
+
+    async def receive():
+        nonlocal enviado
+        if enviado:
+            await asyncio.Event().wait()
+        enviado = True
+        return {"type": "http.request", "body": datos, "more_body": False}
+
+    async def send(mensaje):
+        nonlocal estado
+        if mensaje["type"] == "http.response.start":
+            estado = mensaje["status"]
+
+    await aplicacion(scope, receive, send)
+    return estado
+
+
+def crear_ordenes(cantidad: int, prefijo: str):
+    """Órdenes pendientes con su reserva de stock, listas para pagar"""
+    ordenes = []
+    for i in range(cantidad):
+        orden_id = f"{prefijo}_{i}"
+        mifarma.ALMACEN.stock.reservar(orden_id, TIENDA, [(PRODUCTO, 1)])
+        mifarma.ALMACEN.ordenes.agregar({
+            "orden_id": orden_id, "user_id": "user1", "tienda_id": TIENDA, "estado": "pendiente",
+            "items": [], "total": 4.2, "fecha_creacion": "2024-01-01T00:00:00"
+        })
+        ordenes.append(orden_id)
+    return ordenes
+
+
+def crear_app_sincrona():
+    """Mismo trabajo que /pago-online, pero con un handler `def` que bloquea su hilo"""
+    sincrona = FastAPI()
+
+    @sincrona.post("/pago-online/{orden_id}")
+    def pagar(orden_id: str):
+        time.sleep(LATENCIA_MS / 1000)
+        return {"orden_id": orden_id}
+
+    return sincrona
+
+
+async def medir(aplicacion, ordenes, concurrencia: int, token: str):
+    semaforo = asyncio.Semaphore(concurrencia)
+    estados = []
+
+    async def pagar(orden_id):
+        async with semaforo:
+            estados.append(await llamar(aplicacion, f"/pago-online/{orden_id}",
+                                        {"metodo": "tarjeta", "monto": 4.2}, token))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(pagar(orden_id) for orden_id in ordenes))
+    segundos = time.perf_counter() - inicio
+    errores = sum(1 for estado in estados if estado != 200)
+    return len(ordenes) / segundos, errores
+
+
+async def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: PAGOS CONCURRENTES (pasarela con {LATENCIA_MS} ms de latencia)")
+    print("="*70)
+    mifarma.ALMACEN.stock.stock[TIENDA][PRODUCTO]["stock"] = 10**9
+    token = mifarma.SESIONES.crear(mifarma.USUARIOS["user1"])
+    sincrona = crear_app_sincrona()
+    print(f"   {'Concurrencia':>12} | {'def (req/s)':>12} | {'async (req/s)':>13} | Mejora")
+    for concurrencia in CONCURRENCIAS:
+        ordenes = crear_ordenes(SOLICITUDES, f"bench{concurrencia}")
+        base, _ = await medir(sincrona, ordenes, concurrencia, token)
+        asincrona, errores = await medir(mifarma.app, ordenes, concurrencia, token)
+        print(f"   {concurrencia:>12} | {base:>12,.0f} | {asincrona:>13,.0f} | {asincrona / base:.1f}x"
+              + (f"  ({errores} errores)" if errores else ""))
+    print(f"✅ Techo teórico con 40 hilos: {40 / (LATENCIA_MS / 1000):,.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
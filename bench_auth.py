@@ -0,0 +1,80 @@
+# bench_auth.py - Benchmark de autenticación con 1 y N workers de uvicorn
+# Levanta el servidor con tokens firmados, hace login una vez y golpea /admin
+# desde varios procesos cliente durante unos segundos.
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+PUERTO = 8011
+BASE_URL = f"http://127.0.0.1:{PUERTO}"
+DURACION = 5  # segundos por medición
+CLIENTES = 16
+WORKERS = [1, max(2, os.cpu_count() or 2)]
+
+
+def levantar_servidor(workers, modo):
+    entorno = dict(os.environ, MIFARMA_TOKEN_MODO=modo, MIFARMA_TOKEN_SECRETO="secreto-benchmark")
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(PUERTO),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"{BASE_URL}/productos", timeout=0.5)
+            return proceso
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El servidor no arrancó")
+
+
+def cliente(token, fin, resultados):
+    sesion = requests.Session()
+    ok = rechazadas = 0
+    while time.time() < fin:
+        respuesta = sesion.get(f"{BASE_URL}/admin", headers={"token": token})
+        if respuesta.status_code == 200:
+            ok += 1
+        else:
+            rechazadas += 1
+    resultados.put((ok, rechazadas))
+
+
+def medir(workers, modo):
+    proceso = levantar_servidor(workers, modo)
+    try:
+        token = requests.post(f"{BASE_URL}/login", json={"username": "admin1", "password": "admin123"}).json()["token"]
+        resultados = multiprocessing.Queue()
+        fin = time.time() + DURACION
+        clientes = [multiprocessing.Process(target=cliente, args=(token, fin, resultados)) for _ in range(CLIENTES)]
+        for c in clientes:
+            c.start()
+        totales = [resultados.get() for _ in clientes]
+        for c in clientes:
+            c.join()
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    ok = sum(t[0] for t in totales)
+    rechazadas = sum(t[1] for t in totales)
+    return ok / DURACION, rechazadas
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: AUTENTICACIÓN /admin ({CLIENTES} clientes, {DURACION}s)")
+    print("="*70)
+    print(f"{'modo':>10} | {'workers':>7} | {'req/s':>10} | {'rechazadas (401)':>16}")
+    for modo in ["memoria", "firmado"]:
+        for workers in WORKERS:
+            rps, rechazadas = medir(workers, modo)
+            print(f"{modo:>10} | {workers:>7} | {rps:>10.0f} | {rechazadas:>16}")
+
+
+if __name__ == "__main__":
+    benchmark()
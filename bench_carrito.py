@@ -0,0 +1,76 @@
+# bench_carrito.py - Benchmark de armar un carrito de 200 líneas: lista + carrito completo vs dict + delta
+# Cada "agregar" busca la línea, ajusta el total y codifica la respuesta,
+# como lo hace el endpoint. La versión anterior recorría la lista y devolvía
+# el carrito entero; la nueva ubica la línea por producto_id y puede
+# responder solo el cambio.
+import datetime
+import random
+import time
+
+from carritos import fijar_linea, nuevo_carrito, vista_carrito
+from respuestas import codificar
+
+LINEAS = 200
+AGREGADOS = 400  # cada producto se agrega dos veces
+
+
+def agregar_en_lista(carrito, producto_id, cantidad, precio):
+    for item in carrito["items"]:
+        if item["producto_id"] == producto_id:
+            item["cantidad"] += cantidad
+            break
+    else:
+        carrito["items"].append({"producto_id": producto_id, "cantidad": cantidad, "precio": precio,
+                                 "isDelivery": False})
+    total = sum(item["precio"] * item["cantidad"] for item in carrito["items"])
+    return codificar({"mensaje": "Carrito actualizado", "carrito": carrito, "total": total})
+
+
+def agregar_en_dict(carrito, producto_id, cantidad, precio, delta):
+    linea = carrito["items"].get(producto_id)
+    cambio = fijar_linea(carrito, producto_id, cantidad + (0 if linea is None else linea["cantidad"]), precio)
+    if delta:
+        return codificar({"mensaje": "Carrito actualizado", "cambios": [cambio], "subtotal": carrito["subtotal"],
+                          "lineas": len(carrito["items"])})
+    return codificar({"mensaje": "Carrito actualizado", "carrito": vista_carrito(carrito)})
+
+
+def medir(operaciones, crear, agregar):
+    carrito = crear()
+    bytes_enviados = 0
+    inicio = time.perf_counter()
+    for producto_id, cantidad, precio in operaciones:
+        bytes_enviados += len(agregar(carrito, producto_id, cantidad, precio))
+    return (time.perf_counter() - inicio) * 1000, bytes_enviados
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: CARRITO DE {LINEAS} LÍNEAS ({AGREGADOS} agregados)")
+    print("="*70)
+    random.seed(17)
+    productos = [(f"producto_{i:03d}", round(random.uniform(1, 80), 2)) for i in range(LINEAS)]
+    operaciones = [(p, random.randint(1, 3), precio) for p, precio in productos * 2]
+    ahora = datetime.datetime.now().isoformat()
+
+    def carrito_en_lista():
+        return {"user_id": "user1", "tienda_id": "tienda_1", "items": [], "isDelivery": False,
+                "direccion_entrega": None, "fecha_creacion": ahora}
+
+    casos = [
+        ("lista + carrito completo", carrito_en_lista, agregar_en_lista),
+        ("dict + carrito completo", lambda: nuevo_carrito("user1", "tienda_1"),
+         lambda c, p, n, pr: agregar_en_dict(c, p, n, pr, delta=False)),
+        ("dict + delta", lambda: nuevo_carrito("user1", "tienda_1"),
+         lambda c, p, n, pr: agregar_en_dict(c, p, n, pr, delta=True)),
+    ]
+    base = None
+    print(f"   {'variante':<26} | {'ms':>7} | {'KB enviados':>11} | {'mejora':>6}")
+    for nombre, crear, agregar in casos:
+        ms, enviados = min(medir(operaciones, crear, agregar) for _ in range(5))
+        base = base or ms
+        print(f"   {nombre:<26} | {ms:>7.1f} | {enviados / 1024:>11.0f} | {base / ms:>5.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
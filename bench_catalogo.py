@@ -0,0 +1,114 @@
+# bench_catalogo.py - Benchmark de búsqueda en un catálogo de 100.000 productos
+# Compara el índice (prefijos + listas invertidas) contra recorrer el catálogo
+# completo, que es lo que hace hoy un cliente que descarga /productos.
+import random
+import statistics
+import time
+
+from catalogo import IndiceCatalogo, normalizar
+
+PRODUCTOS = 100_000
+CONSULTAS = 2_000
+
+BASES = ["Paracetamol", "Ibuprofeno", "Aspirina", "Ácido fólico", "Amoxicilina", "Omeprazol", "Loratadina",
+         "Diclofenaco", "Naproxeno", "Metformina", "Losartán", "Atorvastatina", "Cetirizina", "Clorfenamina",
+         "Dexametasona", "Ácido acetilsalicílico", "Ranitidina", "Salbutamol", "Azitromicina", "Ciprofloxacino",
+         "Vitamina C", "Vitamina D3", "Sulfato ferroso", "Hioscina", "Metamizol", "Ketorolaco", "Simeticona"]
+FORMAS = ["tabletas", "cápsulas", "jarabe", "suspensión", "gotas", "crema", "gel", "inyectable", "sobres"]
+DOSIS = ["100mg", "250mg", "400mg", "500mg", "1g", "5ml", "10ml", "120ml", "x10", "x20", "x100"]
+CATEGORIAS = ["Analgésico", "Antipirético", "Antiinflamatorio", "Antibiótico", "Antihistamínico",
+              "Antiácido", "Suplemento", "Broncodilatador", "Antiespasmódico", "Hipotensor"]
+SILABAS = ["la", "bo", "far", "med", "gen", "vi", "ta", "cor", "nex", "pro", "san", "lux", "ter", "mar"]
+
+
+def crear_catalogo():
+    random.seed(3)
+    marcas = sorted({"".join(random.choices(SILABAS, k=3)).capitalize() for _ in range(3_000)})
+    catalogo = []
+    for i in range(PRODUCTOS):
+        base = random.choice(BASES)
+        marca = random.choice(marcas)
+        catalogo.append({
+            "id": f"producto_{i:06d}",
+            "nombre": f"{base} {marca} {random.choice(FORMAS)} {random.choice(DOSIS)}",
+            "descripcion": f"{random.choice(CATEGORIAS)} de uso {random.choice(['oral', 'tópico', 'pediátrico'])}, "
+                           f"laboratorio {marca}"
+        })
+    return catalogo, marcas
+
+
+def crear_consultas(marcas):
+    random.seed(5)
+    consultas = []
+    for _ in range(CONSULTAS):
+        base = normalizar(random.choice(BASES))[0]
+        tipo = random.random()
+        if tipo < 0.3:
+            consultas.append(base[:random.randint(3, 6)])                       # autocompletado
+        elif tipo < 0.5:
+            consultas.append(f"{base[:5]} {random.choice(DOSIS)}")               # dos términos
+        elif tipo < 0.7:
+            consultas.append(random.choice(marcas)[:random.randint(3, 7)])       # marca (poco frecuente)
+        elif tipo < 0.85:
+            consultas.append(random.choice(CATEGORIAS).lower().replace("é", "e").replace("á", "a"))  # sin tildes
+        else:
+            consultas.append(f"{random.choice(FORMAS)} {base[:4]} {random.choice(DOSIS)[:2]}")
+    return consultas
+
+
+def por_recorrido(catalogo, consulta, limite=20):
+    """Búsqueda ingenua: normalizar y comparar cada producto del catálogo"""
+    terminos = normalizar(consulta)
+    resultados = []
+    for producto in catalogo:
+        tokens = normalizar(producto["nombre"] + " " + producto["descripcion"])
+        if all(any(t.startswith(termino) for t in tokens) for termino in terminos):
+            resultados.append(producto["id"])
+            if len(resultados) == limite:
+                break
+    return resultados
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return (statistics.mean(tiempos), tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99)],
+            tiempos[-1])
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: BÚSQUEDA EN EL CATÁLOGO ({PRODUCTOS:,} productos, {CONSULTAS:,} consultas)")
+    print("="*70)
+    catalogo, marcas = crear_catalogo()
+    consultas = crear_consultas(marcas)
+
+    indice = IndiceCatalogo()
+    inicio = time.perf_counter()
+    for producto in catalogo:
+        indice.agregar(producto)
+    segundos = time.perf_counter() - inicio
+    print(f"   Indexación incremental: {segundos:.2f}s ({PRODUCTOS / segundos:,.0f} productos/s), "
+          f"vocabulario de {len(indice._vocabulario):,} tokens")
+
+    tiempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        indice.buscar(consulta, offset=0, limite=20)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    media, p50, p99, maximo = percentiles(tiempos)
+    print(f"   {'método':<18} | {'media ms':>9} | {'p50 ms':>8} | {'p99 ms':>8} | {'máx ms':>8}")
+    print(f"   {'índice':<18} | {media:>9.3f} | {p50:>8.3f} | {p99:>8.3f} | {maximo:>8.3f}")
+
+    muestra = consultas[:50]
+    tiempos = []
+    for consulta in muestra:
+        inicio = time.perf_counter()
+        por_recorrido(catalogo, consulta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    media_lenta, p50, p99, maximo = percentiles(tiempos)
+    print(f"   {'recorrido (50)':<18} | {media_lenta:>9.3f} | {p50:>8.3f} | {p99:>8.3f} | {maximo:>8.3f}")
+    print(f"✅ Mejora media: {media_lenta / media:,.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,98 @@
+# bench_checkout.py - Benchmark de una venta: flujo por pasos vs checkout en una solicitud
+# Levanta la app (con MIFARMA_PASARELA_LATENCIA_MS de latencia simulada) y
+# mide, por venta, cuántas solicitudes hace el cliente y cuánto espera:
+# por pasos son orden, pago, venta, boleta y registro; con /checkout es una
+# sola, y boleta/factura y registro los hace el bus en segundo plano.
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+PUERTO = 8014
+BASE_URL = f"http://127.0.0.1:{PUERTO}"
+VENTAS = 50
+LATENCIA_PASARELA_MS = 20
+
+
+def levantar_app():
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(PUERTO), "--log-level", "warning"],
+        env={**os.environ, "MIFARMA_PASARELA_LATENCIA_MS": str(LATENCIA_PASARELA_MS)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"{BASE_URL}/productos", timeout=0.5)
+            return proceso
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("La app no arrancó")
+
+
+def preparar_carrito(sesion: requests.Session, i: int):
+    """Deja el carrito con una unidad de un producto (la orden no vacía el carrito)"""
+    lineas = [{"producto_id": f"producto_00{n}", "cantidad": int(n == i % 3 + 1), "operacion": "fijar"}
+              for n in (1, 2, 3)]
+    sesion.post(f"{BASE_URL}/carrito/tienda_virtual_1/lineas?respuesta=delta",
+                json={"lineas": lineas, "isDelivery": False}).raise_for_status()
+
+
+def venta_por_pasos(sesion: requests.Session) -> int:
+    orden = sesion.post(f"{BASE_URL}/orden-venta/tienda_virtual_1").json()
+    sesion.post(f"{BASE_URL}/pago-online/{orden['orden_id']}",
+                json={"monto": orden["total"], "metodo": "tarjeta", "detalles": {}}).raise_for_status()
+    venta = sesion.post(f"{BASE_URL}/realizar-venta/{orden['orden_id']}").json()
+    sesion.post(f"{BASE_URL}/boleta/{venta['venta_id']}").raise_for_status()
+    sesion.post(f"{BASE_URL}/registrar-venta/{venta['venta_id']}").raise_for_status()
+    return 5
+
+
+def venta_checkout(sesion: requests.Session) -> int:
+    respuesta = sesion.post(f"{BASE_URL}/checkout/tienda_virtual_1",
+                            json={"metodo": "tarjeta", "detalles": {}, "comprobante": "boleta"})
+    assert respuesta.status_code == 200, respuesta.text
+    return 1
+
+
+def medir(sesion: requests.Session, vender, desplazamiento: int):
+    solicitudes, espera = 0, 0.0
+    for i in range(VENTAS):
+        preparar_carrito(sesion, i + desplazamiento)
+        inicio = time.perf_counter()
+        solicitudes += vender(sesion)
+        espera += time.perf_counter() - inicio
+    return solicitudes / VENTAS, espera / VENTAS * 1000
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: UNA VENTA POR PASOS VS CHECKOUT ({VENTAS} ventas, pasarela de {LATENCIA_PASARELA_MS} ms)")
+    print("="*70)
+    proceso = levantar_app()
+    try:
+        sesion = requests.Session()  # keep-alive, como un cliente real
+        sesion.headers["token"] = sesion.post(f"{BASE_URL}/login",
+                                              json={"username": "admin1", "password": "admin123"}).json()["token"]
+        print(f"   {'flujo':<10} | {'solicitudes/venta':>17} | {'ms por venta':>12}")
+        for nombre, vender, desplazamiento in (("por pasos", venta_por_pasos, 0), ("checkout", venta_checkout, 1)):
+            solicitudes, ms = medir(sesion, vender, desplazamiento)
+            print(f"   {nombre:<10} | {solicitudes:>17.0f} | {ms:>12.1f}")
+
+        for _ in range(100):
+            metricas = sesion.get(f"{BASE_URL}/admin/eventos").json()
+            if not any(s["pendientes"] for s in metricas["suscriptores"].values()):
+                break
+            time.sleep(0.05)
+        registro = metricas["suscriptores"]["registro"]
+        print(f"   bus: {registro['procesados']} ventas registradas en segundo plano, "
+              f"{registro['reintentos']} reintentos, outbox con {metricas['outbox']} eventos")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+if __name__ == "__main__":
+    benchmark()
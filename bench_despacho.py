@@ -0,0 +1,85 @@
+# bench_despacho.py - Benchmark de despacho: 10.000 órdenes y 1.000 repartidores simulados en Lima
+# 1) Asignación de a una: el más cercano con la grilla vs recorrer todos los
+#    repartidores disponibles. Cada repartidor se libera en el punto de
+#    entrega cuando hay 700 ocupados, así que la flota se mueve.
+# 2) Asignación en lote: 10 olas de 1.000 pedidos contra la flota completa,
+#    emparejamiento goloso global vs de a uno en orden de llegada
+#    (kilómetros totales de recojo y tiempo de planificación).
+import random
+import time
+from collections import deque
+
+from despacho import CENTRO, flota_simulada
+from geo import distancia_km
+
+REPARTIDORES = 1_000
+ORDENES = 10_000
+OCUPADOS_MAX = 700
+OLAS = 10
+
+
+def crear_pedidos(cantidad: int, semilla: int):
+    azar = random.Random(semilla)
+    return [(f"orden_{i}", CENTRO[0] + azar.uniform(-12, 12) / 110.574, CENTRO[1] + azar.uniform(-12, 12) / 108.0)
+            for i in range(cantidad)]
+
+
+def asignar_recorriendo(flota, orden_id, lat, lon):
+    mejor = min(
+        (r for r in flota._repartidores.values() if r["orden_id"] is None),
+        key=lambda r: distancia_km(r["lat"], r["lon"], lat, lon), default=None
+    )
+    if mejor is None:
+        return None
+    flota._ocupar(mejor["id"], orden_id)
+    return mejor, distancia_km(mejor["lat"], mejor["lon"], lat, lon)
+
+
+def flujo_continuo(asignar):
+    flota = flota_simulada(REPARTIDORES, semilla=1)
+    ocupados = deque()
+    kilometros = 0.0
+    inicio = time.perf_counter()
+    for orden_id, lat, lon in crear_pedidos(ORDENES, 2):
+        repartidor, km = asignar(flota, orden_id, lat, lon)
+        kilometros += km
+        ocupados.append((repartidor["id"], lat, lon))
+        if len(ocupados) >= OCUPADOS_MAX:
+            flota.liberar(*ocupados.popleft())
+    return (time.perf_counter() - inicio) / ORDENES * 1e6, kilometros
+
+
+def olas(en_lote: bool):
+    planificacion = 0.0
+    kilometros = 0.0
+    for ola in range(OLAS):
+        flota = flota_simulada(REPARTIDORES, semilla=1)
+        pedidos = crear_pedidos(ORDENES // OLAS, 100 + ola)
+        inicio = time.perf_counter()
+        if en_lote:
+            asignados = flota.asignar_lote(pedidos)
+        else:
+            asignados = {orden_id: flota.asignar(orden_id, lat, lon) for orden_id, lat, lon in pedidos}
+        planificacion += time.perf_counter() - inicio
+        kilometros += sum(km for _, km in asignados.values())
+    return planificacion / OLAS * 1000, kilometros
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: DESPACHO ({ORDENES:,} órdenes, {REPARTIDORES:,} repartidores)")
+    print("="*70)
+    recorrer_us, recorrer_km = flujo_continuo(asignar_recorriendo)
+    grilla_us, grilla_km = flujo_continuo(lambda flota, o, lat, lon: flota.asignar(o, lat, lon))
+    print(f"   De a una      | recorrer todos: {recorrer_us:>8.1f} µs/orden | grilla: {grilla_us:>6.1f} µs/orden"
+          f" | {recorrer_us / grilla_us:.0f}x")
+    print(f"                 | km de recojo:   {recorrer_km:>8,.0f}          | grilla: {grilla_km:>6,.0f}")
+
+    secuencial_ms, secuencial_km = olas(en_lote=False)
+    lote_ms, lote_km = olas(en_lote=True)
+    print(f"   Lote de {ORDENES // OLAS:,} | de a uno: {secuencial_ms:>6.1f} ms, {secuencial_km:>8,.0f} km"
+          f" | goloso: {lote_ms:>6.1f} ms, {lote_km:>8,.0f} km ({(1 - lote_km / secuencial_km) * 100:.0f}% menos)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,78 @@
+# bench_documentos.py - Benchmark de render de 10k comprobantes: en serie vs pipeline por lotes
+# La referencia renderiza y guarda cada XML en serie, como haría un handler
+# que emite el comprobante dentro de la solicitud; cada documento incluye
+# escribirlo en el almacén (temporal + rename), que aquí pesa más que el
+# XML. El pipeline los manda al pool en lotes; con tam_lote=1 se ve cuánto
+# cuesta pasar cada documento entre procesos sin agrupar. El pool escala con
+# los núcleos: con una sola CPU no puede superar a la serie, pero igual saca
+# el render del event loop.
+import asyncio
+import os
+import tempfile
+import time
+
+from documentos import AlmacenDocumentos, PipelineDocumentos, renderizar
+
+DOCUMENTOS = 10_000
+
+
+def crear_documentos():
+    documentos = []
+    for i in range(DOCUMENTOS):
+        items = [{"producto_id": f"producto_{p:03d}", "nombre": f"Producto {p}", "cantidad": p % 3 + 1,
+                  "precio_unitario": 4.5 + p, "subtotal": (4.5 + p) * (p % 3 + 1)} for p in range(i % 5 + 1)]
+        documentos.append({
+            "tipo": "factura" if i % 2 else "boleta", "numero": f"F-{i:08d}", "venta_id": f"venta_{i}",
+            "fecha_emision": "2026-10-17T10:30:00", "cliente": "Cliente Normal", "items": items,
+            "costo_delivery": 10.0 if i % 3 == 0 else 0, "total": sum(item["subtotal"] for item in items)
+        })
+    return documentos
+
+
+def medir_serie(documentos) -> float:
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = AlmacenDocumentos(directorio)
+        inicio = time.perf_counter()
+        for documento in documentos:
+            almacen.guardar(renderizar(documento))
+        return len(documentos) / (time.perf_counter() - inicio)
+
+
+def medir_pipeline(documentos, procesos: int, tam_lote: int) -> float:
+    with tempfile.TemporaryDirectory() as directorio:
+        pipeline = PipelineDocumentos(AlmacenDocumentos(directorio), procesos=procesos, tam_lote=tam_lote)
+
+        async def correr():
+            await pipeline.iniciar()
+            # Calentar el pool: el arranque de los procesos no cuenta
+            pipeline.encolar(documentos[0])
+            await pipeline.esperar()
+            inicio = time.perf_counter()
+            for documento in documentos:
+                pipeline.encolar(documento)
+            await pipeline.esperar()
+            transcurrido = time.perf_counter() - inicio
+            await pipeline.detener()
+            return transcurrido
+
+        transcurrido = asyncio.run(correr())
+        assert pipeline.metricas()["errores"] == 0
+        return len(documentos) / transcurrido
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: RENDER DE COMPROBANTES ({DOCUMENTOS:,} documentos, {os.cpu_count()} CPU)")
+    print("="*70)
+    documentos = crear_documentos()
+    print(f"   {'configuración':<30} | {'documentos/s':>12}")
+    print(f"   {'en serie':<30} | {medir_serie(documentos):>12,.0f}")
+    print(f"   {'pipeline, hilo, lotes de 64':<30} | {medir_pipeline(documentos, 0, 64):>12,.0f}")
+    for procesos in sorted({1, 2, 4, os.cpu_count() or 1}):
+        for tam_lote in (1, 64):
+            nombre = f"pool de {procesos}, lotes de {tam_lote}"
+            print(f"   {nombre:<30} | {medir_pipeline(documentos, procesos, tam_lote):>12,.0f}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,86 @@
+# bench_journal.py - Benchmark de recuperación: snapshot + cola del journal
+# Uso: python bench_journal.py [entradas]   (por defecto 10 millones)
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from almacen import crear_almacen_memoria
+from journal import Journal, _linea
+
+TIENDAS = 100
+PRODUCTOS = 1_000
+ORDENES_DISTINTAS = 100_000
+LOTE = 100_000
+
+
+def crear_stock():
+    return {
+        f"tienda_{t:03d}": {
+            f"producto_{p:04d}": {"nombre": f"Producto {p}", "precio": 1.0, "stock": 1_000}
+            for p in range(PRODUCTOS)
+        }
+        for t in range(TIENDAS)
+    }
+
+
+def escribir_journal(directorio, entradas):
+    """Genera un journal sintético: 70% stock, 20% órdenes, 10% carritos"""
+    random.seed(7)
+    ruta = os.path.join(directorio, f"journal-{1:020d}.log")
+    with open(ruta, "wb") as archivo:
+        lote = []
+        for seq in range(1, entradas + 1):
+            tipo = random.random()
+            tienda_id = f"tienda_{random.randrange(TIENDAS):03d}"
+            if tipo < 0.7:
+                clave = f"{tienda_id}|producto_{random.randrange(PRODUCTOS):04d}"
+                lote.append(_linea(seq, "stock", clave, str(random.randrange(1_000))))
+            elif tipo < 0.9:
+                orden_id = f"orden_{random.randrange(ORDENES_DISTINTAS)}"
+                orden = {"orden_id": orden_id, "user_id": "user1", "tienda_id": tienda_id,
+                         "estado": random.choice(["pendiente", "pagada", "vendida"]), "items": [], "total": 10.0}
+                lote.append(_linea(seq, "orden", orden_id, json.dumps(orden)))
+            else:
+                carrito_id = f"cart_user{random.randrange(10_000)}_{tienda_id}"
+                carrito = {"user_id": "user1", "tienda_id": tienda_id, "items": [], "isDelivery": False}
+                lote.append(_linea(seq, "carrito", carrito_id, json.dumps(carrito)))
+            if len(lote) == LOTE:
+                archivo.write(b"".join(lote))
+                lote = []
+        archivo.write(b"".join(lote))
+    return os.path.getsize(ruta)
+
+
+def benchmark(entradas):
+    print("\n" + "="*70)
+    print(f"BENCHMARK: RECUPERACIÓN DEL JOURNAL ({entradas:,} entradas)")
+    print("="*70)
+    with tempfile.TemporaryDirectory() as directorio:
+        inicio = time.perf_counter()
+        tamano = escribir_journal(directorio, entradas)
+        print(f"   Journal generado: {tamano / 1e6:.0f} MB en {time.perf_counter() - inicio:.1f}s")
+
+        # Recuperación completa desde el journal (sin snapshot)
+        almacen = crear_almacen_memoria(crear_stock())
+        journal = Journal(directorio)
+        resultado = journal.recuperar(almacen)
+        print(f"✅ Replay completo: {resultado['entradas']:,} entradas en {resultado['segundos']:.2f}s "
+              f"({resultado['entradas'] / resultado['segundos']:,.0f} entradas/s)")
+
+        # Snapshot compactado y recuperación desde él (la cola queda vacía)
+        inicio = time.perf_counter()
+        journal.snapshot(almacen)
+        print(f"   Snapshot escrito en {time.perf_counter() - inicio:.2f}s")
+        journal.detener()
+
+        almacen = crear_almacen_memoria(crear_stock())
+        resultado = Journal(directorio).recuperar(almacen)
+        print(f"✅ Desde snapshot: {resultado['entradas']:,} entradas en {resultado['segundos']:.2f}s")
+        print(f"   Órdenes: {len(almacen.ordenes):,} - Carritos: {len(almacen.carritos):,}")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
@@ -0,0 +1,140 @@
+# bench_lecturas.py - Benchmark de lecturas calientes: serializar en cada solicitud vs caché por versión y 304
+# Mezcla de 90% lecturas (/productos y /verificar-stock) y 10% reservas que
+# cambian el stock de la tienda, sobre un catálogo de 2.000 productos y una
+# tienda con 500. Cada reserva cambia la versión de la tienda e invalida
+# todas sus lecturas; la ventana de desactualización lo amortigua. Las
+# solicitudes se envían directo a la aplicación ASGI, así que se mide el
+# trabajo del servidor y no el de la red.
+import asyncio
+import random
+import time
+
+from fastapi import FastAPI, HTTPException
+from typing import Optional
+
+import app as mifarma
+
+PRODUCTOS = 2_000
+PRODUCTOS_TIENDA = 500
+SOLICITUDES = 5_000
+VENTANA_MS = 50
+TIENDA = "tienda_virtual_1"
+
+
+async def llamar(aplicacion, ruta: str, consulta: str = "", etag: Optional[str] = None):
+    """GET directo a la aplicación ASGI; devuelve (estado, etag, bytes del cuerpo)"""
+    cabeceras = [] if etag is None else [(b"if-none-match", etag.encode())]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": ruta, "raw_path": ruta.encode(),
+        "query_string": consulta.encode(), "root_path": "", "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 8000), "headers": cabeceras,
+    }
+    respuesta = {"estado": 0, "etag": None, "bytes": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensaje):
+        if mensaje["type"] == "http.response.start":
+            respuesta["estado"] = mensaje["status"]
+            for nombre, valor in mensaje["headers"]:
+                if nombre == b"etag":
+                    respuesta["etag"] = valor.decode()
+        elif mensaje["type"] == "http.response.body":
+            respuesta["bytes"] += len(mensaje.get("body", b""))
+
+    await aplicacion(scope, receive, send)
+    return respuesta["estado"], respuesta["etag"], respuesta["bytes"]
+
+
+def poblar():
+    """Agranda el catálogo y el inventario de la tienda de la POC"""
+    random.seed(13)
+    inventario = mifarma.ALMACEN.stock.stock[TIENDA]
+    for i in range(PRODUCTOS):
+        producto = {"id": f"producto_b{i:05d}", "nombre": f"Producto {i}", "descripcion": f"Descripción del producto {i}"}
+        mifarma.PRODUCTOS[producto["id"]] = producto
+        mifarma.CATALOGO.agregar(producto)
+        if i < PRODUCTOS_TIENDA:
+            inventario[producto["id"]] = {"nombre": producto["nombre"], "precio": 3.5, "stock": 0}
+            mifarma.ALMACEN.stock.establecer(TIENDA, producto["id"], 1_000)
+
+
+def crear_app_sin_cache():
+    """Los handlers de antes: devuelven el dict y FastAPI lo serializa en cada solicitud"""
+    sin_cache = FastAPI()
+
+    @sin_cache.get("/productos")
+    async def get_productos():
+        return mifarma.PRODUCTOS
+
+    @sin_cache.get("/verificar-stock/{tienda_id}")
+    async def verificar_stock(tienda_id: str, producto_id: Optional[str] = None):
+        if not await mifarma.MOTOR_STOCK.existe_tienda(tienda_id):
+            raise HTTPException(status_code=404, detail="Tienda no encontrada")
+        if producto_id:
+            producto = await mifarma.MOTOR_STOCK.producto(tienda_id, producto_id)
+            return {"producto": producto, "disponible": producto["stock"] > 0}
+        return await mifarma.MOTOR_STOCK.inventario(tienda_id)
+
+    return sin_cache
+
+
+def crear_mezcla():
+    random.seed(17)
+    mezcla = []
+    for _ in range(SOLICITUDES):
+        tipo = random.random()
+        if tipo < 0.1:
+            mezcla.append(("reserva", None, ""))
+        elif tipo < 0.4:
+            mezcla.append(("lectura", "/productos", ""))
+        elif tipo < 0.7:
+            mezcla.append(("lectura", f"/verificar-stock/{TIENDA}", ""))
+        else:
+            producto_id = f"producto_b{random.randrange(PRODUCTOS_TIENDA):05d}"
+            mezcla.append(("lectura", f"/verificar-stock/{TIENDA}", f"producto_id={producto_id}"))
+    return mezcla
+
+
+async def medir(nombre, aplicacion, mezcla, revalidar: bool):
+    etags = {}
+    estados = {}
+    enviados = 0
+    inicio = time.perf_counter()
+    for i, (tipo, ruta, consulta) in enumerate(mezcla):
+        if tipo == "reserva":
+            producto_id = f"producto_b{i % PRODUCTOS_TIENDA:05d}"
+            mifarma.ALMACEN.stock.reservar(f"bench_{nombre}_{i}", TIENDA, [(producto_id, 1)], ttl=0)
+            continue
+        estado, etag, enviados_cuerpo = await llamar(aplicacion, ruta, consulta,
+                                                     etags.get((ruta, consulta)) if revalidar else None)
+        etags[(ruta, consulta)] = etag
+        estados[estado] = estados.get(estado, 0) + 1
+        enviados += enviados_cuerpo
+    segundos = time.perf_counter() - inicio
+    lecturas = sum(estados.values())
+    print(f"   {nombre:<22} | {lecturas / segundos:>10,.0f} | {enviados / lecturas / 1024:>10.1f} | "
+          f"{estados.get(304, 0) / lecturas:>6.0%}")
+    return lecturas / segundos
+
+
+async def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: LECTURAS CALIENTES ({SOLICITUDES:,} solicitudes, 90% lecturas / 10% reservas)")
+    print("="*70)
+    poblar()
+    mezcla = crear_mezcla()
+    print(f"   {'modo':<22} | {'lecturas/s':>10} | {'KB/lectura':>10} | {'304':>6}")
+    base = await medir("sin caché", crear_app_sin_cache(), mezcla, revalidar=False)
+    cache = await medir("caché por versión", mifarma.app, mezcla, revalidar=False)
+    revalidando = await medir("caché + If-None-Match", mifarma.app, mezcla, revalidar=True)
+    mifarma.LECTURAS.ventana = VENTANA_MS / 1000
+    await medir(f"+ ventana de {VENTANA_MS} ms", mifarma.app, mezcla, revalidar=True)
+    print(f"✅ Mejora: {cache / base:.1f}x con caché, {revalidando / base:.1f}x revalidando con ETag "
+          f"({mifarma.LECTURAS.aciertos:,} aciertos, {mifarma.LECTURAS.fallos:,} serializaciones)")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
@@ -0,0 +1,105 @@
+# bench_numeracion.py - Benchmark de numeración correlativa: contador global vs bloques arrendados
+# El contador global es lo ingenuo: una transacción BEGIN IMMEDIATE por
+# número, que serializa a todos los hilos y procesos en el lock de escritura
+# de SQLite. Con bloques, cada worker va a la base una vez cada tam_bloque
+# números y el resto sale de memoria con un lock por serie. Cada corrida
+# verifica que no haya números repetidos.
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from almacen_sqlite import PoolConexiones
+from numeracion import NumeradorSeries
+
+NUMEROS = 20_000
+SERIES = ("F001", "B001", "F002", "B002")
+
+
+class ContadorGlobal:
+    """Un número por transacción, directo sobre la marca alta"""
+
+    def __init__(self, pool: PoolConexiones):
+        self._pool = pool
+        NumeradorSeries(pool)  # crea las tablas
+
+    def siguiente(self, serie: str) -> int:
+        with self._pool.transaccion() as con:
+            fila = con.execute("UPDATE numeracion_series SET siguiente = siguiente + 1 WHERE serie = ? "
+                               "RETURNING siguiente - 1", (serie,)).fetchone()
+            if fila is None:
+                con.execute("INSERT INTO numeracion_series (serie, siguiente) VALUES (?, 2)", (serie,))
+                return 1
+            return fila[0]
+
+    def cerrar(self):
+        pass
+
+
+def crear_numerador(ruta: str, tam_bloque: int):
+    pool = PoolConexiones(ruta, esquema="")
+    return ContadorGlobal(pool) if tam_bloque == 0 else NumeradorSeries(pool, tam_bloque=tam_bloque)
+
+
+def emitir_con_hilos(numerador, hilos: int, cantidad: int):
+    emitidos = []
+
+    def emitir(n: int):
+        for i in range(cantidad // hilos):
+            serie = SERIES[(i + n) % len(SERIES)]
+            emitidos.append((serie, numerador.siguiente(serie)))
+
+    trabajadores = [threading.Thread(target=emitir, args=(n,)) for n in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    numerador.cerrar()
+    return emitidos
+
+
+def worker(ruta: str, tam_bloque: int, hilos: int, cantidad: int, listos, salida):
+    numerador = crear_numerador(ruta, tam_bloque)
+    listos.wait()
+    salida.put(emitir_con_hilos(numerador, hilos, cantidad))
+
+
+def medir(tam_bloque: int, procesos: int, hilos: int) -> float:
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "numeracion.db")
+        crear_numerador(ruta, tam_bloque)  # esquema antes de arrancar a los workers
+        if procesos == 1:
+            numerador = crear_numerador(ruta, tam_bloque)
+            inicio = time.perf_counter()
+            emitidos = emitir_con_hilos(numerador, hilos, NUMEROS)
+        else:
+            listos = multiprocessing.Barrier(procesos + 1)
+            salida = multiprocessing.Queue()
+            hijos = [multiprocessing.Process(target=worker, args=(ruta, tam_bloque, hilos, NUMEROS // procesos,
+                                                                  listos, salida)) for _ in range(procesos)]
+            for hijo in hijos:
+                hijo.start()
+            listos.wait()
+            inicio = time.perf_counter()
+            emitidos = [numero for _ in hijos for numero in salida.get()]
+            for hijo in hijos:
+                hijo.join()
+        transcurrido = time.perf_counter() - inicio
+    assert len(set(emitidos)) == len(emitidos) == NUMEROS, "Números repetidos o perdidos"
+    return NUMEROS / transcurrido
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: NUMERACIÓN POR SERIES ({NUMEROS:,} números, {len(SERIES)} series, {os.cpu_count()} CPU)")
+    print("="*70)
+    print(f"   {'configuración':<22} | {'8 hilos':>10} | {'4 procesos x 2 hilos':>20}")
+    for tam_bloque in (0, 10, 100, 1_000):
+        nombre = "contador global" if tam_bloque == 0 else f"bloques de {tam_bloque}"
+        print(f"   {nombre:<22} | {medir(tam_bloque, 1, 8):>10,.0f} | {medir(tam_bloque, 4, 2):>20,.0f}")
+    print("   ✅ Sin números repetidos en ninguna corrida (números/s)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,83 @@
+# bench_ordenes.py - Benchmark de búsqueda de órdenes: lista lineal vs repositorio indexado, y colas paginadas
+import random
+import time
+import uuid
+
+from ordenes import RepositorioOrdenes
+
+TAMANOS = [1_000, 10_000, 100_000, 300_000]
+BUSQUEDAS = 2_000
+
+
+def crear_orden(i):
+    return {
+        "orden_id": str(uuid.uuid4()),
+        "user_id": f"user{i % 500}",
+        "tienda_id": f"tienda_virtual_{i % 20}",
+        "estado": random.choice(["pendiente", "pagada", "vendida"]),
+        "isDelivery": i % 2 == 0,
+        "items": [],
+        "total": 10.0,
+    }
+
+
+def medir(funcion, ids):
+    inicio = time.perf_counter()
+    for orden_id in ids:
+        funcion(orden_id)
+    return (time.perf_counter() - inicio) / len(ids) * 1e6  # microsegundos por búsqueda
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print("BENCHMARK: BÚSQUEDA DE ÓRDENES POR orden_id")
+    print("="*70)
+    print(f"{'órdenes':>10} | {'lista (µs)':>12} | {'repositorio (µs)':>17}")
+
+    for tamano in TAMANOS:
+        lista = []
+        repositorio = RepositorioOrdenes()
+        for i in range(tamano):
+            orden = crear_orden(i)
+            lista.append(orden)
+            repositorio.agregar(orden)
+
+        ids = [random.choice(lista)["orden_id"] for _ in range(BUSQUEDAS)]
+        # La búsqueda lineal se muestrea con menos consultas para no tardar minutos
+        ids_lineal = ids[:max(10, BUSQUEDAS * 1_000 // tamano)]
+
+        lineal = medir(lambda oid: next((o for o in lista if o["orden_id"] == oid), None), ids_lineal)
+        indexada = medir(repositorio.obtener, ids)
+        print(f"{tamano:>10} | {lineal:>12.2f} | {indexada:>17.3f}")
+
+
+def benchmark_colas():
+    """Página de 50 órdenes 'por asignar' (pagadas de delivery): filtrar el índice por estado vs la cola"""
+    print("\n" + "="*70)
+    print("BENCHMARK: PÁGINA DE 50 ÓRDENES POR ASIGNAR (la tercera)")
+    print("="*70)
+    print(f"{'órdenes':>10} | {'índice + filtro (µs)':>21} | {'cola paginada (µs)':>19}")
+    for tamano in TAMANOS:
+        repositorio = RepositorioOrdenes()
+        for i in range(tamano):
+            repositorio.agregar(crear_orden(i))
+        cursor = None
+        for _ in range(2):
+            cursor = repositorio.pagina("pagada", "delivery", despues=cursor, limite=50)[1]
+
+        repeticiones = 20
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            filtradas = [o for o in repositorio.buscar("estado", "pagada") if o.get("isDelivery")][100:150]
+        filtro = (time.perf_counter() - inicio) / repeticiones * 1e6
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            pagina, _ = repositorio.pagina("pagada", "delivery", despues=cursor, limite=50)
+        cola = (time.perf_counter() - inicio) / repeticiones * 1e6
+        assert pagina == filtradas
+        print(f"{tamano:>10} | {filtro:>21.1f} | {cola:>19.1f}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_colas()
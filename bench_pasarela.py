@@ -0,0 +1,115 @@
+# bench_pasarela.py - Benchmark del cliente de la pasarela contra stub_pasarela.py
+# Mide throughput y latencia de cola (p50/p99) con y sin keep-alive, en lotes,
+# con errores inyectados y con la pasarela caída (con y sin circuit breaker).
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from pasarela_http import CircuitoPasarela, PasarelaHTTP
+
+PUERTO = 8013
+BASE_URL = f"http://127.0.0.1:{PUERTO}"
+PAGOS = 2_000
+CONCURRENCIA = 100
+
+
+def levantar_stub():
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "stub_pasarela:app", "--port", str(PUERTO), "--log-level", "warning"],
+        env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"{BASE_URL}/v1/estadisticas", timeout=0.5)
+            return proceso
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El stub de la pasarela no arrancó")
+
+
+def configurar(**cambios):
+    requests.post(f"{BASE_URL}/v1/configuracion", json=cambios).raise_for_status()
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000 if valores else 0
+
+
+async def medir(pasarela, prefijo, pagos=PAGOS):
+    """Autoriza `pagos` pagos con CONCURRENCIA llamadas en vuelo; devuelve (req/s, p50, p99, ok)"""
+    semaforo = asyncio.Semaphore(CONCURRENCIA)
+    latencias = []
+    ok = 0
+
+    async def pagar(i):
+        nonlocal ok
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                await pasarela.autorizar(f"{prefijo}_{i}", 10.0, "tarjeta")
+                ok += 1
+            except Exception:
+                pass
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(pagar(i) for i in range(pagos)))
+    segundos = time.perf_counter() - inicio
+    await pasarela.cerrar()
+    return pagos / segundos, percentil(latencias, 0.5), percentil(latencias, 0.99), ok
+
+
+def fila(nombre, rps, p50, p99, ok, total=PAGOS):
+    print(f"   {nombre:<28} | {rps:>8,.0f} | {p50:>7.1f} | {p99:>7.1f} | {ok:>5}/{total}")
+
+
+async def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: CLIENTE DE LA PASARELA ({PAGOS:,} pagos, {CONCURRENCIA} en vuelo)")
+    print("="*70)
+    print(f"   {'escenario':<28} | {'req/s':>8} | {'p50 ms':>7} | {'p99 ms':>7} | {'ok':>10}")
+
+    configurar(latencia_ms=20, tasa_error=0)
+    fila("sin keep-alive", *await medir(PasarelaHTTP(BASE_URL, keep_alive=False), "a"))
+    pasarela = PasarelaHTTP(BASE_URL)
+    fila("pool keep-alive", *await medir(pasarela, "b"))
+    print(f"      conexiones abiertas: {pasarela.pool.creadas}, reutilizadas: {pasarela.pool.reutilizadas:,}")
+
+    pasarela = PasarelaHTTP(BASE_URL, tamano_lote=50)
+    inicio = time.perf_counter()
+    resultados = await pasarela.autorizar_lote(
+        [{"orden_id": f"c_{i}", "monto": 10.0, "metodo": "tarjeta"} for i in range(PAGOS)]
+    )
+    segundos = time.perf_counter() - inicio
+    await pasarela.cerrar()
+    ok = sum(1 for r in resultados if isinstance(r, dict))
+    fila("lotes de 50", PAGOS / segundos, segundos * 1000, segundos * 1000, ok)
+
+    configurar(tasa_error=0.2)
+    fila("20% de 503, sin reintentos", *await medir(PasarelaHTTP(BASE_URL, reintentos=0), "d"))
+    fila("20% de 503, 2 reintentos", *await medir(PasarelaHTTP(BASE_URL, reintentos=2), "e"))
+
+    # Pasarela colgada: cada llamada agota su plazo de 200 ms
+    configurar(latencia_ms=5_000, tasa_error=0)
+    sin_circuito = CircuitoPasarela(umbral_fallos=10**9)
+    fila("caída, sin circuit breaker",
+         *await medir(PasarelaHTTP(BASE_URL, timeout=0.2, reintentos=0, circuito=sin_circuito), "f", 500), 500)
+    con_circuito = CircuitoPasarela(umbral_fallos=5, tiempo_apertura=30)
+    fila("caída, con circuit breaker",
+         *await medir(PasarelaHTTP(BASE_URL, timeout=0.2, reintentos=0, circuito=con_circuito), "g", 500), 500)
+    print(f"      llamadas rechazadas sin tocar la red: {con_circuito.rechazadas}")
+
+
+if __name__ == "__main__":
+    stub = levantar_stub()
+    try:
+        asyncio.run(benchmark())
+    finally:
+        stub.terminate()
+        stub.wait()
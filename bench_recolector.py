@@ -0,0 +1,52 @@
+# bench_recolector.py - Benchmark de un ciclo del recolector: recorrer todo vs heap de vencimientos
+# 1M carritos con vencimientos repartidos en 24 h; en cada ciclo de 30 s
+# vencen ~350. Recorrer todos para encontrarlos cuesta O(total); el heap
+# cuesta O(vencidos).
+import random
+import time
+
+from recolector import Vencimientos
+
+CARRITOS = 1_000_000
+TTL = 86_400
+CICLO = 30
+CICLOS = 20
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: CICLO DEL RECOLECTOR ({CARRITOS:,} carritos, ciclo de {CICLO} s)")
+    print("="*70)
+    random.seed(23)
+    vence = {f"cart_{i}": random.uniform(0, TTL) for i in range(CARRITOS)}
+    vencimientos = Vencimientos()
+    inicio = time.perf_counter()
+    for carrito_id, momento in vence.items():
+        vencimientos.programar(carrito_id, momento)
+    print(f"   Programar {CARRITOS:,}: {(time.perf_counter() - inicio) / CARRITOS * 1e6:.2f} µs por carrito")
+
+    recorrido = heap = 0.0
+    total = 0
+    for ciclo in range(1, CICLOS + 1):
+        ahora = ciclo * CICLO
+        inicio = time.perf_counter()
+        vencidos = [c for c, momento in vence.items() if momento <= ahora]
+        for carrito_id in vencidos:
+            del vence[carrito_id]
+        recorrido += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        sacados = vencimientos.vencidas(ahora)
+        heap += time.perf_counter() - inicio
+        assert sorted(sacados) == sorted(vencidos)
+        total += len(sacados)
+
+    print(f"   ({total / CICLOS:.0f} carritos vencidos por ciclo)")
+    print(f"   {'estrategia':<22} | {'ms por ciclo':>12}")
+    print(f"   {'recorrer todos':<22} | {recorrido / CICLOS * 1000:>12.2f}")
+    print(f"   {'heap de vencimientos':<22} | {heap / CICLOS * 1000:>12.2f}")
+    print(f"   mejora: {recorrido / heap:,.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,77 @@
+# bench_rutas.py - Benchmark de rutas de varias paradas: 1.000 órdenes de delivery de una tienda
+# Compara despachar cada orden sola (ida y vuelta) con agrupar en rutas de
+# hasta 6 paradas: vecino más cercano solo y vecino más cercano + 2-opt.
+# También mide armar las rutas con búsqueda lineal del vecino (O(n²)).
+import math
+import random
+import statistics
+import time
+
+from despacho import IndiceGrilla
+from rutas import distancia_individual, planificar_rutas
+
+ORIGEN = (-12.0464, -77.0428)
+ORDENES = 1_000
+CAPACIDAD = 6
+
+
+def crear_paradas():
+    azar = random.Random(12)
+    # Demanda concentrada en barrios, como la real
+    barrios = [(azar.uniform(-7, 7), azar.uniform(-7, 7)) for _ in range(12)]
+    paradas = []
+    for i in range(ORDENES):
+        bx, by = azar.choice(barrios)
+        paradas.append((f"orden_{i}", ORIGEN[0] + (by + azar.gauss(0, 1.2)) / 110.574,
+                        ORIGEN[1] + (bx + azar.gauss(0, 1.2)) / 108.0))
+    return paradas
+
+
+def vecino_lineal(paradas):
+    """Mismas rutas de vecino más cercano, buscando el vecino entre todas las paradas restantes"""
+    indice = IndiceGrilla(centro=ORIGEN)
+    puntos = {clave: indice.proyectar(lat, lon) for clave, lat, lon in paradas}
+    origen = indice.proyectar(*ORIGEN)
+    rutas = []
+    while puntos:
+        actual, ruta = origen, []
+        while len(ruta) < CAPACIDAD and puntos:
+            clave = min(puntos, key=lambda c: math.hypot(puntos[c][0] - actual[0], puntos[c][1] - actual[1]))
+            actual = puntos.pop(clave)
+            ruta.append(clave)
+        rutas.append(ruta)
+    return rutas
+
+
+def cronometrar(funcion, repeticiones: int = 5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: RUTAS DE VARIAS PARADAS ({ORDENES:,} órdenes, hasta {CAPACIDAD} paradas por ruta)")
+    print("="*70)
+    paradas = crear_paradas()
+    individual = distancia_individual(ORIGEN, paradas)
+    lineal_ms, lineal = cronometrar(lambda: vecino_lineal(paradas), repeticiones=1)
+    vecino_ms, vecino = cronometrar(lambda: planificar_rutas(ORIGEN, paradas, CAPACIDAD, mejorar=False))
+    opt_ms, opt = cronometrar(lambda: planificar_rutas(ORIGEN, paradas, CAPACIDAD))
+    assert [r["paradas"] for r in vecino] == lineal
+
+    print(f"   {'estrategia':<34} | {'planificación ms':>16} | {'km totales':>10} | {'ahorro':>6}")
+    print(f"   {'una orden por viaje':<34} | {'-':>16} | {individual:>10,.0f} | {'-':>6}")
+    for nombre, ms, rutas in (("vecino más cercano (lineal)", lineal_ms, vecino),
+                              ("vecino más cercano (grilla)", vecino_ms, vecino),
+                              ("vecino más cercano + 2-opt", opt_ms, opt)):
+        km = sum(r["distancia_km"] for r in rutas)
+        print(f"   {nombre:<34} | {ms:>16.1f} | {km:>10,.0f} | {(1 - km / individual) * 100:>5.0f}%")
+    print(f"   ({len(opt)} rutas)")
+
+
+if __name__ == "__main__":
+    benchmark()
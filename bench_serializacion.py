@@ -0,0 +1,98 @@
+# bench_serializacion.py - Microbenchmark del costo de serializar las respuestas de cada endpoint
+# Compara el camino por defecto de FastAPI (jsonable_encoder + json.dumps de
+# JSONResponse) con el codificador de respuestas.py. Para el catálogo y la
+# búsqueda también se mide unir entradas ya codificadas: con entradas tan
+# chicas el bucle en Python cuesta más que volver a codificarlas con orjson,
+# por eso la app no lo usa y el catálogo completo se codifica una vez por
+# versión en cache_lecturas.py.
+import datetime
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+import respuestas
+from respuestas import codificar
+
+ITEMS = 200
+PRODUCTOS = 2_000
+
+
+class Fragmento(bytes):
+    """JSON ya codificado que se inserta tal cual"""
+
+
+def objeto_json(campos) -> bytes:
+    partes = [
+        codificar(clave) + b":" + (valor if isinstance(valor, Fragmento) else codificar(valor))
+        for clave, valor in campos.items()
+    ]
+    return b"{" + b",".join(partes) + b"}"
+
+
+def lista_json(fragmentos) -> Fragmento:
+    return Fragmento(b"[" + b",".join(fragmentos) + b"]")
+
+
+def fastapi_por_defecto(datos) -> bytes:
+    return JSONResponse(jsonable_encoder(datos)).body
+
+
+def crear_payloads():
+    ahora = datetime.datetime.now().isoformat()
+    items = [{"producto_id": f"producto_{i:05d}", "nombre": f"Producto {i}", "cantidad": i % 5 + 1,
+              "precio": 3.5 + i / 100, "subtotal": (3.5 + i / 100) * (i % 5 + 1)} for i in range(ITEMS)]
+    carrito = {"mensaje": "Producto agregado al carrito", "carrito": {
+        "user_id": "user1", "tienda_id": "tienda_virtual_1", "isDelivery": False, "direccion_entrega": None,
+        "fecha_creacion": ahora, "items": [{**item, "isDelivery": False} for item in items]}}
+    orden = {"mensaje": "Orden de venta creada", "orden_id": "orden_1", "total": 1234.5, "orden": {
+        "orden_id": "orden_1", "user_id": "user1", "tienda_id": "tienda_virtual_1", "estado": "pendiente",
+        "items": items, "total": 1234.5, "isDelivery": True, "direccion_entrega": "Av. Larco 123",
+        "fecha_creacion": ahora}}
+    catalogo = {f"producto_{i:05d}": {"id": f"producto_{i:05d}", "nombre": f"Producto {i}",
+                                      "descripcion": f"Descripción del producto {i}"} for i in range(PRODUCTOS)}
+    return carrito, orden, catalogo
+
+
+def medir(funcion, repeticiones: int) -> float:
+    return min(timeit.repeat(funcion, number=repeticiones, repeat=5)) / repeticiones * 1e6
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: SERIALIZACIÓN POR ENDPOINT (codificador: {'orjson' if respuestas.orjson else 'pydantic-core'})")
+    print("="*70)
+    carrito, orden, catalogo = crear_payloads()
+    fragmentos = {producto_id: Fragmento(codificar(p)) for producto_id, p in catalogo.items()}
+    pagina = list(catalogo)[:20]
+    busqueda = {"resultados": [catalogo[p] for p in pagina], "offset": 0, "limite": 20, "hay_mas": True}
+
+    casos = [
+        ("POST /carrito", carrito, None, 2_000),
+        ("POST /orden-venta", orden, None, 2_000),
+        ("GET /productos", catalogo, lambda: objeto_json(fragmentos), 200),
+        ("GET /productos/buscar", busqueda, lambda: objeto_json({
+            "resultados": lista_json(fragmentos[p] for p in pagina), "offset": 0, "limite": 20, "hay_mas": True
+        }), 10_000),
+    ]
+    print(f"   {'endpoint':<22} | {'FastAPI µs':>10} | {'pydantic µs':>11} | {'codificar µs':>12} | "
+          f"{'fragmentos µs':>13} | {'mejora':>6}")
+    for nombre, datos, con_fragmentos, repeticiones in casos:
+        assert respuestas.codificar(datos) == to_json(datos)
+        base = medir(lambda: fastapi_por_defecto(datos), repeticiones)
+        pydantic = medir(lambda: to_json(datos), repeticiones)
+        rapido = medir(lambda: codificar(datos), repeticiones)
+        mejor = rapido
+        texto_fragmentos = "-"
+        if con_fragmentos is not None:
+            assert con_fragmentos() == codificar(datos)
+            unido = medir(con_fragmentos, repeticiones)
+            mejor = min(rapido, unido)
+            texto_fragmentos = f"{unido:.1f}"
+        print(f"   {nombre:<22} | {base:>10.1f} | {pydantic:>11.1f} | {rapido:>12.1f} | "
+              f"{texto_fragmentos:>13} | {base / mejor:>5.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,57 @@
+# bench_stock.py - Benchmark de reservas concurrentes: lock global vs locks por franja
+import threading
+import time
+
+from stock import MotorStock, StockInsuficiente
+
+HILOS = 200
+OPERACIONES = 500  # reservas por hilo
+PRODUCTOS = 2_000
+
+
+def crear_stock():
+    return {
+        "tienda_virtual_1": {
+            f"producto_{i:05d}": {"nombre": f"Producto {i}", "precio": 1.0, "stock": 10**9}
+            for i in range(PRODUCTOS)
+        }
+    }
+
+
+def medir(franjas):
+    motor = MotorStock(crear_stock(), franjas=franjas, ttl_reserva=0)
+    inicio = threading.Barrier(HILOS + 1)
+
+    def comprador(n):
+        inicio.wait()
+        for i in range(OPERACIONES):
+            reserva_id = f"{n}_{i}"
+            producto_id = f"producto_{(n * 7919 + i) % PRODUCTOS:05d}"
+            try:
+                motor.reservar(reserva_id, "tienda_virtual_1", [(producto_id, 1)])
+            except StockInsuficiente:
+                continue
+            motor.confirmar(reserva_id)
+
+    hilos = [threading.Thread(target=comprador, args=(n,)) for n in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    inicio.wait()
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.join()
+    return HILOS * OPERACIONES / (time.perf_counter() - t0)
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: RESERVAS CONCURRENTES ({HILOS} hilos x {OPERACIONES} reservas)")
+    print("="*70)
+    print(f"{'franjas':>8} | {'reservas/s':>12}")
+    for franjas in [1, 16, 64, 256]:
+        etiqueta = "global" if franjas == 1 else str(franjas)
+        print(f"{etiqueta:>8} | {medir(franjas):>12.0f}")
+
+
+if __name__ == "__main__":
+    benchmark()
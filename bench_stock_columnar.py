@@ -0,0 +1,91 @@
+# bench_stock_columnar.py - Benchmark de memoria y reportes: stock en dicts anidados vs en columnas
+# 2.000 tiendas y 20.000 SKUs; cada tienda lleva ~500 SKUs con sesgo hacia los
+# más populares (1M de entradas). La matriz completa de 40M celdas no cabe
+# como dicts, y en columnas densas ocuparía 480 MB casi vacíos, así que se
+# guardan solo las entradas existentes.
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+
+from stock import MotorStock
+from stock_columnar import MotorStockColumnar
+
+TIENDAS = 2_000
+SKUS = 20_000
+SKUS_POR_TIENDA = 500
+LECTURAS = 20_000
+
+
+def crear_stock():
+    random.seed(11)
+    pesos = [1 / (i + 1) for i in range(SKUS)]
+    skus = [f"producto_{i:05d}" for i in range(SKUS)]
+    stock = {}
+    for t in range(TIENDAS):
+        surtido = set(random.choices(skus, weights=pesos, k=SKUS_POR_TIENDA * 2))
+        stock[f"tienda_{t:04d}"] = {
+            p: {"nombre": p, "precio": round(random.uniform(1, 200), 2), "stock": random.choice([0, 1, 5, 20, 100])}
+            for p in surtido
+        }
+    return stock
+
+
+def construir(clase):
+    """Motor construido y memoria que retiene (el dict de entrada incluido solo si el motor lo usa)"""
+    gc.collect()
+    tracemalloc.start()
+    motor = clase(crear_stock())
+    gc.collect()
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return motor, memoria
+
+
+def cronometrar(funcion, repeticiones: int = 5) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: STOCK EN COLUMNAS ({TIENDAS:,} tiendas x {SKUS:,} SKUs)")
+    print("="*70)
+    motores = {}
+    for nombre, clase in (("dicts", MotorStock), ("columnas", MotorStockColumnar)):
+        motor, memoria = construir(clase)
+        motores[nombre] = motor
+        print(f"   {nombre:<10} memoria retenida: {memoria / 2**20:>7.1f} MB")
+    dicts, columnas = motores["dicts"], motores["columnas"]
+    entradas = sum(len(p) for p in dicts.stock.values())
+    print(f"   ({entradas:,} entradas de stock)")
+
+    assert dicts.unidades_por_producto() == columnas.unidades_por_producto()
+    assert {t: sorted(p) for t, p in dicts.bajo_umbral(5).items()} == columnas.bajo_umbral(5)
+    valores = columnas.valorizacion()
+    assert all(abs(v - valores[t]) < 1e-6 for t, v in dicts.valorizacion().items())
+
+    random.seed(5)
+    pares = [(t, random.choice(list(p))) for t, p in random.choices(list(dicts.stock.items()), k=LECTURAS)]
+    consultas = [
+        ("unidades por producto", lambda m: m.unidades_por_producto()),
+        ("bajo umbral (< 5)", lambda m: m.bajo_umbral(5)),
+        ("valorización", lambda m: m.valorizacion()),
+        ("tiendas para carrito x100", lambda m: [m.tiendas_con_stock([(p, 1), ("producto_00000", 2)])
+                                                for _, p in pares[:100]]),
+        (f"producto() x{LECTURAS // 1000}k", lambda m: [m.producto(t, p) for t, p in pares]),
+    ]
+    print(f"   {'consulta':<26} | {'dicts ms':>9} | {'columnas ms':>11} | {'mejora':>7}")
+    for nombre, consulta in consultas:
+        lento = cronometrar(lambda: consulta(dicts))
+        rapido = cronometrar(lambda: consulta(columnas))
+        print(f"   {nombre:<26} | {lento:>9.1f} | {rapido:>11.1f} | {lento / rapido:>6.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,86 @@
+# bench_stock_compartido.py - Benchmark de reservar+confirmar con 1..8 procesos sobre el mismo segmento
+# Cada proceso es un worker de uvicorn simulado que reserva y confirma
+# órdenes de 2 productos. La referencia es el MotorStock de un solo proceso
+# (dict + threading.Lock). Los locks de fcntl cuestan una llamada al sistema
+# por franja, así que un proceso solo es más lento que el dict; lo que se
+# gana es poder sumar workers sin partir el inventario. Con un solo núcleo
+# el total no escala: los procesos se turnan la misma CPU.
+import multiprocessing
+import os
+import time
+
+from stock import MotorStock
+from stock_compartido import MotorStockCompartido
+
+OPERACIONES = 20_000
+PRODUCTOS = 200
+NOMBRE = f"mifarma_bench_{os.getpid()}"
+
+
+def crear_stock():
+    return {f"tienda_{t}": {f"producto_{p:03d}": {"nombre": f"P{p}", "precio": 1.0, "stock": 10**9}
+                            for p in range(PRODUCTOS)} for t in range(4)}
+
+
+def vender(motor, n: int, operaciones: int):
+    for i in range(operaciones):
+        reserva_id = f"orden_{n}_{i}"
+        motor.reservar(reserva_id, f"tienda_{i % 4}",
+                       [(f"producto_{(i * 7 + n) % PRODUCTOS:03d}", 1), (f"producto_{(i * 13) % PRODUCTOS:03d}", 2)])
+        motor.confirmar(reserva_id)
+
+
+def worker(n: int, operaciones: int, listos, salida):
+    motor = MotorStockCompartido(crear_stock(), nombre=NOMBRE)
+    listos.wait()
+    vender(motor, n, operaciones)
+    salida.put(n)
+    motor.cerrar()
+
+
+def medir_procesos(procesos: int) -> float:
+    listos = multiprocessing.Barrier(procesos + 1)
+    salida = multiprocessing.Queue()
+    por_proceso = OPERACIONES // procesos
+    hijos = [multiprocessing.Process(target=worker, args=(n, por_proceso, listos, salida)) for n in range(procesos)]
+    for hijo in hijos:
+        hijo.start()
+    listos.wait()
+    inicio = time.perf_counter()
+    for _ in hijos:
+        salida.get()
+    duracion = time.perf_counter() - inicio
+    for hijo in hijos:
+        hijo.join()
+    return por_proceso * procesos / duracion
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: STOCK EN MEMORIA COMPARTIDA ({OPERACIONES:,} órdenes, {os.cpu_count()} CPU)")
+    print("="*70)
+    MotorStockCompartido.eliminar_segmento(NOMBRE)
+    motor = MotorStockCompartido(crear_stock(), nombre=NOMBRE)  # siembra el segmento
+    try:
+        local = MotorStock(crear_stock())
+        inicio = time.perf_counter()
+        vender(local, 0, OPERACIONES)
+        referencia = OPERACIONES / (time.perf_counter() - inicio)
+
+        print(f"   {'configuración':<28} | {'órdenes/s':>10}")
+        print(f"   {'MotorStock (1 proceso)':<28} | {referencia:>10,.0f}")
+        for procesos in (1, 2, 4, 8):
+            print(f"   {f'compartido, {procesos} proceso(s)':<28} | {medir_procesos(procesos):>10,.0f}")
+
+        total = sum(motor.unidades_por_producto().values())
+        vendidas = OPERACIONES * 3 * 4  # 4 corridas de OPERACIONES órdenes de 3 unidades
+        assert total == 4 * PRODUCTOS * 10**9 - vendidas, "Se perdieron unidades entre procesos"
+        print("   ✅ Unidades consistentes entre procesos")
+    finally:
+        motor.cerrar()
+        MotorStockCompartido.eliminar_segmento(NOMBRE)
+        os.remove(motor.ruta_locks)
+
+
+if __name__ == "__main__":
+    benchmark()
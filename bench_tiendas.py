@@ -0,0 +1,84 @@
+# bench_tiendas.py - Benchmark de búsqueda de tiendas para un carrito: recorrido completo vs índice invertido
+# 2.000 tiendas y 20.000 SKUs; cada tienda lleva 500 SKUs con sesgo hacia los
+# más populares, como en una cadena real.
+import heapq
+import random
+import statistics
+import time
+
+from geo import distancia_km
+from stock import MotorStock, agrupar_items
+
+TIENDAS = 2_000
+SKUS = 20_000
+SKUS_POR_TIENDA = 500
+CONSULTAS = 500
+ITEMS_POR_CARRITO = 3
+
+
+def crear_datos():
+    random.seed(11)
+    pesos = [1 / (i + 1) for i in range(SKUS)]
+    skus = [f"producto_{i:05d}" for i in range(SKUS)]
+    stock = {}
+    ubicaciones = {}
+    for t in range(TIENDAS):
+        tienda_id = f"tienda_{t:04d}"
+        surtido = set(random.choices(skus, weights=pesos, k=SKUS_POR_TIENDA * 2))
+        stock[tienda_id] = {
+            p: {"nombre": p, "precio": 1.0, "stock": random.choice([0, 1, 5, 20, 100])} for p in surtido
+        }
+        ubicaciones[tienda_id] = (-12.05 + random.uniform(-0.5, 0.5), -77.04 + random.uniform(-0.5, 0.5))
+    carritos = [
+        [(p, random.choice([1, 1, 2])) for p in random.choices(skus[:500], weights=pesos[:500], k=ITEMS_POR_CARRITO)]
+        for _ in range(CONSULTAS)
+    ]
+    return stock, ubicaciones, carritos
+
+
+def ranking(candidatas, ubicaciones, lat, lon, limite=5):
+    return heapq.nsmallest(limite, ((distancia_km(lat, lon, *ubicaciones[t]), t) for t in candidatas))
+
+
+def por_recorrido(stock, carrito):
+    """Lo que hacía el cliente: consultar el inventario de cada tienda"""
+    cantidades = agrupar_items(carrito).items()
+    return [
+        tienda_id for tienda_id, inventario in stock.items()
+        if all(inventario.get(p, {}).get("stock", 0) >= c for p, c in cantidades)
+    ]
+
+
+def medir(nombre, buscar, ubicaciones, carritos):
+    tiempos = []
+    for carrito in carritos:
+        inicio = time.perf_counter()
+        ranking(buscar(carrito), ubicaciones, -12.05, -77.04)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    print(f"   {nombre:<18} | {statistics.mean(tiempos):>9.3f} | {tiempos[len(tiempos) // 2]:>8.3f} | "
+          f"{tiempos[int(len(tiempos) * 0.99)]:>8.3f}")
+    return statistics.mean(tiempos)
+
+
+def benchmark():
+    print("\n" + "="*70)
+    print(f"BENCHMARK: TIENDAS PARA UN CARRITO ({TIENDAS:,} tiendas, {SKUS:,} SKUs, {CONSULTAS} consultas)")
+    print("="*70)
+    stock, ubicaciones, carritos = crear_datos()
+    inicio = time.perf_counter()
+    motor = MotorStock(stock)
+    print(f"   Índice construido en {time.perf_counter() - inicio:.2f}s "
+          f"({sum(len(p) for p in stock.values()):,} entradas de stock)")
+
+    for carrito in carritos[:50]:
+        assert sorted(motor.tiendas_con_stock(carrito)) == sorted(por_recorrido(stock, carrito))
+
+    print(f"   {'método':<18} | {'media ms':>9} | {'p50 ms':>8} | {'p99 ms':>8}")
+    lento = medir("recorrido", lambda carrito: por_recorrido(stock, carrito), ubicaciones, carritos)
+    rapido = medir("índice invertido", motor.tiendas_con_stock, ubicaciones, carritos)
+    print(f"✅ Mejora: {lento / rapido:.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,91 @@
+# cache_lecturas.py - Respuestas de lectura pre-serializadas por versión, con ETag y ventana de desactualización
+import hashlib
+import time
+from typing import Dict, Hashable, Optional
+
+from fastapi import Response
+
+from respuestas import codificar
+
+
+class LecturaCacheada:
+    __slots__ = ("version", "etag", "cuerpo", "verificada")
+
+    def __init__(self, version, etag: str, cuerpo: bytes, verificada: float):
+        self.version = version
+        self.etag = etag
+        self.cuerpo = cuerpo
+        self.verificada = verificada
+
+
+class CacheLecturas:
+    """Bytes JSON por clave, válidos mientras no cambie la versión de los datos.
+
+    Cada recurso tiene un contador que sube con cada cambio; si coincide con
+    el de la entrada guardada se devuelven los mismos bytes sin volver a
+    serializar. El ETag es un hash del contenido, así que sigue siendo
+    válido entre reinicios y entre workers. Con `ventana` > 0, `reciente`
+    sirve una entrada verificada hace menos de `ventana` segundos sin
+    consultar la versión (que en SQLite cuesta una query).
+
+    Uso desde un handler:
+        entrada = cache.reciente(clave)
+        if entrada is None:
+            version = ...            # leer la versión ANTES que los datos
+            entrada = cache.vigente(clave, version) or cache.guardar(clave, version, datos)
+    Si los datos cambian entre ambas lecturas la entrada queda con datos más
+    nuevos que su versión y se rehace en la siguiente consulta; al revés se
+    serviría contenido viejo hasta el próximo cambio.
+    """
+
+    def __init__(self, ventana: float = 0, reloj=time.monotonic):
+        self.ventana = ventana
+        self._reloj = reloj
+        self._entradas: Dict[Hashable, LecturaCacheada] = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def reciente(self, clave: Hashable) -> Optional[LecturaCacheada]:
+        """Entrada verificada dentro de la ventana, sin mirar la versión"""
+        if not self.ventana:
+            return None
+        entrada = self._entradas.get(clave)
+        if entrada is not None and self._reloj() - entrada.verificada < self.ventana:
+            self.aciertos += 1
+            return entrada
+        return None
+
+    def vigente(self, clave: Hashable, version) -> Optional[LecturaCacheada]:
+        """Entrada guardada con esa misma versión, o None"""
+        entrada = self._entradas.get(clave)
+        if entrada is None or entrada.version != version:
+            return None
+        entrada.verificada = self._reloj()
+        self.aciertos += 1
+        return entrada
+
+    def guardar(self, clave: Hashable, version, datos) -> LecturaCacheada:
+        """Guarda `datos` (o bytes JSON ya codificados) con su versión"""
+        cuerpo = datos if isinstance(datos, bytes) else codificar(datos)
+        etag = '"' + hashlib.blake2b(cuerpo, digest_size=12).hexdigest() + '"'
+        entrada = self._entradas[clave] = LecturaCacheada(version, etag, cuerpo, self._reloj())
+        self.fallos += 1
+        return entrada
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+def responder(entrada: LecturaCacheada, if_none_match: Optional[str]) -> Response:
+    """200 con los bytes cacheados, o 304 sin cuerpo si el cliente ya tiene ese contenido"""
+    cabeceras = {"ETag": entrada.etag, "Cache-Control": "no-cache"}
+    if if_none_match and _coincide(if_none_match, entrada.etag):
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=entrada.cuerpo, media_type="application/json", headers=cabeceras)
+
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    return any(candidato.strip().removeprefix("W/") == etag for candidato in if_none_match.split(","))
@@ -0,0 +1,111 @@
+# carritos.py - Repositorio de carritos de compra y operaciones sobre sus líneas
+import datetime
+import json
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# ----- LÍNEAS DEL CARRITO -----
+# Los items se guardan en un dict por producto_id (buscar o cambiar una línea
+# es O(1)) y el carrito lleva su `subtotal`, que se ajusta con cada cambio en
+# vez de recalcularse en cada lectura.
+def nuevo_carrito(user_id: str, tienda_id: str, isDelivery: bool = False,
+                  direccion_entrega: Optional[str] = None, ubicacion_entrega: Optional[Dict] = None) -> Dict:
+    return {
+        "user_id": user_id,
+        "tienda_id": tienda_id,
+        "items": {},
+        "subtotal": 0,
+        "isDelivery": isDelivery,
+        "direccion_entrega": direccion_entrega if isDelivery else None,
+        "ubicacion_entrega": ubicacion_entrega if isDelivery else None,
+        "fecha_creacion": datetime.datetime.now().isoformat()
+    }
+
+
+def normalizar_carrito(carrito: Dict) -> Dict:
+    """Convierte un carrito guardado con items en lista (formato anterior) al formato por producto_id"""
+    if isinstance(carrito["items"], list):
+        carrito["items"] = {item["producto_id"]: item for item in carrito["items"]}
+        carrito["subtotal"] = round(sum(item["precio"] * item["cantidad"] for item in carrito["items"].values()), 2)
+    return carrito
+
+
+def fijar_linea(carrito: Dict, producto_id: str, cantidad: int, precio: float, isDelivery: bool = False) -> Dict:
+    """Deja la línea con `cantidad` unidades (0 la quita) y devuelve el cambio.
+
+    Una línea existente conserva el precio con que se agregó.
+    """
+    items = carrito["items"]
+    linea = items.get(producto_id)
+    anterior = 0 if linea is None else linea["cantidad"]
+    if linea is not None:
+        precio = linea["precio"]
+    cantidad = max(cantidad, 0)
+    if cantidad == 0:
+        items.pop(producto_id, None)
+    elif linea is None:
+        items[producto_id] = {"producto_id": producto_id, "cantidad": cantidad, "precio": precio,
+                              "isDelivery": isDelivery}
+    else:
+        linea["cantidad"] = cantidad
+    carrito["subtotal"] = round(carrito["subtotal"] + (cantidad - anterior) * precio, 2)
+    return {"producto_id": producto_id, "cantidad": cantidad, "precio": precio}
+
+
+def lineas_carrito(carrito: Dict) -> List[Dict]:
+    return list(carrito["items"].values())
+
+
+def vista_carrito(carrito: Dict) -> Dict:
+    """El carrito con los items como lista, que es lo que ven los clientes"""
+    return {**carrito, "items": lineas_carrito(carrito)}
+
+
+class RepositorioCarritos:
+    """Carritos en memoria, uno por (usuario, tienda).
+
+    Los handlers leen el carrito con `obtener`, lo modifican y lo guardan con
+    `guardar`, de modo que el mismo código sirve para backends persistentes.
+    """
+
+    def __init__(self):
+        self._carritos: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.journal = None  # Journal opcional donde se registra cada cambio
+
+    def obtener(self, carrito_id: str) -> Optional[Dict]:
+        return self._carritos.get(carrito_id)
+
+    def guardar(self, carrito_id: str, carrito: Dict) -> Dict:
+        with self._lock:
+            self._carritos[carrito_id] = carrito
+            if self.journal is not None:
+                self.journal.registrar("carrito", carrito_id, carrito)
+        return carrito
+
+    def eliminar(self, carrito_id: str) -> Optional[Dict]:
+        with self._lock:
+            carrito = self._carritos.pop(carrito_id, None)
+            if carrito is not None and self.journal is not None:
+                self.journal.registrar("carrito", carrito_id, None)
+            return carrito
+
+    def exportar(self) -> Iterator[Tuple[str, str]]:
+        """(carrito_id, carrito en JSON) de cada carrito, serializado bajo el lock"""
+        for carrito_id in list(self._carritos):
+            with self._lock:
+                carrito = self._carritos.get(carrito_id)
+                if carrito is None:
+                    continue
+                texto = json.dumps(carrito, ensure_ascii=False)
+            yield carrito_id, texto
+
+    def __len__(self) -> int:
+        return len(self._carritos)
+
+    def __contains__(self, carrito_id: str) -> bool:
+        return carrito_id in self._carritos
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._carritos))
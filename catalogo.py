@@ -0,0 +1,184 @@
+# catalogo.py - Índice de búsqueda del catálogo: listas invertidas, prefijos y ranking
+import bisect
+import heapq
+import re
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto: str) -> List[str]:
+    """Tokens en minúsculas y sin tildes: "Ácido acetilsalicílico" -> ["acido", "acetilsalicilico"]"""
+    descompuesto = unicodedata.normalize("NFD", texto.casefold())
+    sin_tildes = "".join(c for c in descompuesto if unicodedata.category(c) != "Mn")
+    return _PALABRA.findall(sin_tildes)
+
+
+class IndiceCatalogo:
+    """Índice invertido en memoria sobre `nombre` y `descripcion`.
+
+    Cada producto recibe un número de orden creciente al indexarse. Por cada
+    token hay dos listas de postings (nombre y descripción), guardadas como
+    dicts: dan pertenencia O(1) y conservan el orden de inserción, que es el
+    orden por número. El vocabulario es un arreglo ordenado, así que un
+    prefijo se resuelve con bisect.
+
+    Todos los términos de la consulta se tratan como prefijos y deben
+    aparecer (AND). El puntaje suma, por término, 2 si aparece en el nombre
+    o 1 si solo está en la descripción; los empates se ordenan por antigüedad
+    del producto. Con un solo término las listas se recorren en orden y se
+    corta apenas se llena la página; con varios, el costo lo fija el término
+    menos frecuente. No es seguro para hilos: se usa desde el event loop.
+    """
+
+    def __init__(self, max_expansiones: int = 32):
+        self.max_expansiones = max_expansiones
+        self._vocabulario: List[str] = []
+        self._en_nombre: Dict[str, Dict[int, None]] = {}
+        self._en_descripcion: Dict[str, Dict[int, None]] = {}
+        self._ids: List[Optional[str]] = []  # número de orden -> producto_id (None si se reindexó)
+        self._numeros: Dict[str, int] = {}
+        self._tokens: Dict[int, Tuple[List[str], List[str]]] = {}
+        self.version = 0  # sube con cada alta, cambio o baja (para cachear el catálogo)
+
+    # ----- INDEXACIÓN -----
+    def agregar(self, producto: Dict):
+        """Indexa (o reindexa) un producto con `id`, `nombre` y `descripcion`"""
+        producto_id = producto["id"]
+        self.eliminar(producto_id)
+        numero = len(self._ids)
+        self.version += 1
+        self._ids.append(producto_id)
+        self._numeros[producto_id] = numero
+        tokens_nombre = normalizar(producto.get("nombre", ""))
+        tokens_descripcion = normalizar(producto.get("descripcion", ""))
+        self._tokens[numero] = (tokens_nombre, tokens_descripcion)
+        for token in tokens_nombre:
+            self._postings(self._en_nombre, token)[numero] = None
+        for token in tokens_descripcion:
+            if numero not in self._en_nombre.get(token, ()):
+                self._postings(self._en_descripcion, token)[numero] = None
+
+    def eliminar(self, producto_id: str) -> bool:
+        numero = self._numeros.pop(producto_id, None)
+        if numero is None:
+            return False
+        tokens_nombre, tokens_descripcion = self._tokens.pop(numero)
+        for token in tokens_nombre:
+            self._en_nombre[token].pop(numero, None)
+        for token in tokens_descripcion:
+            self._en_descripcion.get(token, {}).pop(numero, None)
+        self._ids[numero] = None
+        self.version += 1
+        return True
+
+    def _postings(self, postings: Dict[str, Dict[int, None]], token: str) -> Dict[int, None]:
+        lista = postings.get(token)
+        if lista is None:
+            lista = postings[token] = {}
+            posicion = bisect.bisect_left(self._vocabulario, token)
+            if posicion == len(self._vocabulario) or self._vocabulario[posicion] != token:
+                self._vocabulario.insert(posicion, token)
+        return lista
+
+    # ----- CONSULTA -----
+    def _frecuencia(self, token: str) -> int:
+        return len(self._en_nombre.get(token, ())) + len(self._en_descripcion.get(token, ()))
+
+    def _expandir(self, prefijo: str) -> List[str]:
+        """Tokens del vocabulario que empiezan con el prefijo; los más frecuentes si son demasiados"""
+        inicio = bisect.bisect_left(self._vocabulario, prefijo)
+        fin = bisect.bisect_left(self._vocabulario, prefijo + "\uffff", inicio)
+        tokens = self._vocabulario[inicio:fin]
+        if len(tokens) > self.max_expansiones:
+            tokens = heapq.nlargest(self.max_expansiones, tokens, key=self._frecuencia)
+            if prefijo in self._en_nombre or prefijo in self._en_descripcion:
+                tokens.append(prefijo)  # la palabra exacta nunca queda fuera
+        return tokens
+
+    def buscar(self, consulta: str, offset: int = 0, limite: int = 20) -> Tuple[List[str], bool]:
+        """Devuelve (producto_ids de la página, hay_mas)"""
+        terminos = []
+        for prefijo in dict.fromkeys(normalizar(consulta)):
+            tokens = self._expandir(prefijo)
+            nombre = [self._en_nombre[t] for t in tokens if self._en_nombre.get(t)]
+            descripcion = [self._en_descripcion[t] for t in tokens if self._en_descripcion.get(t)]
+            if not nombre and not descripcion:
+                return [], False
+            terminos.append((nombre, descripcion))
+        if not terminos:
+            return [], False
+        necesarios = offset + limite
+        if len(terminos) == 1:
+            numeros = list(self._un_termino(*terminos[0], necesarios + 1))
+        else:
+            numeros = self._varios_terminos(terminos, necesarios + 1)
+        pagina = [self._ids[n] for n in numeros[offset:necesarios]]
+        return pagina, len(numeros) > necesarios
+
+    def _un_termino(self, nombre, descripcion, cuantos: int) -> Iterator[int]:
+        """Primero los productos con el término en el nombre, luego en la descripción, cada grupo por orden.
+
+        Las listas ya están ordenadas, así que se mezclan de forma perezosa y
+        solo se recorren los postings necesarios para la página.
+        """
+        entregados = 0
+        for grupo, excluir in ((nombre, ()), (descripcion, nombre)):
+            anterior = -1
+            for numero in heapq.merge(*grupo):
+                if numero == anterior or any(numero in lista for lista in excluir):
+                    continue
+                anterior = numero
+                yield numero
+                entregados += 1
+                if entregados == cuantos:
+                    return
+
+    def _varios_terminos(self, terminos, cuantos: int) -> List[int]:
+        """Filtra los productos del término más escaso contra los demás y puntúa los que quedan.
+
+        El puntaje es (términos) + (términos hallados en el nombre); se filtra
+        con comprensiones sobre un set que solo puede achicarse, así que el
+        costo lo fija el término menos frecuente y no el tamaño del catálogo.
+        """
+        terminos = sorted(terminos, key=lambda t: sum(map(len, t[0])) + sum(map(len, t[1])))
+        nombre, descripcion = terminos[0]
+        candidatos = set().union(*nombre, *descripcion)
+        for nombre, descripcion in terminos[1:]:
+            candidatos = _filtrar(candidatos, nombre + descripcion)
+            if not candidatos:
+                return []
+        # Solo los términos que aparecen en nombres y en descripciones distinguen el puntaje
+        variables = [nombre for nombre, descripcion in terminos if nombre and descripcion]
+        if not variables:
+            return heapq.nsmallest(cuantos, candidatos)
+        return [
+            numero for _, numero in heapq.nsmallest(
+                cuantos,
+                ((-sum(any(numero in lista for lista in nombre) for nombre in variables), numero)
+                 for numero in candidatos)
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self._numeros)
+
+    def __contains__(self, producto_id: str) -> bool:
+        return producto_id in self._numeros
+
+
+def _filtrar(candidatos: set, listas) -> set:
+    """Candidatos presentes en alguna de las listas.
+
+    set.intersection recorre en C la lista de postings; la comprensión
+    recorre en Python los candidatos. Se elige según cuál sea más corto,
+    tomando en cuenta que el recorrido en C es varias veces más rápido.
+    """
+    quedan = set()
+    for lista in listas:
+        if len(lista) < 3 * len(candidatos):
+            quedan.update(candidatos.intersection(lista))
+        else:
+            quedan.update(numero for numero in candidatos if numero in lista)
+    return quedan
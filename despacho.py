@@ -0,0 +1,232 @@
+# despacho.py - Flota de repartidores con posiciones en una grilla espacial y asignación por cercanía
+import heapq
+import math
+import random
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from geo import distancia_km
+
+# Lima; solo fija el origen de la proyección a kilómetros
+CENTRO = (-12.0464, -77.0428)
+KM_POR_GRADO_LAT = 110.574
+
+VELOCIDAD_KMH = {"Moto": 25.0, "Bicicleta": 14.0, "Auto": 20.0}
+MINUTOS_PREPARACION = 10
+
+
+def eta_minutos(distancia: float, vehiculo: str = "Moto") -> int:
+    """Minutos estimados de entrega para recorrer `distancia` km, incluida la preparación"""
+    return MINUTOS_PREPARACION + math.ceil(distancia / VELOCIDAD_KMH.get(vehiculo, 20.0) * 60)
+
+
+class IndiceGrilla:
+    """Índice espacial de puntos en celdas cuadradas de `celda_km` de lado.
+
+    Las coordenadas se proyectan a kilómetros (equirectangular alrededor de
+    `centro`, exacta de sobra a escala de ciudad). Mover un punto es O(1);
+    buscar los k más cercanos recorre anillos de celdas alrededor de la del
+    punto y se detiene cuando el anillo siguiente ya no puede mejorar el
+    k-ésimo, así que con densidad pareja cuesta O(k) y no O(n).
+    """
+
+    def __init__(self, celda_km: float = 1.0, centro: Tuple[float, float] = CENTRO, radio_max_km: float = 60):
+        self.celda_km = celda_km
+        self._lat0, self._lon0 = centro
+        self._km_por_grado_lon = KM_POR_GRADO_LAT * math.cos(math.radians(centro[0]))
+        self._max_anillos = int(radio_max_km / celda_km) + 1
+        self._celdas: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        self._celda_de: Dict[str, Tuple[int, int]] = {}
+
+    def proyectar(self, lat: float, lon: float) -> Tuple[float, float]:
+        """(x, y) en km respecto del centro del índice"""
+        return (lon - self._lon0) * self._km_por_grado_lon, (lat - self._lat0) * KM_POR_GRADO_LAT
+
+    def _celda(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.celda_km), math.floor(y / self.celda_km)
+
+    def mover(self, clave: str, lat: float, lon: float):
+        """Inserta o actualiza la posición de `clave`"""
+        x, y = self.proyectar(lat, lon)
+        celda = self._celda(x, y)
+        anterior = self._celda_de.get(clave)
+        if anterior is not None and anterior != celda:
+            self._quitar_de_celda(clave, anterior)
+        self._celdas.setdefault(celda, {})[clave] = (x, y)
+        self._celda_de[clave] = celda
+
+    def _quitar_de_celda(self, clave: str, celda: Tuple[int, int]):
+        puntos = self._celdas[celda]
+        del puntos[clave]
+        if not puntos:
+            del self._celdas[celda]
+
+    def quitar(self, clave: str) -> bool:
+        celda = self._celda_de.pop(clave, None)
+        if celda is None:
+            return False
+        self._quitar_de_celda(clave, celda)
+        return True
+
+    def _anillo(self, cx: int, cy: int, r: int) -> Iterator[Tuple[int, int]]:
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def cercanos(self, lat: float, lon: float, k: int = 1) -> List[Tuple[float, str]]:
+        """Hasta k pares (distancia en km, clave), del más cercano al más lejano"""
+        if not self._celda_de:
+            return []
+        x, y = self.proyectar(lat, lon)
+        cx, cy = self._celda(x, y)
+        mejores: List[Tuple[float, str]] = []  # heap de máximos con la distancia negada
+        celdas = self._celdas
+        for r in range(self._max_anillos + 1):
+            for celda in self._anillo(cx, cy, r):
+                puntos = celdas.get(celda)
+                if not puntos:
+                    continue
+                for clave, (px, py) in puntos.items():
+                    d = math.hypot(px - x, py - y)
+                    if len(mejores) < k:
+                        heapq.heappush(mejores, (-d, clave))
+                    elif d < -mejores[0][0]:
+                        heapq.heapreplace(mejores, (-d, clave))
+            # Todo lo que está más allá del anillo r queda a más de r celdas
+            if len(mejores) == k and -mejores[0][0] <= r * self.celda_km:
+                break
+            if len(mejores) == len(self._celda_de):
+                break
+        return sorted((-d, clave) for d, clave in mejores)
+
+    def __len__(self) -> int:
+        return len(self._celda_de)
+
+    def __contains__(self, clave: str) -> bool:
+        return clave in self._celda_de
+
+
+class Flota:
+    """Registro de repartidores con su posición en vivo.
+
+    Solo los repartidores disponibles están en el índice espacial, así que
+    la búsqueda del más cercano no filtra ocupados. Asignar saca al
+    repartidor del índice; `liberar` lo devuelve en la posición de la última
+    entrega. Lo usan los handlers desde el event loop; el lock protege las
+    lecturas de otros hilos (p. ej. reportes).
+    """
+
+    def __init__(self, celda_km: float = 1.0, centro: Tuple[float, float] = CENTRO):
+        self._repartidores: Dict[str, Dict] = {}
+        self._disponibles = IndiceGrilla(celda_km, centro)
+        self._lock = threading.Lock()
+
+    # ----- REGISTRO Y POSICIONES -----
+    def registrar(self, repartidor_id: str, nombre: str, lat: float, lon: float,
+                  vehiculo: str = "Moto", telefono: str = "") -> Dict:
+        with self._lock:
+            repartidor = {"id": repartidor_id, "nombre": nombre, "vehiculo": vehiculo, "telefono": telefono,
+                          "lat": lat, "lon": lon, "orden_id": None}
+            self._repartidores[repartidor_id] = repartidor
+            self._disponibles.mover(repartidor_id, lat, lon)
+            return repartidor
+
+    def actualizar_posicion(self, repartidor_id: str, lat: float, lon: float) -> Dict:
+        with self._lock:
+            repartidor = self._repartidores[repartidor_id]
+            repartidor["lat"], repartidor["lon"] = lat, lon
+            if repartidor["orden_id"] is None:
+                self._disponibles.mover(repartidor_id, lat, lon)
+            return repartidor
+
+    def obtener(self, repartidor_id: str) -> Optional[Dict]:
+        return self._repartidores.get(repartidor_id)
+
+    # ----- ASIGNACIÓN -----
+    def _ocupar(self, repartidor_id: str, orden_id: str) -> Dict:
+        repartidor = self._repartidores[repartidor_id]
+        repartidor["orden_id"] = orden_id
+        self._disponibles.quitar(repartidor_id)
+        return repartidor
+
+    def asignar(self, orden_id: str, lat: float, lon: float) -> Optional[Tuple[Dict, float]]:
+        """Asigna el repartidor disponible más cercano a (lat, lon); None si no hay ninguno"""
+        with self._lock:
+            cercano = self._disponibles.cercanos(lat, lon, 1)
+            if not cercano:
+                return None
+            repartidor = self._ocupar(cercano[0][1], orden_id)
+            return repartidor, distancia_km(repartidor["lat"], repartidor["lon"], lat, lon)
+
+    def asignar_lote(self, pedidos: List[Tuple[str, float, float]],
+                     candidatos: int = 8) -> Dict[str, Tuple[Dict, float]]:
+        """Asigna muchos pedidos (orden_id, lat, lon) a la vez.
+
+        Emparejamiento goloso por distancia: se toman los `candidatos`
+        repartidores más cercanos de cada pedido, se ordenan todos los pares
+        por distancia y se aceptan en ese orden si ninguno de los dos está
+        tomado. Los pedidos que se quedan sin candidato libre buscan de nuevo
+        entre los que quedan. Evita que un pedido temprano se lleve al único
+        repartidor cercano de otro, que es lo que pasa asignando de a uno.
+        """
+        asignados: Dict[str, Tuple[Dict, float]] = {}
+        with self._lock:
+            pares = []
+            for orden_id, lat, lon in pedidos:
+                for d, repartidor_id in self._disponibles.cercanos(lat, lon, candidatos):
+                    pares.append((d, orden_id, repartidor_id))
+            pares.sort()
+            ubicacion = {orden_id: (lat, lon) for orden_id, lat, lon in pedidos}
+            for _, orden_id, repartidor_id in pares:
+                if orden_id in asignados or repartidor_id not in self._disponibles:
+                    continue
+                asignados[orden_id] = (self._ocupar(repartidor_id, orden_id), 0.0)
+            for orden_id, lat, lon in pedidos:
+                if orden_id in asignados:
+                    continue
+                cercano = self._disponibles.cercanos(lat, lon, 1)
+                if not cercano:
+                    break
+                asignados[orden_id] = (self._ocupar(cercano[0][1], orden_id), 0.0)
+            for orden_id, (repartidor, _) in asignados.items():
+                lat, lon = ubicacion[orden_id]
+                asignados[orden_id] = (repartidor, distancia_km(repartidor["lat"], repartidor["lon"], lat, lon))
+        return asignados
+
+    def liberar(self, repartidor_id: str, lat: Optional[float] = None, lon: Optional[float] = None) -> bool:
+        """Vuelve a dejar disponible al repartidor, opcionalmente en una nueva posición"""
+        with self._lock:
+            repartidor = self._repartidores.get(repartidor_id)
+            if repartidor is None or repartidor["orden_id"] is None:
+                return False
+            if lat is not None and lon is not None:
+                repartidor["lat"], repartidor["lon"] = lat, lon
+            repartidor["orden_id"] = None
+            self._disponibles.mover(repartidor_id, repartidor["lat"], repartidor["lon"])
+            return True
+
+    @property
+    def disponibles(self) -> int:
+        return len(self._disponibles)
+
+    def __len__(self) -> int:
+        return len(self._repartidores)
+
+
+def flota_simulada(cantidad: int, centro: Tuple[float, float] = CENTRO, radio_km: float = 12,
+                   semilla: int = 0) -> Flota:
+    """Flota de `cantidad` repartidores repartidos al azar alrededor de `centro`"""
+    azar = random.Random(semilla)
+    flota = Flota(centro=centro)
+    for i in range(1, cantidad + 1):
+        lat = centro[0] + azar.uniform(-radio_km, radio_km) / KM_POR_GRADO_LAT
+        lon = centro[1] + azar.uniform(-radio_km, radio_km) / (KM_POR_GRADO_LAT * math.cos(math.radians(centro[0])))
+        flota.registrar(f"REP{i:03d}", f"Repartidor {i}", lat, lon,
+                        vehiculo="Bicicleta" if i % 5 == 0 else "Moto", telefono=f"999-{i:06d}")
+    return flota
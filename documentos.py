@@ -0,0 +1,301 @@
+# documentos.py - Pipeline de comprobantes: render por lotes en un pool de procesos y almacén por contenido
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape
+
+# Catálogo 01 de SUNAT: tipo de comprobante
+TIPOS_SUNAT = {"factura": "01", "boleta": "03"}
+
+_HASH = re.compile(r"[0-9a-f]{64}")
+
+_NAMESPACES = (
+    'xmlns="urn:oasis:names:specification:ubl:schema:xsd:Invoice-2" '
+    'xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2" '
+    'xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2" '
+    'xmlns:ext="urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2"'
+)
+
+
+# ----- RENDER (corre en los procesos del pool) -----
+def _monto(valor: float) -> str:
+    return f'currencyID="PEN">{valor:.2f}'
+
+
+def _linea(numero: int, descripcion: str, codigo: str, cantidad: int, precio: float, subtotal: float) -> str:
+    return (
+        f"<cac:InvoiceLine><cbc:ID>{numero}</cbc:ID>"
+        f'<cbc:InvoicedQuantity unitCode="NIU">{cantidad}</cbc:InvoicedQuantity>'
+        f"<cbc:LineExtensionAmount {_monto(subtotal)}</cbc:LineExtensionAmount>"
+        f"<cac:Item><cbc:Description>{escape(descripcion)}</cbc:Description>"
+        f"<cac:SellersItemIdentification><cbc:ID>{escape(codigo)}</cbc:ID></cac:SellersItemIdentification></cac:Item>"
+        f"<cac:Price><cbc:PriceAmount {_monto(precio)}</cbc:PriceAmount></cac:Price></cac:InvoiceLine>"
+    )
+
+
+def renderizar(documento: Dict) -> bytes:
+    """XML UBL 2.1 (el formato que recibe SUNAT) de una factura o boleta.
+
+    Es determinista: el mismo comprobante produce siempre los mismos bytes,
+    así que su hash sirve de dirección en el almacén.
+    """
+    tipo = documento.get("tipo", "boleta")
+    cliente = documento["cliente"]
+    costo_delivery = documento.get("costo_delivery", 0)
+    total = documento["total"]
+    igv = documento.get("igv", round((total - costo_delivery) * 0.18, 2))
+
+    lineas = [
+        _linea(i, item["nombre"], item["producto_id"], item["cantidad"], item["precio_unitario"], item["subtotal"])
+        for i, item in enumerate(documento["items"], start=1)
+    ]
+    if costo_delivery:
+        lineas.append(_linea(len(lineas) + 1, "Servicio de delivery", "delivery", 1, costo_delivery, costo_delivery))
+
+    cuerpo = (
+        f"<cbc:ID>{escape(documento.get('numero') or documento['boleta_id'])}</cbc:ID>"
+        f"<cbc:IssueDate>{documento['fecha_emision'][:10]}</cbc:IssueDate>"
+        f"<cbc:IssueTime>{documento['fecha_emision'][11:19]}</cbc:IssueTime>"
+        f"<cbc:InvoiceTypeCode>{TIPOS_SUNAT[tipo]}</cbc:InvoiceTypeCode>"
+        f"<cbc:Note>{escape(documento['venta_id'])}</cbc:Note>"
+        f"<cbc:DocumentCurrencyCode>PEN</cbc:DocumentCurrencyCode>"
+        f"<cac:AccountingCustomerParty><cac:Party><cac:PartyLegalEntity><cbc:RegistrationName>"
+        f"{escape(cliente['nombre'] if isinstance(cliente, dict) else cliente)}"
+        f"</cbc:RegistrationName></cac:PartyLegalEntity></cac:Party></cac:AccountingCustomerParty>"
+        f"<cac:TaxTotal><cbc:TaxAmount {_monto(igv)}</cbc:TaxAmount></cac:TaxTotal>"
+        f"<cac:LegalMonetaryTotal><cbc:PayableAmount {_monto(total)}</cbc:PayableAmount></cac:LegalMonetaryTotal>"
+        + "".join(lineas)
+    ).encode("utf-8")
+    # Resumen del contenido en la extensión, donde SUNAT espera la firma
+    resumen = hashlib.sha256(cuerpo).hexdigest()
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<Invoice {_NAMESPACES}>'
+        f"<ext:UBLExtensions><ext:UBLExtension><ext:ExtensionContent><DigestValue>{resumen}</DigestValue>"
+        f"</ext:ExtensionContent></ext:UBLExtension></ext:UBLExtensions><cbc:UBLVersionID>2.1</cbc:UBLVersionID>"
+    ).encode("utf-8") + cuerpo + b"</Invoice>"
+
+
+def renderizar_lote(documentos: List[Dict], directorio: str) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Renderiza y guarda cada documento en el almacén de `directorio`.
+
+    Devuelve (hash, error) por documento: un documento malo no tumba al lote,
+    y los bytes no vuelven por el pipe al proceso principal.
+    """
+    almacen = AlmacenDocumentos(directorio)
+    resultados = []
+    for documento in documentos:
+        try:
+            resultados.append((almacen.guardar(renderizar(documento)), None))
+        except Exception as e:
+            resultados.append((None, repr(e)))
+    return resultados
+
+
+# ----- ALMACÉN POR CONTENIDO -----
+class AlmacenDocumentos:
+    """Archivos direccionados por su sha256 (directorio/ab/cdef....xml).
+
+    Guardar dos veces el mismo contenido no lo duplica, y un archivo guardado
+    no cambia nunca: se escribe en un temporal y se renombra, así que nadie
+    lee uno a medias.
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, digest: str) -> str:
+        return os.path.join(self.directorio, digest[:2], digest[2:] + ".xml")
+
+    def guardar(self, contenido: bytes, digest: Optional[str] = None) -> str:
+        digest = digest or hashlib.sha256(contenido).hexdigest()
+        ruta = self._ruta(digest)
+        if os.path.exists(ruta):
+            return digest
+        carpeta = os.path.dirname(ruta)
+        try:
+            descriptor, temporal = tempfile.mkstemp(dir=carpeta)
+        except FileNotFoundError:
+            os.makedirs(carpeta, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=carpeta)
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+        return digest
+
+    def obtener(self, digest: str) -> Optional[bytes]:
+        if not _HASH.fullmatch(digest):
+            return None  # no es un hash: tampoco es una ruta válida
+        try:
+            with open(self._ruta(digest), "rb") as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            return None
+
+
+# ----- PIPELINE -----
+class PipelineDocumentos:
+    """Cola de trabajos de render que se despachan por lotes a un pool de procesos.
+
+    `encolar` responde al instante con un trabajo_id; un despachador junta lo
+    que llegue durante `espera_lote` (hasta `tam_lote` documentos) y lo manda
+    como una sola tarea al pool, que renderiza y escribe los archivos, para
+    pagar el costo de pasar datos entre procesos una vez por lote. Hay a lo
+    sumo un lote por proceso en vuelo: si el pool está ocupado la cola crece
+    y el siguiente lote sale más grande. Con procesos=0 se renderiza en un
+    hilo (sin pool).
+
+    Cada trabajo terminado queda con el hash de su archivo en el almacén y se
+    avisa a `al_terminar`. Los trabajos viven en memoria (los últimos
+    `max_trabajos`): quien necesite el hash después de un reinicio lo guarda
+    desde ese aviso, y los que no terminaron se pierden y el comprobante se
+    vuelve a pedir.
+    """
+
+    def __init__(self, almacen: AlmacenDocumentos, procesos: Optional[int] = None, tam_lote: int = 64,
+                 espera_lote: float = 0.005, max_trabajos: int = 100_000):
+        self.almacen = almacen
+        self.procesos = (os.cpu_count() or 1) if procesos is None else procesos
+        self.tam_lote = tam_lote
+        self.espera_lote = espera_lote
+        self.max_trabajos = max_trabajos
+        self._trabajos: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cola: asyncio.Queue = asyncio.Queue()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._despachador: Optional[asyncio.Task] = None
+        self._lotes: Set[asyncio.Task] = set()
+        self._lotes_en_vuelo: Optional[asyncio.Semaphore] = None
+        self._sin_terminar = 0
+        self._en_proceso = 0
+        self._contadores = {"lotes": 0, "documentos": 0, "errores": 0}
+        self.al_terminar: Optional[Callable[[Dict], Awaitable[None]]] = None  # recibe cada trabajo listo
+        self._vacio = asyncio.Event()
+        self._vacio.set()
+
+    def encolar(self, documento: Dict, trabajo_id: Optional[str] = None, **datos) -> str:
+        """Agrega un trabajo de render; `datos` (p. ej. user_id) quedan en el trabajo.
+
+        El `trabajo_id` se puede fijar antes, para guardarlo en otro lado
+        antes de que el trabajo pueda terminar.
+        """
+        trabajo_id = trabajo_id or str(uuid.uuid4())
+        self._trabajos[trabajo_id] = {"trabajo_id": trabajo_id, "estado": "pendiente",
+                                      "tipo": documento.get("tipo", "boleta"), **datos}
+        while len(self._trabajos) > self.max_trabajos:
+            self._trabajos.popitem(last=False)
+        self._sin_terminar += 1
+        self._vacio.clear()
+        self._cola.put_nowait((trabajo_id, documento))
+        return trabajo_id
+
+    def trabajo(self, trabajo_id: str) -> Optional[Dict]:
+        trabajo = self._trabajos.get(trabajo_id)
+        return None if trabajo is None else dict(trabajo)
+
+    # ----- DESPACHO -----
+    async def _juntar_lote(self) -> List[Tuple[str, Dict]]:
+        lote = [await self._cola.get()]
+        loop = asyncio.get_running_loop()
+        fin = loop.time() + self.espera_lote
+        while len(lote) < self.tam_lote:
+            if not self._cola.empty():
+                lote.append(self._cola.get_nowait())
+                continue
+            restante = fin - loop.time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._cola.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        return lote
+
+    async def _despachar(self):
+        while True:
+            await self._lotes_en_vuelo.acquire()
+            try:
+                lote = await self._juntar_lote()
+            except asyncio.CancelledError:
+                self._lotes_en_vuelo.release()
+                raise
+            self._en_proceso += len(lote)
+            tarea = asyncio.create_task(self._procesar(lote))
+            self._lotes.add(tarea)
+            tarea.add_done_callback(self._lotes.discard)
+
+    async def _procesar(self, lote: List[Tuple[str, Dict]]):
+        loop = asyncio.get_running_loop()
+        try:
+            for trabajo_id, _ in lote:
+                if trabajo_id in self._trabajos:
+                    self._trabajos[trabajo_id]["estado"] = "renderizando"
+            try:
+                # Render y escritura corren en el pool (o en un hilo con procesos=0), nunca en el event loop
+                resultados = await loop.run_in_executor(self._pool, renderizar_lote, [d for _, d in lote],
+                                                        self.almacen.directorio)
+            except Exception as e:
+                resultados = [(None, repr(e))] * len(lote)
+            listos = []
+            for (trabajo_id, _), (digest, error) in zip(lote, resultados):
+                trabajo = self._trabajos.get(trabajo_id)
+                if trabajo is None:
+                    continue  # ya salió del registro
+                if error is None:
+                    trabajo.update(estado="listo", hash=digest)
+                    listos.append(dict(trabajo))
+                else:
+                    trabajo.update(estado="error", error=error)
+                    self._contadores["errores"] += 1
+            self._contadores["lotes"] += 1
+            self._contadores["documentos"] += len(lote)
+            if self.al_terminar is not None:
+                for trabajo in listos:
+                    await self.al_terminar(trabajo)
+        finally:
+            self._en_proceso -= len(lote)
+            self._sin_terminar -= len(lote)
+            self._lotes_en_vuelo.release()
+            if self._sin_terminar == 0:
+                self._vacio.set()
+
+    # ----- CICLO DE VIDA -----
+    async def iniciar(self):
+        if self.procesos > 0:
+            # spawn: el proceso del servidor tiene hilos, y hacer fork con hilos no es seguro
+            self._pool = ProcessPoolExecutor(self.procesos, mp_context=multiprocessing.get_context("spawn"))
+        self._lotes_en_vuelo = asyncio.Semaphore(max(self.procesos, 1))
+        self._despachador = asyncio.create_task(self._despachar())
+
+    async def detener(self):
+        """Detiene el despacho; lo que no se renderizó se pierde con el proceso"""
+        if self._despachador is not None:
+            self._despachador.cancel()
+            await asyncio.gather(self._despachador, return_exceptions=True)
+            self._despachador = None
+        for tarea in list(self._lotes):
+            tarea.cancel()
+        await asyncio.gather(*self._lotes, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def esperar(self, timeout: Optional[float] = None):
+        """Espera a que no quede ningún trabajo pendiente (para pruebas y benchmarks)"""
+        await asyncio.wait_for(self._vacio.wait(), timeout)
+
+    def metricas(self) -> Dict:
+        lotes = self._contadores["lotes"]
+        return {
+            "procesos": self.procesos,
+            "en_cola": self._cola.qsize(),
+            "en_proceso": self._en_proceso,
+            "documentos_por_lote": round(self._contadores["documentos"] / lotes, 1) if lotes else 0,
+            **self._contadores
+        }
@@ -0,0 +1,129 @@
+# estados.py - Máquina de estados de las órdenes: transiciones válidas, lock por orden y colas por estado
+import asyncio
+import bisect
+from contextlib import asynccontextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PENDIENTE = "pendiente"
+PAGADA = "pagada"
+EN_DELIVERY = "en_delivery"
+VENDIDA = "vendida"
+ENTREGADO = "entregado"
+EXPIRADA = "expirada"
+CANCELADA = "cancelada"
+
+# Estado actual -> estados a los que puede pasar. Una orden de recojo va de
+# pagada a vendida; una de delivery pasa por en_delivery antes de venderse
+# (o se vende pagada si se despacha por fuera) y termina en entregado.
+TRANSICIONES = {
+    PENDIENTE: {PAGADA, EXPIRADA, CANCELADA},
+    PAGADA: {EN_DELIVERY, VENDIDA},
+    EN_DELIVERY: {VENDIDA},
+    VENDIDA: {ENTREGADO},
+    ENTREGADO: set(),
+    EXPIRADA: set(),
+    CANCELADA: set()
+}
+
+MODALIDADES = ("delivery", "recojo")
+
+
+class TransicionInvalida(Exception):
+    """La orden no puede pasar de su estado actual al pedido"""
+
+    def __init__(self, orden_id: str, actual: str, destino: str):
+        super().__init__(f"La orden {orden_id} no puede pasar de {actual} a {destino}")
+        self.orden_id = orden_id
+        self.actual = actual
+        self.destino = destino
+
+
+def puede_pasar(actual: str, destino: str) -> bool:
+    return destino in TRANSICIONES.get(actual, ())
+
+
+def validar_transicion(orden: Dict, destino: str):
+    if not puede_pasar(orden["estado"], destino):
+        raise TransicionInvalida(orden["orden_id"], orden["estado"], destino)
+
+
+def modalidad(orden: Dict) -> str:
+    return "delivery" if orden.get("isDelivery") else "recojo"
+
+
+class ConjuntoOrdenado:
+    """Conjunto de orden_id en orden de llegada, paginable con un cursor.
+
+    Cada alta recibe un número de secuencia creciente y se agrega al final
+    de `_entradas`, que queda ordenada por secuencia: el cursor de una página
+    se ubica con bisect en O(log n) y la página cuesta O(límite), sin
+    recorrer lo anterior. Las bajas son perezosas (la entrada queda hasta
+    compactar, como en recolector.Vencimientos).
+    """
+
+    def __init__(self):
+        self._secuencia: Dict[str, int] = {}
+        self._entradas: List[Tuple[int, str]] = []
+        self._ultima = 0
+
+    def agregar(self, orden_id: str):
+        self._ultima += 1
+        self._secuencia[orden_id] = self._ultima
+        self._entradas.append((self._ultima, orden_id))
+
+    def quitar(self, orden_id: str):
+        if self._secuencia.pop(orden_id, None) is not None and len(self._entradas) > 2 * len(self._secuencia) + 1024:
+            self._entradas = [(s, o) for s, o in self._entradas if self._secuencia.get(o) == s]
+
+    def pagina(self, despues: Optional[int] = None, limite: int = 50) -> Tuple[List[str], Optional[int]]:
+        """Hasta `limite` ids posteriores al cursor `despues`, y el cursor de la página siguiente"""
+        i = 0 if despues is None else bisect.bisect_right(self._entradas, despues, key=lambda e: e[0])
+        ids: List[str] = []
+        cursor = None
+        while i < len(self._entradas) and len(ids) < limite:
+            secuencia, orden_id = self._entradas[i]
+            if self._secuencia.get(orden_id) == secuencia:
+                ids.append(orden_id)
+                cursor = secuencia
+            i += 1
+        return ids, cursor if len(ids) == limite else None
+
+    def __len__(self) -> int:
+        return len(self._secuencia)
+
+    def __contains__(self, orden_id: str) -> bool:
+        return orden_id in self._secuencia
+
+    def __iter__(self) -> Iterator[str]:
+        return (o for s, o in self._entradas if self._secuencia.get(o) == s)
+
+
+class LocksOrden:
+    """Un asyncio.Lock por orden, creado al pedirlo y descartado cuando nadie lo espera.
+
+    Los handlers que validan el estado, esperan algo (la pasarela, el pool
+    de SQLite) y después cambian el estado lo toman para que dos pedidos
+    sobre la misma orden no pasen los dos la validación. La transición del
+    repositorio sigue validando el estado, así que un cambio hecho por otro
+    hilo (el barrido de reservas) se detecta igual.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, List] = {}  # orden_id -> [lock, usuarios]
+
+    @asynccontextmanager
+    async def orden(self, orden_id: str):
+        entrada = self._locks.get(orden_id)
+        if entrada is None:
+            entrada = self._locks[orden_id] = [asyncio.Lock(), 0]
+        entrada[1] += 1
+        try:
+            async with entrada[0]:
+                yield
+        finally:
+            entrada[1] -= 1
+            if not entrada[1]:
+                del self._locks[orden_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,201 @@
+# eventos.py - Bus de eventos en proceso con outbox, concurrencia acotada y reintentos
+import asyncio
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+Manejador = Callable[[Dict], Awaitable[None]]
+
+
+class OutboxMemoria:
+    """Outbox en el proceso: sirve de cola pero no sobrevive a un reinicio.
+
+    Guarda cada evento con el conjunto de suscriptores que todavía no lo
+    procesaron; el evento se borra cuando ese conjunto queda vacío. Las
+    entregas que agotan los reintentos quedan en `fallidas`.
+    """
+
+    def __init__(self):
+        self._eventos: Dict[str, Tuple[Dict, Dict[str, None]]] = {}
+        self.fallidas: List[Tuple[Dict, str, str]] = []
+        self._lock = threading.Lock()
+
+    def agregar(self, evento: Dict, suscriptores: List[str]):
+        with self._lock:
+            self._eventos[evento["evento_id"]] = (evento, dict.fromkeys(suscriptores))
+
+    def _quitar(self, evento_id: str, suscriptor: str) -> Optional[Dict]:
+        entrada = self._eventos.get(evento_id)
+        if entrada is None:
+            return None
+        evento, pendientes = entrada
+        pendientes.pop(suscriptor, None)
+        if not pendientes:
+            del self._eventos[evento_id]
+        return evento
+
+    def completar(self, evento_id: str, suscriptor: str):
+        with self._lock:
+            self._quitar(evento_id, suscriptor)
+
+    def fallar(self, evento_id: str, suscriptor: str, error: str):
+        with self._lock:
+            evento = self._quitar(evento_id, suscriptor)
+            if evento is not None:
+                self.fallidas.append((evento, suscriptor, error))
+
+    def pendientes(self) -> Iterator[Tuple[Dict, str]]:
+        """(evento, suscriptor) de cada entrega pendiente, en orden de publicación"""
+        with self._lock:
+            entregas = [(evento, s) for evento, pendientes in self._eventos.values() for s in pendientes]
+        return iter(entregas)
+
+    def __len__(self) -> int:
+        return len(self._eventos)
+
+
+class BusEventos:
+    """Bus de eventos asíncrono del proceso con outbox.
+
+    `publicar` guarda el evento en el outbox (una entrega pendiente por cada
+    suscriptor durable) antes de encolarlo, así que con un outbox persistente
+    lo publicado sobrevive a un reinicio: `iniciar` vuelve a encolar las
+    entregas pendientes. Un número fijo de tareas consume la cola, lo que
+    acota la concurrencia. Si un manejador falla, la entrega se reintenta
+    con espera exponencial y, agotados los intentos, queda como fallida en
+    el outbox. La entrega es al menos una vez: los manejadores deben tolerar
+    repetidos. Los suscriptores no durables (p. ej. agregados que se
+    reconstruyen del historial al arrancar) no pasan por el outbox.
+    """
+
+    def __init__(self, outbox, concurrencia: int = 4, max_intentos: int = 5, espera_base: float = 0.5,
+                 ejecutar: Optional[Callable[..., Awaitable]] = None, reloj: Callable[[], float] = time.time):
+        self.outbox = outbox
+        self.concurrencia = concurrencia
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self._ejecutar = ejecutar
+        self._reloj = reloj
+        self._suscripciones: Dict[str, Tuple[str, Manejador, bool]] = {}  # nombre -> (tipo, manejador, durable)
+        self._por_tipo: Dict[str, List[str]] = {}
+        self._cola: asyncio.Queue = asyncio.Queue()
+        self._tareas: List[asyncio.Task] = []
+        self._esperas: Set[asyncio.TimerHandle] = set()
+        self._pendientes: Dict[str, Dict[str, float]] = {}  # suscriptor -> {evento_id: creado}
+        self._contadores: Dict[str, Dict[str, int]] = {}
+        self._en_curso = 0
+        self._vacio = asyncio.Event()
+        self._vacio.set()
+
+    async def _llamar(self, funcion, *args):
+        if self._ejecutar is None:
+            return funcion(*args)
+        return await self._ejecutar(funcion, *args)
+
+    # ----- SUSCRIPCIÓN Y PUBLICACIÓN -----
+    def suscribir(self, tipo: str, nombre: str, manejador: Manejador, durable: bool = True):
+        if nombre in self._suscripciones:
+            raise ValueError(f"Ya existe un suscriptor llamado {nombre}")
+        self._suscripciones[nombre] = (tipo, manejador, durable)
+        self._por_tipo.setdefault(tipo, []).append(nombre)
+        self._pendientes[nombre] = {}
+        self._contadores[nombre] = {"procesados": 0, "reintentos": 0, "fallidos": 0}
+
+    async def publicar(self, tipo: str, datos: Dict) -> str:
+        evento = {"evento_id": uuid.uuid4().hex, "tipo": tipo, "datos": datos, "creado": self._reloj()}
+        suscriptores = self._por_tipo.get(tipo, [])
+        durables = [nombre for nombre in suscriptores if self._suscripciones[nombre][2]]
+        if durables:
+            await self._llamar(self.outbox.agregar, evento, durables)
+        for nombre in suscriptores:
+            self._encolar(evento, nombre, 1)
+        return evento["evento_id"]
+
+    def _encolar(self, evento: Dict, nombre: str, intento: int):
+        self._pendientes[nombre][evento["evento_id"]] = evento["creado"]
+        self._vacio.clear()
+        self._cola.put_nowait((evento, nombre, intento))
+
+    def _reintentar(self, evento: Dict, nombre: str, intento: int):
+        """Vuelve a encolar la entrega tras una espera exponencial (0.5 s, 1 s, 2 s... con espera_base=0.5)"""
+        def encolar():
+            self._esperas.discard(espera)
+            self._cola.put_nowait((evento, nombre, intento))
+        espera = asyncio.get_running_loop().call_later(self.espera_base * 2 ** (intento - 2), encolar)
+        self._esperas.add(espera)
+
+    # ----- CONSUMO -----
+    async def _trabajar(self):
+        while True:
+            evento, nombre, intento = await self._cola.get()
+            _, manejador, durable = self._suscripciones[nombre]
+            self._en_curso += 1
+            try:
+                await manejador(evento["datos"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if intento < self.max_intentos:
+                    self._contadores[nombre]["reintentos"] += 1
+                    self._reintentar(evento, nombre, intento + 1)
+                else:
+                    self._contadores[nombre]["fallidos"] += 1
+                    await self._terminar(evento, nombre, durable, repr(e))
+            else:
+                self._contadores[nombre]["procesados"] += 1
+                await self._terminar(evento, nombre, durable)
+            finally:
+                self._en_curso -= 1
+
+    async def _terminar(self, evento: Dict, nombre: str, durable: bool, error: Optional[str] = None):
+        if durable:
+            if error is None:
+                await self._llamar(self.outbox.completar, evento["evento_id"], nombre)
+            else:
+                await self._llamar(self.outbox.fallar, evento["evento_id"], nombre, error)
+        self._pendientes[nombre].pop(evento["evento_id"], None)
+        if not any(self._pendientes.values()):
+            self._vacio.set()
+
+    async def iniciar(self):
+        """Vuelve a encolar lo pendiente del outbox y arranca `concurrencia` consumidores"""
+        for evento, nombre in await self._llamar(lambda: list(self.outbox.pendientes())):
+            if nombre in self._suscripciones and evento["evento_id"] not in self._pendientes[nombre]:
+                self._encolar(evento, nombre, 1)
+        self._tareas = [asyncio.create_task(self._trabajar()) for _ in range(self.concurrencia)]
+
+    async def detener(self):
+        """Detiene los consumidores; lo no procesado queda en el outbox para el próximo arranque"""
+        for espera in self._esperas:
+            espera.cancel()
+        self._esperas.clear()
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+    async def esperar(self, timeout: Optional[float] = None):
+        """Espera a que no quede ninguna entrega pendiente (para pruebas y apagados ordenados)"""
+        await asyncio.wait_for(self._vacio.wait(), timeout)
+
+    # ----- MÉTRICAS -----
+    def metricas(self) -> Dict:
+        """Profundidad de la cola y, por suscriptor, pendientes y lag (antigüedad del más viejo sin procesar)"""
+        ahora = self._reloj()
+        suscriptores = {}
+        for nombre, pendientes in self._pendientes.items():
+            mas_viejo = min(pendientes.values(), default=ahora)
+            suscriptores[nombre] = {
+                "evento": self._suscripciones[nombre][0],
+                "pendientes": len(pendientes),
+                "lag_segundos": round(ahora - mas_viejo, 3),
+                **self._contadores[nombre]
+            }
+        return {
+            "profundidad": self._cola.qsize(),
+            "en_curso": self._en_curso,
+            "reintentando": len(self._esperas),
+            "consumidores": len(self._tareas),
+            "suscriptores": suscriptores
+        }
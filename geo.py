@@ -0,0 +1,13 @@
+# geo.py - Cálculos geográficos sobre coordenadas (lat, lon) en grados
+import math
+
+RADIO_TIERRA_KM = 6371.0
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia de gran círculo (fórmula del haversine) en kilómetros"""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi = fi2 - fi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,187 @@
+# idempotencia.py - Cabecera Idempotency-Key: caché de respuestas con TTL/LRU y espera de duplicados en curso
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INFINITO = float("inf")
+
+
+class RespuestaGuardada:
+    """Respuesta de una solicitud idempotente; `cuerpo` es None mientras está en curso"""
+
+    __slots__ = ("huella", "expira", "estado", "cabeceras", "cuerpo", "lista")
+
+    def __init__(self, huella: bytes):
+        self.huella = huella
+        self.expira = INFINITO
+        self.estado = 0
+        self.cabeceras: List[Tuple[bytes, bytes]] = []
+        self.cuerpo: Optional[bytes] = None
+        self.lista = asyncio.Event()
+
+
+class CacheIdempotencia:
+    """Respuestas por clave de idempotencia, con TTL deslizante y tope LRU.
+
+    Igual que en AlmacenSesiones, cada acceso renueva la expiración y mueve la
+    entrada al final del OrderedDict, así que el orden LRU coincide con el de
+    expiración y tanto buscar como desalojar cuestan O(1). Las solicitudes en
+    curso van aparte y no se desalojan: perder una haría que su reintento
+    ejecutara el handler otra vez. Solo se usa desde el event loop, por lo
+    que no necesita lock.
+    """
+
+    def __init__(self, ttl: float = 86400, max_entradas: int = 100_000, reloj=time.monotonic):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._reloj = reloj
+        self._entradas: "OrderedDict[tuple, RespuestaGuardada]" = OrderedDict()
+        self._en_curso: Dict[tuple, RespuestaGuardada] = {}
+        self.repetidas = 0
+        self.esperas = 0
+        self.desalojadas = 0
+
+    def reservar(self, llave: tuple, huella: bytes) -> Tuple[RespuestaGuardada, bool]:
+        """Devuelve (entrada, nueva). Si es nueva, quien llama debe ejecutar la solicitud"""
+        ahora = self._reloj()
+        self.barrer(ahora)
+        entrada = self._en_curso.get(llave)
+        if entrada is not None:
+            return entrada, False
+        entrada = self._entradas.get(llave)
+        if entrada is not None:
+            entrada.expira = ahora + self.ttl
+            self._entradas.move_to_end(llave)
+            return entrada, False
+        entrada = self._en_curso[llave] = RespuestaGuardada(huella)
+        return entrada, True
+
+    def completar(self, llave: tuple, entrada: RespuestaGuardada, estado: int, cabeceras, cuerpo: bytes):
+        entrada.estado = estado
+        entrada.cabeceras = cabeceras
+        entrada.cuerpo = cuerpo
+        entrada.expira = self._reloj() + self.ttl
+        if self._en_curso.get(llave) is entrada:
+            del self._en_curso[llave]
+            self._entradas[llave] = entrada
+            self._entradas.move_to_end(llave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojadas += 1
+        entrada.lista.set()
+
+    def descartar(self, llave: tuple, entrada: RespuestaGuardada):
+        """La solicitud falló: se olvida la clave para que un reintento vuelva a ejecutarla"""
+        if self._en_curso.get(llave) is entrada:
+            del self._en_curso[llave]
+        entrada.lista.set()
+
+    def barrer(self, ahora: Optional[float] = None) -> int:
+        """Elimina las respuestas vencidas del principio; se detiene en la primera vigente"""
+        ahora = self._reloj() if ahora is None else ahora
+        eliminadas = 0
+        while self._entradas:
+            llave, entrada = next(iter(self._entradas.items()))
+            if entrada.expira > ahora:
+                break
+            del self._entradas[llave]
+            eliminadas += 1
+        return eliminadas
+
+    def __len__(self) -> int:
+        return len(self._entradas) + len(self._en_curso)
+
+
+class MiddlewareIdempotencia:
+    """Middleware ASGI que aplica Idempotency-Key a los POST de las rutas indicadas.
+
+    La clave se asocia al token de sesión y a la ruta. Un reintento con la
+    misma clave recibe la respuesta guardada sin ejecutar el handler (con la
+    cabecera `Idempotent-Replayed: true`); un duplicado que llega mientras la
+    primera solicitud sigue en curso espera a que termine. Reusar la clave
+    con otro cuerpo responde 422. Las respuestas 5xx no se guardan, así que
+    un reintento después de un error del servidor vuelve a ejecutarse.
+    """
+
+    def __init__(self, app, cache: CacheIdempotencia, rutas: Iterable[str]):
+        self.app = app
+        self.cache = cache
+        self.rutas = tuple(rutas)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.rutas):
+            return await self.app(scope, receive, send)
+        cabeceras = dict(scope["headers"])
+        clave = cabeceras.get(b"idempotency-key")
+        if clave is None:
+            return await self.app(scope, receive, send)
+        if not clave or len(clave) > 255:
+            return await _responder_error(send, 400, "Idempotency-Key debe tener entre 1 y 255 caracteres")
+
+        cuerpo = await _leer_cuerpo(receive)
+        huella = hashlib.sha256(cuerpo).digest()
+        llave = (cabeceras.get(b"token", b""), scope["path"], clave)
+        while True:
+            entrada, nueva = self.cache.reservar(llave, huella)
+            if nueva:
+                break
+            if entrada.huella != huella:
+                return await _responder_error(send, 422, "Idempotency-Key ya usada con otra solicitud")
+            if entrada.cuerpo is None:
+                self.cache.esperas += 1
+                await entrada.lista.wait()
+                continue
+            self.cache.repetidas += 1
+            await send({"type": "http.response.start", "status": entrada.estado,
+                        "headers": entrada.cabeceras + [(b"idempotent-replayed", b"true")]})
+            await send({"type": "http.response.body", "body": entrada.cuerpo})
+            return
+
+        respuesta = {"estado": 500, "cabeceras": [], "trozos": []}
+        enviado = False
+
+        async def recibir():
+            nonlocal enviado
+            if enviado:
+                return await receive()
+            enviado = True
+            return {"type": "http.request", "body": cuerpo, "more_body": False}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["estado"] = mensaje["status"]
+                respuesta["cabeceras"] = list(mensaje.get("headers", []))
+            elif mensaje["type"] == "http.response.body":
+                respuesta["trozos"].append(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, recibir, enviar)
+        except BaseException:
+            self.cache.descartar(llave, entrada)
+            raise
+        if respuesta["estado"] >= 500:
+            self.cache.descartar(llave, entrada)
+        else:
+            self.cache.completar(llave, entrada, respuesta["estado"], respuesta["cabeceras"],
+                                 b"".join(respuesta["trozos"]))
+
+
+async def _leer_cuerpo(receive) -> bytes:
+    trozos = []
+    while True:
+        mensaje = await receive()
+        trozos.append(mensaje.get("body", b""))
+        if not mensaje.get("more_body"):
+            return b"".join(trozos)
+
+
+async def _responder_error(send, estado: int, detalle: str):
+    cuerpo = json.dumps({"detail": detalle}).encode("utf-8")
+    await send({"type": "http.response.start", "status": estado,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(cuerpo)).encode())]})
+    await send({"type": "http.response.body", "body": cuerpo})
@@ -0,0 +1,304 @@
+# journal.py - Journal de escritura anticipada (NDJSON) con group commit y snapshots
+import asyncio
+import glob
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+# Cada línea del journal y del snapshot es una entrada:
+#   {"s": seq, "t": tipo, "k": clave, "v": valor}
+# donde `v` es el valor completo resultante (null = eliminado). Como se guarda
+# el valor y no el cambio, reaplicar una entrada es idempotente: un snapshot
+# tomado mientras llegan escrituras más el journal posterior siempre converge
+# al estado final.
+logger = logging.getLogger(__name__)
+
+
+def _linea(seq: int, tipo: str, clave: str, valor_json: str) -> bytes:
+    return f'{{"s":{seq},"t":"{tipo}","k":{json.dumps(clave)},"v":{valor_json}}}\n'.encode("utf-8")
+
+
+def _leer_lineas(ruta: str) -> Iterator[bytes]:
+    """Recorre un archivo NDJSON mapeado en memoria, sin cargarlo entero"""
+    with open(ruta, "rb") as archivo:
+        if os.fstat(archivo.fileno()).st_size == 0:
+            return
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            for linea in iter(mapa.readline, b""):
+                # Una última línea sin "\n" es una escritura cortada por un crash
+                if linea.endswith(b"\n"):
+                    yield linea
+
+
+def _recortar_cola(ruta: str) -> int:
+    """Trunca el archivo tras su último "\n" y devuelve cuántos bytes quitó.
+
+    Sin esto, el próximo segmento abierto en modo "ab" sobre el mismo archivo
+    pegaría su primera entrada a la línea cortada.
+    """
+    with open(ruta, "r+b") as archivo:
+        tamano = fin = archivo.seek(0, os.SEEK_END)
+        while fin > 0:
+            inicio = max(0, fin - 65_536)
+            archivo.seek(inicio)
+            posicion = archivo.read(fin - inicio).rfind(b"\n")
+            if posicion >= 0:
+                fin = inicio + posicion + 1
+                break
+            fin = inicio
+        if fin < tamano:
+            archivo.truncate(fin)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+    return tamano - fin
+
+
+def _resolver(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+def aplicar(almacen, tipo: str, clave: str, valor):
+    """Aplica una entrada del journal sobre un almacén en memoria"""
+    if tipo == "orden":
+        almacen.ordenes.eliminar(clave)
+        if valor is not None:
+            almacen.ordenes.agregar(valor)
+    elif tipo == "venta":
+        if clave in almacen.ventas:
+            almacen.ventas.actualizar(clave, **{campo: v for campo, v in valor.items() if campo != "venta_id"})
+        else:
+            almacen.ventas.agregar(valor)
+    elif tipo == "carrito":
+        if valor is None:
+            almacen.carritos.eliminar(clave)
+        else:
+            almacen.carritos.guardar(clave, valor)
+    elif tipo == "stock":
+        tienda_id, _, producto_id = clave.partition("|")
+        almacen.stock.establecer(tienda_id, producto_id, valor)
+    elif tipo == "reserva":
+        # Cerrar la reserva sin devolver stock: el stock ya viene en sus propias entradas
+        almacen.stock.confirmar(clave)
+        if valor is not None:
+            almacen.stock.restaurar_reserva(clave, valor["tienda_id"], valor["items"], valor["fijada"])
+
+
+def exportar(almacen) -> Iterator[Tuple[str, str, str]]:
+    """Estado completo del almacén como (tipo, clave, valor en JSON)"""
+    for orden_id, texto in almacen.ordenes.exportar():
+        yield "orden", orden_id, texto
+    for venta_id, texto in almacen.ventas.exportar():
+        yield "venta", venta_id, texto
+    for carrito_id, texto in almacen.carritos.exportar():
+        yield "carrito", carrito_id, texto
+    yield from almacen.stock.exportar()
+
+
+class Journal:
+    """Journal append-only con fsync agrupado y snapshots compactados.
+
+    `registrar` solo serializa la entrada y la agrega a un buffer (se llama
+    con el lock del repositorio tomado, así que el orden del journal respeta
+    el orden real de cada clave). Un hilo escritor vacía el buffer cada
+    `intervalo_fsync_ms` con un único write + fsync para todo el lote;
+    `esperar(seq)` bloquea hasta que ese seq sea durable.
+
+    Cada snapshot rota el segmento activo, vuelca el estado a
+    `snapshot-<seq>.ndjson` y borra los segmentos anteriores.
+    """
+
+    def __init__(self, directorio: str, intervalo_fsync_ms: float = 5, intervalo_snapshot: float = 300):
+        self.directorio = directorio
+        self.intervalo_fsync = intervalo_fsync_ms / 1000
+        self.intervalo_snapshot = intervalo_snapshot
+        self.seq = 0
+        self.seq_durable = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._lock_archivo = threading.Lock()
+        self._durable = threading.Condition(threading.Lock())
+        self._esperas_async = []
+        self._archivo = None
+        self._detener = threading.Event()
+        self._hilos = []
+        self._almacen = None
+        self.lotes = 0
+        self.snapshots = 0
+        os.makedirs(directorio, exist_ok=True)
+
+    # ----- ESCRITURA -----
+    def registrar(self, tipo: str, clave: str, valor) -> int:
+        valor_json = "null" if valor is None else json.dumps(valor, ensure_ascii=False)
+        with self._lock:
+            self.seq += 1
+            self._buffer.append(_linea(self.seq, tipo, clave, valor_json))
+            return self.seq
+
+    def _vaciar(self):
+        with self._lock_archivo:
+            with self._lock:
+                lote, self._buffer = self._buffer, []
+                hasta = self.seq
+            if lote:
+                self._archivo.write(b"".join(lote))
+                self._archivo.flush()
+                os.fsync(self._archivo.fileno())
+                self.lotes += 1
+        with self._durable:
+            if hasta > self.seq_durable:
+                self.seq_durable = hasta
+                self._durable.notify_all()
+            listas = [espera for espera in self._esperas_async if espera[0] <= self.seq_durable]
+            self._esperas_async = [espera for espera in self._esperas_async if espera[0] > self.seq_durable]
+        for _, loop, futuro in listas:
+            loop.call_soon_threadsafe(_resolver, futuro)
+
+    def esperar(self, seq: Optional[int] = None, timeout: float = 5) -> bool:
+        """Bloquea hasta que `seq` (por defecto el último registrado) esté en disco"""
+        seq = self.seq if seq is None else seq
+        with self._durable:
+            return self._durable.wait_for(lambda: self.seq_durable >= seq, timeout)
+
+    async def esperar_async(self, seq: Optional[int] = None):
+        """Como `esperar`, pero sin ocupar un hilo: el escritor despierta al event loop"""
+        seq = self.seq if seq is None else seq
+        with self._durable:
+            if self.seq_durable >= seq:
+                return
+            loop = asyncio.get_running_loop()
+            futuro = loop.create_future()
+            self._esperas_async.append((seq, loop, futuro))
+        await futuro
+
+    def _abrir_segmento(self):
+        ruta = os.path.join(self.directorio, f"journal-{self.seq + 1:020d}.log")
+        self._archivo = open(ruta, "ab")
+
+    # ----- SNAPSHOTS -----
+    def snapshot(self, almacen) -> str:
+        """Rota el journal y escribe un snapshot compactado del almacén"""
+        with self._lock_archivo:
+            with self._lock:
+                lote, self._buffer = self._buffer, []
+                corte = self.seq
+                anterior, self._archivo = self._archivo, None
+                self._abrir_segmento()
+            if anterior is not None:
+                anterior.write(b"".join(lote))
+                anterior.flush()
+                os.fsync(anterior.fileno())
+                anterior.close()
+
+        ruta = os.path.join(self.directorio, f"snapshot-{corte:020d}.ndjson")
+        temporal = ruta + ".tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(json.dumps({"seq": corte}).encode("utf-8") + b"\n")
+            for tipo, clave, valor_json in exportar(almacen):
+                archivo.write(_linea(0, tipo, clave, valor_json))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+
+        # Todo lo anterior al corte ya está en el snapshot
+        for viejo in glob.glob(os.path.join(self.directorio, "snapshot-*.ndjson")):
+            if viejo != ruta:
+                os.remove(viejo)
+        for segmento in glob.glob(os.path.join(self.directorio, "journal-*.log")):
+            if self._inicio_segmento(segmento) <= corte:
+                os.remove(segmento)
+        self.snapshots += 1
+        return ruta
+
+    @staticmethod
+    def _inicio_segmento(ruta: str) -> int:
+        return int(os.path.basename(ruta)[len("journal-"):-len(".log")])
+
+    # ----- RECUPERACIÓN -----
+    def recuperar(self, almacen) -> Dict:
+        """Carga el último snapshot y reaplica solo la cola del journal.
+
+        Una última línea cortada por un crash se descarta y se trunca en el
+        archivo, para que lo que se escriba después empiece en una línea nueva.
+        """
+        inicio = time.perf_counter()
+        corte = 0
+        aplicadas = 0
+        snapshots = sorted(glob.glob(os.path.join(self.directorio, "snapshot-*.ndjson")))
+        if snapshots:
+            lineas = _leer_lineas(snapshots[-1])
+            corte = json.loads(next(lineas))["seq"]
+            for linea in lineas:
+                entrada = json.loads(linea)
+                aplicar(almacen, entrada["t"], entrada["k"], entrada["v"])
+                aplicadas += 1
+        ultimo = corte
+        segmentos = sorted(glob.glob(os.path.join(self.directorio, "journal-*.log")), key=self._inicio_segmento)
+        recortados = 0
+        for segmento in segmentos:
+            recortado = _recortar_cola(segmento)
+            if recortado:
+                logger.warning("Se descartó una escritura cortada de %d bytes al final de %s", recortado, segmento)
+                recortados += recortado
+            for linea in _leer_lineas(segmento):
+                entrada = json.loads(linea)
+                if entrada["s"] <= corte:
+                    continue
+                aplicar(almacen, entrada["t"], entrada["k"], entrada["v"])
+                ultimo = entrada["s"]
+                aplicadas += 1
+        self.seq = self.seq_durable = ultimo
+        return {
+            "snapshot": snapshots[-1] if snapshots else None,
+            "entradas": aplicadas,
+            "seq": ultimo,
+            "bytes_recortados": recortados,
+            "segundos": time.perf_counter() - inicio
+        }
+
+    # ----- CICLO DE VIDA -----
+    def conectar(self, almacen):
+        """Recupera el estado y engancha el journal a los repositorios del almacén"""
+        resultado = self.recuperar(almacen)
+        self._almacen = almacen
+        self._abrir_segmento()
+        for repositorio in (almacen.ordenes, almacen.ventas, almacen.carritos, almacen.stock):
+            repositorio.journal = self
+        return resultado
+
+    def _ciclo_escritura(self):
+        while not self._detener.wait(self.intervalo_fsync):
+            self._vaciar()
+        self._vaciar()
+
+    def _ciclo_snapshot(self):
+        while not self._detener.wait(self.intervalo_snapshot):
+            try:
+                self.snapshot(self._almacen)
+            except Exception:
+                # El journal sigue siendo válido; se reintenta en el próximo ciclo
+                logger.exception("No se pudo escribir el snapshot")
+
+    def iniciar(self):
+        if self._hilos:
+            return
+        self._detener.clear()
+        self._hilos = [
+            threading.Thread(target=self._ciclo_escritura, name="journal-escritura", daemon=True),
+            threading.Thread(target=self._ciclo_snapshot, name="journal-snapshot", daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
@@ -0,0 +1,197 @@
+# numeracion.py - Numeración correlativa por serie (SUNAT) con bloques arrendados a cada worker
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from almacen_sqlite import PoolConexiones
+
+# numeracion_series guarda la marca alta de cada serie: el primer número que
+# nunca se arrendó. Un número solo sale de ahí o de numeracion_libres (rangos
+# devueltos), siempre dentro de una transacción BEGIN IMMEDIATE, así que tras
+# un crash nunca se vuelve a entregar un número arrendado.
+ESQUEMA_NUMERACION = """
+CREATE TABLE IF NOT EXISTS numeracion_series (
+    serie TEXT PRIMARY KEY,
+    siguiente INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS numeracion_bloques (
+    serie TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    fin INTEGER NOT NULL,
+    dueno TEXT NOT NULL,
+    vence REAL NOT NULL,
+    PRIMARY KEY (serie, inicio)
+);
+CREATE TABLE IF NOT EXISTS numeracion_libres (
+    serie TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    fin INTEGER NOT NULL,
+    PRIMARY KEY (serie, inicio)
+);
+"""
+
+
+def formatear(serie: str, numero: int) -> str:
+    """F001-00000042: serie de 4 caracteres y correlativo de 8 dígitos"""
+    return f"{serie}-{numero:08d}"
+
+
+def separar(comprobante: str) -> Tuple[str, int]:
+    serie, _, numero = comprobante.partition("-")
+    return serie, int(numero)
+
+
+def _rangos(numeros: List[int]) -> List[Tuple[int, int]]:
+    """[1, 2, 3, 7] -> [(1, 4), (7, 8)] (rangos semiabiertos)"""
+    rangos = []
+    for numero in sorted(numeros):
+        if rangos and rangos[-1][1] == numero:
+            rangos[-1] = (rangos[-1][0], numero + 1)
+        else:
+            rangos.append((numero, numero + 1))
+    return rangos
+
+
+class _Bloque:
+    """Rango [actual, fin) arrendado a este proceso para una serie"""
+    __slots__ = ("inicio", "actual", "fin", "vence")
+
+    def __init__(self, inicio: int, fin: int, vence: float):
+        self.inicio = inicio
+        self.actual = inicio
+        self.fin = fin
+        self.vence = vence
+
+
+class NumeradorSeries:
+    """Entrega números correlativos por serie sin serializar a todos los workers.
+
+    Cada proceso arrienda bloques de `tam_bloque` números en la base
+    compartida y los reparte desde memoria con un lock por serie: las series
+    no compiten entre sí y una serie solo toca la base una vez por bloque.
+
+    Sin huecos: los rangos devueltos (lo que sobra al cerrar o al renovar un
+    bloque) se reparten antes de subir la marca alta. Cada arriendo vence a
+    los `ttl` segundos; el dueño lo suelta `margen` segundos antes, así que
+    un bloque vencido hace más de `margen` es de un proceso caído, y
+    `recuperar` devuelve los números que no llegaron a usarse. Como los
+    workers consumen bloques distintos, los números no salen en orden
+    global estricto, pero el conjunto emitido no tiene repetidos ni huecos.
+    """
+
+    def __init__(self, pool: PoolConexiones, tam_bloque: int = 50, ttl: float = 3_600,
+                 reloj: Callable[[], float] = time.time):
+        self._pool = pool
+        self._pool.conexion().executescript(ESQUEMA_NUMERACION)
+        self.tam_bloque = tam_bloque
+        self.ttl = ttl
+        self.margen = min(60.0, ttl / 10)
+        self._reloj = reloj
+        self.dueno = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._bloques: Dict[str, _Bloque] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.arriendos = 0
+
+    # ----- EMISIÓN -----
+    def siguiente(self, serie: str) -> int:
+        """Próximo número de la serie; solo va a la base cuando el bloque se agota o está por vencer"""
+        lock = self._locks.get(serie)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(serie, threading.Lock())
+        with lock:
+            bloque = self._bloques.get(serie)
+            if bloque is None or bloque.actual == bloque.fin or self._reloj() >= bloque.vence - self.margen:
+                bloque = self._bloques[serie] = self._arrendar(serie, bloque)
+            numero = bloque.actual
+            bloque.actual += 1
+            return numero
+
+    def _arrendar(self, serie: str, anterior: Optional[_Bloque]) -> _Bloque:
+        """Suelta el bloque anterior (devolviendo lo no usado) y arrienda otro, en una transacción"""
+        vence = self._reloj() + self.ttl
+        with self._pool.transaccion() as con:
+            if anterior is not None:
+                self._soltar(con, serie, anterior)
+            libre = con.execute(
+                "SELECT inicio, fin FROM numeracion_libres WHERE serie = ? ORDER BY inicio LIMIT 1", (serie,)
+            ).fetchone()
+            if libre is not None:
+                inicio, fin = libre[0], min(libre[1], libre[0] + self.tam_bloque)
+                if fin == libre[1]:
+                    con.execute("DELETE FROM numeracion_libres WHERE serie = ? AND inicio = ?", (serie, inicio))
+                else:
+                    con.execute("UPDATE numeracion_libres SET inicio = ? WHERE serie = ? AND inicio = ?",
+                                (fin, serie, inicio))
+            else:
+                fila = con.execute("SELECT siguiente FROM numeracion_series WHERE serie = ?", (serie,)).fetchone()
+                inicio = 1 if fila is None else fila[0]
+                fin = inicio + self.tam_bloque
+                con.execute("INSERT OR REPLACE INTO numeracion_series (serie, siguiente) VALUES (?, ?)", (serie, fin))
+            con.execute("INSERT INTO numeracion_bloques (serie, inicio, fin, dueno, vence) VALUES (?, ?, ?, ?, ?)",
+                        (serie, inicio, fin, self.dueno, vence))
+        self.arriendos += 1
+        return _Bloque(inicio, fin, vence)
+
+    def _soltar(self, con, serie: str, bloque: _Bloque):
+        cursor = con.execute("DELETE FROM numeracion_bloques WHERE serie = ? AND inicio = ? AND dueno = ?",
+                             (serie, bloque.inicio, self.dueno))
+        # Si ya no estaba, otro proceso lo recuperó al vencer: lo que sobra ya no es nuestro
+        if cursor.rowcount and bloque.actual < bloque.fin:
+            con.execute("INSERT INTO numeracion_libres (serie, inicio, fin) VALUES (?, ?, ?)",
+                        (serie, bloque.actual, bloque.fin))
+
+    def cerrar(self):
+        """Devuelve lo no usado de cada bloque para que otro worker lo emita"""
+        with self._lock:
+            series = list(self._bloques)
+        for serie in series:
+            with self._locks[serie]:
+                bloque = self._bloques.pop(serie, None)
+                if bloque is not None:
+                    with self._pool.transaccion() as con:
+                        self._soltar(con, serie, bloque)
+
+    # ----- RECUPERACIÓN Y REPORTE -----
+    def recuperar(self, usados: Dict[str, Iterable[int]]) -> Dict[str, List[Tuple[int, int]]]:
+        """Libera lo no usado de los bloques de procesos caídos (vencidos hace más de `margen`).
+
+        `usados` son los números de cada serie que figuran en comprobantes ya
+        guardados; el resto del bloque nunca salió y vuelve a repartirse.
+        Devuelve por serie los rangos recuperados.
+        """
+        limite = self._reloj() - self.margen
+        recuperados: Dict[str, List[Tuple[int, int]]] = {}
+        with self._pool.transaccion() as con:
+            vencidos = con.execute(
+                "SELECT serie, inicio, fin FROM numeracion_bloques WHERE vence < ?", (limite,)
+            ).fetchall()
+            conjuntos: Dict[str, Set[int]] = {}
+            for serie, inicio, fin in vencidos:
+                if serie not in conjuntos:
+                    conjuntos[serie] = set(usados.get(serie, ()))
+                libres = _rangos([n for n in range(inicio, fin) if n not in conjuntos[serie]])
+                con.executemany("INSERT INTO numeracion_libres (serie, inicio, fin) VALUES (?, ?, ?)",
+                                [(serie, a, b) for a, b in libres])
+                con.execute("DELETE FROM numeracion_bloques WHERE serie = ? AND inicio = ?", (serie, inicio))
+                recuperados.setdefault(serie, []).extend(libres)
+        return recuperados
+
+    def reporte(self) -> Dict[str, Dict]:
+        """Por serie: marca alta, bloques arrendados (y si están vencidos) y rangos libres por reemitir"""
+        ahora = self._reloj()
+        con = self._pool.conexion()
+        series = {serie: {"siguiente": siguiente, "arrendados": [], "libres": [], "sin_emitir": 0}
+                  for serie, siguiente in con.execute("SELECT serie, siguiente FROM numeracion_series")}
+        for serie, inicio, fin, dueno, vence in con.execute(
+                "SELECT serie, inicio, fin, dueno, vence FROM numeracion_bloques ORDER BY serie, inicio"):
+            series[serie]["arrendados"].append(
+                {"inicio": inicio, "fin": fin, "dueno": dueno, "vencido": vence + self.margen < ahora})
+        for serie, inicio, fin in con.execute(
+                "SELECT serie, inicio, fin FROM numeracion_libres ORDER BY serie, inicio"):
+            series[serie]["libres"].append((inicio, fin))
+            series[serie]["sin_emitir"] += fin - inicio
+        return series
@@ -0,0 +1,165 @@
+# ordenes.py - Repositorio de órdenes de venta con índices hash
+import json
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from estados import ConjuntoOrdenado, modalidad, validar_transicion
+
+
+class RepositorioOrdenes:
+    """Repositorio en memoria de órdenes con búsqueda O(1) por orden_id.
+
+    Mantiene índices secundarios por user_id, tienda_id y estado. Cada índice
+    guarda un dict (ordenado por inserción) de orden_id, así que las altas,
+    bajas y cambios de estado cuestan O(1) y el orden de llegada se conserva.
+    Además cada estado, y cada estado por modalidad (delivery o recojo),
+    tiene una cola (estados.ConjuntoOrdenado) en orden de llegada al estado
+    que se pagina con cursor en O(tamaño de página).
+    """
+
+    INDICES = ("user_id", "tienda_id", "estado")
+
+    def __init__(self):
+        self._ordenes: Dict[str, Dict] = {}
+        self._indices: Dict[str, Dict[str, Dict[str, None]]] = {campo: {} for campo in self.INDICES}
+        self._colas: Dict[Tuple[str, Optional[str]], ConjuntoOrdenado] = {}
+        self._lock = threading.RLock()
+        self.journal = None  # Journal opcional donde se registra cada cambio
+
+    # ----- ÍNDICES -----
+    def _indexar(self, campo: str, valor, orden_id: str):
+        self._indices[campo].setdefault(valor, {})[orden_id] = None
+
+    def _desindexar(self, campo: str, valor, orden_id: str):
+        grupo = self._indices[campo].get(valor)
+        if grupo is None:
+            return
+        grupo.pop(orden_id, None)
+        if not grupo:
+            del self._indices[campo][valor]
+
+    def _encolar(self, orden: Dict):
+        for clave in ((orden.get("estado"), None), (orden.get("estado"), modalidad(orden))):
+            self._colas.setdefault(clave, ConjuntoOrdenado()).agregar(orden["orden_id"])
+
+    def _desencolar(self, estado: str, modo: str, orden_id: str):
+        for clave in ((estado, None), (estado, modo)):
+            cola = self._colas.get(clave)
+            if cola is not None:
+                cola.quitar(orden_id)
+
+    # ----- ESCRITURA -----
+    def agregar(self, orden: Dict) -> Dict:
+        """Registra una orden nueva y la indexa"""
+        orden_id = orden["orden_id"]
+        with self._lock:
+            if orden_id in self._ordenes:
+                raise KeyError(f"La orden {orden_id} ya existe")
+            self._ordenes[orden_id] = orden
+            for campo in self.INDICES:
+                self._indexar(campo, orden.get(campo), orden_id)
+            self._encolar(orden)
+            if self.journal is not None:
+                self.journal.registrar("orden", orden_id, orden)
+        return orden
+
+    def actualizar(self, orden_id: str, **campos) -> Dict:
+        """Actualiza campos de una orden manteniendo los índices sincronizados"""
+        with self._lock:
+            orden = self._ordenes[orden_id]
+            cola = (orden.get("estado"), modalidad(orden))
+            for campo, valor in campos.items():
+                if campo in self._indices and orden.get(campo) != valor:
+                    self._desindexar(campo, orden.get(campo), orden_id)
+                    self._indexar(campo, valor, orden_id)
+                orden[campo] = valor
+            if (orden.get("estado"), modalidad(orden)) != cola:
+                self._desencolar(*cola, orden_id)
+                self._encolar(orden)
+            if self.journal is not None:
+                self.journal.registrar("orden", orden_id, orden)
+            return orden
+
+    def transicion(self, orden_id: str, estado: str, **campos) -> Dict:
+        """Pasa la orden a `estado` (y actualiza `campos`) si la tabla de estados lo permite.
+
+        Validar y cambiar ocurren bajo el mismo lock: si dos pedidos compiten,
+        el segundo recibe TransicionInvalida.
+        """
+        with self._lock:
+            orden = self._ordenes[orden_id]
+            validar_transicion(orden, estado)
+            return self.actualizar(orden_id, estado=estado, **campos)
+
+    def cambiar_estado(self, orden_id: str, estado: str) -> Dict:
+        """Cambia el estado de la orden (validado) y actualiza índices y colas"""
+        return self.transicion(orden_id, estado)
+
+    def eliminar(self, orden_id: str) -> Optional[Dict]:
+        """Quita una orden del repositorio y de todos los índices"""
+        with self._lock:
+            orden = self._ordenes.pop(orden_id, None)
+            if orden is not None:
+                for campo in self.INDICES:
+                    self._desindexar(campo, orden.get(campo), orden_id)
+                self._desencolar(orden.get("estado"), modalidad(orden), orden_id)
+                if self.journal is not None:
+                    self.journal.registrar("orden", orden_id, None)
+            return orden
+
+    # ----- LECTURA -----
+    def obtener(self, orden_id: str) -> Optional[Dict]:
+        """Busca una orden por su id en O(1)"""
+        return self._ordenes.get(orden_id)
+
+    def buscar(self, campo: str, valor) -> List[Dict]:
+        """Órdenes cuyo campo indexado coincide con el valor, en orden de llegada"""
+        with self._lock:
+            ids = list(self._indices[campo].get(valor, ()))
+        return [self._ordenes[orden_id] for orden_id in ids]
+
+    def por_usuario(self, user_id: str) -> List[Dict]:
+        return self.buscar("user_id", user_id)
+
+    def por_tienda(self, tienda_id: str) -> List[Dict]:
+        return self.buscar("tienda_id", tienda_id)
+
+    def por_estado(self, estado: str) -> List[Dict]:
+        return self.buscar("estado", estado)
+
+    def pagina(self, estado: str, modo: Optional[str] = None, despues: Optional[int] = None,
+               limite: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """Órdenes de la cola del estado (y modalidad) en orden de llegada, desde el cursor `despues`"""
+        with self._lock:
+            cola = self._colas.get((estado, modo))
+            if cola is None:
+                return [], None
+            ids, siguiente = cola.pagina(despues, limite)
+            return [self._ordenes[orden_id] for orden_id in ids], siguiente
+
+    def contar_cola(self, estado: str, modo: Optional[str] = None) -> int:
+        cola = self._colas.get((estado, modo))
+        return 0 if cola is None else len(cola)
+
+    def contar(self, campo: str, valor) -> int:
+        """Cantidad de órdenes con ese valor en el índice, sin materializarlas"""
+        return len(self._indices[campo].get(valor, ()))
+
+    def exportar(self) -> Iterator[Tuple[str, str]]:
+        """(orden_id, orden en JSON) de cada orden, serializada bajo el lock"""
+        for orden_id in list(self._ordenes):
+            with self._lock:
+                orden = self._ordenes.get(orden_id)
+                if orden is None:
+                    continue
+                texto = json.dumps(orden, ensure_ascii=False)
+            yield orden_id, texto
+
+    def __len__(self) -> int:
+        return len(self._ordenes)
+
+    def __contains__(self, orden_id: str) -> bool:
+        return orden_id in self._ordenes
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(list(self._ordenes.values()))
@@ -0,0 +1,57 @@
+# pasarela.py - Interfaz asíncrona con la pasarela de pagos
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+
+
+class PagoRechazado(Exception):
+    """La pasarela rechazó la autorización del pago"""
+
+
+class PasarelaNoDisponible(Exception):
+    """La pasarela no respondió a tiempo o devolvió un error propio"""
+
+
+class CircuitoAbierto(PasarelaNoDisponible):
+    """El circuito está abierto: no se intenta llamar a la pasarela"""
+
+
+class Pasarela:
+    """Interfaz de una pasarela de pagos asíncrona"""
+
+    async def autorizar(self, orden_id: str, monto: float, metodo: str, detalles: Optional[Dict] = None) -> Dict:
+        """Autoriza un cobro; devuelve {"transaccion_id", "referencia"} o lanza PagoRechazado"""
+        raise NotImplementedError
+
+    async def anular(self, transaccion_id: str) -> None:
+        """Revierte una autorización que no se llegó a usar"""
+        raise NotImplementedError
+
+    async def autorizar_lote(self, pagos: List[Dict]) -> List:
+        """Autoriza varios pagos a la vez; devuelve, en orden, la autorización o la excepción de cada uno"""
+        return await asyncio.gather(
+            *(self.autorizar(p["orden_id"], p["monto"], p["metodo"], p.get("detalles")) for p in pagos),
+            return_exceptions=True
+        )
+
+    async def cerrar(self):
+        pass
+
+
+class PasarelaSimulada(Pasarela):
+    """Pasarela local que solo genera ids, con latencia opcional para pruebas de carga"""
+
+    def __init__(self, latencia: float = 0):
+        self.latencia = latencia
+
+    async def autorizar(self, orden_id: str, monto: float, metodo: str, detalles: Optional[Dict] = None) -> Dict:
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        return {
+            "transaccion_id": str(uuid.uuid4()),
+            "referencia": f"REF-{uuid.uuid4().hex[:8]}"
+        }
+
+    async def anular(self, transaccion_id: str) -> None:
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
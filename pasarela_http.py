@@ -0,0 +1,307 @@
+# pasarela_http.py - Cliente HTTP de la pasarela de pagos: pool keep-alive, plazos, reintentos y circuit breaker
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pasarela import CircuitoAbierto, PagoRechazado, Pasarela, PasarelaNoDisponible
+
+
+# ----- CIRCUIT BREAKER -----
+class CircuitoPasarela:
+    """Circuit breaker por conteo de fallos consecutivos.
+
+    cerrado: las llamadas pasan. Tras `umbral_fallos` fallos seguidos pasa a
+    abierto y rechaza todo sin llamar durante `tiempo_apertura` segundos.
+    Luego queda semiabierto: deja pasar una sola llamada de prueba, que lo
+    cierra si funciona o lo vuelve a abrir si falla.
+    """
+
+    def __init__(self, umbral_fallos: int = 5, tiempo_apertura: float = 10.0, reloj=time.monotonic):
+        self.umbral_fallos = umbral_fallos
+        self.tiempo_apertura = tiempo_apertura
+        self.reloj = reloj
+        self.estado = "cerrado"
+        self.fallos = 0
+        self.abierto_hasta = 0.0
+        self.rechazadas = 0
+        self._sonda = False
+
+    def permitir(self) -> bool:
+        if self.estado == "abierto":
+            if self.reloj() < self.abierto_hasta:
+                self.rechazadas += 1
+                return False
+            self.estado = "semiabierto"
+            self._sonda = False
+        if self.estado == "semiabierto":
+            if self._sonda:
+                self.rechazadas += 1
+                return False
+            self._sonda = True
+        return True
+
+    def exito(self):
+        self.estado = "cerrado"
+        self.fallos = 0
+        self._sonda = False
+
+    def fallo(self):
+        self.fallos += 1
+        if self.estado == "semiabierto" or self.fallos >= self.umbral_fallos:
+            self.estado = "abierto"
+            self.abierto_hasta = self.reloj() + self.tiempo_apertura
+            self._sonda = False
+
+
+# ----- POOL DE CONEXIONES HTTP/1.1 -----
+class ErrorHTTP(Exception):
+    """Respuesta HTTP mal formada o conexión cerrada a mitad de la respuesta"""
+
+
+class _Conexion:
+    def __init__(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        self.lector = lector
+        self.escritor = escritor
+        self.usos = 0
+
+    async def solicitar(self, solicitud: bytes) -> Tuple[int, bytes, bool]:
+        """Envía una solicitud ya codificada; devuelve (estado, cuerpo, reutilizable)"""
+        self.escritor.write(solicitud)
+        await self.escritor.drain()
+        linea = await self.lector.readline()
+        if not linea:
+            raise ErrorHTTP("La conexión se cerró antes de la respuesta")
+        partes = linea.split(None, 2)
+        if len(partes) < 2 or not partes[0].startswith(b"HTTP/1."):
+            raise ErrorHTTP(f"Línea de estado inválida: {linea!r}")
+        estado = int(partes[1])
+        cabeceras = {}
+        while True:
+            linea = await self.lector.readline()
+            if linea in (b"\r\n", b"\n"):
+                break
+            if not linea:
+                raise ErrorHTTP("La conexión se cerró en las cabeceras")
+            nombre, _, valor = linea.partition(b":")
+            cabeceras[nombre.strip().lower()] = valor.strip().lower()
+        if cabeceras.get(b"transfer-encoding") == b"chunked":
+            trozos = []
+            while True:
+                tamano = int((await self.lector.readline()).split(b";")[0], 16)
+                if tamano == 0:
+                    await self.lector.readline()
+                    break
+                trozos.append(await self.lector.readexactly(tamano))
+                await self.lector.readexactly(2)
+            cuerpo = b"".join(trozos)
+        elif b"content-length" in cabeceras:
+            cuerpo = await self.lector.readexactly(int(cabeceras[b"content-length"]))
+        else:
+            # Sin longitud, el cuerpo termina al cerrar la conexión
+            return estado, await self.lector.read(), False
+        self.usos += 1
+        return estado, cuerpo, cabeceras.get(b"connection") != b"close"
+
+    def cerrar(self):
+        self.escritor.close()
+
+
+class PoolHTTP:
+    """Conexiones keep-alive reutilizables hacia un único host.
+
+    Como mucho `max_conexiones` solicitudes en vuelo; las conexiones libres se
+    reusan en orden LIFO (la más recientemente usada es la que menos
+    probablemente cerró el servidor por inactividad).
+    """
+
+    def __init__(self, host: str, puerto: int, max_conexiones: int = 100,
+                 timeout_conexion: float = 1.0, ssl=None, keep_alive: bool = True):
+        self.host = host
+        self.puerto = puerto
+        self.timeout_conexion = timeout_conexion
+        self.ssl = ssl
+        self.keep_alive = keep_alive
+        self._libres: List[_Conexion] = []
+        self._cupos = asyncio.Semaphore(max_conexiones)
+        self.creadas = 0
+        self.reutilizadas = 0
+
+    def _codificar(self, metodo: str, ruta: str, cuerpo: bytes, cabeceras: Optional[Dict]) -> bytes:
+        lineas = [
+            f"{metodo} {ruta} HTTP/1.1",
+            f"Host: {self.host}:{self.puerto}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(cuerpo)}",
+            "Connection: keep-alive" if self.keep_alive else "Connection: close",
+        ]
+        lineas.extend(f"{nombre}: {valor}" for nombre, valor in (cabeceras or {}).items())
+        return ("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + cuerpo
+
+    async def _abrir(self) -> _Conexion:
+        lector, escritor = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.puerto, ssl=self.ssl), self.timeout_conexion
+        )
+        self.creadas += 1
+        return _Conexion(lector, escritor)
+
+    async def solicitar(self, metodo: str, ruta: str, cuerpo: bytes = b"",
+                        cabeceras: Optional[Dict] = None) -> Tuple[int, bytes]:
+        solicitud = self._codificar(metodo, ruta, cuerpo, cabeceras)
+        async with self._cupos:
+            while self._libres:
+                conexion = self._libres.pop()
+                try:
+                    estado, datos, reutilizable = await conexion.solicitar(solicitud)
+                except (ErrorHTTP, ConnectionError, asyncio.IncompleteReadError):
+                    # El servidor cerró la conexión inactiva: se prueba con otra
+                    conexion.cerrar()
+                    continue
+                except BaseException:
+                    conexion.cerrar()
+                    raise
+                self.reutilizadas += 1
+                self._devolver(conexion, reutilizable)
+                return estado, datos
+            conexion = await self._abrir()
+            try:
+                estado, datos, reutilizable = await conexion.solicitar(solicitud)
+            except BaseException:
+                conexion.cerrar()
+                raise
+            self._devolver(conexion, reutilizable)
+            return estado, datos
+
+    def _devolver(self, conexion: _Conexion, reutilizable: bool):
+        if reutilizable and self.keep_alive:
+            self._libres.append(conexion)
+        else:
+            conexion.cerrar()
+
+    def cerrar(self):
+        for conexion in self._libres:
+            conexion.cerrar()
+        self._libres = []
+
+
+# ----- CLIENTE DE LA PASARELA -----
+class PasarelaHTTP(Pasarela):
+    """Cliente de una pasarela de pagos remota.
+
+    Cada operación tiene un plazo total de `timeout` segundos que cubre todos
+    sus intentos. Los errores de red, los timeouts y los 5xx se reintentan
+    hasta `reintentos` veces con backoff exponencial y jitter completo; un 4xx
+    es un rechazo definitivo. La clave de idempotencia de cada intento de pago
+    (orden_id + hash de monto, método y detalles) hace seguros los reintentos
+    sin que un rechazo bloquee reintentar la orden con otra tarjeta. Tras varios fallos seguidos el circuito se abre y las
+    llamadas fallan al instante con CircuitoAbierto.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0, reintentos: int = 2, backoff: float = 0.05,
+                 max_conexiones: int = 100, tamano_lote: int = 50,
+                 circuito: Optional[CircuitoPasarela] = None, keep_alive: bool = True):
+        partes = urlsplit(url)
+        self.prefijo = partes.path.rstrip("/")
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.tamano_lote = tamano_lote
+        self.circuito = circuito or CircuitoPasarela()
+        self.pool = PoolHTTP(
+            partes.hostname, partes.port or (443 if partes.scheme == "https" else 80),
+            max_conexiones=max_conexiones, ssl=True if partes.scheme == "https" else None,
+            keep_alive=keep_alive
+        )
+
+    async def _llamar(self, ruta: str, cuerpo: Dict, clave_idempotencia: Optional[str] = None) -> Dict:
+        if not self.circuito.permitir():
+            raise CircuitoAbierto("Pasarela de pagos no disponible (circuito abierto)")
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + self.timeout
+        datos = json.dumps(cuerpo).encode("utf-8")
+        cabeceras = {"Idempotency-Key": clave_idempotencia} if clave_idempotencia else None
+        error = None
+        for intento in range(self.reintentos + 1):
+            restante = limite - loop.time()
+            if restante <= 0:
+                break
+            try:
+                estado, respuesta = await asyncio.wait_for(
+                    self.pool.solicitar("POST", self.prefijo + ruta, datos, cabeceras), restante
+                )
+            except (OSError, ErrorHTTP, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                if estado < 500:
+                    # Un 4xx es una respuesta válida: la pasarela está sana
+                    self.circuito.exito()
+                    if estado >= 400:
+                        raise PagoRechazado(_motivo(respuesta, estado))
+                    return json.loads(respuesta)
+                error = PasarelaNoDisponible(f"HTTP {estado}")
+            espera = random.uniform(0, self.backoff * 2 ** intento)
+            if intento == self.reintentos or loop.time() + espera >= limite:
+                break
+            await asyncio.sleep(espera)
+        self.circuito.fallo()
+        raise PasarelaNoDisponible(f"La pasarela no respondió correctamente: {error!r}") from error
+
+    async def autorizar(self, orden_id: str, monto: float, metodo: str, detalles: Optional[Dict] = None) -> Dict:
+        datos = await self._llamar(
+            "/v1/autorizaciones",
+            {"orden_id": orden_id, "monto": monto, "metodo": metodo, "detalles": detalles},
+            clave_idempotencia=clave_pago(orden_id, monto, metodo, detalles)
+        )
+        return {"transaccion_id": datos["transaccion_id"], "referencia": datos["referencia"]}
+
+    async def autorizar_lote(self, pagos: List[Dict]) -> List:
+        """Envía los pagos en lotes de `tamano_lote`, todos los lotes en paralelo"""
+        pagos = [{**pago, "clave": clave_pago(pago["orden_id"], pago["monto"], pago["metodo"], pago.get("detalles"))}
+                 for pago in pagos]
+        lotes = [pagos[i:i + self.tamano_lote] for i in range(0, len(pagos), self.tamano_lote)]
+        # El lote también se reintenta: su clave sale de las claves de sus pagos
+        respuestas = await asyncio.gather(
+            *(self._llamar("/v1/autorizaciones/lote", {"pagos": lote}, clave_idempotencia=clave_lote(lote))
+              for lote in lotes),
+            return_exceptions=True
+        )
+        resultados = []
+        for lote, respuesta in zip(lotes, respuestas):
+            if isinstance(respuesta, Exception):
+                resultados.extend([respuesta] * len(lote))
+                continue
+            for resultado in respuesta["resultados"]:
+                if "error" in resultado:
+                    resultados.append(PagoRechazado(resultado["error"]))
+                else:
+                    resultados.append({"transaccion_id": resultado["transaccion_id"],
+                                       "referencia": resultado["referencia"]})
+        return resultados
+
+    async def anular(self, transaccion_id: str) -> None:
+        await self._llamar("/v1/anulaciones", {"transaccion_id": transaccion_id},
+                           clave_idempotencia=f"anular-{transaccion_id}")
+
+    async def cerrar(self):
+        self.pool.cerrar()
+
+
+def clave_pago(orden_id: str, monto: float, metodo: str, detalles: Optional[Dict]) -> str:
+    """Clave de idempotencia de un intento de pago: igual al reintentarlo, distinta con otros datos de pago"""
+    datos = json.dumps([monto, metodo, detalles], sort_keys=True).encode("utf-8")
+    return f"{orden_id}-{hashlib.sha256(datos).hexdigest()[:16]}"
+
+
+def clave_lote(pagos: List[Dict]) -> str:
+    claves = "\n".join(sorted(pago["clave"] for pago in pagos)).encode("utf-8")
+    return f"lote-{hashlib.sha256(claves).hexdigest()[:32]}"
+
+
+def _motivo(respuesta: bytes, estado: int) -> str:
+    try:
+        return json.loads(respuesta)["detail"]
+    except (ValueError, KeyError, TypeError):
+        return f"HTTP {estado}"
@@ -0,0 +1,147 @@
+# recolector.py - Expiración de carritos abandonados y órdenes pendientes con un heap de vencimientos
+import datetime
+import heapq
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from estados import EXPIRADA, PENDIENTE
+
+
+class Vencimientos:
+    """Min-heap de (vence, clave) con entradas perezosas.
+
+    `_vence` guarda el vencimiento vigente de cada clave; reprogramar o
+    cancelar no busca la entrada vieja en el heap, solo cambia el dict, y la
+    entrada obsoleta se descarta cuando llega al tope. Sacar las vencidas
+    cuesta O(log n) por entrada vencida (u obsoleta), sin mirar las demás.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, Hashable]] = []
+        self._vence: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def programar(self, clave: Hashable, vence: float):
+        with self._lock:
+            self._vence[clave] = vence
+            heapq.heappush(self._heap, (vence, clave))
+            if len(self._heap) > 2 * len(self._vence) + 1024:
+                # Demasiadas entradas obsoletas: se reconstruye con las vigentes
+                self._heap = [(v, c) for c, v in self._vence.items()]
+                heapq.heapify(self._heap)
+
+    def cancelar(self, clave: Hashable):
+        with self._lock:
+            self._vence.pop(clave, None)
+
+    def vencidas(self, ahora: float) -> List[Hashable]:
+        """Saca y devuelve las claves cuyo vencimiento vigente ya pasó"""
+        claves = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= ahora:
+                vence, clave = heapq.heappop(self._heap)
+                if self._vence.get(clave) == vence:
+                    del self._vence[clave]
+                    claves.append(clave)
+        return claves
+
+    def __len__(self) -> int:
+        return len(self._vence)
+
+
+class Recolector:
+    """Elimina carritos sin actividad y órdenes que nunca se pagaron.
+
+    Un carrito vence `ttl_carrito` segundos después de su último cambio
+    (cada `guardar` lo reprograma con `tocar_carrito`); una orden, a los
+    `ttl_orden` segundos de creada si sigue pendiente o expirada. Antes de
+    borrar una orden se libera su reserva de stock, salvo que ya esté fijada
+    porque la orden se está pagando. Trabaja sobre los repositorios
+    síncronos del Almacen desde su propio hilo, como el barrido de reservas.
+    """
+
+    ESTADOS_RECOLECTABLES = (PENDIENTE, EXPIRADA)
+
+    def __init__(self, almacen, ttl_carrito: float = 86_400, ttl_orden: float = 3_600,
+                 intervalo: float = 30, reloj=time.time):
+        self.almacen = almacen
+        self.ttl_carrito = ttl_carrito
+        self.ttl_orden = ttl_orden
+        self.intervalo = intervalo
+        self._reloj = reloj
+        self._vencimientos = Vencimientos()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.carritos_eliminados = 0
+        self.ordenes_eliminadas = 0
+        self.reservas_liberadas = 0
+
+    # ----- PROGRAMACIÓN -----
+    def tocar_carrito(self, carrito_id: str):
+        self._vencimientos.programar(("carrito", carrito_id), self._reloj() + self.ttl_carrito)
+
+    def programar_orden(self, orden_id: str, creada: Optional[float] = None):
+        creada = self._reloj() if creada is None else creada
+        self._vencimientos.programar(("orden", orden_id), creada + self.ttl_orden)
+
+    def cargar(self):
+        """Programa lo que ya estaba guardado al arrancar (un recorrido, una sola vez)"""
+        for carrito_id in self.almacen.carritos:
+            self.tocar_carrito(carrito_id)
+        for estado in self.ESTADOS_RECOLECTABLES:
+            for orden in self.almacen.ordenes.buscar("estado", estado):
+                creada = datetime.datetime.fromisoformat(orden["fecha_creacion"]).timestamp()
+                self.programar_orden(orden["orden_id"], creada)
+
+    # ----- RECOLECCIÓN -----
+    def _eliminar_orden(self, orden_id: str) -> bool:
+        orden = self.almacen.ordenes.obtener(orden_id)
+        if orden is None or orden["estado"] not in self.ESTADOS_RECOLECTABLES:
+            return False
+        stock = self.almacen.stock
+        if stock.reservado(orden_id):
+            if not stock.liberar(orden_id, si_no_fijada=True):
+                return False  # Reserva fijada: el pago está en curso
+            self.reservas_liberadas += 1
+        self.almacen.ordenes.eliminar(orden_id)
+        return True
+
+    def recolectar(self) -> int:
+        """Elimina lo vencido hasta ahora; devuelve cuántas entradas eliminó"""
+        eliminadas = 0
+        for tipo, clave in self._vencimientos.vencidas(self._reloj()):
+            if tipo == "carrito":
+                if self.almacen.carritos.eliminar(clave) is not None:
+                    self.carritos_eliminados += 1
+                    eliminadas += 1
+            elif self._eliminar_orden(clave):
+                self.ordenes_eliminadas += 1
+                eliminadas += 1
+        return eliminadas
+
+    def estadisticas(self) -> Dict:
+        return {
+            "carritos_eliminados": self.carritos_eliminados,
+            "ordenes_eliminadas": self.ordenes_eliminadas,
+            "reservas_liberadas": self.reservas_liberadas,
+            "programados": len(self._vencimientos),
+        }
+
+    # ----- RECOLECCIÓN EN SEGUNDO PLANO -----
+    def _ciclo(self):
+        while not self._detener.wait(self.intervalo):
+            self.recolectar()
+
+    def iniciar(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name="recolector", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
@@ -0,0 +1,63 @@
+# respuestas.py - Serialización rápida de respuestas: orjson o pydantic-core, sin jsonable_encoder
+import functools
+import inspect
+from typing import Any, Callable
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+from pydantic_core import to_json, to_jsonable_python
+
+if orjson is not None:
+    def codificar(datos: Any) -> bytes:
+        # Lo que orjson no conoce (modelos pydantic, sets, ...) lo convierte pydantic-core
+        return orjson.dumps(datos, default=to_jsonable_python)
+else:
+    def codificar(datos: Any) -> bytes:
+        # Serializador compilado de pydantic-core (Rust); viene con pydantic 2
+        return to_json(datos)
+
+
+class RespuestaJSON(Response):
+    """JSONResponse que codifica con `codificar`; acepta bytes ya codificados"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return codificar(content)
+
+
+class RutaRapida(APIRoute):
+    """Ruta cuyos handlers devuelven RespuestaJSON en lugar de pasar por jsonable_encoder.
+
+    FastAPI solo se salta jsonable_encoder cuando el handler devuelve un
+    Response, así que se envuelve el endpoint: si devuelve un dict o una
+    lista, se codifica directo con orjson/pydantic-core. La firma se
+    conserva (functools.wraps), así que la inyección de dependencias y la
+    documentación no cambian. Solo aplica a handlers `async def` sin
+    response_model explícito (con modelo, FastAPI tiene que validar).
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        modelo = kwargs.get("response_model")
+        if inspect.iscoroutinefunction(endpoint) and (modelo is None or isinstance(modelo, DefaultPlaceholder)):
+            endpoint = _envolver(endpoint, kwargs.get("status_code"))
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _envolver(endpoint: Callable, status_code) -> Callable:
+    @functools.wraps(endpoint)
+    async def envuelto(*args, **kwargs):
+        resultado = await endpoint(*args, **kwargs)
+        if isinstance(resultado, Response):
+            return resultado
+        return RespuestaJSON(resultado, status_code=status_code or 200)
+    return envuelto
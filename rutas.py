@@ -0,0 +1,84 @@
+# rutas.py - Agrupación de entregas en rutas de varias paradas (vecino más cercano + 2-opt)
+import math
+from typing import Dict, List, Tuple
+
+from despacho import IndiceGrilla
+
+
+def _largo(puntos: List[Tuple[float, float]]) -> float:
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(puntos, puntos[1:]))
+
+
+def dos_opt(recorrido: List[Tuple[float, float]]) -> List[int]:
+    """Orden de las paradas de `recorrido` (origen, paradas..., origen) mejorado con 2-opt.
+
+    Invierte tramos mientras eso acorte el recorrido; los extremos (la
+    tienda) quedan fijos. Devuelve la permutación de las paradas.
+    """
+    orden = list(range(len(recorrido)))
+    mejora = True
+    while mejora:
+        mejora = False
+        for i in range(1, len(orden) - 2):
+            a, b = recorrido[orden[i - 1]], recorrido[orden[i]]
+            for j in range(i + 1, len(orden) - 1):
+                c, d = recorrido[orden[j]], recorrido[orden[j + 1]]
+                antes = math.hypot(b[0] - a[0], b[1] - a[1]) + math.hypot(d[0] - c[0], d[1] - c[1])
+                despues = math.hypot(c[0] - a[0], c[1] - a[1]) + math.hypot(d[0] - b[0], d[1] - b[1])
+                if despues < antes - 1e-9:
+                    orden[i:j + 1] = reversed(orden[i:j + 1])
+                    b = recorrido[orden[i]]
+                    mejora = True
+    return [i - 1 for i in orden[1:-1]]
+
+
+def planificar_rutas(origen: Tuple[float, float], paradas: List[Tuple[str, float, float]],
+                     capacidad: int = 6, mejorar: bool = True) -> List[Dict]:
+    """Reparte las paradas (clave, lat, lon) en rutas de hasta `capacidad` entregas.
+
+    Cada ruta sale de `origen` y va al vecino más cercano todavía sin
+    visitar hasta llenarse; la siguiente vuelve a empezar en el origen. El
+    vecino se busca en una grilla (despacho.IndiceGrilla) de la que se quitan
+    las paradas visitadas, así que armar las rutas cuesta ~O(n) y no O(n²).
+    Después cada ruta se mejora con 2-opt. Las distancias son en km sobre la
+    proyección de la grilla.
+
+    Cada ruta es {"paradas": [clave, ...], "km_acumulados": [...], "distancia_km"}
+    donde km_acumulados[i] es lo recorrido desde el origen hasta la parada i y
+    distancia_km incluye la vuelta al origen.
+    """
+    indice = IndiceGrilla(celda_km=0.5, centro=origen, radio_max_km=500)
+    ubicacion = {}
+    for clave, lat, lon in paradas:
+        indice.mover(clave, lat, lon)
+        ubicacion[clave] = (lat, lon)
+
+    rutas = []
+    while len(indice):
+        actual = origen
+        claves: List[str] = []
+        while len(claves) < capacidad and len(indice):
+            _, clave = indice.cercanos(actual[0], actual[1], 1)[0]
+            indice.quitar(clave)
+            claves.append(clave)
+            actual = ubicacion[clave]
+
+        recorrido = [indice.proyectar(*origen)] + [indice.proyectar(*ubicacion[c]) for c in claves]
+        recorrido.append(recorrido[0])
+        if mejorar and len(claves) > 2:
+            claves = [claves[i] for i in dos_opt(recorrido)]
+            recorrido = [recorrido[0]] + [indice.proyectar(*ubicacion[c]) for c in claves] + [recorrido[0]]
+
+        acumulados, total = [], 0.0
+        for anterior, punto in zip(recorrido, recorrido[1:-1]):
+            total += math.hypot(punto[0] - anterior[0], punto[1] - anterior[1])
+            acumulados.append(round(total, 3))
+        rutas.append({"paradas": claves, "km_acumulados": acumulados, "distancia_km": round(_largo(recorrido), 3)})
+    return rutas
+
+
+def distancia_individual(origen: Tuple[float, float], paradas: List[Tuple[str, float, float]]) -> float:
+    """Km si cada entrega sale sola de `origen` y vuelve (el despacho sin agrupar)"""
+    indice = IndiceGrilla(centro=origen)
+    x0, y0 = indice.proyectar(*origen)
+    return sum(2 * math.hypot(x - x0, y - y0) for x, y in (indice.proyectar(lat, lon) for _, lat, lon in paradas))
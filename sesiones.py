@@ -0,0 +1,112 @@
+# sesiones.py - Almacén de sesiones con expiración deslizante y tope LRU
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class Sesion:
+    """Registro compacto de una sesión: solo lo que necesitan los endpoints"""
+
+    __slots__ = ("user_id", "nombre", "es_admin", "expira")
+
+    def __init__(self, user_id: str, nombre: str, es_admin: bool, expira: float):
+        self.user_id = user_id
+        self.nombre = nombre
+        self.es_admin = es_admin
+        self.expira = expira
+
+    def como_usuario(self) -> Dict:
+        return {"id": self.user_id, "nombre": self.nombre, "es_admin": self.es_admin}
+
+
+class AlmacenSesiones:
+    """Sesiones en memoria con TTL deslizante, tamaño máximo y desalojo LRU.
+
+    Todas las sesiones comparten el mismo TTL y cada acceso mueve la sesión al
+    final del OrderedDict, así que el orden LRU coincide con el orden de
+    expiración: la sesión más próxima a vencer siempre está al principio. Por
+    eso validar, desalojar y barrer vencidas cuesta O(1) por sesión afectada.
+    """
+
+    def __init__(self, ttl: float = 1800, max_sesiones: int = 100_000,
+                 intervalo_barrido: float = 60, reloj=time.monotonic):
+        self.ttl = ttl
+        self.max_sesiones = max_sesiones
+        self.intervalo_barrido = intervalo_barrido
+        self._reloj = reloj
+        self._sesiones: "OrderedDict[str, Sesion]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.desalojadas = 0
+        self.expiradas = 0
+
+    def crear(self, user: Dict) -> str:
+        """Crea una sesión para el usuario y devuelve su token"""
+        token = str(uuid.uuid4())
+        sesion = Sesion(user["id"], user["nombre"], user["es_admin"], self._reloj() + self.ttl)
+        with self._lock:
+            self._sesiones[token] = sesion
+            while len(self._sesiones) > self.max_sesiones:
+                self._sesiones.popitem(last=False)
+                self.desalojadas += 1
+        return token
+
+    def obtener(self, token: str) -> Optional[Dict]:
+        """Valida el token en O(1) y renueva su expiración; None si no es válido"""
+        ahora = self._reloj()
+        with self._lock:
+            sesion = self._sesiones.get(token)
+            if sesion is None:
+                return None
+            if sesion.expira <= ahora:
+                del self._sesiones[token]
+                self.expiradas += 1
+                return None
+            sesion.expira = ahora + self.ttl
+            self._sesiones.move_to_end(token)
+        return sesion.como_usuario()
+
+    def eliminar(self, token: str) -> bool:
+        with self._lock:
+            return self._sesiones.pop(token, None) is not None
+
+    def barrer(self) -> int:
+        """Elimina las sesiones vencidas; recorre solo las que vencieron"""
+        ahora = self._reloj()
+        eliminadas = 0
+        with self._lock:
+            while self._sesiones:
+                token, sesion = next(iter(self._sesiones.items()))
+                if sesion.expira > ahora:
+                    break
+                del self._sesiones[token]
+                eliminadas += 1
+            self.expiradas += eliminadas
+        return eliminadas
+
+    # ----- BARRIDO EN SEGUNDO PLANO -----
+    def _ciclo_barrido(self):
+        while not self._detener.wait(self.intervalo_barrido):
+            self.barrer()
+
+    def iniciar_barrido(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo_barrido, name="barrido-sesiones", daemon=True)
+        self._hilo.start()
+
+    def detener_barrido(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def __len__(self) -> int:
+        return len(self._sesiones)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._sesiones
@@ -0,0 +1,395 @@
+# stock.py - Motor de reservas de stock con locks por franja (lock striping)
+import heapq
+import itertools
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class StockInsuficiente(Exception):
+    """No hay stock disponible para reservar un producto"""
+
+    def __init__(self, tienda_id: str, producto_id: str):
+        super().__init__(f"Stock insuficiente para {producto_id} en {tienda_id}")
+        self.tienda_id = tienda_id
+        self.producto_id = producto_id
+
+
+def agrupar_items(items: List[Tuple[str, int]]) -> Dict[str, int]:
+    """Suma las cantidades de un mismo producto"""
+    cantidades: Dict[str, int] = {}
+    for producto_id, cantidad in items:
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    return cantidades
+
+
+class Reserva:
+    __slots__ = ("tienda_id", "items", "expira")
+
+    def __init__(self, tienda_id: str, items: List[Tuple[str, int]], expira: Optional[float]):
+        self.tienda_id = tienda_id
+        self.items = items
+        self.expira = expira
+
+
+class BaseMotorStock:
+    """Interfaz común de los motores de stock (memoria, SQLite, ...).
+
+    Implementa el barrido periódico de reservas vencidas; las subclases
+    definen las lecturas y las operaciones de reserva.
+    """
+
+    def __init__(self, intervalo_barrido: float = 30):
+        self.intervalo_barrido = intervalo_barrido
+        self.al_liberar_vencida: Optional[Callable[[str], None]] = None
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    # ----- LECTURA -----
+    def existe_tienda(self, tienda_id: str) -> bool:
+        raise NotImplementedError
+
+    def inventario(self, tienda_id: str) -> Dict:
+        raise NotImplementedError
+
+    def producto(self, tienda_id: str, producto_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def disponible(self, tienda_id: str, producto_id: str, cantidad: int) -> bool:
+        entrada = self.producto(tienda_id, producto_id)
+        return entrada is not None and entrada["stock"] >= cantidad
+
+    def tiendas_con_stock(self, items: List[Tuple[str, int]]) -> List[str]:
+        """Tiendas que pueden surtir todos los items a la vez"""
+        raise NotImplementedError
+
+    def version(self, tienda_id: str) -> int:
+        """Contador que cambia con cada cambio de stock de la tienda (para cachear lecturas)"""
+        raise NotImplementedError
+
+    # ----- REPORTES -----
+    def unidades_por_producto(self) -> Dict[str, int]:
+        """Unidades de cada producto sumando todas las tiendas"""
+        raise NotImplementedError
+
+    def bajo_umbral(self, umbral: int) -> Dict[str, List[str]]:
+        """Por tienda, los productos con menos de `umbral` unidades"""
+        raise NotImplementedError
+
+    def valorizacion(self) -> Dict[str, float]:
+        """Por tienda, la suma de precio * stock"""
+        raise NotImplementedError
+
+    # ----- RESERVAS -----
+    def reservar(self, reserva_id: str, tienda_id: str, items: List[Tuple[str, int]],
+                 ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def confirmar(self, reserva_id: str) -> bool:
+        raise NotImplementedError
+
+    def fijar(self, reserva_id: str) -> bool:
+        raise NotImplementedError
+
+    def liberar(self, reserva_id: str, si_no_fijada: bool = False) -> bool:
+        raise NotImplementedError
+
+    def reservado(self, reserva_id: str) -> bool:
+        raise NotImplementedError
+
+    def liberar_vencidas(self) -> List[str]:
+        raise NotImplementedError
+
+    # ----- BARRIDO EN SEGUNDO PLANO -----
+    def _ciclo_barrido(self):
+        while not self._detener.wait(self.intervalo_barrido):
+            self.liberar_vencidas()
+
+    def iniciar_barrido(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo_barrido, name="barrido-reservas", daemon=True)
+        self._hilo.start()
+
+    def detener_barrido(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def cerrar(self):
+        """Libera recursos del motor al apagar la app (memoria compartida, archivos)"""
+
+
+class MotorStock(BaseMotorStock):
+    """Reserva, confirma y libera stock sobre el dict STOCK de forma atómica.
+
+    Cada (tienda, producto) se protege con uno de `franjas` locks elegido por
+    hash, así que compras de productos distintos no compiten entre sí. Reservar
+    descuenta el stock de inmediato (nunca queda negativo), confirmar solo
+    cierra la reserva y liberar devuelve las unidades. Las reservas sin
+    confirmar vencen a los `ttl_reserva` segundos; un heap por expiración hace
+    que liberar las vencidas cueste O(vencidas).
+
+    Un índice invertido producto -> {tienda: unidades} con las tiendas que
+    tienen stock > 0 se mantiene en cada cambio de stock, así que buscar
+    tiendas para un carrito recorre solo las tiendas del producto más escaso
+    en vez de todo el inventario. En el mismo punto se asigna a la tienda una
+    versión nueva, tomada de un contador global (itertools.count es atómico
+    con el GIL, así que dos franjas no pueden perder un incremento).
+    """
+
+    def __init__(self, stock: Dict, franjas: int = 64, ttl_reserva: float = 900,
+                 intervalo_barrido: float = 30, reloj=time.monotonic):
+        super().__init__(intervalo_barrido)
+        self.ttl_reserva = ttl_reserva
+        self._reloj = reloj
+        self._franjas = [threading.Lock() for _ in range(franjas)]
+        self._reservas: Dict[str, Reserva] = {}
+        self._vencimientos: List[Tuple[float, str]] = []
+        self._lock_reservas = threading.Lock()
+        self._tiendas_por_producto: Dict[str, Dict[str, int]] = {}
+        self._versiones: Dict[str, int] = {}
+        self._contador_versiones = itertools.count(1)
+        self._cargar(stock)
+        self.journal = None  # Journal opcional donde se registra cada cambio
+
+    # ----- LOCKS -----
+    def _indice_franja(self, tienda_id: str, producto_id: str) -> int:
+        return hash((tienda_id, producto_id)) % len(self._franjas)
+
+    def _bloquear(self, tienda_id: str, productos) -> List[threading.Lock]:
+        # Se toman en orden de índice para evitar deadlocks entre reservas
+        indices = sorted({self._indice_franja(tienda_id, p) for p in productos})
+        locks = [self._franjas[i] for i in indices]
+        for lock in locks:
+            lock.acquire()
+        return locks
+
+    @staticmethod
+    def _soltar(locks: List[threading.Lock]):
+        for lock in reversed(locks):
+            lock.release()
+
+    # ----- ACCESO A LAS UNIDADES -----
+    # Único punto que conoce la forma de STOCK (dict de dicts); otras
+    # representaciones (stock_columnar.py) redefinen estos métodos.
+    def _cargar(self, stock: Dict):
+        self.stock = stock
+        for tienda_id, productos in stock.items():
+            self._stock_cambiado(tienda_id, productos)
+
+    def _unidades(self, tienda_id: str, producto_id: str) -> int:
+        return self.stock[tienda_id][producto_id]["stock"]
+
+    def _sumar(self, tienda_id: str, producto_id: str, cantidad: int):
+        self.stock[tienda_id][producto_id]["stock"] += cantidad
+
+    def _fijar_unidades(self, tienda_id: str, producto_id: str, cantidad: int):
+        self.stock[tienda_id][producto_id]["stock"] = cantidad
+
+    def _recorrer_unidades(self) -> Iterator[Tuple[str, str, int]]:
+        for tienda_id, productos in list(self.stock.items()):
+            for producto_id, entrada in list(productos.items()):
+                yield tienda_id, producto_id, entrada["stock"]
+
+    # ----- ÍNDICE PRODUCTO -> TIENDAS Y VERSIONES -----
+    # Se actualiza con el lock de franja del (tienda, producto) tomado. El
+    # índice copia las unidades para que la consulta no tenga que saltar a la
+    # entrada de cada tienda (un dict compacto por producto cabe en caché).
+    # La versión se cambia después de escribir el stock.
+    def _stock_cambiado(self, tienda_id: str, productos):
+        for producto_id in productos:
+            tiendas = self._tiendas_por_producto.setdefault(producto_id, {})
+            unidades = self._unidades(tienda_id, producto_id)
+            if unidades > 0:
+                tiendas[tienda_id] = unidades
+            else:
+                tiendas.pop(tienda_id, None)
+        self._versiones[tienda_id] = next(self._contador_versiones)
+
+    def establecer(self, tienda_id: str, producto_id: str, cantidad: int):
+        """Fija el stock de un producto (recuperación del journal) sin pasar por reservas"""
+        locks = self._bloquear(tienda_id, [producto_id])
+        try:
+            self._fijar_unidades(tienda_id, producto_id, cantidad)
+            self._stock_cambiado(tienda_id, [producto_id])
+        finally:
+            self._soltar(locks)
+
+    # ----- JOURNAL -----
+    # Se registra el valor resultante (no el delta) para que reaplicar una
+    # entrada sea idempotente; se llama con el lock correspondiente tomado.
+    def _registrar_stock(self, tienda_id: str, items: List[Tuple[str, int]]):
+        if self.journal is not None:
+            for producto_id, _ in items:
+                self.journal.registrar("stock", f"{tienda_id}|{producto_id}", self._unidades(tienda_id, producto_id))
+
+    def _registrar_reserva(self, reserva_id: str, reserva: Optional[Reserva]):
+        if self.journal is not None:
+            valor = None if reserva is None else {
+                "tienda_id": reserva.tienda_id, "items": reserva.items, "fijada": reserva.expira is None
+            }
+            self.journal.registrar("reserva", reserva_id, valor)
+
+    def restaurar_reserva(self, reserva_id: str, tienda_id: str, items: List[Tuple[str, int]], fijada: bool):
+        """Vuelve a registrar una reserva recuperada sin tocar el stock"""
+        expira = None if fijada or not self.ttl_reserva else self._reloj() + self.ttl_reserva
+        with self._lock_reservas:
+            self._reservas[reserva_id] = Reserva(tienda_id, [tuple(item) for item in items], expira)
+            if expira is not None:
+                heapq.heappush(self._vencimientos, (expira, reserva_id))
+
+    def exportar(self) -> Iterator[Tuple[str, str, str]]:
+        """(tipo, clave, valor en JSON) del stock y las reservas abiertas"""
+        for tienda_id, producto_id, unidades in self._recorrer_unidades():
+            yield "stock", f"{tienda_id}|{producto_id}", json.dumps(unidades)
+        with self._lock_reservas:
+            reservas = list(self._reservas.items())
+        for reserva_id, reserva in reservas:
+            valor = {"tienda_id": reserva.tienda_id, "items": reserva.items, "fijada": reserva.expira is None}
+            yield "reserva", reserva_id, json.dumps(valor, ensure_ascii=False)
+
+    # ----- LECTURA -----
+    def existe_tienda(self, tienda_id: str) -> bool:
+        return tienda_id in self.stock
+
+    def inventario(self, tienda_id: str) -> Dict:
+        return self.stock[tienda_id]
+
+    def producto(self, tienda_id: str, producto_id: str) -> Optional[Dict]:
+        return self.stock.get(tienda_id, {}).get(producto_id)
+
+    def version(self, tienda_id: str) -> int:
+        return self._versiones.get(tienda_id, 0)
+
+    # ----- REPORTES -----
+    def unidades_por_producto(self) -> Dict[str, int]:
+        totales: Dict[str, int] = {}
+        for productos in list(self.stock.values()):
+            for producto_id, entrada in list(productos.items()):
+                totales[producto_id] = totales.get(producto_id, 0) + entrada["stock"]
+        return totales
+
+    def bajo_umbral(self, umbral: int) -> Dict[str, List[str]]:
+        resultado = {}
+        for tienda_id, productos in list(self.stock.items()):
+            bajos = [producto_id for producto_id, entrada in list(productos.items()) if entrada["stock"] < umbral]
+            if bajos:
+                resultado[tienda_id] = bajos
+        return resultado
+
+    def valorizacion(self) -> Dict[str, float]:
+        return {
+            tienda_id: sum(entrada["precio"] * entrada["stock"] for entrada in list(productos.values()))
+            for tienda_id, productos in list(self.stock.items())
+        }
+
+    def tiendas_con_stock(self, items: List[Tuple[str, int]]) -> List[str]:
+        cantidades = agrupar_items(items)
+        if not cantidades:
+            return []
+        # Se parte del producto presente en menos tiendas y se filtra con los demás
+        indices = sorted(
+            ((self._tiendas_por_producto.get(p, {}), cantidad) for p, cantidad in cantidades.items()),
+            key=lambda par: len(par[0])
+        )
+        tiendas, cantidad = indices[0]
+        candidatas = [t for t, unidades in list(tiendas.items()) if unidades >= cantidad]
+        for tiendas, cantidad in indices[1:]:
+            candidatas = [t for t in candidatas if tiendas.get(t, 0) >= cantidad]
+        return candidatas
+
+    # ----- RESERVAS -----
+    def reservar(self, reserva_id: str, tienda_id: str, items: List[Tuple[str, int]],
+                 ttl: Optional[float] = None) -> None:
+        """Descuenta todos los items o ninguno; lanza StockInsuficiente si falta alguno"""
+        locks = self._bloquear(tienda_id, [producto_id for producto_id, _ in items])
+        try:
+            # Un producto repetido en los items se valida por su cantidad total
+            for producto_id, cantidad in agrupar_items(items).items():
+                if self._unidades(tienda_id, producto_id) < cantidad:
+                    raise StockInsuficiente(tienda_id, producto_id)
+            for producto_id, cantidad in items:
+                self._sumar(tienda_id, producto_id, -cantidad)
+            self._stock_cambiado(tienda_id, [producto_id for producto_id, _ in items])
+            self._registrar_stock(tienda_id, items)
+        finally:
+            self._soltar(locks)
+
+        ttl = self.ttl_reserva if ttl is None else ttl
+        expira = self._reloj() + ttl if ttl else None
+        reserva = Reserva(tienda_id, list(items), expira)
+        with self._lock_reservas:
+            self._reservas[reserva_id] = reserva
+            if expira is not None:
+                heapq.heappush(self._vencimientos, (expira, reserva_id))
+            self._registrar_reserva(reserva_id, reserva)
+
+    def confirmar(self, reserva_id: str) -> bool:
+        """Cierra la reserva (la venta se concretó). False si no existe"""
+        with self._lock_reservas:
+            if self._reservas.pop(reserva_id, None) is None:
+                return False
+            self._registrar_reserva(reserva_id, None)
+            return True
+
+    def fijar(self, reserva_id: str) -> bool:
+        """Quita el vencimiento de una reserva (p.ej. al pagar). False si ya no existe"""
+        with self._lock_reservas:
+            reserva = self._reservas.get(reserva_id)
+            if reserva is None:
+                return False
+            reserva.expira = None
+            self._registrar_reserva(reserva_id, reserva)
+            return True
+
+    def liberar(self, reserva_id: str, si_no_fijada: bool = False) -> bool:
+        """Devuelve al stock las unidades de una reserva no confirmada.
+
+        Con `si_no_fijada` solo libera reservas que todavía pueden vencer, para
+        no devolver el stock de una orden que se pagó mientras tanto.
+        """
+        with self._lock_reservas:
+            reserva = self._reservas.get(reserva_id)
+            if reserva is None or (si_no_fijada and reserva.expira is None):
+                return False
+            del self._reservas[reserva_id]
+            self._registrar_reserva(reserva_id, None)
+        self._devolver(reserva)
+        return True
+
+    def _devolver(self, reserva: Reserva):
+        locks = self._bloquear(reserva.tienda_id, [producto_id for producto_id, _ in reserva.items])
+        try:
+            for producto_id, cantidad in reserva.items:
+                self._sumar(reserva.tienda_id, producto_id, cantidad)
+            self._stock_cambiado(reserva.tienda_id, [producto_id for producto_id, _ in reserva.items])
+            self._registrar_stock(reserva.tienda_id, reserva.items)
+        finally:
+            self._soltar(locks)
+
+    def reservado(self, reserva_id: str) -> bool:
+        return reserva_id in self._reservas
+
+    def liberar_vencidas(self) -> List[str]:
+        """Libera las reservas vencidas; recorre solo las entradas vencidas del heap"""
+        ahora = self._reloj()
+        vencidas = []
+        with self._lock_reservas:
+            while self._vencimientos and self._vencimientos[0][0] <= ahora:
+                expira, reserva_id = heapq.heappop(self._vencimientos)
+                reserva = self._reservas.get(reserva_id)
+                # Entradas obsoletas: la reserva ya se cerró o se fijó
+                if reserva is None or reserva.expira != expira:
+                    continue
+                del self._reservas[reserva_id]
+                self._registrar_reserva(reserva_id, None)
+                vencidas.append((reserva_id, reserva))
+        for reserva_id, reserva in vencidas:
+            self._devolver(reserva)
+            if self.al_liberar_vencida is not None:
+                self.al_liberar_vencida(reserva_id)
+        return [reserva_id for reserva_id, _ in vencidas]
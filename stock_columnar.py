@@ -0,0 +1,165 @@
+# stock_columnar.py - Stock en columnas contiguas (array) indexadas por (tienda, producto)
+import bisect
+import itertools
+import operator
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from stock import MotorStock, agrupar_items
+
+
+class MotorStockColumnar(MotorStock):
+    """MotorStock con el stock en arreglos contiguos en lugar de dicts anidados.
+
+    Tiendas y productos se traducen a índices enteros. Las entradas
+    (tienda, producto) se ordenan por tienda y, dentro de cada tienda, por
+    producto (formato CSR): la fila de la tienda t va de `_inicio_tienda[t]`
+    a `_inicio_tienda[t + 1]`, `_producto_de` dice a qué producto
+    corresponde cada entrada y `_unidades_col` / `_precios` son las columnas
+    de datos. Ubicar una entrada es un bisect dentro de la fila. Una
+    permutación ordenada por producto (`_por_producto`, con
+    `_inicio_producto`) sirve las consultas por producto sin recorrer todas
+    las tiendas.
+
+    Las entradas quedan fijas al cargar (una tienda no agrega productos en
+    caliente); las unidades cambian en su lugar con los locks por franja de
+    MotorStock. Los reportes recorren las columnas con sum/map/compress, que
+    iteran en C, en vez de visitar un dict por entrada.
+    """
+
+    # ----- CARGA -----
+    def _cargar(self, stock: Dict):
+        self._tiendas: List[str] = list(stock)
+        self._indice_tienda = {tienda_id: t for t, tienda_id in enumerate(self._tiendas)}
+        self._productos: List[str] = sorted({p for productos in stock.values() for p in productos})
+        self._indice_producto = {producto_id: p for p, producto_id in enumerate(self._productos)}
+        self._nombres: List[Optional[str]] = [None] * len(self._productos)
+
+        self._inicio_tienda = array("I", [0])
+        self._tienda_de = array("I")
+        self._producto_de = array("I")
+        self._unidades_col = array("q")
+        self._precios = array("d")
+        for t, tienda_id in enumerate(self._tiendas):
+            for p, entrada in sorted((self._indice_producto[p], e) for p, e in stock[tienda_id].items()):
+                self._tienda_de.append(t)
+                self._producto_de.append(p)
+                self._unidades_col.append(entrada["stock"])
+                self._precios.append(entrada["precio"])
+                if self._nombres[p] is None:
+                    self._nombres[p] = entrada["nombre"]
+            self._inicio_tienda.append(len(self._producto_de))
+            self._versiones[tienda_id] = next(self._contador_versiones)
+
+        # Orden estable por producto: dentro de cada producto las tiendas quedan en orden
+        self._por_producto = array("I", sorted(range(len(self._producto_de)), key=self._producto_de.__getitem__))
+        self._inicio_producto = array("I", [0] * (len(self._productos) + 1))
+        for p in self._producto_de:
+            self._inicio_producto[p + 1] += 1
+        for p in range(len(self._productos)):
+            self._inicio_producto[p + 1] += self._inicio_producto[p]
+
+    def _posicion(self, tienda_id: str, producto_id: str) -> int:
+        """Posición de la entrada en las columnas; KeyError si la tienda no tiene el producto"""
+        t = self._indice_tienda[tienda_id]
+        p = self._indice_producto[producto_id]
+        inicio, fin = self._inicio_tienda[t], self._inicio_tienda[t + 1]
+        i = bisect.bisect_left(self._producto_de, p, inicio, fin)
+        if i == fin or self._producto_de[i] != p:
+            raise KeyError(producto_id)
+        return i
+
+    # ----- ACCESO A LAS UNIDADES -----
+    def _unidades(self, tienda_id: str, producto_id: str) -> int:
+        return self._unidades_col[self._posicion(tienda_id, producto_id)]
+
+    def _sumar(self, tienda_id: str, producto_id: str, cantidad: int):
+        self._unidades_col[self._posicion(tienda_id, producto_id)] += cantidad
+
+    def _fijar_unidades(self, tienda_id: str, producto_id: str, cantidad: int):
+        self._unidades_col[self._posicion(tienda_id, producto_id)] = cantidad
+
+    def _recorrer_unidades(self) -> Iterator[Tuple[str, str, int]]:
+        for i, unidades in enumerate(self._unidades_col):
+            yield self._tiendas[self._tienda_de[i]], self._productos[self._producto_de[i]], unidades
+
+    def _stock_cambiado(self, tienda_id: str, productos):
+        # Sin índice producto -> tiendas: las consultas por producto usan _por_producto
+        self._versiones[tienda_id] = next(self._contador_versiones)
+
+    # ----- LECTURA -----
+    def _entrada(self, i: int) -> Dict:
+        return {"nombre": self._nombres[self._producto_de[i]], "precio": self._precios[i],
+                "stock": self._unidades_col[i]}
+
+    def existe_tienda(self, tienda_id: str) -> bool:
+        return tienda_id in self._indice_tienda
+
+    def inventario(self, tienda_id: str) -> Dict:
+        t = self._indice_tienda[tienda_id]
+        return {self._productos[self._producto_de[i]]: self._entrada(i)
+                for i in range(self._inicio_tienda[t], self._inicio_tienda[t + 1])}
+
+    def producto(self, tienda_id: str, producto_id: str) -> Optional[Dict]:
+        try:
+            return self._entrada(self._posicion(tienda_id, producto_id))
+        except KeyError:
+            return None
+
+    def tiendas_con_stock(self, items: List[Tuple[str, int]]) -> List[str]:
+        cantidades = agrupar_items(items)
+        if not cantidades or any(p not in self._indice_producto for p in cantidades):
+            return []
+        # Se parte del producto presente en menos tiendas; cada uno de los
+        # demás filtra las candidatas recorriendo sus entradas (si son pocas)
+        # o con un bisect en la fila de cada candidata
+        inicio_producto = self._inicio_producto
+        pedidos = sorted(
+            ((self._indice_producto[p], cantidad) for p, cantidad in cantidades.items()),
+            key=lambda pedido: inicio_producto[pedido[0] + 1] - inicio_producto[pedido[0]]
+        )
+        unidades, producto_de, fila = self._unidades_col, self._producto_de, self._inicio_tienda
+        p, cantidad = pedidos[0]
+        candidatas = [self._tienda_de[i] for i in self._por_producto[inicio_producto[p]:inicio_producto[p + 1]]
+                      if unidades[i] >= cantidad]
+        for p, cantidad in pedidos[1:]:
+            inicio, fin = inicio_producto[p], inicio_producto[p + 1]
+            if fin - inicio <= 4 * len(candidatas):
+                con_stock = {self._tienda_de[i] for i in self._por_producto[inicio:fin] if unidades[i] >= cantidad}
+                candidatas = [t for t in candidatas if t in con_stock]
+                continue
+            quedan = []
+            for t in candidatas:
+                i = bisect.bisect_left(producto_de, p, fila[t], fila[t + 1])
+                if i < fila[t + 1] and producto_de[i] == p and unidades[i] >= cantidad:
+                    quedan.append(t)
+            candidatas = quedan
+        return [self._tiendas[t] for t in candidatas]
+
+    # ----- REPORTES -----
+    def unidades_por_producto(self) -> Dict[str, int]:
+        unidades, orden, inicio = self._unidades_col, self._por_producto, self._inicio_producto
+        return {
+            producto_id: sum(map(unidades.__getitem__, orden[inicio[p]:inicio[p + 1]]))
+            for p, producto_id in enumerate(self._productos)
+        }
+
+    def bajo_umbral(self, umbral: int) -> Dict[str, List[str]]:
+        resultado: Dict[str, List[str]] = {}
+        fila, nombre_producto = self._inicio_tienda, self._productos.__getitem__
+        # Por fila: umbral > unidades y la traducción a producto_id se evalúan en C
+        for t, tienda_id in enumerate(self._tiendas):
+            inicio, fin = fila[t], fila[t + 1]
+            bajos = list(map(nombre_producto, itertools.compress(
+                self._producto_de[inicio:fin], map(umbral.__gt__, self._unidades_col[inicio:fin])
+            )))
+            if bajos:
+                resultado[tienda_id] = bajos
+        return resultado
+
+    def valorizacion(self) -> Dict[str, float]:
+        fila = self._inicio_tienda
+        return {
+            tienda_id: sum(map(operator.mul, self._precios[fila[t]:fila[t + 1]], self._unidades_col[fila[t]:fila[t + 1]]))
+            for t, tienda_id in enumerate(self._tiendas)
+        }
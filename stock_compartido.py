@@ -0,0 +1,211 @@
+# stock_compartido.py - Contadores de stock en memoria compartida para varios workers de uvicorn
+import fcntl
+import os
+import struct
+import tempfile
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from stock import MotorStock, agrupar_items
+
+# Cabecera del segmento: inicializado, cantidad de entradas, cantidad de tiendas
+CABECERA = struct.Struct("qqq")
+
+
+class LockCompartido:
+    """Lock de un byte de un archivo (fcntl) más un lock de hilo.
+
+    Los locks de fcntl son del proceso (dos hilos del mismo proceso no se
+    excluyen), así que primero se toma el lock de hilo y después el byte del
+    archivo, que excluye a los demás procesos.
+    """
+
+    __slots__ = ("_fd", "_byte", "_hilos")
+
+    def __init__(self, fd: int, byte: int):
+        self._fd = fd
+        self._byte = byte
+        self._hilos = threading.Lock()
+
+    def acquire(self):
+        self._hilos.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._byte)
+        except BaseException:
+            # Sin el byte del archivo, el lock de hilo no puede quedar tomado
+            self._hilos.release()
+            raise
+
+    def release(self):
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._byte)
+        finally:
+            self._hilos.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+
+class MotorStockCompartido(MotorStock):
+    """MotorStock con las unidades en un segmento de multiprocessing.shared_memory.
+
+    Cada worker arma el mismo mapa (tienda, producto) -> posición ordenando
+    el stock inicial, así que el mapa no se comparte: solo los contadores
+    int64. El primer proceso crea el segmento y lo siembra con el stock
+    inicial; los demás se conectan. Los locks por franja son bytes de un
+    archivo de locks, y la franja sale de la posición (no de hash(), que
+    cambia entre procesos), así que reservar en dos workers a la vez sigue
+    siendo todo o nada. La versión de cada tienda también vive en el segmento
+    para que la caché de lecturas de un worker vea los cambios de los otros.
+
+    Las reservas abiertas siguen siendo del worker que las creó, igual que
+    las órdenes y carritos del backend en memoria. El segmento sobrevive a los
+    workers (es el inventario del despliegue) hasta `eliminar_segmento`.
+    """
+
+    def __init__(self, stock: Dict, nombre: str = "mifarma_stock", ruta_locks: Optional[str] = None, **kwargs):
+        self.nombre = nombre
+        self.ruta_locks = ruta_locks or os.path.join(tempfile.gettempdir(), f"{nombre}.lock")
+        super().__init__(stock, **kwargs)
+
+    # ----- CARGA -----
+    def _cargar(self, stock: Dict):
+        self.stock = stock
+        self._tiendas = sorted(stock)
+        self._posicion: Dict[Tuple[str, str], int] = {}
+        for tienda_id in self._tiendas:
+            for producto_id in sorted(stock[tienda_id]):
+                self._posicion[tienda_id, producto_id] = len(self._posicion)
+        self._indice_tienda = {tienda_id: t for t, tienda_id in enumerate(self._tiendas)}
+        self._tiendas_de_producto: Dict[str, List[Tuple[str, int]]] = {}
+        for (tienda_id, producto_id), i in self._posicion.items():
+            self._tiendas_de_producto.setdefault(producto_id, []).append((tienda_id, i))
+
+        self._fd_locks = os.open(self.ruta_locks, os.O_RDWR | os.O_CREAT, 0o600)
+        franjas = len(self._franjas)
+        self._franjas = [LockCompartido(self._fd_locks, i) for i in range(franjas)]
+        self._locks_tienda = [LockCompartido(self._fd_locks, franjas + t) for t in range(len(self._tiendas))]
+        with LockCompartido(self._fd_locks, franjas + len(self._tiendas)):
+            self._conectar(stock)
+
+    def _conectar(self, stock: Dict):
+        """Crea y siembra el segmento, o se conecta al que creó otro worker (con el lock de carga tomado)"""
+        entradas, tiendas = len(self._posicion), len(self._tiendas)
+        tamano = CABECERA.size + 8 * (entradas + tiendas)
+        try:
+            self._segmento = shared_memory.SharedMemory(self.nombre, create=True, size=tamano)
+        except FileExistsError:
+            self._segmento = shared_memory.SharedMemory(self.nombre)
+        # El resource_tracker borraría el segmento al salir este proceso,
+        # aunque otros workers lo sigan usando
+        resource_tracker.unregister(self._segmento._name, "shared_memory")
+
+        inicializado, guardadas, guardadas_tiendas = CABECERA.unpack_from(self._segmento.buf)
+        if inicializado and (guardadas, guardadas_tiendas) != (entradas, tiendas):
+            raise RuntimeError(f"El segmento {self.nombre} tiene otro inventario; elimínelo con eliminar_segmento")
+        self._datos = self._segmento.buf[CABECERA.size:CABECERA.size + 8 * (entradas + tiendas)]
+        self._unidades_shm = self._datos[:8 * entradas].cast("q")
+        self._versiones_shm = self._datos[8 * entradas:].cast("q")
+        if not inicializado:
+            for (tienda_id, producto_id), i in self._posicion.items():
+                self._unidades_shm[i] = stock[tienda_id][producto_id]["stock"]
+            for t in range(tiendas):
+                self._versiones_shm[t] = 1
+            CABECERA.pack_into(self._segmento.buf, 0, 1, entradas, tiendas)
+
+    @staticmethod
+    def eliminar_segmento(nombre: str = "mifarma_stock"):
+        """Borra el segmento (el próximo arranque vuelve a sembrarlo con el stock inicial)"""
+        try:
+            segmento = shared_memory.SharedMemory(nombre)
+        except FileNotFoundError:
+            return
+        segmento.close()
+        segmento.unlink()
+
+    def cerrar(self):
+        """Suelta el segmento en este proceso (sin borrarlo)"""
+        self._unidades_shm.release()
+        self._versiones_shm.release()
+        self._datos.release()
+        self._segmento.close()
+        os.close(self._fd_locks)
+
+    # ----- LOCKS -----
+    def _indice_franja(self, tienda_id: str, producto_id: str) -> int:
+        return self._posicion[tienda_id, producto_id] % len(self._franjas)
+
+    # ----- ACCESO A LAS UNIDADES -----
+    def _unidades(self, tienda_id: str, producto_id: str) -> int:
+        return self._unidades_shm[self._posicion[tienda_id, producto_id]]
+
+    def _sumar(self, tienda_id: str, producto_id: str, cantidad: int):
+        self._unidades_shm[self._posicion[tienda_id, producto_id]] += cantidad
+
+    def _fijar_unidades(self, tienda_id: str, producto_id: str, cantidad: int):
+        self._unidades_shm[self._posicion[tienda_id, producto_id]] = cantidad
+
+    def _recorrer_unidades(self) -> Iterator[Tuple[str, str, int]]:
+        for (tienda_id, producto_id), i in self._posicion.items():
+            yield tienda_id, producto_id, self._unidades_shm[i]
+
+    def _stock_cambiado(self, tienda_id: str, productos):
+        # Sin índice local (quedaría viejo con los cambios de otros workers):
+        # tiendas_con_stock lee los contadores compartidos
+        t = self._indice_tienda[tienda_id]
+        with self._locks_tienda[t]:
+            self._versiones_shm[t] += 1
+
+    def version(self, tienda_id: str) -> int:
+        t = self._indice_tienda.get(tienda_id)
+        return 0 if t is None else self._versiones_shm[t]
+
+    # ----- LECTURA -----
+    def _entrada(self, tienda_id: str, producto_id: str) -> Dict:
+        entrada = self.stock[tienda_id][producto_id]
+        return {**entrada, "stock": self._unidades(tienda_id, producto_id)}
+
+    def inventario(self, tienda_id: str) -> Dict:
+        return {producto_id: self._entrada(tienda_id, producto_id) for producto_id in self.stock[tienda_id]}
+
+    def producto(self, tienda_id: str, producto_id: str) -> Optional[Dict]:
+        if (tienda_id, producto_id) not in self._posicion:
+            return None
+        return self._entrada(tienda_id, producto_id)
+
+    def tiendas_con_stock(self, items: List[Tuple[str, int]]) -> List[str]:
+        cantidades = agrupar_items(items)
+        if not cantidades:
+            return []
+        pedidos = sorted(cantidades.items(), key=lambda par: len(self._tiendas_de_producto.get(par[0], ())))
+        producto_id, cantidad = pedidos[0]
+        candidatas = [t for t, i in self._tiendas_de_producto.get(producto_id, ()) if self._unidades_shm[i] >= cantidad]
+        for producto_id, cantidad in pedidos[1:]:
+            candidatas = [t for t in candidatas
+                          if (t, producto_id) in self._posicion and self._unidades(t, producto_id) >= cantidad]
+        return candidatas
+
+    # ----- REPORTES -----
+    def unidades_por_producto(self) -> Dict[str, int]:
+        totales: Dict[str, int] = {}
+        for _, producto_id, unidades in self._recorrer_unidades():
+            totales[producto_id] = totales.get(producto_id, 0) + unidades
+        return totales
+
+    def bajo_umbral(self, umbral: int) -> Dict[str, List[str]]:
+        resultado: Dict[str, List[str]] = {}
+        for tienda_id, producto_id, unidades in self._recorrer_unidades():
+            if unidades < umbral:
+                resultado.setdefault(tienda_id, []).append(producto_id)
+        return resultado
+
+    def valorizacion(self) -> Dict[str, float]:
+        totales = {tienda_id: 0.0 for tienda_id in self._tiendas}
+        for tienda_id, producto_id, unidades in self._recorrer_unidades():
+            totales[tienda_id] += self.stock[tienda_id][producto_id]["precio"] * unidades
+        return totales
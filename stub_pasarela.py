@@ -0,0 +1,104 @@
+# stub_pasarela.py - Pasarela de pagos local para pruebas y benchmarks sin red
+# Uso: uvicorn stub_pasarela:app --port 9000
+# La latencia y las tasas de error/rechazo se leen de STUB_PASARELA_LATENCIA_MS,
+# STUB_PASARELA_TASA_ERROR y STUB_PASARELA_TASA_RECHAZO, y se pueden cambiar en
+# caliente con POST /v1/configuracion.
+import asyncio
+import os
+import random
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="Pasarela de pagos (stub)")
+
+CONFIGURACION = {
+    "latencia_ms": float(os.environ.get("STUB_PASARELA_LATENCIA_MS", 20)),
+    "tasa_error": float(os.environ.get("STUB_PASARELA_TASA_ERROR", 0)),
+    "tasa_rechazo": float(os.environ.get("STUB_PASARELA_TASA_RECHAZO", 0)),
+}
+
+# Autorizaciones (y lotes) ya emitidos por clave de idempotencia: un reintento recibe la misma respuesta
+AUTORIZACIONES: Dict[str, Dict] = {}
+LOTES: Dict[str, Dict] = {}
+ESTADISTICAS = {"solicitudes": 0, "errores": 0, "rechazos": 0, "repetidas": 0}
+
+
+class Autorizacion(BaseModel):
+    orden_id: str
+    monto: float
+    metodo: str
+    detalles: Optional[Dict] = None
+    clave: Optional[str] = None  # clave de idempotencia del pago dentro de un lote
+
+
+class Lote(BaseModel):
+    pagos: List[Autorizacion]
+
+
+class Anulacion(BaseModel):
+    transaccion_id: str
+
+
+async def simular():
+    """Aplica la latencia configurada y, con la tasa configurada, falla con 503"""
+    ESTADISTICAS["solicitudes"] += 1
+    if CONFIGURACION["latencia_ms"]:
+        await asyncio.sleep(CONFIGURACION["latencia_ms"] / 1000)
+    if random.random() < CONFIGURACION["tasa_error"]:
+        ESTADISTICAS["errores"] += 1
+        raise HTTPException(status_code=503, detail="Pasarela saturada")
+
+
+def emitir(pago: Autorizacion, clave: str) -> Dict:
+    if clave in AUTORIZACIONES:
+        ESTADISTICAS["repetidas"] += 1
+        return AUTORIZACIONES[clave]
+    if pago.monto <= 0 or random.random() < CONFIGURACION["tasa_rechazo"]:
+        ESTADISTICAS["rechazos"] += 1
+        resultado = {"error": "Fondos insuficientes"}
+    else:
+        resultado = {"transaccion_id": str(uuid.uuid4()), "referencia": f"REF-{uuid.uuid4().hex[:8]}"}
+    AUTORIZACIONES[clave] = resultado
+    return resultado
+
+
+@app.post("/v1/autorizaciones")
+async def autorizar(pago: Autorizacion, idempotency_key: Optional[str] = Header(None)):
+    await simular()
+    resultado = emitir(pago, idempotency_key or pago.orden_id)
+    if "error" in resultado:
+        return JSONResponse(status_code=402, content={"detail": resultado["error"]})
+    return resultado
+
+
+@app.post("/v1/autorizaciones/lote")
+async def autorizar_lote(lote: Lote, idempotency_key: Optional[str] = Header(None)):
+    await simular()
+    if idempotency_key in LOTES:
+        ESTADISTICAS["repetidas"] += 1
+        return LOTES[idempotency_key]
+    respuesta = {"resultados": [emitir(pago, pago.clave or pago.orden_id) for pago in lote.pagos]}
+    if idempotency_key:
+        LOTES[idempotency_key] = respuesta
+    return respuesta
+
+
+@app.post("/v1/anulaciones")
+async def anular(anulacion: Anulacion):
+    await simular()
+    return {"transaccion_id": anulacion.transaccion_id, "estado": "anulada"}
+
+
+@app.post("/v1/configuracion")
+async def configurar(cambios: Dict):
+    CONFIGURACION.update({clave: float(valor) for clave, valor in cambios.items() if clave in CONFIGURACION})
+    return CONFIGURACION
+
+
+@app.get("/v1/estadisticas")
+async def estadisticas():
+    return ESTADISTICAS
@@ -0,0 +1,146 @@
+# test_almacen_sqlite.py - Pruebas del backend SQLite contra las mismas comprobaciones del backend en memoria
+import os
+import tempfile
+
+import pytest
+
+from almacen import crear_almacen_memoria, crear_almacen_sqlite
+from estados import TransicionInvalida
+from stock import StockInsuficiente
+
+
+def crear_stock():
+    return {"tienda_1": {"producto_1": {"nombre": "P1", "precio": 2.0, "stock": 5},
+                         "producto_2": {"nombre": "P2", "precio": 3.0, "stock": 1}},
+            "tienda_2": {"producto_1": {"nombre": "P1", "precio": 2.0, "stock": 8}}}
+
+
+def crear_orden(i: int, user_id: str = "user1") -> dict:
+    return {"orden_id": f"orden_{i:03d}", "user_id": user_id, "tienda_id": "tienda_1",
+            "estado": "pendiente", "isDelivery": i % 2 == 0, "items": [], "total": 10.0}
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request):
+    if request.param == "memoria":
+        almacen = crear_almacen_memoria(crear_stock())
+        yield almacen
+        almacen.cerrar()
+        return
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = crear_almacen_sqlite(os.path.join(directorio, "mifarma.db"), crear_stock())
+        yield almacen
+        almacen.cerrar()
+
+
+def unidades(almacen, tienda_id: str = "tienda_1") -> dict:
+    return {producto_id: entrada["stock"] for producto_id, entrada in almacen.stock.inventario(tienda_id).items()}
+
+
+def recorrer(repositorio, estado: str, modo=None, limite: int = 2) -> list:
+    vistas, cursor = [], None
+    while True:
+        pagina, cursor = repositorio.pagina(estado, modo, despues=cursor, limite=limite)
+        vistas += [orden["orden_id"] for orden in pagina]
+        if cursor is None:
+            return vistas
+
+
+# ----- STOCK -----
+def test_reserva_que_falla_a_mitad_revierte(almacen):
+    antes, version = unidades(almacen), almacen.stock.version("tienda_1")
+
+    # producto_1 alcanza y ya se descontó cuando falla producto_2
+    with pytest.raises(StockInsuficiente):
+        almacen.stock.reservar("res_1", "tienda_1", [("producto_1", 3), ("producto_2", 2)])
+    # Repetido: cada línea alcanza sola pero no la suma
+    with pytest.raises(StockInsuficiente):
+        almacen.stock.reservar("res_2", "tienda_1", [("producto_1", 3), ("producto_1", 3)])
+
+    assert unidades(almacen) == antes
+    assert not any(almacen.stock.reservado(f"res_{i}") for i in (1, 2))
+    assert almacen.stock.version("tienda_1") == version
+    assert almacen.stock.liberar("res_1") is False
+
+
+def test_version_de_stock_cambia_con_el_stock(almacen):
+    inicial = almacen.stock.version("tienda_1")
+    otra = almacen.stock.version("tienda_2")
+
+    almacen.stock.reservar("res_1", "tienda_1", [("producto_1", 2)])
+    reservada = almacen.stock.version("tienda_1")
+    assert reservada != inicial
+    assert unidades(almacen)["producto_1"] == 3
+
+    # Confirmar no mueve unidades; liberar las devuelve y cambia la versión
+    almacen.stock.reservar("res_2", "tienda_1", [("producto_1", 1)])
+    confirmada = almacen.stock.version("tienda_1")
+    assert almacen.stock.confirmar("res_2")
+    assert almacen.stock.version("tienda_1") == confirmada
+    assert almacen.stock.liberar("res_1")
+    assert almacen.stock.version("tienda_1") not in (inicial, reservada, confirmada)
+    assert unidades(almacen)["producto_1"] == 4
+
+    assert almacen.stock.version("tienda_2") == otra  # cada tienda lleva su versión
+
+
+# ----- ÓRDENES -----
+def test_transiciones_y_colas_igual_que_memoria():
+    with tempfile.TemporaryDirectory() as directorio:
+        memoria = crear_almacen_memoria(crear_stock())
+        sqlite = crear_almacen_sqlite(os.path.join(directorio, "mifarma.db"), crear_stock())
+        for almacen in (memoria, sqlite):
+            repositorio = almacen.ordenes
+            for i in range(8):
+                repositorio.agregar(crear_orden(i, user_id=f"user{i % 3}"))
+            for i in (5, 2, 7, 0, 4):
+                repositorio.transicion(f"orden_{i:03d}", "pagada")
+            repositorio.transicion("orden_001", "cancelada")
+            repositorio.transicion("orden_002", "en_delivery")
+            repositorio.transicion("orden_005", "vendida")
+            repositorio.eliminar("orden_007")
+            with pytest.raises(TransicionInvalida):
+                repositorio.transicion("orden_001", "pagada")
+            with pytest.raises(KeyError):
+                repositorio.agregar(crear_orden(0))
+
+        vistas = []
+        for almacen in (memoria, sqlite):
+            repositorio = almacen.ordenes
+            vistas.append({
+                "colas": {(estado, modo): (recorrer(repositorio, estado, modo), repositorio.contar_cola(estado, modo))
+                          for estado in ("pendiente", "pagada", "en_delivery", "vendida", "cancelada")
+                          for modo in (None, "delivery", "recojo")},
+                "usuarios": {user_id: [orden["orden_id"] for orden in repositorio.por_usuario(user_id)]
+                             for user_id in ("user0", "user1", "user2")},
+                "estados": {estado: repositorio.contar("estado", estado)
+                            for estado in ("pendiente", "pagada", "en_delivery", "vendida", "cancelada")},
+                "total": len(repositorio)
+            })
+        assert vistas[0] == vistas[1]
+        assert vistas[1]["colas"][("pagada", None)] == (["orden_000", "orden_004"], 2)
+        assert vistas[1]["colas"][("pendiente", "recojo")] == (["orden_003"], 1)
+        memoria.cerrar()
+        sqlite.cerrar()
+
+
+def test_colas_sobreviven_al_reabrir():
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "mifarma.db")
+        almacen = crear_almacen_sqlite(ruta, crear_stock())
+        for i in range(5):
+            almacen.ordenes.agregar(crear_orden(i))
+        for i in (3, 1, 4):
+            almacen.ordenes.transicion(f"orden_{i:03d}", "pagada")
+        almacen.stock.reservar("res_1", "tienda_1", [("producto_1", 2)])
+        version = almacen.stock.version("tienda_1")
+        almacen.cerrar()
+
+        # Otra vez la siembra: no pisa el stock persistido ni duplica las colas
+        almacen = crear_almacen_sqlite(ruta, crear_stock())
+        assert recorrer(almacen.ordenes, "pagada") == ["orden_003", "orden_001", "orden_004"]
+        assert recorrer(almacen.ordenes, "pendiente") == ["orden_000", "orden_002"]
+        assert unidades(almacen)["producto_1"] == 3
+        assert almacen.stock.version("tienda_1") == version
+        assert almacen.stock.reservado("res_1")
+        almacen.cerrar()
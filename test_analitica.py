@@ -0,0 +1,52 @@
+# test_analitica.py - Pruebas de los agregados de ventas
+import random
+from collections import Counter
+
+from analitica import AnaliticaVentas
+
+
+def crear_ventas(cantidad: int):
+    random.seed(7)
+    ventas = []
+    for i in range(cantidad):
+        items = [{"producto_id": f"producto_{random.randrange(60):03d}", "cantidad": random.randint(1, 4)}
+                 for _ in range(random.randint(1, 3))]
+        ventas.append({
+            "venta_id": f"venta_{i}", "tienda_id": random.choice(["tienda_1", "tienda_2"]), "items": items,
+            "total": round(random.uniform(5, 100), 2), "isDelivery": random.random() < 0.3,
+            "fecha_venta": f"2024-05-{random.randint(1, 14):02d}T{random.randint(8, 21):02d}:15:00"
+        })
+    return ventas
+
+
+def test_incremental_igual_a_recorrer():
+    """Registrar venta a venta da lo mismo que reconstruir o recorrer todo el historial"""
+    ventas = crear_ventas(2_000)
+    incremental = AnaliticaVentas(k=10)
+    for venta in ventas:
+        incremental.registrar(venta)
+    reconstruida = AnaliticaVentas.desde_historial(ventas, k=10)
+
+    unidades = Counter()
+    for venta in ventas:
+        for item in venta["items"]:
+            unidades[item["producto_id"]] += item["cantidad"]
+    esperado = sorted(unidades.items(), key=lambda par: (-par[1], par[0]))
+    for analitica in (incremental, reconstruida):
+        assert [u for _, u in analitica.mas_vendidos(10)] == [u for _, u in esperado[:10]]
+        assert analitica.mas_vendidos(20) == esperado[:20]  # más allá de k se calcula aparte
+
+    del_dia = sum(v["total"] for v in ventas if v["tienda_id"] == "tienda_1" and v["fecha_venta"].startswith("2024-05-03"))
+    ingresos = incremental.ingresos("2024-05-03", "2024-05-03", "dia", "tienda_1")
+    assert abs(ingresos["tienda_1"]["2024-05-03"]["ingresos"] - del_dia) < 1e-6
+    assert sum(f["ventas"] for f in incremental.ingresos("2024-05-03", "2024-05-03", "hora")["tienda_1"].values()) == \
+        ingresos["tienda_1"]["2024-05-03"]["ventas"]
+    assert incremental.ingresos("2024-05-01", "2024-05-14") == reconstruida.ingresos("2024-05-01", "2024-05-14")
+    assert incremental.modalidad() == reconstruida.modalidad()
+    assert incremental.mas_vendidos(5, "2024-05-01", "2024-05-07") == \
+        reconstruida.mas_vendidos(5, "2024-05-01", "2024-05-07")
+    print("✅ Agregados incrementales, reconstrucción y top-K consistentes")
+
+
+if __name__ == "__main__":
+    test_incremental_igual_a_recorrer()
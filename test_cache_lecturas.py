@@ -0,0 +1,58 @@
+# test_cache_lecturas.py - Pruebas de la caché de lecturas por versión y ETag
+import copy
+
+from cache_lecturas import CacheLecturas, responder
+from stock import MotorStock
+
+STOCK = {
+    "tienda_1": {"producto_001": {"nombre": "Paracetamol", "precio": 5.5, "stock": 10}},
+    "tienda_2": {"producto_001": {"nombre": "Paracetamol", "precio": 5.5, "stock": 3}},
+}
+
+
+def lectura(cache, motor, tienda_id):
+    version = motor.version(tienda_id)
+    return cache.vigente(tienda_id, version) or cache.guardar(tienda_id, version, motor.inventario(tienda_id))
+
+
+def test_version_por_tienda_y_304():
+    """Solo los cambios de la propia tienda invalidan su entrada; el ETag da 304"""
+    motor = MotorStock(copy.deepcopy(STOCK))
+    cache = CacheLecturas()
+    primera = lectura(cache, motor, "tienda_1")
+    assert lectura(cache, motor, "tienda_1") is primera
+    assert responder(primera, primera.etag).status_code == 304
+    assert responder(primera, f'"otro", W/{primera.etag}').status_code == 304
+    assert responder(primera, '"otro"').body == primera.cuerpo
+
+    motor.reservar("r1", "tienda_2", [("producto_001", 1)])
+    assert lectura(cache, motor, "tienda_1") is primera
+
+    motor.reservar("r2", "tienda_1", [("producto_001", 2)])
+    segunda = lectura(cache, motor, "tienda_1")
+    assert segunda is not primera and segunda.etag != primera.etag
+    assert b'"stock":8' in segunda.cuerpo
+
+    # Volver al mismo contenido da el mismo ETag aunque la versión sea otra
+    motor.liberar("r2")
+    assert lectura(cache, motor, "tienda_1").etag == primera.etag
+    print("✅ Versiones por tienda, ETag y 304")
+
+
+def test_ventana_de_desactualizacion():
+    ahora = [0.0]
+    motor = MotorStock(copy.deepcopy(STOCK))
+    cache = CacheLecturas(ventana=0.5, reloj=lambda: ahora[0])
+    primera = lectura(cache, motor, "tienda_1")
+    motor.reservar("r1", "tienda_1", [("producto_001", 1)])
+    ahora[0] = 0.4
+    assert cache.reciente("tienda_1") is primera  # dentro de la ventana no se mira la versión
+    ahora[0] = 0.6
+    assert cache.reciente("tienda_1") is None
+    assert lectura(cache, motor, "tienda_1") is not primera
+    print("✅ Ventana de desactualización")
+
+
+if __name__ == "__main__":
+    test_version_por_tienda_y_304()
+    test_ventana_de_desactualizacion()
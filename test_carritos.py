@@ -0,0 +1,37 @@
+# test_carritos.py - Pruebas de las líneas del carrito y su subtotal incremental
+import random
+
+from carritos import fijar_linea, lineas_carrito, normalizar_carrito, nuevo_carrito
+
+
+def test_subtotal_incremental_igual_a_recalcular():
+    """Tras muchos cambios el subtotal mantenido coincide con sumar las líneas"""
+    random.seed(3)
+    carrito = nuevo_carrito("user1", "tienda_1")
+    precios = {f"producto_{i:03d}": round(random.uniform(1, 50), 2) for i in range(40)}
+    for _ in range(2_000):
+        producto_id = random.choice(list(precios))
+        fijar_linea(carrito, producto_id, random.choice([0, 1, 2, 5, 10]), precios[producto_id])
+    esperado = sum(item["precio"] * item["cantidad"] for item in lineas_carrito(carrito))
+    assert abs(carrito["subtotal"] - esperado) < 1e-6
+    assert all(item["cantidad"] > 0 for item in lineas_carrito(carrito))
+
+
+def test_linea_conserva_precio_y_cero_la_quita():
+    carrito = nuevo_carrito("user1", "tienda_1")
+    fijar_linea(carrito, "producto_1", 2, 5.0)
+    cambio = fijar_linea(carrito, "producto_1", 3, 9.0)
+    assert cambio == {"producto_id": "producto_1", "cantidad": 3, "precio": 5.0}
+    assert carrito["subtotal"] == 15.0
+    fijar_linea(carrito, "producto_1", 0, 5.0)
+    assert carrito["items"] == {} and carrito["subtotal"] == 0
+
+
+def test_normalizar_carrito_con_items_en_lista():
+    carrito = {"user_id": "user1", "tienda_id": "tienda_1", "items": [
+        {"producto_id": "producto_1", "cantidad": 2, "precio": 3.5, "isDelivery": False},
+        {"producto_id": "producto_2", "cantidad": 1, "precio": 10.0, "isDelivery": False},
+    ]}
+    normalizar_carrito(carrito)
+    assert set(carrito["items"]) == {"producto_1", "producto_2"}
+    assert carrito["subtotal"] == 17.0
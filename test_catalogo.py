@@ -0,0 +1,47 @@
+# test_catalogo.py - Pruebas del índice de búsqueda del catálogo
+from catalogo import IndiceCatalogo
+
+PRODUCTOS = [
+    {"id": "producto_001", "nombre": "Paracetamol", "descripcion": "Analgésico y antipirético"},
+    {"id": "producto_002", "nombre": "Ibuprofeno", "descripcion": "Antiinflamatorio no esteroideo"},
+    {"id": "producto_003", "nombre": "Aspirina", "descripcion": "Ácido acetilsalicílico"},
+    {"id": "producto_004", "nombre": "Ácido fólico", "descripcion": "Suplemento vitamínico"},
+]
+
+
+def crear_indice():
+    indice = IndiceCatalogo()
+    for producto in PRODUCTOS:
+        indice.agregar(producto)
+    return indice
+
+
+def test_busqueda_por_prefijo_sin_tildes():
+    """Prefijos, mayúsculas y tildes no importan; el nombre pesa más que la descripción"""
+    indice = crear_indice()
+    assert indice.buscar("analg") == (["producto_001"], False)
+    assert indice.buscar("ACIDO") == (["producto_004", "producto_003"], False)
+    assert indice.buscar("ácido fol") == (["producto_004"], False)
+    assert indice.buscar("para antipir") == (["producto_001"], False)
+    assert indice.buscar("para esteroideo") == ([], False)
+    assert indice.buscar("") == ([], False)
+    print("✅ Búsqueda por prefijo, sin tildes y con ranking")
+
+
+def test_paginacion_e_indexacion_incremental():
+    indice = crear_indice()
+    assert indice.buscar("a", offset=0, limite=2) == (["producto_003", "producto_004"], True)
+    assert indice.buscar("a", offset=2, limite=2) == (["producto_001", "producto_002"], False)
+
+    indice.agregar({"id": "producto_005", "nombre": "Amoxicilina", "descripcion": "Antibiótico"})
+    indice.agregar({"id": "producto_003", "nombre": "Aspirina forte", "descripcion": "Analgésico"})
+    assert indice.buscar("analg") == (["producto_001", "producto_003"], False)
+    assert indice.buscar("acetil") == ([], False)
+    assert indice.buscar("amox antib") == (["producto_005"], False)
+    assert len(indice) == 5
+    print("✅ Paginación e indexación incremental")
+
+
+if __name__ == "__main__":
+    test_busqueda_por_prefijo_sin_tildes()
+    test_paginacion_e_indexacion_incremental()
@@ -179,5 +179,50 @@ def test_flujo_delivery():
     print("✅ PRUEBA DE DELIVERY COMPLETADA CON ÉXITO")
     print("="*70)
 
+def test_rutas_con_pago_por_pasarela():
+    """Las rutas incluyen órdenes pagadas por cualquier medio, no solo por pago online"""
+    print("\n" + "="*70)
+    print("PRUEBA DE FLUJO: RUTAS CON PAGO POR PASARELA")
+    print("="*70)
+    
+    tienda_id = "tienda_virtual_1"
+    response = requests.post(f"{BASE_URL}/login", json={"username": "admin1", "password": "admin123"})
+    headers = {"token": response.json()["token"]}
+    
+    # Paso 1: Orden de delivery con coordenadas, pagada por la pasarela
+    print("\n➡️ PASO 1: Orden de delivery pagada por pasarela")
+    response = requests.post(
+        f"{BASE_URL}/carrito/{tienda_id}/lineas",
+        json={"lineas": [{"producto_id": "producto_002", "cantidad": 1, "operacion": "fijar"}],
+              "isDelivery": True, "direccion_entrega": "Av. Arequipa 1500, Lima",
+              "lat_entrega": -12.09, "lon_entrega": -77.03},
+        headers=headers
+    )
+    if response.status_code != 200:
+        print(f"❌ Error al preparar el carrito: {response.text}")
+        return
+    orden = requests.post(f"{BASE_URL}/orden-venta/{tienda_id}", headers=headers).json()
+    response = requests.post(
+        f"{BASE_URL}/pasarela-pagos/{orden['orden_id']}",
+        json={"metodo": "tarjeta", "monto": orden["total"], "detalles": {"tarjeta": "4111"}},
+        headers=headers
+    )
+    if response.status_code != 200:
+        print(f"❌ Error al pagar por pasarela: {response.text}")
+        return
+    print(f"✅ Orden {orden['orden_id']} pagada por pasarela")
+    
+    # Paso 2: Planificar rutas de la tienda
+    print("\n➡️ PASO 2: Planificar rutas")
+    response = requests.post(f"{BASE_URL}/rutas/{tienda_id}", headers=headers)
+    if response.status_code != 200:
+        print(f"❌ Error al planificar rutas: {response.text}")
+        return
+    if not any(orden["orden_id"] in ruta["paradas"] for ruta in response.json()["rutas"]):
+        print(f"❌ La orden no quedó en ninguna ruta: {response.json()}")
+        return
+    print(f"✅ {response.json()['ordenes']} orden(es) en {len(response.json()['rutas'])} ruta(s)")
+
 if __name__ == "__main__":
-    test_flujo_delivery()
\ No newline at end of file
+    test_flujo_delivery()
+    test_rutas_con_pago_por_pasarela()
\ No newline at end of file
@@ -0,0 +1,47 @@
+# test_despacho.py - Pruebas del índice espacial y la asignación de repartidores
+import math
+import random
+
+from despacho import CENTRO, IndiceGrilla, flota_simulada
+
+
+def punto_al_azar(azar: random.Random, radio_km: float = 15):
+    return (CENTRO[0] + azar.uniform(-radio_km, radio_km) / 110.574,
+            CENTRO[1] + azar.uniform(-radio_km, radio_km) / 108.0)
+
+
+def test_cercanos_igual_a_fuerza_bruta():
+    """Los k más cercanos de la grilla coinciden con ordenar todas las distancias"""
+    azar = random.Random(4)
+    indice = IndiceGrilla(celda_km=0.7)
+    puntos = {f"r{i}": punto_al_azar(azar) for i in range(800)}
+    for clave, (lat, lon) in puntos.items():
+        indice.mover(clave, lat, lon)
+    for clave in list(puntos)[:200]:  # la mitad se mueve y una parte se va
+        if azar.random() < 0.5:
+            puntos[clave] = punto_al_azar(azar)
+            indice.mover(clave, *puntos[clave])
+        else:
+            del puntos[clave]
+            indice.quitar(clave)
+
+    for _ in range(100):
+        lat, lon = punto_al_azar(azar, radio_km=20)
+        x, y = indice.proyectar(lat, lon)
+        distancias = sorted(math.hypot(px - x, py - y) for px, py in (indice.proyectar(*p) for p in puntos.values()))
+        encontrados = indice.cercanos(lat, lon, 5)
+        assert [round(d, 9) for d, _ in encontrados] == [round(d, 9) for d in distancias[:5]]
+
+
+def test_lote_asigna_repartidores_distintos():
+    flota = flota_simulada(30, semilla=2)
+    azar = random.Random(8)
+    pedidos = [(f"orden_{i}", *punto_al_azar(azar, radio_km=5)) for i in range(40)]
+    asignados = flota.asignar_lote(pedidos)
+    assert len(asignados) == 30
+    assert len({repartidor["id"] for repartidor, _ in asignados.values()}) == 30
+    assert flota.disponibles == 0 and flota.asignar("orden_extra", *CENTRO) is None
+
+    repartidor = next(iter(asignados.values()))[0]
+    assert flota.liberar(repartidor["id"], *CENTRO)
+    assert flota.asignar("orden_extra", *CENTRO)[0]["id"] == repartidor["id"]
@@ -0,0 +1,90 @@
+# test_documentos.py - Pruebas del render de comprobantes, el almacén por contenido y el pipeline por lotes
+import asyncio
+import tempfile
+
+from documentos import AlmacenDocumentos, PipelineDocumentos, renderizar
+
+
+def crear_boleta(i: int) -> dict:
+    return {
+        "tipo": "boleta", "boleta_id": f"boleta_{i}", "venta_id": f"venta_{i}",
+        "fecha_emision": "2026-10-17T10:30:00", "cliente": {"id": "user1", "nombre": "Cliente <Normal>"},
+        "items": [{"producto_id": "producto_001", "nombre": "Paracetamol", "cantidad": i + 1,
+                   "precio_unitario": 5.5, "subtotal": 5.5 * (i + 1)}],
+        "total": 5.5 * (i + 1), "isDelivery": False
+    }
+
+
+def test_render_determinista_y_almacen_por_contenido():
+    contenido = renderizar(crear_boleta(0))
+    assert contenido == renderizar(crear_boleta(0))
+    assert b"<cbc:InvoiceTypeCode>03</cbc:InvoiceTypeCode>" in contenido
+    assert b"Cliente &lt;Normal&gt;" in contenido
+
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = AlmacenDocumentos(directorio)
+        digest = almacen.guardar(contenido)
+        assert almacen.guardar(contenido) == digest  # mismo contenido, mismo archivo
+        assert almacen.obtener(digest) == contenido
+        assert almacen.obtener("../" + digest[3:]) is None
+        assert almacen.obtener("0" * 64) is None
+
+
+def correr_pipeline(procesos: int, documentos: list):
+    with tempfile.TemporaryDirectory() as directorio:
+        pipeline = PipelineDocumentos(AlmacenDocumentos(directorio), procesos=procesos, tam_lote=8)
+
+        async def correr():
+            await pipeline.iniciar()
+            ids = [pipeline.encolar(documento, user_id="user1") for documento in documentos]
+            await pipeline.esperar(timeout=30)
+            await pipeline.detener()
+            return [pipeline.trabajo(trabajo_id) for trabajo_id in ids]
+
+        trabajos = asyncio.run(correr())
+        return trabajos, pipeline, {t["hash"]: pipeline.almacen.obtener(t["hash"]) for t in trabajos if "hash" in t}
+
+
+def test_pipeline_por_lotes_con_errores_aislados():
+    documentos = [crear_boleta(i) for i in range(20)]
+    documentos[5] = {**documentos[5], "items": None}  # no renderizable
+    trabajos, pipeline, archivos = correr_pipeline(0, documentos)
+
+    assert [t["estado"] for t in trabajos].count("listo") == 19
+    assert trabajos[5]["estado"] == "error" and "TypeError" in trabajos[5]["error"]
+    assert all(archivos[t["hash"]] == renderizar(d) for t, d in zip(trabajos, documentos) if "hash" in t)
+    metricas = pipeline.metricas()
+    assert metricas["documentos"] == 20 and metricas["errores"] == 1 and metricas["lotes"] >= 3
+
+
+def test_pipeline_en_pool_de_procesos():
+    documentos = [crear_boleta(i) for i in range(10)]
+    trabajos, pipeline, archivos = correr_pipeline(2, documentos)
+    assert all(t["estado"] == "listo" and t["user_id"] == "user1" for t in trabajos)
+    assert len(archivos) == 10 and all(archivos.values())
+
+
+def test_avisa_cada_trabajo_listo():
+    documentos = [crear_boleta(i) for i in range(6)]
+    documentos[2] = {**documentos[2], "items": None}
+    avisados = {}
+
+    async def al_terminar(trabajo):
+        await asyncio.sleep(0)
+        avisados[trabajo["trabajo_id"]] = trabajo["hash"]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        pipeline = PipelineDocumentos(AlmacenDocumentos(directorio), procesos=0, tam_lote=4)
+        pipeline.al_terminar = al_terminar
+
+        async def correr():
+            await pipeline.iniciar()
+            ids = [pipeline.encolar(documento, venta_id=documento["venta_id"]) for documento in documentos]
+            await pipeline.esperar(timeout=30)
+            await pipeline.detener()
+            return ids
+
+        ids = asyncio.run(correr())
+        # Solo los listos, y esperar() incluye los avisos
+        assert set(avisados) == set(ids) - {ids[2]}
+        assert all(pipeline.almacen.obtener(digest) for digest in avisados.values())
@@ -0,0 +1,92 @@
+# test_estados.py - Pruebas de la máquina de estados y las colas paginadas de órdenes
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from almacen_sqlite import PoolConexiones, RepositorioOrdenesSQLite
+from estados import ConjuntoOrdenado, LocksOrden, TransicionInvalida
+from ordenes import RepositorioOrdenes
+
+
+def crear_orden(i: int) -> dict:
+    return {"orden_id": f"orden_{i:03d}", "user_id": "user1", "tienda_id": "tienda_1",
+            "estado": "pendiente", "isDelivery": i % 2 == 0, "items": [], "total": 10.0}
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def repositorio(request):
+    if request.param == "memoria":
+        yield RepositorioOrdenes()
+        return
+    with tempfile.TemporaryDirectory() as directorio:
+        pool = PoolConexiones(os.path.join(directorio, "ordenes.db"))
+        yield RepositorioOrdenesSQLite(pool)
+        pool.cerrar()
+
+
+def test_transiciones_validas_e_invalidas(repositorio):
+    repositorio.agregar(crear_orden(0))
+    with pytest.raises(TransicionInvalida):
+        repositorio.transicion("orden_000", "vendida")  # sin pagar
+    repositorio.transicion("orden_000", "pagada", metodo_pago="pos")
+    with pytest.raises(TransicionInvalida):
+        repositorio.cambiar_estado("orden_000", "cancelada")  # ya pagada
+    orden = repositorio.transicion("orden_000", "en_delivery")
+    assert orden["estado"] == "en_delivery" and orden["metodo_pago"] == "pos"
+    assert repositorio.obtener("orden_000")["estado"] == "en_delivery"
+
+
+def test_colas_paginan_en_orden_de_llegada(repositorio):
+    for i in range(10):
+        repositorio.agregar(crear_orden(i))
+    # Se pagan en orden inverso: la cola de pagadas sigue el orden del pago
+    for i in reversed(range(10)):
+        repositorio.transicion(f"orden_{i:03d}", "pagada")
+    repositorio.transicion("orden_006", "en_delivery")
+
+    vistas, cursor = [], None
+    while True:
+        pagina, cursor = repositorio.pagina("pagada", "delivery", despues=cursor, limite=2)
+        vistas += [orden["orden_id"] for orden in pagina]
+        if cursor is None:
+            break
+    assert vistas == ["orden_008", "orden_004", "orden_002", "orden_000"]
+    assert repositorio.contar_cola("pagada", "delivery") == 4
+    assert repositorio.contar_cola("pagada") == 9
+    assert repositorio.contar_cola("pendiente") == 0
+    assert [o["orden_id"] for o in repositorio.pagina("en_delivery")[0]] == ["orden_006"]
+
+    repositorio.eliminar("orden_008")
+    assert repositorio.pagina("pagada", "delivery", limite=1)[0][0]["orden_id"] == "orden_004"
+
+
+def test_conjunto_ordenado_compacta_y_conserva_cursores():
+    conjunto = ConjuntoOrdenado()
+    for i in range(3_000):
+        conjunto.agregar(f"o{i}")
+    ids, cursor = conjunto.pagina(limite=5)
+    for i in range(2_900):
+        conjunto.quitar(f"o{i}")
+    assert len(conjunto._entradas) < 1_200  # se compactó
+    assert conjunto.pagina(cursor, limite=2)[0] == ["o2900", "o2901"]
+    assert len(conjunto) == 100 and list(conjunto)[-1] == "o2999"
+
+
+def test_lock_por_orden_serializa_y_se_descarta():
+    locks = LocksOrden()
+    dentro = []
+
+    async def pagar(n: int):
+        async with locks.orden("orden_1"):
+            dentro.append(n)
+            assert len(dentro) == 1  # nadie más entre validar y cambiar
+            await asyncio.sleep(0.001)
+            dentro.pop()
+
+    async def correr():
+        await asyncio.gather(*(pagar(n) for n in range(5)))
+
+    asyncio.run(correr())
+    assert len(locks) == 0
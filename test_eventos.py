@@ -0,0 +1,105 @@
+# test_eventos.py - Pruebas del bus de eventos: reintentos, concurrencia acotada, outbox y métricas
+import asyncio
+import os
+import tempfile
+
+from almacen_sqlite import OutboxSQLite, PoolConexiones
+from eventos import BusEventos, OutboxMemoria
+
+
+def test_reintenta_y_marca_fallidas():
+    outbox = OutboxMemoria()
+    bus = BusEventos(outbox, max_intentos=3, espera_base=0.001)
+    intentos = {"inestable": 0, "roto": 0}
+
+    async def inestable(datos):
+        intentos["inestable"] += 1
+        if intentos["inestable"] < 3:
+            raise RuntimeError("caído")
+
+    async def roto(datos):
+        intentos["roto"] += 1
+        raise ValueError(datos["venta_id"])
+
+    bus.suscribir("venta_realizada", "inestable", inestable)
+    bus.suscribir("venta_realizada", "roto", roto)
+
+    async def correr():
+        await bus.iniciar()
+        await bus.publicar("venta_realizada", {"venta_id": "v1"})
+        await bus.esperar(timeout=5)
+        await bus.detener()
+
+    asyncio.run(correr())
+    metricas = bus.metricas()["suscriptores"]
+    assert metricas["inestable"]["procesados"] == 1 and metricas["inestable"]["reintentos"] == 2
+    assert metricas["roto"]["fallidos"] == 1 and intentos["roto"] == 3
+    assert len(outbox) == 0 and [(s, e) for _, s, e in outbox.fallidas] == [("roto", "ValueError('v1')")]
+
+
+def test_concurrencia_acotada():
+    bus = BusEventos(OutboxMemoria(), concurrencia=2)
+    activos, maximo = [0], [0]
+
+    async def lento(datos):
+        activos[0] += 1
+        maximo[0] = max(maximo[0], activos[0])
+        await asyncio.sleep(0.005)
+        activos[0] -= 1
+
+    bus.suscribir("venta_realizada", "lento", lento)
+
+    async def correr():
+        await bus.iniciar()
+        for i in range(10):
+            await bus.publicar("venta_realizada", {"venta_id": f"v{i}"})
+        assert bus.metricas()["profundidad"] == 10
+        await bus.esperar(timeout=5)
+        await bus.detener()
+
+    asyncio.run(correr())
+    assert maximo[0] == 2
+    assert bus.metricas()["suscriptores"]["lento"]["procesados"] == 10
+
+
+def test_outbox_sqlite_sobrevive_reinicio_y_mide_lag():
+    reloj = [1_000.0]
+    procesadas = []
+
+    async def registrar(datos):
+        procesadas.append(datos["venta_id"])
+
+    async def analitica(datos):
+        pass
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "outbox.db")
+        # Primer proceso: publica y se cae antes de consumir
+        pool = PoolConexiones(ruta, esquema="")
+        bus = BusEventos(OutboxSQLite(pool), reloj=lambda: reloj[0])
+        bus.suscribir("venta_realizada", "registro", registrar)
+        bus.suscribir("venta_realizada", "analitica", analitica, durable=False)
+        asyncio.run(bus.publicar("venta_realizada", {"venta_id": "v1"}))
+        reloj[0] += 2.5
+        asyncio.run(bus.publicar("venta_realizada", {"venta_id": "v2"}))
+        metricas = bus.metricas()["suscriptores"]
+        assert metricas["registro"]["pendientes"] == 2 and metricas["registro"]["lag_segundos"] == 2.5
+        pool.cerrar()
+
+        # Segundo proceso: recupera solo las entregas durables, en orden
+        pool = PoolConexiones(ruta, esquema="")
+        outbox = OutboxSQLite(pool)
+        bus = BusEventos(outbox, reloj=lambda: reloj[0])
+        bus.suscribir("venta_realizada", "registro", registrar)
+        bus.suscribir("venta_realizada", "analitica", analitica, durable=False)
+
+        async def correr():
+            await bus.iniciar()
+            assert bus.metricas()["suscriptores"]["analitica"]["pendientes"] == 0
+            await bus.esperar(timeout=5)
+            await bus.detener()
+
+        asyncio.run(correr())
+        assert procesadas == ["v1", "v2"] and len(outbox) == 0
+        assert bus.metricas()["suscriptores"]["registro"]["lag_segundos"] == 0
+        pool.cerrar()
@@ -1,7 +1,13 @@
 # test_flow.py - Script para probar el flujo de venta según el diagrama simplificado
+import os
+import subprocess
+import sys
 import requests
 import json
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 # URL base de la API
 BASE_URL = "http://localhost:8000"
@@ -132,9 +138,10 @@ def test_flujo_tienda_fisica():
     
     # Paso 8: Realizar Venta
     print("\n➡️ PASO 8: Realizar Venta (RealizarVenta)")
+    venta_headers = {**user_headers, "Idempotency-Key": f"venta-{orden_id}"}
     response = requests.post(
         f"{BASE_URL}/realizar-venta/{orden_id}", 
-        headers=user_headers
+        headers=venta_headers
     )
     if response.status_code != 200:
         print(f"❌ Error al realizar venta: {response.text}")
@@ -145,6 +152,16 @@ def test_flujo_tienda_fisica():
     
     print(f"✅ Venta realizada con éxito. ID de venta: {venta_id}")
     
+    # Un reintento con la misma Idempotency-Key devuelve la misma venta sin repetirla
+    response = requests.post(
+        f"{BASE_URL}/realizar-venta/{orden_id}", 
+        headers=venta_headers
+    )
+    if response.status_code != 200 or response.json()["venta_id"] != venta_id:
+        print(f"❌ El reintento de la venta no fue idempotente: {response.text}")
+        return
+    print("✅ Reintento idempotente: misma venta, sin duplicar")
+    
     # Paso 9: Generar Boleta
     print("\n➡️ PASO 9: Generar Boleta")
     response = requests.post(
@@ -156,9 +173,201 @@ def test_flujo_tienda_fisica():
         return
     
     print("✅ Boleta generada correctamente")
+    
+    # Paso 10: Generar Factura
+    print("\n➡️ PASO 10: Generar Factura")
+    # Varios pedidos a la vez (p. ej. doble clic) emiten una sola factura
+    with ThreadPoolExecutor(4) as pool:
+        respuestas = list(pool.map(
+            lambda _: requests.post(f"{BASE_URL}/factura/{venta_id}", headers=user_headers), range(4)
+        ))
+    for response in respuestas:
+        if response.status_code != 200:
+            print(f"❌ Error al generar factura: {response.text}")
+            return
+    if len({response.json()["numero"] for response in respuestas}) != 1:
+        print(f"❌ Se emitió más de una factura: {[response.json()['numero'] for response in respuestas]}")
+        return
+    
+    factura = respuestas[0].json()
+    print(f"✅ Factura generada: {factura['numero']} - Total: S/{factura['total']}")
+    
+    # Paso 11: Registrar Venta en BD (solo admin)
+    print("\n➡️ PASO 11: Registrar Venta en BD")
+    response = requests.post(
+        f"{BASE_URL}/registrar-venta/{venta_id}", 
+        headers=admin_headers
+    )
+    if response.status_code != 200:
+        print(f"❌ Error al registrar venta: {response.text}")
+        return
+    
+    print("✅ Venta registrada en la base de datos")
     print("\n" + "="*70)
     print("✅ PRUEBA COMPLETADA CON ÉXITO")
     print("="*70)
 
+def test_checkout_una_solicitud(base_url: str = BASE_URL):
+    """Checkout en una sola solicitud: comprobante y registro llegan por el bus de eventos"""
+    print("\n" + "="*70)
+    print(f"PRUEBA DE FLUJO: CHECKOUT EN UNA SOLICITUD ({base_url})")
+    print("="*70)
+    
+    tienda_id = "tienda_virtual_1"
+    response = requests.post(f"{base_url}/login", json={"username": "admin1", "password": "admin123"})
+    headers = {"token": response.json()["token"]}
+    
+    # Paso 1: Carrito con 2 Aspirinas para recoger en tienda
+    print("\n➡️ PASO 1: Preparar carrito")
+    response = requests.post(
+        f"{base_url}/carrito/{tienda_id}/lineas",
+        json={"lineas": [{"producto_id": "producto_003", "cantidad": 2, "operacion": "fijar"}], "isDelivery": False},
+        headers=headers
+    )
+    if response.status_code != 200:
+        print(f"❌ Error al preparar el carrito: {response.text}")
+        return
+    # Un cambio rechazado (producto inexistente) no debe dejar el carrito en delivery
+    response = requests.post(
+        f"{base_url}/carrito/{tienda_id}/lineas",
+        json={"lineas": [{"producto_id": "producto_999", "cantidad": 1, "operacion": "agregar"}],
+              "isDelivery": True, "direccion_entrega": "Av. Principal 123, Lima"},
+        headers=headers
+    )
+    carrito = requests.get(f"{base_url}/carrito/{tienda_id}", headers=headers).json()["carrito"]
+    if response.status_code != 404 or carrito["isDelivery"]:
+        print(f"❌ El cambio rechazado modificó el carrito: {carrito}")
+        return
+    print("✅ Carrito listo")
+    
+    # Paso 2: Checkout (orden + pago + venta)
+    print("\n➡️ PASO 2: Checkout")
+    response = requests.post(
+        f"{base_url}/checkout/{tienda_id}",
+        json={"metodo": "tarjeta", "detalles": {"tarjeta": "4111"}, "comprobante": "factura"},
+        headers=headers
+    )
+    if response.status_code != 200 or not response.json()["venta_id"]:
+        print(f"❌ Error en checkout: {response.text}")
+        return
+    venta_id = response.json()["venta_id"]
+    print(f"✅ Venta {venta_id} realizada en una solicitud (total S/{response.json()['total']})")
+    
+    # Paso 3: Factura y registro en BD los hace el bus en segundo plano
+    print("\n➡️ PASO 3: Esperar comprobante y registro")
+    for _ in range(50):
+        venta = requests.get(f"{base_url}/ventas/{venta_id}", headers=headers).json()
+        if venta.get("registrada_bd"):
+            break
+        time.sleep(0.05)
+    else:
+        print(f"❌ La venta no se registró: {venta}")
+        return
+    if not venta.get("factura"):
+        print(f"❌ La venta no tiene factura: {venta}")
+        return
+    print(f"✅ Factura {venta['factura']} emitida y venta registrada")
+    # Pedir la factura a mano devuelve la que emitió el bus, sin gastar otro número
+    response = requests.post(f"{base_url}/factura/{venta_id}", headers=headers)
+    if response.status_code != 200 or response.json()["numero"] != venta["factura"]:
+        print(f"❌ Se emitió otra factura para la misma venta: {response.text}")
+        return
+    print("✅ Pedir la factura otra vez devuelve la misma")
+
+    # Paso 4: El XML de la factura se renderiza en el pool de documentos
+    print("\n➡️ PASO 4: Descargar el XML de la factura")
+    for _ in range(100):
+        trabajo = requests.get(f"{base_url}/documentos/trabajos/{venta['documento']}", headers=headers).json()
+        if trabajo.get("estado") in ("listo", "error"):
+            break
+        time.sleep(0.05)
+    if trabajo.get("estado") != "listo":
+        print(f"❌ El XML no se renderizó: {trabajo}")
+        return
+    response = requests.get(f"{base_url}{trabajo['url']}", headers=headers)
+    if response.status_code != 200 or venta["factura"].encode() not in response.content:
+        print(f"❌ Error al descargar el XML: {response.status_code}")
+        return
+    print(f"✅ XML de {len(response.content)} bytes en {trabajo['url']}")
+    # El hash queda en la venta: el XML se sigue encontrando aunque el trabajo se pierda
+    for _ in range(50):
+        venta = requests.get(f"{base_url}/ventas/{venta_id}", headers=headers).json()
+        if venta.get("documento_hash"):
+            break
+        time.sleep(0.05)
+    if venta.get("documento_hash") != trabajo["hash"]:
+        print(f"❌ La venta no guardó el hash del XML: {venta}")
+        return
+    print("✅ Hash del XML guardado en la venta")
+
+    metricas = requests.get(f"{base_url}/admin/eventos", headers=headers).json()
+    print(f"✅ Bus: {metricas['profundidad']} en cola, registro procesó "
+          f"{metricas['suscriptores']['registro']['procesados']} evento(s)")
+
+@contextmanager
+def servidor(puerto: int, *argumentos: str, **entorno: str):
+    """Un servidor aparte (p. ej. con otra configuración) mientras dura el bloque"""
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(puerto), *argumentos],
+        # El journal es de un solo proceso: no se comparte con el servidor principal
+        env={**os.environ, "MIFARMA_JOURNAL_DIR": "", **entorno}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"http://localhost:{puerto}/productos")
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        yield f"http://localhost:{puerto}"
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+def test_checkout_ventas_compactas():
+    """El mismo checkout contra un servidor con el libro de ventas en modo compacto"""
+    with servidor(8001, MIFARMA_VENTAS_COMPACTAS="1") as base_url:
+        test_checkout_una_solicitud(base_url)
+
+def test_factura_una_vez_entre_workers():
+    """Con varios workers sobre SQLite, pedir la factura a la vez en todos emite una sola"""
+    print("\n" + "="*70)
+    print("PRUEBA DE FLUJO: FACTURA ÚNICA ENTRE WORKERS")
+    print("="*70)
+    
+    with tempfile.TemporaryDirectory() as directorio, servidor(
+            8003, "--workers", "3", MIFARMA_BACKEND="sqlite", MIFARMA_SQLITE_RUTA=os.path.join(directorio, "t.db"),
+            MIFARMA_TOKEN_MODO="firmado", MIFARMA_TOKEN_SECRETO="secreto-de-prueba",
+            MIFARMA_DOCUMENTOS_PROCESOS="0", MIFARMA_DOCUMENTOS_DIR=os.path.join(directorio, "documentos")
+    ) as base_url:
+        # Paso 1: Venta por pasos (sin comprobante) en la tienda física
+        print("\n➡️ PASO 1: Venta sin comprobante")
+        response = requests.post(f"{base_url}/login", json={"username": "user1", "password": "password123"})
+        headers = {"token": response.json()["token"]}
+        requests.post(f"{base_url}/carrito/tienda_fisica_1",
+                      json={"producto_id": "producto_002", "cantidad": 1, "isDelivery": False}, headers=headers)
+        orden = requests.post(f"{base_url}/orden-venta/tienda_fisica_1", headers=headers).json()
+        requests.post(f"{base_url}/pos/{orden['orden_id']}",
+                      json={"metodo": "efectivo", "monto": orden["total"], "detalles": {}}, headers=headers)
+        response = requests.post(f"{base_url}/realizar-venta/{orden['orden_id']}", headers=headers)
+        if response.status_code != 200:
+            print(f"❌ Error al realizar la venta: {response.text}")
+            return
+        venta_id = response.json()["venta_id"]
+        print(f"✅ Venta {venta_id}")
+        
+        # Paso 2: Muchos pedidos de factura a la vez, cada uno en su propia conexión
+        print("\n➡️ PASO 2: Pedir la factura en paralelo")
+        with ThreadPoolExecutor(12) as pool:
+            respuestas = list(pool.map(
+                lambda _: requests.post(f"{base_url}/factura/{venta_id}", headers=headers), range(24)
+            ))
+        numeros = {response.json().get("numero") for response in respuestas if response.status_code == 200}
+        if len(numeros) != 1 or any(response.status_code != 200 for response in respuestas):
+            print(f"❌ Se emitió más de una factura: {numeros}")
+            return
+        print(f"✅ Una sola factura: {numeros.pop()}")
+
 if __name__ == "__main__":
-    test_flujo_tienda_fisica()
\ No newline at end of file
+    test_flujo_tienda_fisica()
+    test_checkout_una_solicitud()
\ No newline at end of file
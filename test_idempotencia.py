@@ -0,0 +1,100 @@
+# test_idempotencia.py - Pruebas del middleware Idempotency-Key
+import asyncio
+import json
+
+from idempotencia import CacheIdempotencia, MiddlewareIdempotencia
+
+
+def crear_app():
+    """App ASGI que tarda un poco y cuenta cuántas veces se ejecutó de verdad"""
+    ejecuciones = []
+
+    async def app(scope, receive, send):
+        cuerpo = (await receive())["body"]
+        ejecuciones.append(cuerpo)
+        await asyncio.sleep(0.05)
+        datos = json.dumps({"transaccion_id": f"tx-{len(ejecuciones)}"}).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": datos})
+
+    return app, ejecuciones
+
+
+async def llamar(app, ruta, cuerpo, clave=None):
+    cabeceras = [(b"token", b"tok-1")]
+    if clave:
+        cabeceras.append((b"idempotency-key", clave.encode()))
+    scope = {"type": "http", "method": "POST", "path": ruta, "headers": cabeceras}
+    respuesta = {}
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(cuerpo).encode(), "more_body": False}
+
+    async def send(mensaje):
+        if mensaje["type"] == "http.response.start":
+            respuesta["estado"] = mensaje["status"]
+            respuesta["cabeceras"] = dict(mensaje["headers"])
+        else:
+            respuesta["cuerpo"] = json.loads(mensaje["body"])
+
+    await app(scope, receive, send)
+    return respuesta
+
+
+def test_duplicados_se_ejecutan_una_vez():
+    """Duplicados concurrentes y reintentos posteriores reciben la misma respuesta"""
+    async def escenario():
+        interna, ejecuciones = crear_app()
+        cache = CacheIdempotencia(ttl=60)
+        app = MiddlewareIdempotencia(interna, cache, ["/pago-online/"])
+        pago = {"metodo": "tarjeta", "monto": 10.0}
+
+        concurrentes = await asyncio.gather(*(llamar(app, "/pago-online/o1", pago, "clave-1") for _ in range(10)))
+        reintento = await llamar(app, "/pago-online/o1", pago, "clave-1")
+        assert len(ejecuciones) == 1
+        assert {r["cuerpo"]["transaccion_id"] for r in concurrentes + [reintento]} == {"tx-1"}
+        assert reintento["cabeceras"][b"idempotent-replayed"] == b"true"
+        assert cache.esperas == 9 and cache.repetidas == 10
+
+        # Otra clave, o sin clave, sí se ejecuta; la misma clave con otro cuerpo es un error
+        await llamar(app, "/pago-online/o1", pago, "clave-2")
+        await llamar(app, "/pago-online/o1", pago)
+        assert len(ejecuciones) == 3
+        conflicto = await llamar(app, "/pago-online/o1", {"metodo": "tarjeta", "monto": 99.0}, "clave-1")
+        assert conflicto["estado"] == 422
+
+    asyncio.run(escenario())
+    print("✅ Duplicados con Idempotency-Key ejecutados una sola vez")
+
+
+def test_cache_vence_y_desaloja():
+    reloj = [0.0]
+    cache = CacheIdempotencia(ttl=10, max_entradas=2, reloj=lambda: reloj[0])
+
+    async def escenario():
+        for n in range(3):
+            entrada, nueva = cache.reservar(("t", "/pos/x", n), b"h")
+            assert nueva
+            cache.completar(("t", "/pos/x", n), entrada, 200, [], b"{}")
+        assert len(cache) == 2 and cache.desalojadas == 1
+        reloj[0] = 11
+        assert cache.barrer() == 2
+
+    asyncio.run(escenario())
+
+
+def test_en_curso_no_se_desaloja():
+    """Con el cache lleno, una solicitud en curso sigue reservada hasta terminar"""
+    cache = CacheIdempotencia(ttl=10, max_entradas=1)
+
+    async def escenario():
+        en_curso, _ = cache.reservar(("t", "/pos/x", "lenta"), b"h")
+        for n in range(3):
+            entrada, _ = cache.reservar(("t", "/pos/x", n), b"h")
+            cache.completar(("t", "/pos/x", n), entrada, 200, [], b"{}")
+        repetida, nueva = cache.reservar(("t", "/pos/x", "lenta"), b"h")
+        assert not nueva and repetida is en_curso
+        cache.completar(("t", "/pos/x", "lenta"), en_curso, 200, [], b"{}")
+        assert len(cache) == 1 and cache.desalojadas == 3
+
+    asyncio.run(escenario())
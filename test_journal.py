@@ -0,0 +1,85 @@
+# test_journal.py - Pruebas del journal: snapshot más cola y escrituras cortadas por un crash
+import glob
+import json
+import os
+import tempfile
+
+from almacen import crear_almacen_memoria
+from journal import Journal
+
+
+def crear_stock():
+    return {"tienda_1": {"producto_1": {"nombre": "P1", "precio": 1.0, "stock": 10}}}
+
+
+def crear_orden(orden_id: str, estado: str = "pendiente"):
+    return {"orden_id": orden_id, "user_id": "user1", "tienda_id": "tienda_1", "estado": estado,
+            "items": [], "total": 0}
+
+
+def estado(almacen):
+    return ({orden["orden_id"]: orden["estado"] for orden in almacen.ordenes},
+            almacen.carritos.obtener("cart_1"), almacen.stock.producto("tienda_1", "producto_1")["stock"])
+
+
+def abrir(directorio):
+    almacen = crear_almacen_memoria(crear_stock())
+    journal = Journal(directorio, intervalo_fsync_ms=1, intervalo_snapshot=3_600)
+    resultado = journal.conectar(almacen)
+    journal.iniciar()
+    return almacen, journal, resultado
+
+
+def cerrar(journal):
+    assert journal.esperar()
+    journal.detener()
+
+
+def test_snapshot_mas_cola():
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen, journal, _ = abrir(directorio)
+        for i in range(5):
+            almacen.ordenes.agregar(crear_orden(f"orden_{i}"))
+        almacen.carritos.guardar("cart_1", {"items": {"producto_1": 1}})
+        journal.snapshot(almacen)
+        # Cola posterior al snapshot: cambios y bajas sobre claves que ya están en él
+        almacen.ordenes.cambiar_estado("orden_1", "cancelada")
+        almacen.ordenes.eliminar("orden_2")
+        almacen.ordenes.agregar(crear_orden("orden_5"))
+        almacen.carritos.guardar("cart_1", {"items": {"producto_1": 3}})
+        almacen.stock.reservar("orden_5", "tienda_1", [("producto_1", 3)])
+        esperado = estado(almacen)
+        cerrar(journal)
+
+        recuperado, journal, resultado = abrir(directorio)
+        assert resultado["snapshot"] is not None and resultado["seq"] == journal.seq
+        with open(resultado["snapshot"], "rb") as archivo:
+            corte = json.loads(archivo.readline())["seq"]
+            en_snapshot = sum(1 for _ in archivo)
+        assert resultado["entradas"] == en_snapshot + resultado["seq"] - corte  # del journal, solo la cola
+        assert estado(recuperado) == esperado
+        cerrar(journal)
+
+
+def test_linea_cortada_al_final():
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen, journal, _ = abrir(directorio)
+        almacen.ordenes.agregar(crear_orden("orden_1"))
+        # El snapshot abre journal-<corte + 1>.log: el mismo archivo que abrirá la recuperación
+        journal.snapshot(almacen)
+        cerrar(journal)
+        segmento = max(glob.glob(os.path.join(directorio, "journal-*.log")))
+        with open(segmento, "ab") as archivo:
+            archivo.write(b'{"s":3,"t":"orden","k":"orden_2","v":{"orden_id":"ord')  # crash a mitad de línea
+
+        almacen, journal, resultado = abrir(directorio)
+        assert resultado["bytes_recortados"] > 0 and os.path.getsize(segmento) == 0
+        assert estado(almacen)[0] == {"orden_1": "pendiente"}
+        almacen.ordenes.agregar(crear_orden("orden_3"))
+        cerrar(journal)
+
+        # La entrada escrita tras la recuperación quedó en su propia línea
+        almacen, journal, resultado = abrir(directorio)
+        assert resultado["bytes_recortados"] == 0
+        assert estado(almacen)[0] == {"orden_1": "pendiente", "orden_3": "pendiente"}
+        cerrar(journal)
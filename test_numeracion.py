@@ -0,0 +1,96 @@
+# test_numeracion.py - Pruebas de la numeración por series: sin repetidos ni huecos entre hilos, procesos y crashes
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from almacen_sqlite import PoolConexiones
+from numeracion import NumeradorSeries, formatear, separar
+
+PROCESOS = 3
+HILOS = 4
+POR_HILO = 150
+
+
+def emisor(ruta: str, resultados):
+    """Un worker: varios hilos sacan números de dos series y al final devuelve lo que sobra"""
+    pool = PoolConexiones(ruta, esquema="")
+    numerador = NumeradorSeries(pool, tam_bloque=16)
+    emitidos = {"F001": [], "B001": []}
+
+    def emitir(n: int):
+        for i in range(POR_HILO):
+            serie = "F001" if (i + n) % 3 else "B001"
+            emitidos[serie].append(numerador.siguiente(serie))
+
+    hilos = [threading.Thread(target=emitir, args=(n,)) for n in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    numerador.cerrar()
+    pool.cerrar()
+    resultados.put(emitidos)
+
+
+def test_sin_repetidos_ni_huecos_entre_procesos():
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "numeracion.db")
+        resultados = multiprocessing.Queue()
+        procesos = [multiprocessing.Process(target=emisor, args=(ruta, resultados)) for _ in range(PROCESOS)]
+        for proceso in procesos:
+            proceso.start()
+        por_proceso = [resultados.get(timeout=60) for _ in procesos]
+        for proceso in procesos:
+            proceso.join()
+
+        pool = PoolConexiones(ruta, esquema="")
+        reporte = NumeradorSeries(pool).reporte()
+        pool.cerrar()
+        total = 0
+        for serie in ("F001", "B001"):
+            emitidos = Counter(n for emitidos in por_proceso for n in emitidos[serie])
+            assert max(emitidos.values()) == 1, f"Números repetidos en {serie}"
+            total += len(emitidos)
+            # Lo emitido más lo devuelto cubre exactamente 1..marca alta
+            devueltos = {n for inicio, fin in reporte[serie]["libres"] for n in range(inicio, fin)}
+            assert not devueltos & set(emitidos)
+            assert devueltos | set(emitidos) == set(range(1, reporte[serie]["siguiente"]))
+            assert not reporte[serie]["arrendados"]
+        assert total == PROCESOS * HILOS * POR_HILO
+
+
+def test_reemite_lo_devuelto_y_lo_de_un_proceso_caido():
+    reloj = [1_000.0]
+    with tempfile.TemporaryDirectory() as directorio:
+        pool = PoolConexiones(os.path.join(directorio, "numeracion.db"), esquema="")
+        caido = NumeradorSeries(pool, tam_bloque=10, ttl=100, reloj=lambda: reloj[0])
+        emitidos = [caido.siguiente("F001") for _ in range(7)]  # 1..7; se cae sin cerrar
+        vivo = NumeradorSeries(pool, tam_bloque=10, ttl=100, reloj=lambda: reloj[0])
+        emitidos += [vivo.siguiente("F001") for _ in range(3)]  # 11..13
+        vivo.cerrar()  # devuelve 14..20
+
+        assert vivo.recuperar({"F001": emitidos}) == {}  # el bloque del caído aún no vence
+        reloj[0] += 100 + vivo.margen + 1
+        assert vivo.reporte()["F001"]["arrendados"][0]["vencido"]
+        # 6 y 7 salieron del numerador pero nunca llegaron a una venta guardada: se reemiten
+        assert vivo.recuperar({"F001": emitidos[:5] + emitidos[7:]}) == {"F001": [(6, 11)]}
+
+        emitidos = emitidos[:5] + emitidos[7:]
+        emitidos += [vivo.siguiente("F001") for _ in range(15)]
+        assert sorted(emitidos) == list(range(1, 24)) and len(set(emitidos)) == len(emitidos)
+        assert formatear("F001", emitidos[0]) == "F001-00000001" and separar("F001-00000001") == ("F001", 1)
+        pool.cerrar()
+
+
+def test_bloque_por_vencer_se_renueva_sin_perder_numeros():
+    reloj = [0.0]
+    with tempfile.TemporaryDirectory() as directorio:
+        pool = PoolConexiones(os.path.join(directorio, "numeracion.db"), esquema="")
+        numerador = NumeradorSeries(pool, tam_bloque=10, ttl=100, reloj=lambda: reloj[0])
+        primeros = [numerador.siguiente("B002") for _ in range(4)]
+        reloj[0] = 95  # dentro del margen: suelta 5..10 y arrienda de nuevo (primero lo devuelto)
+        siguientes = [numerador.siguiente("B002") for _ in range(8)]
+        assert primeros + siguientes == list(range(1, 13)) and numerador.arriendos == 3
+        pool.cerrar()
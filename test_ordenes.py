@@ -0,0 +1,95 @@
+# test_ordenes.py - Pruebas de los índices y colas del repositorio de órdenes en memoria
+import random
+
+import pytest
+
+from estados import TRANSICIONES, TransicionInvalida, modalidad
+from ordenes import RepositorioOrdenes
+
+
+def crear_orden(i: int) -> dict:
+    return {"orden_id": f"orden_{i:03d}", "user_id": f"user{i % 4}", "tienda_id": f"tienda_{i % 3}",
+            "estado": "pendiente", "isDelivery": i % 2 == 0, "items": [], "total": 10.0}
+
+
+def recorrer(repositorio, estado: str, modo=None, limite: int = 3) -> list:
+    vistas, cursor = [], None
+    while True:
+        pagina, cursor = repositorio.pagina(estado, modo, despues=cursor, limite=limite)
+        vistas += [orden["orden_id"] for orden in pagina]
+        if cursor is None:
+            return vistas
+
+
+def verificar_indices(repositorio):
+    """Cada índice coincide con recorrer todas las órdenes, sin grupos vacíos ni ids sobrantes"""
+    ordenes = list(repositorio)
+    for campo in repositorio.INDICES:
+        esperado = {}
+        for orden in ordenes:
+            esperado.setdefault(orden.get(campo), []).append(orden["orden_id"])
+        assert {valor: set(ids) for valor, ids in repositorio._indices[campo].items()} == \
+            {valor: set(ids) for valor, ids in esperado.items()}
+        for valor, ids in esperado.items():
+            assert sorted(o["orden_id"] for o in repositorio.buscar(campo, valor)) == sorted(ids)
+            assert repositorio.contar(campo, valor) == len(ids)
+    for (estado, modo), cola in repositorio._colas.items():
+        esperado = {o["orden_id"] for o in ordenes
+                    if o["estado"] == estado and (modo is None or modalidad(o) == modo)}
+        assert set(cola) == esperado and len(cola) == len(esperado)
+
+
+def test_indices_siguen_a_las_transiciones():
+    random.seed(3)
+    repositorio = RepositorioOrdenes()
+    for i in range(60):
+        repositorio.agregar(crear_orden(i))
+
+    for _ in range(300):
+        orden = random.choice(list(repositorio))
+        destino = random.choice(list(TRANSICIONES))
+        if destino in TRANSICIONES[orden["estado"]]:
+            repositorio.transicion(orden["orden_id"], destino, ultimo=destino)
+        else:
+            antes = orden["estado"]
+            with pytest.raises(TransicionInvalida):
+                repositorio.transicion(orden["orden_id"], destino)
+            assert repositorio.obtener(orden["orden_id"])["estado"] == antes
+    verificar_indices(repositorio)
+
+    # Cambiar campos indexados o la modalidad también reubica la orden
+    repositorio.actualizar("orden_000", user_id="user9", isDelivery=False)
+    repositorio.eliminar("orden_001")
+    verificar_indices(repositorio)
+    assert [o["orden_id"] for o in repositorio.por_usuario("user9")] == ["orden_000"]
+
+
+def test_pagina_despues_de_cambios_de_estado():
+    repositorio = RepositorioOrdenes()
+    for i in range(10):
+        repositorio.agregar(crear_orden(i))
+    for i in (7, 2, 9, 4, 0, 5):
+        repositorio.transicion(f"orden_{i:03d}", "pagada")
+
+    assert recorrer(repositorio, "pendiente") == ["orden_001", "orden_003", "orden_006", "orden_008"]
+    assert recorrer(repositorio, "pagada") == ["orden_007", "orden_002", "orden_009", "orden_004", "orden_000", "orden_005"]
+    assert recorrer(repositorio, "pagada", "delivery") == ["orden_002", "orden_004", "orden_000"]
+
+    # Un cursor tomado antes de que salgan órdenes de la cola sigue valiendo
+    primera, cursor = repositorio.pagina("pagada", limite=2)
+    assert [o["orden_id"] for o in primera] == ["orden_007", "orden_002"]
+    repositorio.transicion("orden_009", "vendida")
+    repositorio.transicion("orden_002", "en_delivery")
+    repositorio.transicion("orden_001", "pagada")  # entra al final de la cola
+    resto = []
+    while cursor is not None:
+        pagina, cursor = repositorio.pagina("pagada", despues=cursor, limite=2)
+        resto += [o["orden_id"] for o in pagina]
+    assert resto == ["orden_004", "orden_000", "orden_005", "orden_001"]
+
+    assert recorrer(repositorio, "pagada", "recojo") == ["orden_007", "orden_005", "orden_001"]
+    assert recorrer(repositorio, "vendida") == ["orden_009"]
+    assert recorrer(repositorio, "en_delivery", "delivery") == ["orden_002"]
+    assert repositorio.contar_cola("pagada") == 5 and repositorio.contar_cola("pendiente") == 3
+    assert repositorio.pagina("expirada") == ([], None)
+    verificar_indices(repositorio)
@@ -0,0 +1,116 @@
+# test_pasarela.py - Pruebas del cliente HTTP de la pasarela: reintentos, keep-alive y circuit breaker
+import asyncio
+import json
+
+import pytest
+
+from pasarela import CircuitoAbierto, PagoRechazado, PasarelaNoDisponible
+from pasarela_http import CircuitoPasarela, PasarelaHTTP
+
+
+async def servidor_guionado(respuestas):
+    """Servidor HTTP mínimo que contesta, en orden, los (estado, cuerpo) indicados"""
+    recibidas = []
+    conexiones = []
+
+    async def atender(lector, escritor):
+        conexiones.append(escritor)
+        while True:
+            cabeceras = {}
+            linea = await lector.readline()
+            if not linea:
+                break
+            while (linea := await lector.readline()) not in (b"\r\n", b""):
+                nombre, _, valor = linea.decode().partition(":")
+                cabeceras[nombre.strip().lower()] = valor.strip()
+            cuerpo = await lector.readexactly(int(cabeceras["content-length"]))
+            recibidas.append((cabeceras, json.loads(cuerpo)))
+            estado, datos = respuestas.pop(0)
+            datos = json.dumps(datos).encode()
+            escritor.write(f"HTTP/1.1 {estado} X\r\nContent-Length: {len(datos)}\r\n\r\n".encode() + datos)
+            await escritor.drain()
+        escritor.close()
+
+    servidor = await asyncio.start_server(atender, "127.0.0.1", 0)
+    return servidor, servidor.sockets[0].getsockname()[1], recibidas, conexiones
+
+
+def test_reintenta_5xx_y_reutiliza_la_conexion():
+    """Un 503 se reintenta con la misma clave de idempotencia; un 402 no se reintenta"""
+    async def escenario():
+        servidor, puerto, recibidas, conexiones = await servidor_guionado([
+            (503, {"detail": "Pasarela saturada"}),
+            (200, {"transaccion_id": "tx-1", "referencia": "REF-1"}),
+            (402, {"detail": "Fondos insuficientes"}),
+        ])
+        pasarela = PasarelaHTTP(f"http://127.0.0.1:{puerto}", reintentos=2, backoff=0.001)
+        autorizacion = await pasarela.autorizar("orden_1", 10.0, "tarjeta")
+        assert autorizacion == {"transaccion_id": "tx-1", "referencia": "REF-1"}
+        with pytest.raises(PagoRechazado, match="Fondos insuficientes"):
+            await pasarela.autorizar("orden_2", 10.0, "tarjeta")
+
+        claves = [c["idempotency-key"] for c, _ in recibidas]
+        assert claves[0] == claves[1] and claves[0].startswith("orden_1-") and claves[2].startswith("orden_2-")
+        assert len(conexiones) == 1 and pasarela.pool.reutilizadas == 2
+        assert pasarela.circuito.estado == "cerrado"
+        await pasarela.cerrar()
+        servidor.close()
+
+    asyncio.run(escenario())
+    print("✅ Reintentos idempotentes sobre una única conexión keep-alive")
+
+
+def test_claves_por_intento_de_pago_y_por_lote():
+    """Tras un rechazo, otra tarjeta es otro intento; un lote reintentado repite su clave"""
+    async def escenario():
+        servidor, puerto, recibidas, _ = await servidor_guionado([
+            (402, {"detail": "Fondos insuficientes"}),
+            (200, {"transaccion_id": "tx-1", "referencia": "REF-1"}),
+            (503, {"detail": "Pasarela saturada"}),
+            (200, {"resultados": [{"transaccion_id": "tx-2", "referencia": "REF-2"}, {"error": "Rechazado"}]}),
+        ])
+        pasarela = PasarelaHTTP(f"http://127.0.0.1:{puerto}", reintentos=2, backoff=0.001)
+        with pytest.raises(PagoRechazado):
+            await pasarela.autorizar("orden_1", 10.0, "tarjeta", {"tarjeta": "4000"})
+        await pasarela.autorizar("orden_1", 10.0, "tarjeta", {"tarjeta": "4111"})
+        pagos = [{"orden_id": f"orden_{i}", "monto": 5.0, "metodo": "tarjeta"} for i in (2, 3)]
+        resultados = await pasarela.autorizar_lote(pagos)
+        assert resultados[0]["transaccion_id"] == "tx-2" and isinstance(resultados[1], PagoRechazado)
+
+        claves = [c["idempotency-key"] for c, _ in recibidas]
+        assert claves[0] != claves[1]
+        assert claves[2] == claves[3] and claves[2].startswith("lote-")
+        assert len({pago["clave"] for pago in recibidas[2][1]["pagos"]}) == 2
+        await pasarela.cerrar()
+        servidor.close()
+
+    asyncio.run(escenario())
+
+
+def test_circuito_se_abre_y_se_recupera():
+    """Tras varios fallos el circuito rechaza sin llamar; pasado el tiempo deja pasar una prueba"""
+    reloj = [0.0]
+    circuito = CircuitoPasarela(umbral_fallos=3, tiempo_apertura=10, reloj=lambda: reloj[0])
+
+    async def escenario():
+        # Nada escucha en el puerto: cada llamada falla por conexión rechazada
+        pasarela = PasarelaHTTP("http://127.0.0.1:9", reintentos=0, circuito=circuito)
+        for _ in range(3):
+            with pytest.raises(PasarelaNoDisponible):
+                await pasarela.autorizar("orden_1", 10.0, "tarjeta")
+        assert circuito.estado == "abierto"
+        with pytest.raises(CircuitoAbierto):
+            await pasarela.autorizar("orden_1", 10.0, "tarjeta")
+
+    asyncio.run(escenario())
+    reloj[0] = 11
+    assert circuito.permitir() and circuito.estado == "semiabierto"
+    assert not circuito.permitir()  # solo una llamada de prueba a la vez
+    circuito.exito()
+    assert circuito.estado == "cerrado" and circuito.permitir()
+    print("✅ Circuit breaker abre, rechaza y se recupera")
+
+
+if __name__ == "__main__":
+    test_reintenta_5xx_y_reutiliza_la_conexion()
+    test_circuito_se_abre_y_se_recupera()
@@ -0,0 +1,62 @@
+# test_recolector.py - Pruebas del recolector de carritos y órdenes abandonados
+import datetime
+
+from almacen import crear_almacen_memoria
+from recolector import Recolector, Vencimientos
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000.0
+
+    def __call__(self) -> float:
+        return self.ahora
+
+
+def crear_orden(orden_id: str, estado: str = "pendiente"):
+    return {"orden_id": orden_id, "user_id": "user1", "tienda_id": "tienda_1", "estado": estado,
+            "items": [], "total": 0, "fecha_creacion": datetime.datetime.now().isoformat()}
+
+
+def test_vencimientos_solo_devuelve_el_vigente():
+    vencimientos = Vencimientos()
+    vencimientos.programar("a", 10)
+    vencimientos.programar("b", 20)
+    vencimientos.programar("a", 30)  # reprogramada: la entrada de 10 queda obsoleta
+    vencimientos.programar("c", 5)
+    vencimientos.cancelar("c")
+    assert vencimientos.vencidas(25) == ["b"]
+    assert vencimientos.vencidas(30) == ["a"]
+    assert len(vencimientos) == 0
+
+
+def test_recolecta_carritos_y_ordenes_y_libera_stock():
+    stock = {"tienda_1": {"producto_1": {"nombre": "P1", "precio": 1.0, "stock": 10}}}
+    almacen = crear_almacen_memoria(stock, ttl_reserva=0)
+    reloj = Reloj()
+    recolector = Recolector(almacen, ttl_carrito=100, ttl_orden=50, reloj=reloj)
+
+    almacen.carritos.guardar("cart_1", {"items": {}})
+    almacen.carritos.guardar("cart_2", {"items": {}})
+    recolector.tocar_carrito("cart_1")
+    recolector.tocar_carrito("cart_2")
+    for orden_id, estado in (("orden_1", "pendiente"), ("orden_2", "pagada"), ("orden_3", "pendiente")):
+        almacen.ordenes.agregar(crear_orden(orden_id, estado))
+        recolector.programar_orden(orden_id)
+    almacen.stock.reservar("orden_1", "tienda_1", [("producto_1", 4)], ttl=3_600)
+    almacen.stock.reservar("orden_3", "tienda_1", [("producto_1", 2)], ttl=3_600)
+    almacen.stock.fijar("orden_3")  # se está pagando: no se toca
+
+    reloj.ahora += 60
+    recolector.tocar_carrito("cart_2")  # actividad: su vencimiento se corre
+    assert recolector.recolectar() == 1
+    assert almacen.ordenes.obtener("orden_1") is None
+    assert almacen.ordenes.obtener("orden_2") is not None
+    assert almacen.ordenes.obtener("orden_3") is not None
+    assert almacen.stock.producto("tienda_1", "producto_1")["stock"] == 8
+
+    reloj.ahora += 50
+    assert recolector.recolectar() == 1
+    assert "cart_1" not in almacen.carritos and "cart_2" in almacen.carritos
+    assert recolector.estadisticas() == {"carritos_eliminados": 1, "ordenes_eliminadas": 1,
+                                         "reservas_liberadas": 1, "programados": 1}
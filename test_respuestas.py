@@ -0,0 +1,52 @@
+# test_respuestas.py - Pruebas del codificador de respuestas y de RutaRapida
+import asyncio
+import json
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from respuestas import RutaRapida, codificar
+
+
+class Item(BaseModel):
+    producto_id: str
+    cantidad: int
+
+
+def llamar(aplicacion, ruta: str):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": ruta, "raw_path": ruta.encode(), "query_string": b"x=2",
+             "root_path": "", "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 8000), "headers": []}
+    respuesta = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensaje):
+        if mensaje["type"] == "http.response.start":
+            respuesta["estado"] = mensaje["status"]
+        elif mensaje["type"] == "http.response.body":
+            respuesta["cuerpo"] = respuesta.get("cuerpo", b"") + mensaje.get("body", b"")
+
+    asyncio.run(aplicacion(scope, receive, send))
+    return respuesta["estado"], json.loads(respuesta["cuerpo"])
+
+
+def test_ruta_rapida_mismo_json():
+    """Mismo contenido que el camino por defecto, con parámetros y status_code intactos"""
+    aplicacion = FastAPI()
+    aplicacion.router.route_class = RutaRapida
+
+    @aplicacion.get("/orden/{orden_id}", status_code=201)
+    async def orden(orden_id: str, x: int):
+        return {"orden_id": orden_id, "x": x, "items": [Item(producto_id="p1", cantidad=x)], "nota": "ñandú"}
+
+    assert llamar(aplicacion, "/orden/o1") == (
+        201, {"orden_id": "o1", "x": 2, "items": [{"producto_id": "p1", "cantidad": 2}], "nota": "ñandú"}
+    )
+    assert codificar({"a": [1.5, None]}) == b'{"a":[1.5,null]}'
+    print("✅ RutaRapida codifica sin jsonable_encoder")
+
+
+if __name__ == "__main__":
+    test_ruta_rapida_mismo_json()
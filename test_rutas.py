@@ -0,0 +1,35 @@
+# test_rutas.py - Pruebas de la agrupación de entregas en rutas
+import random
+
+from rutas import distancia_individual, dos_opt, planificar_rutas
+
+ORIGEN = (-12.0464, -77.0428)
+
+
+def crear_paradas(cantidad: int, semilla: int = 6):
+    azar = random.Random(semilla)
+    return [(f"orden_{i}", ORIGEN[0] + azar.uniform(-6, 6) / 110.574, ORIGEN[1] + azar.uniform(-6, 6) / 108.0)
+            for i in range(cantidad)]
+
+
+def test_rutas_cubren_todo_y_respetan_capacidad():
+    paradas = crear_paradas(200)
+    rutas = planificar_rutas(ORIGEN, paradas, capacidad=7)
+    visitadas = [clave for ruta in rutas for clave in ruta["paradas"]]
+    assert sorted(visitadas) == sorted(clave for clave, _, _ in paradas)
+    assert all(1 <= len(ruta["paradas"]) <= 7 for ruta in rutas)
+    for ruta in rutas:
+        assert ruta["km_acumulados"] == sorted(ruta["km_acumulados"])
+        assert ruta["km_acumulados"][-1] <= ruta["distancia_km"]
+
+
+def test_dos_opt_no_empeora_y_agrupar_ahorra():
+    paradas = crear_paradas(300, semilla=9)
+    sin_mejorar = sum(r["distancia_km"] for r in planificar_rutas(ORIGEN, paradas, capacidad=8, mejorar=False))
+    mejoradas = sum(r["distancia_km"] for r in planificar_rutas(ORIGEN, paradas, capacidad=8))
+    assert mejoradas <= sin_mejorar + 1e-6
+    assert mejoradas < distancia_individual(ORIGEN, paradas) / 2
+
+    # Un cuadrado recorrido en cruz se desenreda
+    cruzado = [(0, 0), (1, 1), (1, 0), (0, 1), (0, 0)]
+    assert dos_opt(cruzado) in ([1, 0, 2], [2, 0, 1])
@@ -0,0 +1,96 @@
+# test_sesiones.py - Pruebas del almacén de sesiones con un reloj inyectado
+import time
+
+from sesiones import AlmacenSesiones
+
+USER = {"id": "user1", "nombre": "Juan", "es_admin": False}
+
+
+class Reloj:
+    """Reloj manual: el tiempo solo avanza cuando la prueba lo pide"""
+
+    def __init__(self):
+        self.ahora = 1_000.0
+
+    def __call__(self) -> float:
+        return self.ahora
+
+    def avanzar(self, segundos: float):
+        self.ahora += segundos
+
+
+def test_sesion_vence_al_cumplir_el_ttl():
+    reloj = Reloj()
+    sesiones = AlmacenSesiones(ttl=60, reloj=reloj)
+    token = sesiones.crear(USER)
+
+    reloj.avanzar(59.9)
+    assert sesiones.obtener(token) == {"id": "user1", "nombre": "Juan", "es_admin": False}
+    reloj.avanzar(60)
+    assert sesiones.obtener(token) is None
+    assert token not in sesiones and sesiones.expiradas == 1
+
+
+def test_acceso_renueva_la_expiracion():
+    reloj = Reloj()
+    sesiones = AlmacenSesiones(ttl=60, reloj=reloj)
+    activa, inactiva = sesiones.crear(USER), sesiones.crear(USER)
+
+    # Cada acceso antes del vencimiento corre el plazo otros 60 s
+    for _ in range(5):
+        reloj.avanzar(45)
+        assert sesiones.obtener(activa) is not None
+    assert sesiones.obtener(inactiva) is None
+    reloj.avanzar(59)
+    assert sesiones.obtener(activa) is not None
+
+
+def test_tope_desaloja_la_menos_usada():
+    reloj = Reloj()
+    sesiones = AlmacenSesiones(ttl=60, max_sesiones=3, reloj=reloj)
+    tokens = []
+    for _ in range(3):
+        tokens.append(sesiones.crear(USER))
+        reloj.avanzar(1)
+    sesiones.obtener(tokens[0])  # la más antigua pasa a ser la más reciente
+
+    nuevo = sesiones.crear(USER)
+    assert len(sesiones) == 3 and sesiones.desalojadas == 1
+    assert tokens[1] not in sesiones
+    assert all(token in sesiones for token in (tokens[0], tokens[2], nuevo))
+
+
+def test_barrer_quita_solo_las_vencidas():
+    reloj = Reloj()
+    sesiones = AlmacenSesiones(ttl=60, reloj=reloj)
+    viejas = [sesiones.crear(USER) for _ in range(3)]
+    reloj.avanzar(30)
+    nuevas = [sesiones.crear(USER) for _ in range(2)]
+    reloj.avanzar(31)
+
+    assert sesiones.barrer() == 3
+    assert not any(token in sesiones for token in viejas)
+    assert all(token in sesiones for token in nuevas)
+    assert sesiones.expiradas == 3 and sesiones.barrer() == 0
+
+
+def test_barrido_en_segundo_plano():
+    reloj = Reloj()
+    sesiones = AlmacenSesiones(ttl=60, intervalo_barrido=0.01, reloj=reloj)
+    vencida = sesiones.crear(USER)
+    reloj.avanzar(61)
+    vigente = sesiones.crear(USER)
+
+    sesiones.iniciar_barrido()
+    sesiones.iniciar_barrido()  # idempotente: un solo hilo
+    limite = time.monotonic() + 2
+    while vencida in sesiones and time.monotonic() < limite:
+        time.sleep(0.01)
+    sesiones.detener_barrido()
+
+    assert vencida not in sesiones and vigente in sesiones
+    assert sesiones._hilo is None
+    # Detenido, ya no barre aunque venzan más
+    reloj.avanzar(61)
+    time.sleep(0.05)
+    assert vigente in sesiones
@@ -0,0 +1,162 @@
+# test_stock.py - Prueba de concurrencia del motor de reservas de stock
+import threading
+
+from stock import MotorStock, StockInsuficiente
+from stock_columnar import MotorStockColumnar
+
+HILOS = 300
+STOCK_INICIAL = 1000
+
+
+def crear_stock():
+    return {
+        "tienda_fisica_1": {
+            f"producto_{i:03d}": {"nombre": f"Producto {i}", "precio": 1.0, "stock": STOCK_INICIAL}
+            for i in range(1, 6)
+        }
+    }
+
+
+def test_reservas_concurrentes_no_sobrevenden():
+    """Cientos de hilos compran el mismo stock: nunca queda negativo ni se sobrevende"""
+    print("\n" + "="*70)
+    print("PRUEBA DE CONCURRENCIA: RESERVAS DE STOCK")
+    print("="*70)
+
+    stock = crear_stock()
+    motor = MotorStock(stock)
+    exitosas = []
+    rechazadas = []
+    lock = threading.Lock()
+    inicio = threading.Barrier(HILOS)
+
+    def comprador(n):
+        inicio.wait()
+        for intento in range(20):
+            reserva_id = f"orden_{n}_{intento}"
+            items = [("producto_001", 3), (f"producto_{(n % 5) + 1:03d}", 2)]
+            try:
+                motor.reservar(reserva_id, "tienda_fisica_1", items)
+            except StockInsuficiente:
+                with lock:
+                    rechazadas.append(reserva_id)
+                continue
+            # Una de cada cuatro compras se cancela y devuelve su stock
+            if intento % 4 == 3:
+                motor.liberar(reserva_id)
+            else:
+                motor.confirmar(reserva_id)
+                with lock:
+                    exitosas.append(items)
+
+    hilos = [threading.Thread(target=comprador, args=(n,)) for n in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    vendidos = {}
+    for items in exitosas:
+        for producto_id, cantidad in items:
+            vendidos[producto_id] = vendidos.get(producto_id, 0) + cantidad
+
+    for producto_id, entrada in stock["tienda_fisica_1"].items():
+        assert entrada["stock"] >= 0, f"Stock negativo en {producto_id}"
+        assert entrada["stock"] + vendidos.get(producto_id, 0) == STOCK_INICIAL, f"Unidades perdidas en {producto_id}"
+        print(f"   📦 {producto_id}: vendidos {vendidos.get(producto_id, 0)}, restante {entrada['stock']}")
+
+    print(f"✅ {len(exitosas)} compras confirmadas, {len(rechazadas)} rechazadas por falta de stock")
+
+
+def test_reservas_vencidas_devuelven_stock():
+    """Las reservas sin pagar vencen y devuelven el stock; las fijadas no"""
+    reloj = [0.0]
+    stock = crear_stock()
+    motor = MotorStock(stock, ttl_reserva=10, reloj=lambda: reloj[0])
+    vencidas = []
+    motor.al_liberar_vencida = vencidas.append
+
+    motor.reservar("orden_a", "tienda_fisica_1", [("producto_001", 5)])
+    motor.reservar("orden_b", "tienda_fisica_1", [("producto_001", 7)])
+    motor.fijar("orden_b")
+    assert stock["tienda_fisica_1"]["producto_001"]["stock"] == STOCK_INICIAL - 12
+
+    reloj[0] = 11
+    assert motor.liberar_vencidas() == ["orden_a"]
+    assert vencidas == ["orden_a"]
+    assert stock["tienda_fisica_1"]["producto_001"]["stock"] == STOCK_INICIAL - 7
+    assert not motor.liberar("orden_b", si_no_fijada=True)
+    print("✅ Reservas vencidas liberadas correctamente")
+
+
+def test_indice_tiendas_sigue_al_stock():
+    """Una tienda sale del índice al agotar un producto y vuelve al liberarse la reserva"""
+    stock = crear_stock()
+    stock["tienda_fisica_2"] = {"producto_001": {"nombre": "Producto 1", "precio": 1.0, "stock": 2}}
+    motor = MotorStock(stock)
+    assert sorted(motor.tiendas_con_stock([("producto_001", 1)])) == ["tienda_fisica_1", "tienda_fisica_2"]
+    assert motor.tiendas_con_stock([("producto_001", 1), ("producto_002", 1)]) == ["tienda_fisica_1"]
+    assert motor.tiendas_con_stock([("producto_001", 1), ("producto_001", 2)]) == ["tienda_fisica_1"]
+
+    motor.reservar("orden_a", "tienda_fisica_2", [("producto_001", 2)])
+    assert motor.tiendas_con_stock([("producto_001", 1)]) == ["tienda_fisica_1"]
+    motor.liberar("orden_a")
+    assert "tienda_fisica_2" in motor.tiendas_con_stock([("producto_001", 2)])
+    print("✅ Índice producto -> tiendas actualizado con cada cambio de stock")
+
+
+def test_columnar_equivale_al_dict():
+    """Mismas lecturas, reservas y reportes con el stock en columnas"""
+    def crear(clase):
+        stock = crear_stock()
+        stock["tienda_fisica_2"] = {
+            "producto_003": {"nombre": "Producto 3", "precio": 2.5, "stock": 4},
+            "producto_001": {"nombre": "Producto 1", "precio": 1.0, "stock": 2},
+        }
+        return clase(stock)
+
+    dict_, columnar = crear(MotorStock), crear(MotorStockColumnar)
+    for motor in (dict_, columnar):
+        motor.reservar("orden_a", "tienda_fisica_2", [("producto_001", 2), ("producto_003", 1)])
+        motor.establecer("tienda_fisica_1", "producto_002", 3)
+        try:
+            motor.reservar("orden_b", "tienda_fisica_2", [("producto_003", 5)])
+        except StockInsuficiente:
+            pass
+    for consulta in (
+        lambda m: m.inventario("tienda_fisica_2"),
+        lambda m: m.producto("tienda_fisica_1", "producto_002"),
+        lambda m: m.producto("tienda_fisica_2", "producto_002"),
+        lambda m: sorted(m.tiendas_con_stock([("producto_001", 1)])),
+        lambda m: m.tiendas_con_stock([("producto_001", 1), ("producto_003", 1)]),
+        lambda m: m.unidades_por_producto(),
+        lambda m: {t: sorted(p) for t, p in m.bajo_umbral(5).items()},
+        lambda m: m.valorizacion(),
+        lambda m: sorted(m.exportar()),
+    ):
+        assert consulta(dict_) == consulta(columnar)
+    columnar.liberar("orden_a")
+    assert columnar.producto("tienda_fisica_2", "producto_001")["stock"] == 2
+    assert columnar.version("tienda_fisica_2") > columnar.version("tienda_fisica_1")
+    print("✅ Stock en columnas equivalente al dict")
+
+
+def test_producto_repetido_se_valida_por_su_total():
+    """Un producto que aparece dos veces en la reserva no puede dejar el stock negativo"""
+    for clase in (MotorStock, MotorStockColumnar):
+        motor = clase({"tienda_fisica_1": {"producto_001": {"nombre": "P1", "precio": 1.0, "stock": 4}}})
+        try:
+            motor.reservar("orden_1", "tienda_fisica_1", [("producto_001", 3), ("producto_001", 2)])
+            assert False, "Debió rechazarse por falta de stock"
+        except StockInsuficiente:
+            pass
+        assert motor.producto("tienda_fisica_1", "producto_001")["stock"] == 4
+
+
+if __name__ == "__main__":
+    test_reservas_concurrentes_no_sobrevenden()
+    test_reservas_vencidas_devuelven_stock()
+    test_indice_tiendas_sigue_al_stock()
+    test_columnar_equivale_al_dict()
+    test_producto_repetido_se_valida_por_su_total()
+
@@ -0,0 +1,129 @@
+# test_stock_compartido.py - Prueba multiproceso del stock en memoria compartida
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import Counter
+
+import pytest
+
+from almacen import crear_almacen_memoria
+from almacen_async import AlmacenAsync
+from stock import StockInsuficiente
+from stock_compartido import LockCompartido, MotorStockCompartido
+
+PROCESOS = 4
+INTENTOS = 4_000
+STOCK_INICIAL = 30_000
+
+
+def crear_stock():
+    return {
+        "tienda_fisica_1": {
+            f"producto_{i:03d}": {"nombre": f"Producto {i}", "precio": 1.0, "stock": STOCK_INICIAL}
+            for i in range(1, 6)
+        },
+        "tienda_virtual_1": {"producto_001": {"nombre": "Producto 1", "precio": 1.0, "stock": STOCK_INICIAL}}
+    }
+
+
+def comprador(nombre: str, ruta_locks: str, n: int, resultados):
+    """Un worker: se conecta al segmento y compra hasta agotar el producto más pedido"""
+    motor = MotorStockCompartido(crear_stock(), nombre=nombre, ruta_locks=ruta_locks)
+    vendidos = Counter()
+    for intento in range(INTENTOS):
+        reserva_id = f"orden_{n}_{intento}"
+        items = [("producto_001", 3), (f"producto_{(n + intento) % 5 + 1:03d}", 2)]
+        try:
+            motor.reservar(reserva_id, "tienda_fisica_1", items)
+        except StockInsuficiente:
+            continue
+        if intento % 4 == 3:
+            motor.liberar(reserva_id)
+        else:
+            motor.confirmar(reserva_id)
+            for producto_id, cantidad in items:
+                vendidos[producto_id] += cantidad
+    resultados.put(dict(vendidos))
+    motor.cerrar()
+
+
+def test_procesos_no_sobrevenden():
+    """Varios procesos descuentan del mismo segmento: nunca negativo ni unidades perdidas"""
+    print("\n" + "="*70)
+    print(f"PRUEBA MULTIPROCESO: STOCK EN MEMORIA COMPARTIDA ({PROCESOS} procesos)")
+    print("="*70)
+    nombre = f"mifarma_prueba_{os.getpid()}"
+    ruta_locks = os.path.join(tempfile.gettempdir(), f"{nombre}.lock")
+    MotorStockCompartido.eliminar_segmento(nombre)
+    motor = MotorStockCompartido(crear_stock(), nombre=nombre, ruta_locks=ruta_locks)
+    version_inicial = motor.version("tienda_fisica_1")
+    try:
+        resultados = multiprocessing.Queue()
+        procesos = [multiprocessing.Process(target=comprador, args=(nombre, ruta_locks, n, resultados))
+                    for n in range(PROCESOS)]
+        for proceso in procesos:
+            proceso.start()
+        vendidos = Counter()
+        for _ in procesos:
+            vendidos.update(resultados.get(timeout=60))
+        for proceso in procesos:
+            proceso.join()
+
+        for producto_id, entrada in motor.inventario("tienda_fisica_1").items():
+            assert entrada["stock"] >= 0, f"Stock negativo en {producto_id}"
+            assert entrada["stock"] + vendidos[producto_id] == STOCK_INICIAL, f"Unidades perdidas en {producto_id}"
+            print(f"   📦 {producto_id}: vendidos {vendidos[producto_id]}, restante {entrada['stock']}")
+        # El producto más pedido se agota (hubo competencia real por las últimas unidades)
+        assert motor.producto("tienda_fisica_1", "producto_001")["stock"] < 3
+        assert motor.producto("tienda_virtual_1", "producto_001")["stock"] == STOCK_INICIAL
+        # Las versiones compartidas reflejan los cambios de los otros procesos
+        assert motor.version("tienda_fisica_1") > version_inicial
+        assert motor.tiendas_con_stock([("producto_001", 3)]) == ["tienda_virtual_1"]
+        print("✅ Sin sobreventa entre procesos")
+    finally:
+        motor.cerrar()
+        MotorStockCompartido.eliminar_segmento(nombre)
+        os.remove(ruta_locks)
+
+
+def test_lock_suelta_el_hilo_si_falla_el_archivo():
+    """Si lockf falla, el lock de hilo se suelta y el siguiente intento no se cuelga"""
+    fd, ruta = tempfile.mkstemp()
+    os.close(fd)
+    lock = LockCompartido(fd, 0)  # descriptor ya cerrado: lockf lanza EBADF
+    with pytest.raises(OSError):
+        lock.acquire()
+    assert lock._hilos.acquire(blocking=False)
+    lock._hilos.release()
+    with pytest.raises(OSError):
+        with lock:
+            pass
+    assert lock._hilos.acquire(blocking=False)
+    os.remove(ruta)
+
+
+def test_stock_compartido_corre_fuera_del_event_loop():
+    """Con hilos_stock, las llamadas al motor (que esperan locks de fcntl) van al pool del stock"""
+    nombre = f"mifarma_prueba_async_{os.getpid()}"
+    MotorStockCompartido.eliminar_segmento(nombre)
+    almacen = crear_almacen_memoria(crear_stock(), stock_compartido=nombre)
+    almacen_async = AlmacenAsync(almacen, hilos_stock=2)
+    hilos = []
+    reservar = almacen.stock.reservar
+
+    def reservar_registrando(*args, **kwargs):
+        hilos.append(threading.current_thread().name)
+        return reservar(*args, **kwargs)
+
+    almacen.stock.reservar = reservar_registrando
+    try:
+        asyncio.run(almacen_async.stock.reservar("orden_1", "tienda_fisica_1", [("producto_001", 3)]))
+        assert hilos and hilos[0].startswith("stock")
+        assert almacen_async.ordenes._ejecutor is None  # el resto sigue en el event loop
+        assert almacen.stock.producto("tienda_fisica_1", "producto_001")["stock"] == STOCK_INICIAL - 3
+    finally:
+        almacen_async.cerrar()
+        MotorStockCompartido.eliminar_segmento(nombre)
+        os.remove(almacen.stock.ruta_locks)
@@ -0,0 +1,15 @@
+# test_tokens.py - Pruebas de los tokens firmados
+from tokens import FirmadorTokens
+
+USUARIO = {"id": "user1", "nombre": "Cliente Normal", "es_admin": False}
+
+
+def test_token_valido_y_alterados():
+    firmador = FirmadorTokens(b"secreto")
+    token = firmador.crear(USUARIO)
+    assert firmador.obtener(token)["id"] == "user1"
+    payload, _, firma = token.partition(".")
+    otra = firma[:-1] + ("B" if firma.endswith("A") else "A")
+    # Firma ajena, con caracteres no ASCII o sin firma: inválido, nunca una excepción
+    for alterado in (f"{payload}.{otra}", "abc.ñ", f"{payload}.é", "é.abc", payload, ""):
+        assert firmador.obtener(alterado) is None
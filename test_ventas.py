@@ -0,0 +1,59 @@
+# test_ventas.py - Pruebas del libro de ventas en modo normal y compacto
+import os
+import tempfile
+import threading
+
+from almacen_sqlite import LibroVentasSQLite, PoolConexiones
+from ventas import LibroVentas
+
+
+def crear_venta(i: int) -> dict:
+    return {
+        "venta_id": f"venta_{i}", "orden_id": f"orden_{i}", "user_id": "user1", "tienda_id": "tienda_1",
+        "items": [{"producto_id": "producto_001", "nombre": "Paracetamol", "cantidad": 2,
+                   "precio_unitario": 5.5, "subtotal": 11.0, "isDelivery": False}],
+        "total": 11.0, "isDelivery": False, "comprobante": "boleta", "estado": "completada",
+        "fecha_venta": "2026-10-17T10:30:00"
+    }
+
+
+def test_lecturas_devuelven_copias_en_ambos_modos():
+    for compacto in (False, True):
+        libro = LibroVentas(compacto=compacto)
+        venta = crear_venta(1)
+        libro.agregar(venta)
+        venta["total"] = 0  # el dict agregado tampoco queda enlazado al libro
+
+        for leida in (libro.obtener("venta_1"), libro.por_orden("orden_1"), libro.por_tienda("tienda_1")[0],
+                      next(iter(libro)), libro.actualizar("venta_1", boleta_numero="B001-00000001")):
+            leida["estado"] = "anulada"
+            leida["items"][0]["cantidad"] = 99
+            leida["items"].append({})
+
+        guardada = libro.obtener("venta_1")
+        assert guardada["total"] == 11.0 and guardada["estado"] == "completada", compacto
+        assert guardada["items"] == crear_venta(1)["items"], compacto
+        assert guardada["boleta_numero"] == "B001-00000001" and guardada["comprobante"] == "boleta", compacto
+
+
+def test_actualizar_si_un_solo_ganador():
+    with tempfile.TemporaryDirectory() as directorio:
+        pool = PoolConexiones(os.path.join(directorio, "ventas.db"))
+        for libro in (LibroVentas(), LibroVentas(compacto=True), LibroVentasSQLite(pool)):
+            libro.agregar(crear_venta(1))
+            ganadores = []
+
+            def reclamar(n: int):
+                if libro.actualizar_si("venta_1", "factura_reclamo", None, factura_reclamo=n):
+                    ganadores.append(n)
+
+            hilos = [threading.Thread(target=reclamar, args=(n,)) for n in range(8)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            assert len(ganadores) == 1 and libro.obtener("venta_1")["factura_reclamo"] == ganadores[0]
+            assert libro.actualizar_si("venta_1", "factura_reclamo", -1, factura="F001-00000001") is None
+            venta = libro.actualizar_si("venta_1", "factura_reclamo", ganadores[0], factura="F001-00000001")
+            assert venta["factura"] == libro.obtener("venta_1")["factura"] == "F001-00000001"
+        pool.cerrar()
@@ -0,0 +1,91 @@
+# tokens.py - Tokens de sesión firmados con HMAC (sin estado compartido entre workers)
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode("ascii")
+
+
+def _unb64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+class FirmadorTokens:
+    """Emite y verifica tokens `payload.firma` firmados con HMAC-SHA256.
+
+    El payload lleva el id de usuario, nombre, flag de admin y expiración, así
+    que cualquier worker con el mismo secreto puede validar el token sin
+    consultar memoria compartida. Los tokens ya verificados se guardan en una
+    caché LRU pequeña para que las peticiones repetidas no recalculen el HMAC.
+
+    Expone la misma interfaz que AlmacenSesiones (crear/obtener) para que
+    app.py pueda usar cualquiera de los dos.
+    """
+
+    def __init__(self, secreto: bytes, ttl: float = 1800, tamano_cache: int = 4096, reloj=time.time):
+        if not secreto:
+            raise ValueError("Se requiere un secreto para firmar tokens")
+        self._secreto = secreto
+        self.ttl = ttl
+        self.tamano_cache = tamano_cache
+        self._reloj = reloj
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _firmar(self, payload: str) -> str:
+        return _b64(hmac.new(self._secreto, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def crear(self, user: Dict) -> str:
+        """Emite un token firmado para el usuario"""
+        claims = {"u": user["id"], "n": user["nombre"], "a": user["es_admin"], "e": int(self._reloj() + self.ttl)}
+        payload = _b64(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        return f"{payload}.{self._firmar(payload)}"
+
+    def _verificar(self, token: str) -> Optional[Dict]:
+        payload, _, firma = token.partition(".")
+        # Como bytes: compare_digest rechaza (TypeError) los str con caracteres no ASCII
+        if not firma or not hmac.compare_digest(firma.encode("utf-8"), self._firmar(payload).encode("ascii")):
+            return None
+        try:
+            claims = json.loads(_unb64(payload))
+        except ValueError:
+            return None
+        return {"id": claims["u"], "nombre": claims["n"], "es_admin": claims["a"], "expira": claims["e"]}
+
+    def obtener(self, token: str) -> Optional[Dict]:
+        """Valida firma y expiración; None si el token no es válido"""
+        ahora = self._reloj()
+        with self._lock:
+            verificado = self._cache.get(token)
+            if verificado is not None:
+                self._cache.move_to_end(token)
+        if verificado is None:
+            try:
+                verificado = self._verificar(token)
+            except (UnicodeError, ValueError):
+                verificado = None
+            if verificado is None:
+                return None
+            with self._lock:
+                self._cache[token] = verificado
+                if len(self._cache) > self.tamano_cache:
+                    self._cache.popitem(last=False)
+        if verificado["expira"] <= ahora:
+            with self._lock:
+                self._cache.pop(token, None)
+            return None
+        return {"id": verificado["id"], "nombre": verificado["nombre"], "es_admin": verificado["es_admin"]}
+
+    # Los tokens firmados no guardan estado, así que no hay nada que barrer
+    def iniciar_barrido(self):
+        pass
+
+    def detener_barrido(self):
+        pass
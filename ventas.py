@@ -0,0 +1,130 @@
+# ventas.py - Libro de ventas indexado con modo de almacenamiento compacto
+import json
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Campos fijos de una venta, en el orden en que se guardan en modo compacto
+CAMPOS_VENTA = (
+    "venta_id", "orden_id", "user_id", "tienda_id", "items", "total",
+    "isDelivery", "direccion_entrega", "costo_delivery", "tienda_recojo",
+    "comprobante", "estado", "fecha_venta",
+)
+
+# Campos fijos de cada item de venta (mismos que los items de la orden)
+CAMPOS_ITEM = ("producto_id", "nombre", "cantidad", "precio_unitario", "subtotal", "isDelivery")
+
+
+def _copiar(venta: Dict) -> Dict:
+    """Copia de la venta y de sus items (los demás campos son valores que se reemplazan, no se modifican)"""
+    copia = dict(venta)
+    if "items" in copia:
+        copia["items"] = [dict(item) for item in copia["items"]]
+    return copia
+
+
+class LibroVentas:
+    """Libro de ventas append-only con índices por venta_id, orden_id y tienda_id.
+
+    En modo normal cada venta se guarda como dict. En modo compacto se guarda
+    como tupla (y sus items como tuplas), y los campos que se agregan después
+    (factura, boleta, registro en BD) van en un dict aparte solo para las
+    ventas que los tienen. Las lecturas devuelven siempre un dict nuevo, así
+    que modificarlo no cambia el libro en ninguno de los dos modos; para
+    modificar una venta se usa `actualizar`.
+    """
+
+    def __init__(self, compacto: bool = False):
+        self.compacto = compacto
+        self._filas: List = []
+        self._extras: Dict[int, Dict] = {}
+        self._por_venta: Dict[str, int] = {}
+        self._por_orden: Dict[str, int] = {}
+        self._por_tienda: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self.journal = None  # Journal opcional donde se registra cada cambio
+
+    # ----- CODIFICACIÓN -----
+    def _codificar(self, venta: Dict):
+        if not self.compacto:
+            return _copiar(venta)
+        items = tuple(tuple(item.get(campo) for campo in CAMPOS_ITEM) for item in venta.get("items", ()))
+        return tuple(items if campo == "items" else venta.get(campo) for campo in CAMPOS_VENTA)
+
+    def _decodificar(self, posicion: int) -> Dict:
+        fila = self._filas[posicion]
+        if not self.compacto:
+            return _copiar(fila)
+        venta = dict(zip(CAMPOS_VENTA, fila))
+        venta["items"] = [dict(zip(CAMPOS_ITEM, item)) for item in venta["items"]]
+        venta.update(self._extras.get(posicion, ()))
+        return venta
+
+    # ----- ESCRITURA -----
+    def agregar(self, venta: Dict) -> Dict:
+        """Registra una venta nueva al final del libro"""
+        venta_id = venta["venta_id"]
+        fila = self._codificar(venta)
+        with self._lock:
+            if venta_id in self._por_venta:
+                raise KeyError(f"La venta {venta_id} ya existe")
+            posicion = len(self._filas)
+            self._filas.append(fila)
+            self._por_venta[venta_id] = posicion
+            self._por_orden[venta["orden_id"]] = posicion
+            self._por_tienda.setdefault(venta["tienda_id"], []).append(posicion)
+            if self.journal is not None:
+                self.journal.registrar("venta", venta_id, venta)
+        return venta
+
+    def actualizar(self, venta_id: str, **campos) -> Dict:
+        """Agrega o modifica campos de una venta (factura, boleta, registro, etc.)"""
+        return self.actualizar_si(venta_id, None, None, **campos)
+
+    def actualizar_si(self, venta_id: str, campo: Optional[str], esperado, **campos) -> Optional[Dict]:
+        """Como `actualizar`, pero solo si `campo` vale `esperado` (None si falta); si no, devuelve None"""
+        with self._lock:
+            posicion = self._por_venta[venta_id]
+            if campo is not None and self._decodificar(posicion).get(campo) != esperado:
+                return None
+            if self.compacto:
+                extras = self._extras.setdefault(posicion, {})
+                extras.update(campos)
+            else:
+                self._filas[posicion].update(campos)
+            venta = self._decodificar(posicion)
+            if self.journal is not None:
+                self.journal.registrar("venta", venta_id, venta)
+            return venta
+
+    # ----- LECTURA -----
+    def obtener(self, venta_id: str) -> Optional[Dict]:
+        """Busca una venta por venta_id en O(1)"""
+        posicion = self._por_venta.get(venta_id)
+        return None if posicion is None else self._decodificar(posicion)
+
+    def por_orden(self, orden_id: str) -> Optional[Dict]:
+        """Venta generada a partir de una orden, si existe"""
+        posicion = self._por_orden.get(orden_id)
+        return None if posicion is None else self._decodificar(posicion)
+
+    def por_tienda(self, tienda_id: str) -> List[Dict]:
+        """Ventas de una tienda en orden de registro"""
+        with self._lock:
+            posiciones = list(self._por_tienda.get(tienda_id, ()))
+        return [self._decodificar(posicion) for posicion in posiciones]
+
+    def exportar(self) -> Iterator[Tuple[str, str]]:
+        """(venta_id, venta en JSON) de cada venta, serializada bajo el lock"""
+        for venta_id, posicion in list(self._por_venta.items()):
+            with self._lock:
+                texto = json.dumps(self._decodificar(posicion), ensure_ascii=False)
+            yield venta_id, texto
+
+    def __len__(self) -> int:
+        return len(self._filas)
+
+    def __contains__(self, venta_id: str) -> bool:
+        return venta_id in self._por_venta
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self._decodificar(posicion) for posicion in range(len(self._filas)))